@@ -0,0 +1,54 @@
+"""Benchmark autotiling: a full retile, scattered cell edits and a rectangle edit.
+
+Run from the project root::
+
+    python -m benchmarks.bench_autotile
+    python -m benchmarks.bench_autotile --sizes 2048 --edits 10000
+"""
+
+import argparse
+import random
+import time
+
+from model.autotile import Autotiler
+from model.cellular import CellularAutomataGenerator
+from model.map_data import Rect, WALLS
+
+
+def run(sizes, edits, seed):
+    rng = random.Random(seed)
+    print(f"{'size':>11} {'full (s)':>9} {'Mcells/s':>9} {'edits':>6} {'cells (ms)':>10} "
+          f"{'64x64 (ms)':>10}")
+    for size in sizes:
+        map_data = CellularAutomataGenerator(seed).generate(size, size)
+        start = time.perf_counter()
+        tiler = Autotiler(map_data)
+        full = time.perf_counter() - start
+
+        cells = [(rng.randrange(size), rng.randrange(size)) for _ in range(edits)]
+        for x, y in cells:
+            map_data.set(WALLS, x, y, rng.randrange(2))
+        start = time.perf_counter()
+        tiler.update_cells(cells)
+        scattered = time.perf_counter() - start
+
+        rect = Rect(size // 4, size // 4, 64, 64)
+        map_data.fill(WALLS, 0, *rect)
+        start = time.perf_counter()
+        tiler.update(rect)
+        block = time.perf_counter() - start
+        print(f"{size:>5}x{size:<5} {full:>9.3f} {size * size / full / 1e6:>9.1f} {edits:>6} "
+              f"{scattered * 1000:>10.2f} {block * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.edits, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Benchmark Voronoi biome partitioning across map sizes.
+
+Time per cell should stay flat as maps grow; ``--blend 0`` shows the cost
+of the row envelopes alone.
+
+Run from the project root::
+
+    python -m benchmarks.bench_biomes
+    python -m benchmarks.bench_biomes --sizes 512 2048 --spacing 32 --blend 0
+"""
+
+import argparse
+import time
+
+from model.biomes import VoronoiBiomeGenerator
+
+
+def run(sizes, spacing, blend, repeats):
+    print(f"{'size':>11} {'best s':>8} {'ns/cell':>8} {'Mcells/s':>9}")
+    for size in sizes:
+        best = None
+        for seed in range(repeats):
+            generator = VoronoiBiomeGenerator(seed=seed, spacing=spacing, blend=blend)
+            start = time.perf_counter()
+            generator.generate(size, size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        cells = size * size
+        print(f"{size:>5}x{size:<5} {best:>8.3f} {best / cells * 1e9:>8.0f} "
+              f"{cells / best / 1e6:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--spacing", type=int, default=64)
+    parser.add_argument("--blend", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+    run(args.sizes, args.spacing, args.blend, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
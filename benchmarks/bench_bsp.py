@@ -0,0 +1,37 @@
+"""Benchmark BSP dungeon generation.
+
+Run from the project root::
+
+    python -m benchmarks.bench_bsp
+    python -m benchmarks.bench_bsp --sizes 250 1000 2000 --repeats 10
+"""
+
+import argparse
+import time
+
+from model.bsp import BSPGenerator
+
+
+def run(sizes, repeats):
+    print(f"{'size':>11} {'best ms':>8} {'mean ms':>8} {'rooms':>7}")
+    for size in sizes:
+        times = []
+        for seed in range(repeats):
+            generator = BSPGenerator(seed=seed)
+            start = time.perf_counter()
+            generator.generate(size, size)
+            times.append(time.perf_counter() - start)
+        print(f"{size:>5}x{size:<5} {min(times) * 1000:>8.1f} "
+              f"{sum(times) / len(times) * 1000:>8.1f} {len(generator.rooms):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Benchmark cellular-automata cave generation.
+
+Run from the project root::
+
+    python -m benchmarks.bench_cellular
+    python -m benchmarks.bench_cellular --sizes 512 2048 4096 --iterations 5
+"""
+
+import argparse
+import time
+
+from model.cellular import CellularAutomataGenerator
+
+
+def run(sizes, iterations, repeats):
+    print(f"{'size':>11} {'iterations':>10} {'best s':>8} {'Mcells/s':>9}")
+    for size in sizes:
+        best = None
+        for seed in range(repeats):
+            generator = CellularAutomataGenerator(seed=seed, iterations=iterations)
+            start = time.perf_counter()
+            generator.generate(size, size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rate = size * size * iterations / best / 1e6
+        print(f"{size:>5}x{size:<5} {iterations:>10} {best:>8.3f} {rate:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024, 2048])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.iterations, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark chunked WFC scaling from one worker to many on a large map.
+
+Run from the project root::
+
+    python -m benchmarks.bench_chunked_wfc
+    python -m benchmarks.bench_chunked_wfc --size 1024 --workers 1 2 4
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.bench_wfc import edge_tileset
+from model.chunked_wfc import ChunkedWFCGenerator
+
+
+def run(size, tile_count, chunk_size, overlap, worker_counts, seed):
+    tileset = edge_tileset(tile_count, 3)
+    baseline = None
+    reference = None
+    print(f"{size}x{size} map, {tile_count} tiles, {chunk_size}-cell chunks")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'restarts':>9} {'identical':>10}")
+    for workers in worker_counts:
+        generator = ChunkedWFCGenerator(tileset, seed=seed, chunk_size=chunk_size,
+                                        overlap=overlap, workers=workers)
+        start = time.perf_counter()
+        tiles = generator.solve(size, size)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        reference = reference or tiles
+        print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x "
+              f"{generator.stats.restarts:>9} {str(tiles == reference):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--tiles", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=128)
+    parser.add_argument("--overlap", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.size, args.tiles, args.chunk_size, args.overlap, args.workers, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark chunk streaming while panning a viewport across an unbounded world.
+
+The first viewport and its prefetch ring are loaded up front (a loading
+screen).  Then each frame moves the viewport, calls ``set_viewport`` and
+``peek`` on every visible chunk, and sleeps out the rest of a 60 Hz frame.
+Reported are the frame times and how many frames had to draw a visible
+chunk that was not ready yet; that stays at zero as long as the pool
+generates chunks faster than the viewport uncovers them.
+
+Run from the project root::
+
+    python -m benchmarks.bench_chunks
+    python -m benchmarks.bench_chunks --frames 600 --speed 8 --workers 4
+"""
+
+import argparse
+import time
+
+from model.chunks import ChunkManager, WindowSource
+from model.map_data import Rect
+from model.noise import TerrainNoiseGenerator
+from model.store import WorldStore
+
+
+def run(frames, speed, workers, chunk_size, budget, seed):
+    source = WindowSource(TerrainNoiseGenerator(seed))
+    store = WorldStore()
+    times = []
+    missing = 0
+    with ChunkManager(source, chunk_size, budget << 20, store, workers=workers) as manager:
+        first = Rect(0, 0, 640, 384)
+        manager.set_viewport(first)
+        for key in manager.chunks_in(first.expand(manager.margin * chunk_size)):
+            manager.get(*key)
+        for frame in range(frames):
+            viewport = Rect(frame * speed, 0, 640, 384)
+            start = time.perf_counter()
+            manager.set_viewport(viewport)
+            ready = [manager.peek(*key) for key in manager.chunks_in(viewport)]
+            times.append(time.perf_counter() - start)
+            missing += None in ready
+            time.sleep(max(0.0, 1 / 60 - times[-1]))
+        print(f"frames {frames}, {speed} cells/frame, {workers} workers")
+        print(f"frame ms: mean {1000 * sum(times) / frames:.2f}, max {1000 * max(times):.2f}")
+        print(f"frames with a chunk still loading: {missing}")
+        print(f"generated {manager.generated}, loaded {manager.loaded}, "
+              f"spilled {manager.spilled}, resident {manager.resident_bytes / 2 ** 20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--speed", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--budget", type=int, default=16, help="memory budget in MiB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.frames, args.speed, args.workers, args.chunk_size, args.budget, args.seed)
+
+
+if __name__ == "__main__":
+    main()
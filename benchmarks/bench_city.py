@@ -0,0 +1,46 @@
+"""Benchmark the city generator (road growth, rasterising, blocks and lots).
+
+The last column regenerates a 32x32 window in the middle of the city; it
+should stay flat as the map grows.
+
+Run from the project root::
+
+    python -m benchmarks.bench_city
+    python -m benchmarks.bench_city --sizes 576 1024
+"""
+
+import argparse
+import time
+
+from model.city import CityGenerator
+from model.map_data import Rect
+
+
+def run(sizes, seed):
+    print(f"{'size':>11} {'seconds':>8} {'segments':>9} {'blocks':>7} {'lots':>6} "
+          f"{'region ms':>10}")
+    for size in sizes:
+        generator = CityGenerator(seed)
+        start = time.perf_counter()
+        map_data = generator.generate(size, size)
+        elapsed = time.perf_counter() - start
+        counts = (len(generator.network.live_segments()), len(generator.blocks),
+                  len(generator.lots))
+        start = time.perf_counter()
+        generator.regenerate(map_data, Rect(size // 2 - 16, size // 2 - 16, 32, 32), margin=4,
+                             variant=1)
+        region = time.perf_counter() - start
+        print(f"{size:>5}x{size:<5} {elapsed:>8.2f} {counts[0]:>9} {counts[1]:>7} {counts[2]:>6} "
+              f"{1000 * region:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 576, 1024])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
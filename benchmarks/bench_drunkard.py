@@ -0,0 +1,42 @@
+"""Benchmark Drunkard's Walk cave generation.
+
+Run from the project root::
+
+    python -m benchmarks.bench_drunkard
+    python -m benchmarks.bench_drunkard --sizes 512 1024 --walkers 8 64 --workers 4
+"""
+
+import argparse
+import time
+
+from model.drunkard import DrunkardsWalkGenerator
+from model.map_data import WALLS, OPEN
+
+
+def run(sizes, walker_counts, repeats, workers):
+    print(f"{'size':>11} {'walkers':>8} {'best ms':>8} {'mean ms':>8} {'Mcells/s':>9}")
+    for size in sizes:
+        for walkers in walker_counts:
+            times = []
+            for seed in range(repeats):
+                generator = DrunkardsWalkGenerator(seed=seed, walkers=walkers, workers=workers)
+                start = time.perf_counter()
+                map_data = generator.generate(size, size)
+                times.append(time.perf_counter() - start)
+            carved = map_data.layer(WALLS).count(OPEN)
+            print(f"{size:>5}x{size:<5} {walkers:>8} {min(times) * 1000:>8.1f} "
+                  f"{sum(times) / len(times) * 1000:>8.1f} {carved / min(times) / 1e6:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--walkers", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    run(args.sizes, args.walkers, args.repeats, args.workers)
+
+
+if __name__ == "__main__":
+    main()
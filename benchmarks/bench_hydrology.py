@@ -0,0 +1,55 @@
+"""Benchmark the hydrology pass (priority-flood, flow and accumulation).
+
+Each size is timed for a whole pass, then for the pass after a 64x64
+window a third of the way in is given new terrain, which floods again only
+the band the window lies in.  Terrain generation is not timed.
+
+Run from the project root::
+
+    python -m benchmarks.bench_hydrology
+    python -m benchmarks.bench_hydrology --sizes 1024 4096 --workers 4
+"""
+
+import argparse
+import time
+
+from model.generator import dirty_window
+from model.hydrology import BAND_ROWS, Hydrology, LAKE, RIVER
+from model.map_data import Rect, WATER
+from model.noise import TerrainNoiseGenerator
+
+
+def run(sizes, seed, band, workers):
+    print(f"{'size':>11} {'workers':>7} {'seconds':>8} {'Mcells/s':>9} {'region s':>9} "
+          f"{'river %':>8} {'lake %':>7}")
+    for size in sizes:
+        terrain = TerrainNoiseGenerator(seed)
+        map_data = terrain.generate(size, size)
+        hydrology = Hydrology(band=band, workers=workers)
+        start = time.perf_counter()
+        hydrology.apply(map_data)
+        elapsed = time.perf_counter() - start
+        water = map_data.layer(WATER)
+        cells = size * size
+        rivers, lakes = water.count(RIVER), water.count(LAKE)
+        rect = Rect(size // 3, size // 3, 64, 64)
+        terrain.regenerate(map_data, rect, variant=1)
+        start = time.perf_counter()
+        hydrology.apply(map_data, dirty_window(map_data, rect, 2))
+        region = time.perf_counter() - start
+        print(f"{size:>5}x{size:<5} {workers:>7} {elapsed:>8.2f} {cells / elapsed / 1e6:>9.2f} "
+              f"{region:>9.2f} {100 * rivers / cells:>8.2f} {100 * lakes / cells:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 4096])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--band", type=int, default=BAND_ROWS)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    run(args.sizes, args.seed, args.band, args.workers)
+
+
+if __name__ == "__main__":
+    main()
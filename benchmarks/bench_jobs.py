@@ -0,0 +1,88 @@
+"""Benchmark generation jobs: checkpoint spacing and cancellation latency per generator.
+
+Each generator runs once as a job to completion, recording the longest
+stretch between checkpoints (the worst case for a cancel) and how many
+progress and preview callbacks fired.  It then runs again, is cancelled a
+third of the way through its first run's time, and the time from
+:meth:`Job.cancel` to the job ending is reported.  The target is 50 ms.
+
+Run from the project root::
+
+    python -m benchmarks.bench_jobs
+    python -m benchmarks.bench_jobs --size 512 --generators wfc cellular
+"""
+
+import argparse
+import threading
+import time
+
+from model.biomes import VoronoiBiomeGenerator
+from model.bsp import BSPGenerator
+from model.cellular import CellularAutomataGenerator
+from model.chunked_wfc import ChunkedWFCGenerator
+from model.city import CityGenerator
+from model.drunkard import DrunkardsWalkGenerator
+from model.hydrology import HydrologyGenerator
+from model.noise import TerrainNoiseGenerator
+from model.pipeline import Pipeline, standard_stages
+from model.scatter import PoissonScatterGenerator
+from model.tileset import Tileset
+from model.wfc import WFCGenerator
+
+
+def road_tileset():
+    return Tileset.from_edges([(a, b, c, d) for a in "gr" for b in "gr"
+                               for c in "gr" for d in "gr"])
+
+
+GENERATORS = {
+    "bsp": lambda seed: BSPGenerator(seed),
+    "cellular": lambda seed: CellularAutomataGenerator(seed, connected=True),
+    "drunkard": lambda seed: DrunkardsWalkGenerator(seed),
+    "noise": lambda seed: TerrainNoiseGenerator(seed),
+    "biomes": lambda seed: VoronoiBiomeGenerator(seed),
+    "hydrology": lambda seed: HydrologyGenerator(seed),
+    "scatter": lambda seed: PoissonScatterGenerator(seed),
+    "city": lambda seed: CityGenerator(seed),
+    "wfc": lambda seed: WFCGenerator(road_tileset(), seed),
+    "chunked-wfc": lambda seed: ChunkedWFCGenerator(road_tileset(), seed),
+    "pipeline": lambda seed: Pipeline(standard_stages(road_tileset()), seed),
+}
+
+
+def run(names, size, seed):
+    print(f"{'generator':<12} {'run s':>7} {'gap ms':>7} {'updates':>8} {'previews':>9} "
+          f"{'cancel ms':>10}")
+    for name in names:
+        counts = {"progress": 0, "preview": 0}
+        job = GENERATORS[name](seed).job(
+            size, size,
+            on_progress=lambda fraction: counts.__setitem__("progress", counts["progress"] + 1),
+            on_preview=lambda preview: counts.__setitem__("preview", counts["preview"] + 1))
+        job.run()
+        # A fresh generator, so pipeline stages are not served from its cache.
+        again = GENERATORS[name](seed).job(size, size).start()
+        time.sleep(job.elapsed / 3)
+        start = time.perf_counter()
+        again.cancel()
+        again.wait()
+        latency = time.perf_counter() - start
+        while threading.active_count() > 1:  # let it free its buffers before the next run
+            time.sleep(0.01)
+        state = "" if again.state == again.CANCELLED else f" ({again.state})"
+        print(f"{name:<12} {job.elapsed:>7.2f} {1000 * job.longest_gap:>7.1f} "
+              f"{counts['progress']:>8} {counts['preview']:>9} {1000 * latency:>10.1f}{state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS),
+                        default=list(GENERATORS))
+    args = parser.parse_args()
+    run(args.generators, args.size, args.seed)
+
+
+if __name__ == "__main__":
+    main()
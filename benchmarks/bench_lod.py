@@ -0,0 +1,82 @@
+"""Benchmark mip pyramids: full builds, incremental updates and world overviews.
+
+The maps are random (terrain classes, walls and 16-bit heights) so the
+reducers never hit a shortcut.  The overview case tiles a world of
+``--world`` cells square into 64-cell chunk thumbnails at 1/8 scale, then
+times picking a level of at most 1024x1024 and colouring its terrain - what
+a zoomed-out viewer does per frame.
+
+Run from the project root::
+
+    python -m benchmarks.bench_lod
+    python -m benchmarks.bench_lod --sizes 1024 2048 --world 16384
+"""
+
+import argparse
+import random
+import time
+from array import array
+
+from model.lod import MipPyramid, WorldOverview
+from model.map_data import MapData, Rect, HEIGHT, TERRAIN, WALLS
+
+PALETTE = bytes(range(0, 256, 32)) * 32
+
+
+def random_map(width, height, rng):
+    map_data = MapData(width, height, layers=(TERRAIN, WALLS))
+    size = width * height
+    map_data.layer(TERRAIN)[:] = array("B", rng.randbytes(size).translate(bytes(range(8)) * 32))
+    map_data.layer(WALLS)[:] = array("B", rng.randbytes(size).translate(
+        bytes([0] * 200 + [1] * 56)))
+    map_data.add_layer(HEIGHT, "H")[:] = array("H", rng.randbytes(2 * size))
+    return map_data
+
+
+def run(sizes, world, seed):
+    rng = random.Random(seed)
+    print(f"{'size':>11} {'build s':>8} {'Mcells/s':>9} {'64x64 edit ms':>14}")
+    for size in sizes:
+        map_data = random_map(size, size, rng)
+        start = time.perf_counter()
+        pyramid = MipPyramid(map_data)
+        elapsed = time.perf_counter() - start
+        map_data.fill(TERRAIN, 7, size // 2, size // 2, 64, 64)
+        edit_start = time.perf_counter()
+        pyramid.update(Rect(size // 2, size // 2, 64, 64))
+        edit = time.perf_counter() - edit_start
+        print(f"{size:>5}x{size:<5} {elapsed:>8.2f} {size * size / elapsed / 1e6:>9.2f} "
+              f"{1000 * edit:>14.2f}")
+
+    chunks = world // 64
+    overview = WorldOverview(Rect(0, 0, chunks, chunks), 64, level=3)
+    chunk = random_map(64, 64, rng)
+    overview.update(0, 0, chunk)  # allocates the mosaic
+    start = time.perf_counter()
+    overview.update(1, 0, chunk)
+    update = time.perf_counter() - start
+    # Stand in for a fully explored world: fill the mosaic directly and
+    # build its pyramid once, instead of reporting every chunk.
+    tile = random_map(overview.mosaic.width, overview.mosaic.height, rng)
+    for name in overview.mosaic.layer_names:
+        overview.mosaic.layer(name)[:] = tile.layer(name)
+    overview.pyramid.refresh()
+    start = time.perf_counter()
+    level = overview.level_for(1024, 1024)
+    pixels = level.layer(TERRAIN).tobytes().translate(PALETTE)
+    render = time.perf_counter() - start
+    print(f"overview of {world}x{world}: chunk update {1000 * update:.2f} ms, "
+          f"{level.width}x{level.height} render {1000 * render:.2f} ms ({len(pixels)} px)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024])
+    parser.add_argument("--world", type=int, default=16384)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.world, args.seed)
+
+
+if __name__ == "__main__":
+    main()
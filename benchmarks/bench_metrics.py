@@ -0,0 +1,47 @@
+"""Benchmark map quality metrics on generated dungeons and caves.
+
+Run from the project root::
+
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --sizes 512 2048
+"""
+
+import argparse
+import time
+
+from model.bsp import BSPGenerator
+from model.cellular import CellularAutomataGenerator
+from model.drunkard import DrunkardsWalkGenerator
+from model.metrics import map_metrics
+
+GENERATORS = {
+    "bsp": BSPGenerator,
+    "cellular": CellularAutomataGenerator,
+    "drunkard": DrunkardsWalkGenerator,
+}
+
+
+def run(sizes, seed):
+    print(f"{'generator':<10} {'size':>11} {'seconds':>8} {'Mcells/s':>9} {'rooms':>6} "
+          f"{'loops':>6} {'dead ends':>9}")
+    for name, factory in GENERATORS.items():
+        for size in sizes:
+            map_data = factory(seed).generate(size, size)
+            start = time.perf_counter()
+            metrics = map_metrics(map_data)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {size:>5}x{size:<5} {elapsed:>8.3f} "
+                  f"{size * size / elapsed / 1e6:>9.2f} {metrics.rooms:>6} {metrics.loops:>6} "
+                  f"{metrics.dead_ends:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
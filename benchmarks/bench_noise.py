@@ -0,0 +1,54 @@
+"""Benchmark gradient-noise throughput in samples per second.
+
+Compares one whole-map region against the same area requested chunk by
+chunk, where adjacent chunks share cached low-frequency octave tiles.
+
+Run from the project root::
+
+    python -m benchmarks.bench_noise
+    python -m benchmarks.bench_noise --size 2048 --chunk 64 --octaves 6
+"""
+
+import argparse
+import time
+
+from model.noise import GradientNoise
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(size, chunk, octaves, repeats):
+    samples = size * size
+    print(f"{'mode':>8} {'best s':>8} {'Msamples/s':>11} {'Moctave-samples/s':>18}")
+
+    def whole():
+        GradientNoise(0, octaves=octaves).region(0, 0, size, size)
+
+    def chunked():
+        noise = GradientNoise(0, octaves=octaves)
+        for cy in range(size // chunk):
+            for cx in range(size // chunk):
+                noise.chunk(cx, cy, chunk)
+
+    for name, fn in (("region", whole), ("chunks", chunked)):
+        best = min(_timed(fn) for _ in range(repeats))
+        rate = samples / best / 1e6
+        print(f"{name:>8} {best:>8.3f} {rate:>11.2f} {rate * octaves:>18.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--chunk", type=int, default=64)
+    parser.add_argument("--octaves", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.chunk, args.octaves, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
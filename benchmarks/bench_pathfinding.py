@@ -0,0 +1,78 @@
+"""Benchmark shortest-path queries between random open cells.
+
+Compares A*, Jump Point Search and descent through cached Dijkstra distance
+fields (queries cycle over a handful of goals, so fields are reused).
+
+Run from the project root::
+
+    python -m benchmarks.bench_pathfinding
+    python -m benchmarks.bench_pathfinding --map caves --size 512 --queries 200
+"""
+
+import argparse
+import random
+import time
+
+from model.bsp import BSPGenerator
+from model.cellular import CellularAutomataGenerator
+from model.connectivity import label
+from model.pathfinding import PathFinder
+
+MAPS = {
+    "dungeon": lambda seed: BSPGenerator(seed=seed),
+    "caves": lambda seed: CellularAutomataGenerator(seed=seed, connected=True),
+}
+
+
+def open_cells(map_data, count, rng):
+    regions, _ = label(map_data)
+    runs = [run for region in regions for run in region.runs]
+    cells = []
+    for _ in range(count):
+        y, x0, x1 = rng.choice(runs)
+        cells.append((rng.randrange(x0, x1), y))
+    return cells
+
+
+def run(kind, size, queries, goals, seed):
+    map_data = MAPS[kind](seed).generate(size, size)
+    rng = random.Random(seed)
+    starts = open_cells(map_data, queries, rng)
+    targets = open_cells(map_data, goals, rng)
+    pairs = [(start, targets[i % goals]) for i, start in enumerate(starts)]
+    print(f"{kind} {size}x{size}, {queries} queries")
+    print(f"{'method':>8} {'total s':>8} {'ms/query':>9} {'expanded':>9}")
+
+    for name in ("jps", "astar"):
+        finder = PathFinder(map_data)
+        search = getattr(finder, name)
+        expanded = 0
+        start = time.perf_counter()
+        for source, target in pairs:
+            search(source, target)
+            expanded += finder.expanded
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8} {elapsed:>8.2f} {elapsed / queries * 1000:>9.2f} "
+              f"{expanded // queries:>9}")
+
+    finder = PathFinder(map_data)
+    start = time.perf_counter()
+    for source, target in pairs:
+        finder.distance_field([target]).path(*source)
+    elapsed = time.perf_counter() - start
+    print(f"{'field':>8} {elapsed:>8.2f} {elapsed / queries * 1000:>9.2f} {'-':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--map", choices=sorted(MAPS), default="dungeon")
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--goals", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.map, args.size, args.queries, args.goals, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark the standard pipeline: a cold run, a warm run and a props-only change.
+
+The warm run repeats the cold one and should restore every stage from the
+cache; the third run changes the prop spacing, so only the props stage
+should do any work.  Last, a 32x32 window in the middle is regenerated
+twice: once on the map, once on a fresh copy, which the stage cache
+should answer without running anything.
+
+Run from the project root::
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --size 512
+"""
+
+import argparse
+
+from model.map_data import Rect
+from model.pipeline import Pipeline, standard_stages
+from model.tileset import Tileset
+
+
+def road_tileset():
+    return Tileset.from_edges([(a, b, c, d) for a in "gr" for b in "gr"
+                               for c in "gr" for d in "gr"])
+
+
+def run(size, seed):
+    pipeline = Pipeline(standard_stages(road_tileset()), seed=seed)
+    for label in ("cold", "warm", "props"):
+        if label == "props":
+            pipeline.configure("props", r_min=4.0)
+        map_data = pipeline.generate(size, size)
+        print(f"-- {label} run, {size}x{size}")
+        print(pipeline.report)
+    rect = Rect(size // 2 - 16, size // 2 - 16, 32, 32)
+    for label in ("region", "cached region"):
+        if label == "cached region":
+            map_data = pipeline.generate(size, size)
+        pipeline.regenerate(map_data, rect, margin=4, variant=1)
+        print(f"-- {label} run, 32x32 in {size}x{size}")
+        print(pipeline.report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.size, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark region re-runs against map size for the cave and WFC generators.
+
+A 32x32 dirty rectangle (plus a 4-cell margin) is regenerated in maps of
+growing size; its cost should stay flat while a full generation grows with
+the map.  The connected caves (the ``main.py`` default) also rejoin the
+window's caves to the passages around it.  The WFC map starts as
+all-grass, which is already a solution, so only the re-run is timed.
+
+Run from the project root::
+
+    python -m benchmarks.bench_regenerate
+    python -m benchmarks.bench_regenerate --sizes 256 1024 2048
+"""
+
+import argparse
+import time
+
+from model.cellular import CellularAutomataGenerator
+from model.map_data import Rect, TERRAIN
+from model.tileset import Tileset
+from model.wfc import WFCGenerator
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run(sizes, seed):
+    edges = [(a, b, c, d) for a in "gr" for b in "gr" for c in "gr" for d in "gr"]
+    wfc = WFCGenerator(Tileset.from_edges(edges), seed)
+    caves = CellularAutomataGenerator(seed)
+    connected = CellularAutomataGenerator(seed, connected=True)
+    print(f"{'size':>11} {'cave full s':>12} {'cave region ms':>15} {'connected ms':>13} "
+          f"{'wfc region ms':>14}")
+    for size in sizes:
+        rect = Rect(size // 2 - 16, size // 2 - 16, 32, 32)
+        start = time.perf_counter()
+        cave_map = caves.generate(size, size)
+        full = time.perf_counter() - start
+        cave = timed(caves.regenerate, cave_map, rect, margin=4, variant=1)
+        joined = timed(connected.regenerate, cave_map, rect, margin=4, variant=1)
+        wfc_map = wfc.new_map(size, size)
+        wfc_map.fill(TERRAIN, edges.index(("g", "g", "g", "g")))
+        tiles = timed(wfc.regenerate, wfc_map, rect, margin=4, variant=1)
+        print(f"{size:>5}x{size:<5} {full:>12.3f} {1000 * cave:>15.2f} {1000 * joined:>13.2f} "
+              f"{1000 * tiles:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 512, 2048])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
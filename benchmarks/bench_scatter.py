@@ -0,0 +1,38 @@
+"""Benchmark Poisson-disk prop scattering in points per second.
+
+Run from the project root::
+
+    python -m benchmarks.bench_scatter
+    python -m benchmarks.bench_scatter --sizes 512 1024 --radius 3 --workers 4
+"""
+
+import argparse
+import time
+
+from model.scatter import PoissonScatterGenerator
+
+
+def run(sizes, radius, chunk_size, workers):
+    print(f"{'size':>11} {'seconds':>8} {'props':>8} {'props/s':>9}")
+    for size in sizes:
+        generator = PoissonScatterGenerator(seed=0, r_min=radius, chunk_size=chunk_size,
+                                            workers=workers)
+        start = time.perf_counter()
+        map_data = generator.generate(size, size)
+        elapsed = time.perf_counter() - start
+        count = len(map_data.prop_layer())
+        print(f"{size:>5}x{size:<5} {elapsed:>8.2f} {count:>8} {count / elapsed:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--radius", type=float, default=3.0)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    run(args.sizes, args.radius, args.chunk_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
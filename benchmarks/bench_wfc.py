@@ -0,0 +1,64 @@
+"""Benchmark the WFC solver across grid sizes and tile counts.
+
+Run from the project root::
+
+    python -m benchmarks.bench_wfc
+    python -m benchmarks.bench_wfc --sizes 64 128 256 --tiles 10 100
+"""
+
+import argparse
+import random
+import time
+
+from model.tileset import Tileset
+from model.wfc import WFCSolver, ContradictionError
+
+
+def edge_tileset(tile_count, labels=3, seed=0):
+    """Random edge-labelled tileset; two tiles touch when the shared edge labels match."""
+    rng = random.Random(seed)
+    edges = set()
+    while len(edges) < tile_count:
+        edges.add(tuple(rng.randrange(labels) for _ in range(4)))
+    edges = sorted(edges)
+    weights = [rng.uniform(0.5, 2.0) for _ in edges]
+    return Tileset.from_edges(edges, weights)
+
+
+def run(sizes, tile_counts, repeats):
+    print(f"{'size':>9} {'tiles':>6} {'seconds':>9} {'cells/s':>10} {'restarts':>9}")
+    for tile_count in tile_counts:
+        # Labels grow with the tile count so every requested size is reachable.
+        labels = 2
+        while labels ** 4 < tile_count:
+            labels += 1
+        tileset = edge_tileset(tile_count, labels)
+        for size in sizes:
+            best = None
+            restarts = 0
+            for repeat in range(repeats):
+                solver = WFCSolver(tileset, size, size, random.Random(repeat))
+                try:
+                    solver.solve()
+                except ContradictionError:
+                    pass
+                restarts += solver.stats.restarts
+                if best is None or solver.stats.elapsed < best:
+                    best = solver.stats.elapsed
+            print(f"{size:>4}x{size:<4} {tile_count:>6} {best:>9.3f} "
+                  f"{size * size / best:>10.0f} {restarts:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--tiles", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    run(args.sizes, args.tiles, args.repeats)
+    print(f"total {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare restart-only WFC with trail backtracking on constrained tilesets.
+
+Reports latency percentiles over many seeds; the interesting column is p99.
+Run from the project root::
+
+    python -m benchmarks.bench_wfc_recovery
+    python -m benchmarks.bench_wfc_recovery --size 64 --seeds 200
+"""
+
+import argparse
+import random
+
+from benchmarks.bench_wfc import edge_tileset
+from model.tileset import compile_tileset
+from model.wfc import WFCSolver, ContradictionError
+
+# Streets and canals that may only cross at bridges.
+CITY_ROADS = {
+    "tiles": [
+        {"name": "lot", "weight": 0.5, "edges": ["g", "g", "g", "g"]},
+        {"name": "street", "symmetry": "I", "edges": ["g", "r", "g", "r"]},
+        {"name": "corner", "symmetry": "L", "edges": ["r", "r", "g", "g"]},
+        {"name": "junction", "symmetry": "T", "edges": ["g", "r", "r", "r"]},
+        {"name": "canal", "symmetry": "I", "edges": ["g", "w", "g", "w"]},
+        {"name": "canal-bend", "symmetry": "L", "edges": ["w", "w", "g", "g"]},
+        {"name": "bridge", "symmetry": "I", "edges": ["w", "r", "w", "r"]},
+    ],
+}
+
+TILESETS = {
+    "city-roads": lambda: compile_tileset(CITY_ROADS),
+    "dungeon-walls": lambda: edge_tileset(30, 4),
+    "dense-60": lambda: edge_tileset(60, 5),
+}
+
+MODES = {
+    "restart": dict(max_backtracks=0, max_local_resets=0),
+    "backtrack": dict(),
+}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run(size, seeds, max_restarts):
+    print(f"{size}x{size}, {seeds} seeds per row")
+    print(f"{'tileset':>14} {'mode':>10} {'p50':>8} {'p90':>8} {'p99':>8} "
+          f"{'failed':>7} {'restarts':>9} {'backtracks':>11} {'resets':>7}")
+    for name, build in TILESETS.items():
+        tileset = build()
+        for mode, options in MODES.items():
+            times, failed = [], 0
+            restarts = backtracks = resets = 0
+            for seed in range(seeds):
+                solver = WFCSolver(tileset, size, size, random.Random(seed),
+                                   max_restarts=max_restarts, **options)
+                try:
+                    solver.solve()
+                except ContradictionError:
+                    failed += 1
+                times.append(solver.stats.elapsed)
+                restarts += solver.stats.restarts
+                backtracks += solver.stats.backtracks
+                resets += solver.stats.local_resets
+            times.sort()
+            print(f"{name:>14} {mode:>10} {percentile(times, 0.5):>8.3f} "
+                  f"{percentile(times, 0.9):>8.3f} {percentile(times, 0.99):>8.3f} "
+                  f"{failed:>7} {restarts:>9} {backtracks:>11} {resets:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=48)
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--max-restarts", type=int, default=50)
+    args = parser.parse_args()
+    run(args.size, args.seeds, args.max_restarts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""InfiniteWorlds command line: run a generator as a job, headless or in the main window.
+
+Run from the project root::
+
+    python main.py generate cellular --size 256 --seed 7 --out cave.png
+    python main.py generate pipeline --size 512 --out world.iwmd --previews previews
+    python main.py generate wfc --store worlds.db --tileset roads --out roads.png
+    python main.py search bsp --size 96 --candidates 64 --top 5 --workers 4 \
+        --require connectivity=1: --require rooms=12:
+    python main.py gui
+
+A ``.png`` output is a greyscale image of the map's main layer (``--layer``
+picks another); any other name gets the map's binary form
+(:meth:`MapData.to_bytes`).  Progress goes to stderr.  Ctrl-C, or
+``--timeout`` seconds passing, cancels the job at its next checkpoint.
+
+``search`` scores seeds ``--first`` onwards with :mod:`model.seed_search`
+and prints the best; ``--require name=low:high`` (either bound optional)
+rejects candidates outside it.  ``--out`` saves the winner.
+"""
+
+import argparse
+import os
+import sys
+from functools import partial
+
+from model.biomes import VoronoiBiomeGenerator
+from model.bsp import BSPGenerator
+from model.cellular import CellularAutomataGenerator
+from model.city import CityGenerator
+from model.drunkard import DrunkardsWalkGenerator
+from model.hydrology import HydrologyGenerator
+from model.image_io import grey_levels, grey_pixels, write_png
+from model.jobs import Job
+from model.noise import TerrainNoiseGenerator
+from model.pipeline import Pipeline, standard_stages
+from model.scatter import PoissonScatterGenerator
+from model.seed_search import SeedSearch
+
+
+def pipeline(seed):
+    return Pipeline(standard_stages(), seed)
+
+
+# Factories taking a seed; picklable, so seed search can ship them to workers.
+GENERATORS = {
+    "bsp": BSPGenerator,
+    "cellular": partial(CellularAutomataGenerator, connected=True),
+    "drunkard": DrunkardsWalkGenerator,
+    "noise": TerrainNoiseGenerator,
+    "biomes": VoronoiBiomeGenerator,
+    "hydrology": HydrologyGenerator,
+    "scatter": PoissonScatterGenerator,
+    "city": CityGenerator,
+    "pipeline": pipeline,
+}
+
+
+def save(map_data, path, layer=None):
+    if path.lower().endswith(".png"):
+        _, levels = grey_levels(map_data, layer)
+        write_png(path, map_data.width, map_data.height, grey_pixels(levels))
+    else:
+        with open(path, "wb") as handle:
+            handle.write(map_data.to_bytes())
+
+
+def make_factory(args):
+    if args.generator != "wfc":
+        return GENERATORS[args.generator]
+    if not (args.store and args.tileset):
+        raise SystemExit("wfc needs --store and --tileset")
+    from model.store import WorldStore
+    from model.wfc import WFCGenerator
+    key = int(args.tileset) if args.tileset.isdigit() else args.tileset
+    tileset = WorldStore(args.store).load_compiled(key)
+    if tileset is None:
+        raise SystemExit(f"unknown tileset {args.tileset!r}")
+    return partial(WFCGenerator, tileset)
+
+
+def make_generator(args):
+    return make_factory(args)(args.seed)
+
+
+class ProgressBar:
+    """Text progress bar on stderr, redrawn in place."""
+
+    def __init__(self, label, width=40, stream=sys.stderr):
+        self.label = label
+        self.width = width
+        self.stream = stream
+
+    def __call__(self, fraction):
+        filled = int(fraction * self.width)
+        self.stream.write(f"\r{self.label} [{'#' * filled}{'.' * (self.width - filled)}] "
+                          f"{fraction:4.0%}")
+        self.stream.flush()
+
+    def close(self, message):
+        self.stream.write(f"\r{self.label} {message}".ljust(self.width + len(self.label) + 8))
+        self.stream.write("\n")
+
+
+def generate(args):
+    generator = make_generator(args)
+    bar = ProgressBar(args.generator)
+    previews = []
+
+    def on_preview(map_data):
+        path = os.path.join(args.previews, f"preview-{len(previews):03d}.png")
+        save(map_data, path, args.layer if map_data.has_layer(args.layer or "") else None)
+        previews.append(path)
+
+    if args.previews:
+        os.makedirs(args.previews, exist_ok=True)
+    job = generator.job(args.size, args.size, on_progress=bar,
+                        on_preview=on_preview if args.previews else None)
+    job.start()
+    try:
+        if not job.wait(args.timeout):
+            job.cancel()
+            job.wait()
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+    if job.state == Job.CANCELLED:
+        bar.close(f"cancelled after {job.elapsed:.2f} s")
+        return 130
+    if job.state == Job.FAILED:
+        bar.close(f"failed: {job.error}")
+        return 1
+    bar.close(f"done in {job.elapsed:.2f} s ({len(previews)} previews)")
+    if args.out:
+        save(job.result, args.out, args.layer)
+    return 0
+
+
+def parse_constraint(text):
+    """``"name=low:high"`` -> ``(name, (low, high))``; an empty bound is ``None``."""
+    name, _, bounds = text.partition("=")
+    low, _, high = bounds.partition(":")
+    try:
+        return name, (float(low) if low else None, float(high) if high else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected name=low:high, got {text!r}")
+
+
+def search(args):
+    seed_search = SeedSearch(make_factory(args), args.size, args.size, top=args.top,
+                             constraints=dict(args.require), workers=args.workers)
+    bar = ProgressBar(f"search {args.generator}")
+    job = Job(seed_search.run, range(args.first, args.first + args.candidates),
+              on_progress=bar)
+    job.start()
+    try:
+        job.wait()
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+    if job.state != Job.FINISHED:
+        bar.close(job.state)
+        return 130 if job.state == Job.CANCELLED else 1
+    rejected = ", ".join(f"{count} {name}" for name, count in sorted(seed_search.rejected.items()))
+    bar.close(f"done in {job.elapsed:.2f} s (rejected: {rejected or 'none'})")
+    for candidate in job.result:
+        metrics = " ".join(f"{name}={value:.3g}" for name, value in candidate.metrics.items())
+        print(f"seed {candidate.seed:>8} score {candidate.score:>9.2f}  {metrics}")
+    if args.out and job.result:
+        save(seed_search.generate(job.result[0]), args.out, args.layer)
+    return 0
+
+
+def gui(args):
+    from PyQt6.QtWidgets import QApplication
+    from view.main_window import MainWindow
+
+    app = QApplication(sys.argv[:1])
+    window = MainWindow(GENERATORS, args.size)
+    window.show()
+    return app.exec()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("generate", help="generate one map headless")
+    best = commands.add_parser("search", help="search seeds for the best-scoring maps")
+    for command in (run, best):
+        command.add_argument("generator", choices=sorted(GENERATORS) + ["wfc"])
+        command.add_argument("--size", type=int, default=256)
+        command.add_argument("--out", help="output path (.png for an image)")
+        command.add_argument("--layer", help="layer to draw in PNG output and previews")
+        command.add_argument("--store", help="world database holding the WFC tileset")
+        command.add_argument("--tileset", help="tileset id, name or biome in --store")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--previews", metavar="DIR", help="write partial results here as PNGs")
+    run.add_argument("--timeout", type=float, help="cancel after this many seconds")
+    run.set_defaults(action=generate)
+    best.add_argument("--first", type=int, default=0, help="first seed to try")
+    best.add_argument("--candidates", type=int, default=32)
+    best.add_argument("--top", type=int, default=5)
+    best.add_argument("--workers", type=int, default=1)
+    best.add_argument("--require", type=parse_constraint, action="append", default=[],
+                      metavar="NAME=LOW:HIGH", help="hard constraint on a metric")
+    best.set_defaults(action=search)
+    window = commands.add_parser("gui", help="open the main window")
+    window.add_argument("--size", type=int, default=256)
+    window.set_defaults(action=gui)
+    args = parser.parse_args(argv)
+    return args.action(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
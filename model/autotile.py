@@ -0,0 +1,155 @@
+"""Autotiling: pick each cell's tile variant from its 8-neighbour mask (47-tile blob).
+
+A cell's mask has bit ``i`` set when its neighbour in direction ``i``
+(clockwise from north-west, as :func:`model.packed.neighbour_offsets`)
+connects to it, i.e. holds a ``match`` value.  A corner only matters to the
+art when both edges beside it connect, so dropping the other corner bits
+folds the 256 masks onto 47 distinct shapes - the "blob" tileset.
+:data:`BLOB_TABLE` maps a raw mask straight to its shape index and
+:data:`BLOB_MASKS` lists the reduced mask of each shape.
+
+Masks for a whole layer, or a rectangle of it, come from one
+:func:`model.packed.neighbour_mask` over a bordered copy - eight shifts of
+one big integer - and go to tile ids through a single ``bytes.translate``.
+Single-cell edits only touch the mask bits of the eight neighbours, so
+:meth:`Autotiler.update_cells` patches those bits instead of recomputing
+anything.
+"""
+
+from array import array
+
+from model import packed
+from model.map_data import Rect, WALLS, SOLID
+
+AUTOTILE = "autotile"
+
+# Tile value of cells that do not match.
+NO_TILE = 0xFF
+
+NW, N, NE, E, SE, S, SW, W = (1 << bit for bit in range(8))
+
+# Neighbour directions in mask bit order.
+_DIRECTIONS = ((-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0))
+
+# Each corner with the two edges it needs.
+_CORNERS = ((NW, N | W), (NE, N | E), (SE, S | E), (SW, S | W))
+
+
+def blob_mask(mask):
+    """``mask`` without the corner bits whose neighbouring edges are not both set."""
+    for corner, edges in _CORNERS:
+        if mask & edges != edges:
+            mask &= ~corner
+    return mask
+
+
+BLOB_MASKS = tuple(sorted({blob_mask(mask) for mask in range(256)}))
+BLOB_TABLE = bytes(BLOB_MASKS.index(blob_mask(mask)) for mask in range(256))
+
+
+class Autotiler:
+    """Keeps layer ``target`` of ``map_data`` tiled from the cells of ``layer`` in ``match``.
+
+    Matching cells get a blob shape index from 0 to 46, or ``tiles[index]``
+    when a tilesheet order is given; other cells get :data:`NO_TILE`.  With
+    ``edge`` true the world beyond the map edge counts as matching, so walls
+    run off the map instead of being capped.  After editing ``layer`` call
+    :meth:`update_cells` with the edited cells or :meth:`update` with an
+    edited rectangle; :meth:`refresh` retiles after unknown edits.
+    """
+
+    def __init__(self, map_data, layer=WALLS, match=(SOLID,), target=AUTOTILE, tiles=None,
+                 edge=True, build=True):
+        if tiles is not None and len(tiles) != len(BLOB_MASKS):
+            raise ValueError(f"tiles must give one tile id per blob shape ({len(BLOB_MASKS)})")
+        if tiles is not None and any(not 0 <= tile < NO_TILE for tile in tiles):
+            raise ValueError(f"tile ids must lie in 0..{NO_TILE - 1}")
+        if map_data.layer(layer).itemsize != 1:
+            raise ValueError("autotiling needs a one-byte-per-cell layer")
+        self.map_data = map_data
+        self.layer = layer
+        self.target = target
+        self.edge = 1 if edge else 0
+        self._match = bytes(1 if value in match else 0 for value in range(256))
+        order = tiles if tiles is not None else range(len(BLOB_MASKS))
+        self._tiles = bytes(order[BLOB_TABLE[mask]] for mask in range(256))
+        self.masks = bytearray(map_data.width * map_data.height)
+        if not map_data.has_layer(target):
+            map_data.add_layer(target, fill=NO_TILE)
+        self._revision = None
+        if build:
+            self.update(Rect(0, 0, map_data.width, map_data.height))
+
+    def _cells(self, y, x0, x1):
+        """0/1 match flags for row ``y`` from ``x0`` to ``x1``, with the edge value outside."""
+        map_data = self.map_data
+        width = map_data.width
+        if not 0 <= y < map_data.height:
+            return bytes([self.edge]) * (x1 - x0)
+        lo, hi = max(x0, 0), min(x1, width)
+        row = map_data.layer(self.layer)[y * width + lo:y * width + hi]
+        edge = bytes([self.edge])
+        return edge * (lo - x0) + row.tobytes().translate(self._match) + edge * (x1 - hi)
+
+    def update(self, rect):
+        """Recompute masks and tiles for ``rect`` and the ring of cells around it."""
+        map_data = self.map_data
+        x0, y0 = max(rect.x - 1, 0), max(rect.y - 1, 0)
+        x1 = min(rect.right + 1, map_data.width)
+        y1 = min(rect.bottom + 1, map_data.height)
+        if x1 > x0 and y1 > y0:
+            width, height = x1 - x0, y1 - y0
+            # The window plus a one-cell halo, as packed.pad would lay it out.
+            grid = b"".join(self._cells(y, x0 - 1, x1 + 1) for y in range(y0 - 1, y1 + 1))
+            length = len(grid)
+            masks = packed.to_bytes(packed.neighbour_mask(packed.to_int(grid), width + 2, length),
+                                    length)
+            masks = packed.unpad(masks, width, height)
+            cells = packed.unpad(grid, width, height)
+            # OR-ing 0xFF into the tile of every cell that does not match gives NO_TILE.
+            tiles = (packed.to_int(masks.translate(self._tiles))
+                     | packed.to_int(cells.translate(b"\xff\x00" + bytes(254))))
+            tiles = packed.to_bytes(tiles, len(masks))
+            target = map_data.layer(self.target)
+            stride = map_data.width
+            for row in range(height):
+                start = (y0 + row) * stride + x0
+                self.masks[start:start + width] = masks[row * width:(row + 1) * width]
+                target[start:start + width] = array("B", tiles[row * width:(row + 1) * width])
+        self._commit()
+
+    def update_cells(self, cells):
+        """Retile after edits to ``cells`` (``(x, y)`` pairs) by patching neighbour masks."""
+        map_data = self.map_data
+        width, height = map_data.width, map_data.height
+        source = map_data.layer(self.layer)
+        target = map_data.layer(self.target)
+        masks, match, tiles = self.masks, self._match, self._tiles
+        dirty = set()
+        for x, y in cells:
+            index = map_data.index(x, y)
+            matched = match[source[index]]
+            dirty.add(index)
+            for bit, (dx, dy) in enumerate(_DIRECTIONS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    # This cell is the neighbour's neighbour in the opposite direction.
+                    neighbour = ny * width + nx
+                    opposite = 1 << ((bit + 4) & 7)
+                    if matched:
+                        masks[neighbour] |= opposite
+                    else:
+                        masks[neighbour] &= ~opposite
+                    dirty.add(neighbour)
+        for index in dirty:
+            target[index] = tiles[masks[index]] if match[source[index]] else NO_TILE
+        self._commit()
+
+    def refresh(self):
+        """Retile the whole map if it changed since the last update."""
+        if self._revision != self.map_data.revision:
+            self.update(Rect(0, 0, self.map_data.width, self.map_data.height))
+
+    def _commit(self):
+        self.map_data.touch()
+        self._revision = self.map_data.revision
@@ -0,0 +1,225 @@
+"""Voronoi biome regions from jittered sites, labelled a row at a time.
+
+Sites sit on a jittered grid: bucket ``(gx, gy)`` of side ``spacing`` holds
+exactly one site, placed and given a biome from the stream keyed by
+``(seed, gx, gy)``.  The grid doubles as the spatial hash - the nearest site
+to any point lies within two buckets of it - and, like the noise module,
+makes the partition a pure function of world coordinates, so chunks
+generated separately agree at their seams.
+
+For a fixed row ``y`` the squared distance to site ``i`` is
+``x*x + m_i*x + b_i`` with ``m_i = -2*sx_i`` and ``b_i = sx_i**2 +
+(y - sy_i)**2``, so the nearest site along the row is the lower envelope of
+a set of lines.  Each row builds that envelope from the sites in the five
+bucket rows around it (the convex-hull trick, in exact integers) and then
+writes whole runs of cells with slice assignment; the work per row depends
+on the number of sites, not cells.
+
+Borders are blended by domain warping: each cell within ``blend`` cells of
+a border takes the label of the cell displaced from it by two noise
+fields (by less than ``blend`` cells).  That displacement cannot cross a
+border from outside the band, so only band cells need per-cell work.
+"""
+
+import math
+from array import array
+
+from model.generator import MapGenerator, regenerate_window
+from model.jobs import checkpoint, progress
+from model.map_data import BIOME
+from model.noise import GradientNoise
+
+DEFAULT_BIOMES = ("forest", "grassland", "desert", "swamp", "tundra")
+
+
+class VoronoiBiomeGenerator(MapGenerator):
+    """Partition the map into Voronoi cells, one biome per site.
+
+    ``biomes`` names the biomes (their index is what the ``biome`` layer
+    stores) and ``weights`` sets how often each is picked.  Sites are
+    ``spacing`` cells apart on average; ``blend`` is the half-width of the
+    ragged band along borders (0 for straight Voronoi edges).
+    """
+
+    def __init__(self, seed=0, biomes=DEFAULT_BIOMES, weights=None, spacing=64, blend=6):
+        super().__init__(seed)
+        if spacing < 2:
+            raise ValueError("spacing must be at least 2")
+        self.biomes = tuple(biomes)
+        self.weights = list(weights) if weights is not None else [1] * len(self.biomes)
+        if len(self.weights) != len(self.biomes):
+            raise ValueError("need one weight per biome")
+        self.spacing = spacing
+        self.blend = blend
+        self._sites = {}
+        frequency = 1 / (4 * max(blend, 1))
+        self._warp = (GradientNoise(f"{seed}:warp-x", frequency, 1),
+                      GradientNoise(f"{seed}:warp-y", frequency, 1))
+
+    def site(self, gx, gy):
+        """``(x, y, biome)`` of the site in bucket ``(gx, gy)``."""
+        key = (gx, gy)
+        site = self._sites.get(key)
+        if site is None:
+            rng = self.stream("biome-sites", gx, gy)
+            s = self.spacing
+            biome = rng.choices(range(len(self.biomes)), self.weights)[0]
+            site = self._sites[key] = (gx * s + rng.randrange(s), gy * s + rng.randrange(s), biome)
+        return site
+
+    def nearest(self, x, y):
+        """Biome of the site closest to the (possibly fractional) point ``(x, y)``."""
+        s = self.spacing
+        gx, gy = math.floor(x / s), math.floor(y / s)
+        best = None
+        for by in range(gy - 2, gy + 3):
+            for bx in range(gx - 2, gx + 3):
+                sx, sy, biome = self.site(bx, by)
+                d = (sx - x) ** 2 + (sy - y) ** 2
+                if best is None or d < best[0]:
+                    best = (d, biome)
+        return best[1]
+
+    def row_runs(self, y, x0, width):
+        """Biome runs ``[(start, end, biome), ...]`` covering row ``y`` from ``x0``."""
+        s = self.spacing
+        gy = y // s
+        lines = []
+        for by in range(gy - 2, gy + 3):
+            for bx in range(x0 // s - 2, (x0 + width - 1) // s + 3):
+                sx, sy, biome = self.site(bx, by)
+                lines.append((sx, sx * sx + (y - sy) ** 2, biome))
+        lines.sort()
+        hull = []
+        for line in lines:
+            if hull and hull[-1][0] == line[0]:
+                continue
+            while len(hull) >= 2:
+                (s1, b1, _), (s2, b2, _) = hull[-2], hull[-1]
+                if (line[1] - b1) * (s2 - s1) <= (b2 - b1) * (line[0] - s1):
+                    hull.pop()
+                else:
+                    break
+            hull.append(line)
+        runs = []
+        start = x0
+        x1 = x0 + width
+        for i, (sx, b, biome) in enumerate(hull):
+            if i + 1 < len(hull):
+                nx, nb, _ = hull[i + 1]
+                end = min((nb - b) // (2 * (nx - sx)) + 1, x1)
+            else:
+                end = x1
+            if end <= start:
+                continue
+            if runs and runs[-1][2] == biome:
+                runs[-1][1] = end
+            else:
+                runs.append([start, end, biome])
+            start = end
+            if start >= x1:
+                break
+        return [tuple(run) for run in runs]
+
+    def _bands(self, rows, width, height):
+        """Per row, merged x-intervals within ``blend`` cells of a border."""
+        r = self.blend
+        marks = [[] for _ in range(height)]
+
+        def mark(y, a, b):
+            for row in range(max(0, y - r), min(height, y + r + 1)):
+                marks[row].append((max(0, a - r), min(width, b + r)))
+
+        previous = None
+        for y, runs in enumerate(rows):
+            checkpoint()
+            for start, _, _ in runs[1:]:
+                mark(y, start, start)
+            if previous is not None and previous != runs:
+                i = j = 0
+                while i < len(runs) and j < len(previous):
+                    start = max(runs[i][0], previous[j][0])
+                    end = min(runs[i][1], previous[j][1])
+                    if runs[i][2] != previous[j][2] and start < end:
+                        mark(y, start, end)
+                    if runs[i][1] <= previous[j][1]:
+                        i += 1
+                    else:
+                        j += 1
+            previous = runs
+        bands = []
+        for intervals in marks:
+            checkpoint()
+            intervals.sort()
+            merged = []
+            for a, b in intervals:
+                if merged and a <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], b)
+                else:
+                    merged.append([a, b])
+            bands.append(merged)
+        return bands
+
+    def partition(self, x0, y0, width, height):
+        """Biome index of every cell of a window, as a flat ``array('B')``."""
+        # Label a margin around the window so borders just outside it still
+        # mark the band inside it.
+        m = self.blend + 1 if self.blend else 0
+        ox, oy, ow, oh = x0 - m, y0 - m, width + 2 * m, height + 2 * m
+        steps = oh + height if self.blend else oh
+        rows = []
+        for y in range(oy, oy + oh):
+            rows.append([(a - ox, b - ox, biome) for a, b, biome in self.row_runs(y, ox, ow)])
+            progress(y - oy + 1, steps)
+        cells = array("B", bytes(ow * oh))
+        for y, runs in enumerate(rows):
+            base = y * ow
+            for a, b, biome in runs:
+                cells[base + a:base + b] = array("B", [biome]) * (b - a)
+        if self.blend:
+            amplitude = self.blend / 2
+            warp_x, warp_y = self._warp
+            source = cells[:]
+            bands = self._bands(rows, ow, oh)
+            for y in range(m, m + height):
+                progress(oh + y - m, steps)
+                wy = oy + y
+                for a, b in bands[y]:
+                    a, b = max(a, m), min(b, m + width)
+                    if a >= b:
+                        continue
+                    shifts = zip(warp_x.region(ox + a, wy, b - a, 1),
+                                 warp_y.region(ox + a, wy, b - a, 1))
+                    # Noise stays within +-sqrt(2), so a shift is below 0.71 * blend:
+                    # inside the margin and too short to cross a border from
+                    # outside the band.
+                    cells[y * ow + a:y * ow + b] = array("B", [
+                        source[(y + int(amplitude * v)) * ow + x + int(amplitude * u)]
+                        for x, (u, v) in enumerate(shifts, a)])
+        if not m:
+            return cells
+        result = array("B")
+        for y in range(m, m + height):
+            result.extend(cells[y * ow + m:y * ow + m + width])
+        return result
+
+    def fill(self, map_data, x0=0, y0=0):
+        """Write the ``biome`` layer for the window whose top-left is ``(x0, y0)``."""
+        map_data.add_layer(BIOME)[:] = self.partition(x0, y0, map_data.width, map_data.height)
+        return map_data
+
+    def generate(self, width, height):
+        return self.fill(self.new_map(width, height))
+
+    def variant(self, variant):
+        if not variant:
+            return self
+        clone = super().variant(variant)
+        clone._sites = {}
+        clone._warp = tuple(noise.reseeded(f"{clone.seed}:warp-{axis}")
+                            for noise, axis in zip(self._warp, "xy"))
+        return clone
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Partition the window again; labels are replaced, not blended."""
+        return regenerate_window(self, map_data, rect, margin, keep, variant, (BIOME,))
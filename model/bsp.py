@@ -0,0 +1,196 @@
+"""Binary space partitioning dungeons: rooms in leaves, corridors between siblings.
+
+The walls layer starts solid and is carved with rectangle and line fills on
+the underlying buffers, so cost grows with the number of rooms rather than
+the number of cells.  Regenerating a region partitions just that window and
+tunnels its rooms to every corridor that reaches its edge.
+"""
+
+
+from model.connectivity import connect
+from model.generator import MapGenerator, dirty_window, held_cells
+from model.jobs import progress
+from model.map_data import MapData, Rect, WALLS, OPEN, SOLID
+
+
+class BSPGenerator(MapGenerator):
+    """Dungeon generator using recursive binary space partitioning.
+
+    Leaves are never smaller than ``min_leaf`` cells along a side; each leaf
+    holds one room at least ``min_room`` cells wide.  After generation
+    ``rooms`` lists the room rectangles and ``corridors`` the corridor
+    segments as ``(x0, y0, x1, y1)`` elbow paths.
+    """
+
+    def __init__(self, seed=0, min_leaf=10, min_room=4, max_depth=16, corridor_width=1):
+        super().__init__(seed)
+        if min_room + 2 > min_leaf:
+            raise ValueError("min_leaf must leave room for a walled room")
+        self.min_leaf = min_leaf
+        self.min_room = min_room
+        self.max_depth = max_depth
+        self.corridor_width = corridor_width
+        self.rooms = []
+        self.corridors = []
+
+    def _split(self, rng, leaf):
+        """Return the two halves of ``leaf``, or ``None`` if it is too small to split."""
+        min_leaf = self.min_leaf
+        can_split_x = leaf.width >= 2 * min_leaf
+        can_split_y = leaf.height >= 2 * min_leaf
+        if not (can_split_x or can_split_y):
+            return None
+        if can_split_x and can_split_y:
+            vertical = leaf.width > leaf.height if leaf.width != leaf.height else rng.random() < 0.5
+        else:
+            vertical = can_split_x
+        if vertical:
+            cut = rng.randint(min_leaf, leaf.width - min_leaf)
+            return (Rect(leaf.x, leaf.y, cut, leaf.height),
+                    Rect(leaf.x + cut, leaf.y, leaf.width - cut, leaf.height))
+        cut = rng.randint(min_leaf, leaf.height - min_leaf)
+        return (Rect(leaf.x, leaf.y, leaf.width, cut),
+                Rect(leaf.x, leaf.y + cut, leaf.width, leaf.height - cut))
+
+    def _room(self, rng, leaf):
+        width = rng.randint(self.min_room, leaf.width - 2)
+        height = rng.randint(self.min_room, leaf.height - 2)
+        x = rng.randint(leaf.x + 1, leaf.right - width - 1)
+        y = rng.randint(leaf.y + 1, leaf.bottom - height - 1)
+        return Rect(x, y, width, height)
+
+    def partition(self, rng, bounds):
+        """Split ``bounds`` into rooms, returning ``(rooms, links)``.
+
+        ``links`` pairs a room from each side of every split, deepest splits
+        first, which is the order corridors are dug in.
+        """
+        rooms = []
+        links = []
+        # Iterative post-order walk; each node resolves to one of its rooms.
+        stack = [(bounds, 0, False)]
+        results = []
+        while stack:
+            leaf, depth, expanded = stack.pop()
+            if expanded:
+                right, left = results.pop(), results.pop()
+                links.append((left, right))
+                results.append(left if rng.random() < 0.5 else right)
+                continue
+            halves = self._split(rng, leaf) if depth < self.max_depth else None
+            if halves is None:
+                room = self._room(rng, leaf)
+                rooms.append(room)
+                results.append(room)
+                continue
+            stack.append((leaf, depth, True))
+            stack.append((halves[1], depth + 1, False))
+            stack.append((halves[0], depth + 1, False))
+        return rooms, links
+
+    def carve(self, map_data, rng, rooms, links):
+        fill = map_data.fill
+        size = self.corridor_width
+        corridors = []
+        for room in rooms:
+            fill(WALLS, OPEN, *room)
+        for first, second in links:
+            x0, y0 = first.centre
+            x1, y1 = second.centre
+            # Elbow corridor; which leg comes first is random.
+            if rng.random() < 0.5:
+                fill(WALLS, OPEN, min(x0, x1), y0, abs(x1 - x0) + size, size)
+                fill(WALLS, OPEN, x1, min(y0, y1), size, abs(y1 - y0) + size)
+            else:
+                fill(WALLS, OPEN, x0, min(y0, y1), size, abs(y1 - y0) + size)
+                fill(WALLS, OPEN, min(x0, x1), y1, abs(x1 - x0) + size, size)
+            corridors.append((x0, y0, x1, y1))
+        return corridors
+
+    def generate(self, width, height):
+        if width < self.min_leaf or height < self.min_leaf:
+            raise ValueError(f"map must be at least {self.min_leaf} cells on each side")
+        rng = self.stream("bsp")
+        map_data = self.new_map(width, height)
+        map_data.fill(WALLS, SOLID)
+        self.rooms, links = self.partition(rng, Rect(0, 0, width, height))
+        progress(1, 2)
+        self.corridors = self.carve(map_data, rng, self.rooms, links)
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Partition the window afresh and tunnel its rooms to the passages at its edge.
+
+        The window is refilled with rock, split into rooms if it is at
+        least ``min_leaf`` cells on each side, and every open cell just
+        outside it gets an opening next to it; then the window's regions
+        are joined (see :func:`~model.connectivity.connect`).  Rooms
+        reaching outside the window or into a kept ``rect`` are held, and
+        new rooms that would overlap them (or ``rect``) are dropped.  Joins
+        are only dug outside a kept ``rect``, so a wall kept there can still
+        cut the dungeon in two.  ``rooms`` and ``corridors`` lose the
+        entries that lay wholly inside the window and gain the new ones.
+        """
+        window = dirty_window(map_data, rect, margin)
+        width = map_data.width
+        walls = map_data.layer(WALLS)
+
+        def inside(x0, y0, x1, y1):
+            return window.contains(x0, y0) and window.contains(x1, y1)
+
+        kept = [room for room in self.rooms if room.intersects(window)
+                and (not inside(room.x, room.y, room.right - 1, room.bottom - 1)
+                     or keep and room.intersects(rect))]
+        free = held_cells(window, window, rect if keep else None).translate(
+            bytes([1, 0]) + bytes(254))
+        for room in kept:
+            x0, x1 = max(room.x, window.x) - window.x, min(room.right, window.right) - window.x
+            for y in range(max(room.y, window.y), min(room.bottom, window.bottom)):
+                start = (y - window.y) * window.width
+                free[start + x0:start + x1] = bytes(x1 - x0)
+        sub = MapData(window.width, window.height, layers=(WALLS,))
+        cells = sub.layer(WALLS)
+        for y in range(window.height):
+            row = (window.y + y) * width + window.x
+            cells[y * window.width:(y + 1) * window.width] = walls[row:row + window.width]
+        for index, cell in enumerate(free):
+            if cell:
+                cells[index] = SOLID
+        # Openings where a passage outside meets the window's edge.
+        for x, y, ox, oy in self._edge_cells(window):
+            if map_data.in_bounds(ox, oy) and walls[oy * width + ox] == OPEN:
+                index = (y - window.y) * window.width + x - window.x
+                if free[index]:
+                    cells[index] = OPEN
+        rng = self.stream("bsp-region", *rect, margin, variant)
+        rooms, links = [], []
+        if window.width >= self.min_leaf and window.height >= self.min_leaf:
+            rooms, links = self.partition(rng, Rect(0, 0, window.width, window.height))
+        local = [Rect(room.x - window.x, room.y - window.y, room.width, room.height)
+                 for room in kept + ([rect] if keep else [])]
+        rooms = [room for room in rooms if not any(room.intersects(old) for old in local)]
+        links = [link for link in links if link[0] in rooms and link[1] in rooms]
+        corridors = self.carve(sub, rng, rooms, links)
+        connect(sub, WALLS)
+        for index, cell in enumerate(free):
+            if cell:
+                y, x = divmod(index, window.width)
+                walls[(window.y + y) * width + window.x + x] = cells[index]
+        map_data.touch()
+        self.rooms = [room for room in self.rooms if room in kept
+                      or not inside(room.x, room.y, room.right - 1, room.bottom - 1)]
+        self.rooms += [Rect(window.x + r.x, window.y + r.y, r.width, r.height) for r in rooms]
+        self.corridors = [c for c in self.corridors if not inside(*c)]
+        self.corridors += [(window.x + x0, window.y + y0, window.x + x1, window.y + y1)
+                           for x0, y0, x1, y1 in corridors]
+        return map_data
+
+    @staticmethod
+    def _edge_cells(window):
+        """``(x, y, outside_x, outside_y)`` for each edge cell of ``window`` and side."""
+        for x in range(window.x, window.right):
+            yield x, window.y, x, window.y - 1
+            yield x, window.bottom - 1, x, window.bottom
+        for y in range(window.y, window.bottom):
+            yield window.x, y, window.x - 1, y
+            yield window.right - 1, y, window.right, y
@@ -0,0 +1,201 @@
+"""Cellular-automata caves computed a whole grid at a time.
+
+The walls layer (1 = solid, 0 = open) is packed into one big integer per
+generation (see :mod:`model.packed`).  One iteration is eight shifted adds
+for the neighbour counts, one more shift to fold each cell's own state into
+bit 4 of its byte, and a single ``bytes.translate`` through a 256-entry
+birth/survival table.  Cells outside the map count as solid so caves stay
+closed at the edges.
+"""
+
+import re
+from array import array
+
+from model import packed
+from model.connectivity import Region, carve_tunnel, connect, label, plan_tunnels
+from model.generator import MapGenerator, dirty_window, held_cells
+from model.jobs import progress
+from model.map_data import MapData, Rect, WALLS, SOLID
+
+CAVE_RULE = "B5678/S45678"
+
+
+def parse_rule(rule):
+    """Parse ``"B3/S23"`` notation into ``(birth, survival)`` sets of counts."""
+    match = re.fullmatch(r"B([0-8]*)/S([0-8]*)", rule.strip().upper())
+    if not match:
+        raise ValueError(f"invalid cellular automaton rule {rule!r}")
+    return {int(c) for c in match.group(1)}, {int(c) for c in match.group(2)}
+
+
+def rule_table(birth, survival):
+    """Translation table from ``count + 16 * state`` to the next state."""
+    table = bytearray(256)
+    for count in range(9):
+        table[count] = 1 if count in birth else 0
+        table[16 + count] = 1 if count in survival else 0
+    return bytes(table)
+
+
+def step(cells, width, height, table, iterations=1, border=SOLID, held=None):
+    """Run ``iterations`` generations over a flat 0/1 byte buffer; returns ``bytes``.
+
+    ``held`` is an optional 0/1 buffer of the same shape; cells marked 1
+    keep their state.
+    """
+    stride = width + 2
+    length = stride * (height + 2)
+    inside = packed.interior_mask(width, height)
+    outside = packed.border_mask(width, height, border)
+    value = packed.to_int(packed.pad(cells, width, height, border))
+    if held is not None:
+        hold = packed.to_int(packed.pad(held, width, height))
+        inside ^= hold
+        outside |= value & hold
+    for iteration in range(iterations):
+        counts = packed.neighbour_sum(value, stride, length)
+        coded = packed.to_bytes(counts + (value << 4), length).translate(table)
+        value = (packed.to_int(coded) & inside) | outside
+        progress(iteration + 1, iterations, lambda: _preview(value, width, height))
+    return packed.unpad(packed.to_bytes(value, length), width, height)
+
+
+def _preview(value, width, height):
+    map_data = MapData(width, height)
+    cells = packed.to_bytes(value, (width + 2) * (height + 2))
+    memoryview(map_data.layer(WALLS))[:] = packed.unpad(cells, width, height)
+    return map_data
+
+
+class CellularAutomataGenerator(MapGenerator):
+    """Cave generator: random noise smoothed by a birth/survival rule.
+
+    With ``connected`` set, pockets smaller than ``min_region`` cells are
+    filled and the remaining caves are joined by tunnels.
+    """
+
+    def __init__(self, seed=0, fill=0.45, iterations=5, rule=CAVE_RULE, connected=False,
+                 min_region=16):
+        super().__init__(seed)
+        self.fill = fill
+        self.iterations = iterations
+        self.birth, self.survival = parse_rule(rule)
+        self.connected = connected
+        self.min_region = min_region
+        self.tunnels = []
+
+    def noise(self, rng, size):
+        """``size`` random 0/1 bytes, solid with probability ``fill``."""
+        threshold = int(self.fill * 256)
+        table = bytes(1 if b < threshold else 0 for b in range(256))
+        return rng.randbytes(size).translate(table)
+
+    def generate(self, width, height):
+        rng = self.stream("cellular")
+        map_data = self.new_map(width, height)
+        cells = self.noise(rng, width * height)
+        cells = step(cells, width, height, rule_table(self.birth, self.survival),
+                     self.iterations)
+        memoryview(map_data.layer(WALLS))[:] = cells
+        if self.connected:
+            self.tunnels = connect(map_data, WALLS, self.min_region)
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Fresh noise and smoothing inside the window, next to the walls around it.
+
+        With ``connected`` set, the caves in the window are joined up
+        again as in :meth:`_connect_window`, which only looks at the window
+        and the ring of cells around it.
+        """
+        window = dirty_window(map_data, rect, margin)
+        grid = dirty_window(map_data, window, 1)
+        held = held_cells(grid, window, rect if keep else None)
+        walls = map_data.layer(WALLS)
+        width = map_data.width
+        cells = b"".join(walls[y * width + grid.x:y * width + grid.right].tobytes()
+                         for y in range(grid.y, grid.bottom))
+        noise = self.noise(self.stream("cellular-region", *rect, margin, variant), grid.area)
+        hold = packed.to_int(held)
+        free = packed.to_int(held.translate(bytes([1, 0]) + bytes(254)))
+        cells = packed.to_bytes((packed.to_int(cells) & hold) | (packed.to_int(noise) & free),
+                                grid.area)
+        cells = step(cells, grid.width, grid.height, rule_table(self.birth, self.survival),
+                     self.iterations, held=held)
+        for y in range(window.y, window.bottom):
+            start = (y - grid.y) * grid.width + window.x - grid.x
+            walls[y * width + window.x:y * width + window.right] = array(
+                walls.typecode, cells[start:start + window.width])
+        map_data.touch()
+        if self.connected:
+            self.tunnels = self._connect_window(map_data, window, rect if keep else None)
+        return map_data
+
+    def _connect_window(self, map_data, window, kept=None):
+        """Join the caves in ``window`` to each other and to every passage at its edge.
+
+        Only the window and its one-cell ring are labelled.  Caves wholly
+        inside the window that are smaller than ``min_region`` are filled;
+        the rest, and every passage that reaches the ring, are joined by
+        tunnels dug inside the window.  Joining all the ring's passages
+        may add loops where they already met outside, but it keeps a
+        connected map connected without labelling the rest of it.  Cells
+        in ``kept`` are not changed.  Returns the tunnels in map cells.
+        """
+        area = dirty_window(map_data, window, 1)
+        inner = Rect(window.x - area.x, window.y - area.y, window.width, window.height)
+        walls = map_data.layer(WALLS)
+        width = map_data.width
+        sub = MapData(area.width, area.height, layers=(WALLS,))
+        cells = sub.layer(WALLS)
+        for y in range(area.height):
+            start = (area.y + y) * width + area.x
+            cells[y * area.width:(y + 1) * area.width] = walls[start:start + area.width]
+        regions, _ = label(sub, WALLS)
+        joined = []
+        for region in regions:
+            runs = [(y, max(x0, inner.x), min(x1, inner.right)) for y, x0, x1 in region.runs
+                    if inner.y <= y < inner.bottom and x0 < inner.right and inner.x < x1]
+            if runs == region.runs:
+                if region.size < self.min_region:
+                    for y, x0, x1 in runs:
+                        sub.fill(WALLS, SOLID, x0, y, x1 - x0, 1)
+                    continue
+            elif not runs:
+                # Only ring cells: tunnel to the window cells next to them.
+                runs = self._inward(region.runs, inner)
+                if not runs:
+                    continue
+            x0, x1 = min(run[1] for run in runs), max(run[2] for run in runs)
+            bounds = Rect(x0, runs[0][0], x1 - x0, runs[-1][0] + 1 - runs[0][0])
+            joined.append(Region(region.label, region.size, bounds, runs))
+        tunnels = plan_tunnels(joined)
+        for start, end in tunnels:
+            carve_tunnel(sub, start, end, WALLS)
+        for y in range(window.y, window.bottom):
+            spans = [(window.x, window.right)]
+            if kept is not None and kept.y <= y < kept.bottom:
+                spans = [(window.x, min(kept.x, window.right)),
+                         (max(kept.right, window.x), window.right)]
+            for x0, x1 in spans:
+                if x0 < x1:
+                    start = (y - area.y) * area.width - area.x
+                    walls[y * width + x0:y * width + x1] = cells[start + x0:start + x1]
+        map_data.touch()
+        return [((ax + area.x, ay + area.y), (bx + area.x, by + area.y))
+                for (ax, ay), (bx, by) in tunnels]
+
+    @staticmethod
+    def _inward(runs, inner):
+        """One-cell runs for the ``inner`` cells 4-adjacent to ring ``runs`` outside it."""
+        cells = set()
+        for y, x0, x1 in runs:
+            if y in (inner.y - 1, inner.bottom):
+                row = inner.y if y < inner.y else inner.bottom - 1
+                cells.update((row, x) for x in range(max(x0, inner.x), min(x1, inner.right)))
+            elif inner.y <= y < inner.bottom:
+                if x1 == inner.x:
+                    cells.add((y, inner.x))
+                if x0 == inner.right:
+                    cells.add((y, inner.right - 1))
+        return [(y, x, x + 1) for y, x in sorted(cells)]
@@ -0,0 +1,202 @@
+"""Chunked, parallel Wave Function Collapse for maps too large for one solve.
+
+The world is split into square chunks that are solved in four phases by
+chunk parity ``(cx % 2, cy % 2)``.  Chunks in the same phase are at least one
+chunk apart, so they can be solved concurrently in a process pool without
+seeing each other's output.
+
+Each chunk is solved over a window that overlaps its neighbours by
+``overlap`` cells.  Cells in the overlap that earlier phases already solved
+are released and re-solved, which gives the later chunk room to meet its
+neighbours; the ring just outside the window is pinned to whatever is
+already solved there, so the seams stay consistent.
+
+Every window draws from the :mod:`model.rng` stream ``(seed, cx, cy, attempt)``
+and only reads cells written by earlier phases, so the output depends on the
+seed alone and not on how many workers ran it.
+"""
+
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from model.generator import MapGenerator
+from model.jobs import phase, progress, wait_for
+from model.map_data import TERRAIN
+from model.rng import stream
+from model.wfc import WFCSolver, WFCStats, ContradictionError, solve_region
+
+UNSOLVED = 0xFFFF
+
+PHASES = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+_worker_tileset = None
+
+
+def _init_worker(tileset):
+    global _worker_tileset
+    _worker_tileset = tileset
+
+
+def _solve_window(task):
+    """Solve one window; ``halo`` holds the pinned ring as tile ids or ``UNSOLVED``.
+
+    ``domains`` is ``None`` or the tiles each window cell may take, as masks.
+    """
+    seed, cx, cy, width, height, halo, domains, attempts, max_restarts = task
+    tileset = _worker_tileset
+    if domains is None:
+        domains = [tileset.full_mask] * (width * height)
+    initial = [domain if tile == UNSOLVED else 1 << tile
+               for tile, domain in zip(array("H", halo), domains)]
+    stats = WFCStats()
+    for attempt in range(attempts):
+        solver = WFCSolver(tileset, width, height,
+                           stream(seed, "chunked-wfc", cx, cy, attempt),
+                           max_restarts=max_restarts, initial=initial)
+        try:
+            tiles = solver.solve()
+        except ContradictionError:
+            continue
+        finally:
+            stats.add(solver.stats)
+        return cx, cy, array("H", tiles).tobytes(), stats
+    raise ContradictionError(f"chunk ({cx}, {cy}) unsolvable after {attempts} attempts")
+
+
+class ChunkedWFCGenerator(MapGenerator):
+    """Generate large maps chunk by chunk, optionally across ``workers`` processes."""
+
+    def __init__(self, tileset, seed=0, chunk_size=64, overlap=4, workers=1,
+                 attempts=4, max_restarts=2):
+        super().__init__(seed)
+        if 2 * overlap + 2 > chunk_size:
+            raise ValueError("overlap must leave at least two cells between same-phase windows")
+        self.tileset = tileset
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.workers = workers
+        self.attempts = attempts
+        self.max_restarts = max_restarts
+        self.stats = None
+
+    def _window(self, cx, cy, width, height):
+        size, overlap = self.chunk_size, self.overlap
+        x0 = max(cx * size - overlap, 0)
+        y0 = max(cy * size - overlap, 0)
+        x1 = min((cx + 1) * size + overlap, width)
+        y1 = min((cy + 1) * size + overlap, height)
+        return x0, y0, x1, y1
+
+    def _task(self, tiles, cx, cy, width, height, classes=None, masks=None):
+        """Build the solver input for a window plus its one-cell ring."""
+        x0, y0, x1, y1 = self._window(cx, cy, width, height)
+        window_width = x1 - x0 + 2
+        halo = array("H", [UNSOLVED]) * (window_width * (y1 - y0 + 2))
+        domains = None
+        if classes is not None:
+            # The ring is either pinned or off the map, so it stays unconstrained.
+            full = self.tileset.full_mask
+            domains = [full] * len(halo)
+            for y in range(y0, y1):
+                row = (y - y0 + 1) * window_width + 1
+                cells = classes[y * width + x0:y * width + x1]
+                domains[row:row + x1 - x0] = [masks[c] for c in cells]
+        for y in (y0 - 1, y1):
+            if 0 <= y < height:
+                lo, hi = max(x0 - 1, 0), min(x1 + 1, width)
+                start = (y - y0 + 1) * window_width + lo - x0 + 1
+                halo[start:start + hi - lo] = tiles[y * width + lo:y * width + hi]
+        for y in range(y0, y1):
+            row = (y - y0 + 1) * window_width
+            if x0 > 0:
+                halo[row] = tiles[y * width + x0 - 1]
+            if x1 < width:
+                halo[row + window_width - 1] = tiles[y * width + x1]
+        return (self.seed, cx, cy, window_width, y1 - y0 + 2, halo.tobytes(), domains,
+                self.attempts, self.max_restarts)
+
+    def _store(self, tiles, result, width, height):
+        cx, cy, solved, stats = result
+        x0, y0, x1, y1 = self._window(cx, cy, width, height)
+        window_width = x1 - x0 + 2
+        solved = array("H", solved)
+        for y in range(y0, y1):
+            start = (y - y0 + 1) * window_width + 1
+            tiles[y * width + x0:y * width + x1] = solved[start:start + x1 - x0]
+        self.stats.add(stats)
+
+    def solve(self, width, height, classes=None, masks=None):
+        """Return a flat ``array('H')`` of tile ids for a ``width`` x ``height`` world.
+
+        ``classes`` optionally gives every cell a class, and ``masks[c]`` the
+        tiles a cell of class ``c`` may take; the solver starts from those
+        domains instead of the full tileset.
+        """
+        start = time.perf_counter()
+        self.stats = WFCStats()
+        tiles = array("H", [UNSOLVED]) * (width * height)
+        chunks_x = -(-width // self.chunk_size)
+        chunks_y = -(-height // self.chunk_size)
+        count = chunks_x * chunks_y
+        solved = 0
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                       initargs=(self.tileset,))
+        else:
+            _init_worker(self.tileset)
+        try:
+            for px, py in PHASES:
+                tasks = [self._task(tiles, cx, cy, width, height, classes, masks)
+                         for cy in range(py, chunks_y, 2)
+                         for cx in range(px, chunks_x, 2)]
+                futures = [pool.submit(_solve_window, task) for task in tasks] if pool else tasks
+                for item in futures:
+                    if pool:
+                        result = wait_for(item)
+                    else:
+                        with phase(solved / count, (solved + 1) / count, previews=False):
+                            result = _solve_window(item)
+                    self._store(tiles, result, width, height)
+                    solved += 1
+                    progress(solved, count, lambda: self.to_map(tiles, width, height))
+        except BaseException:
+            if pool:
+                # Cancelled or failed: do not wait for windows still running.
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            raise
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stats.elapsed = time.perf_counter() - start
+        return tiles
+
+    def to_map(self, tiles, width, height):
+        """New map with ``tiles`` on its terrain layer; unsolved cells read as tile 0."""
+        map_data = self.new_map(width, height)
+        if self.tileset.size > 256:
+            map_data.add_layer(TERRAIN, "H")
+        terrain = map_data.layer(TERRAIN)
+        terrain[:] = array(terrain.typecode, [0 if tile == UNSOLVED else tile for tile in tiles])
+        return map_data
+
+    def generate(self, width, height):
+        return self.to_map(self.solve(width, height), width, height)
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0, classes=None,
+                   masks=None):
+        """Re-solve one window the way a chunk is solved, retrying up to ``attempts`` times.
+
+        ``classes`` and ``masks`` constrain the window as in :meth:`solve`.
+        """
+        for attempt in range(self.attempts):
+            rng = stream(self.seed, "chunked-wfc-region", *rect, margin, variant, attempt)
+            try:
+                self.stats = solve_region(self.tileset, map_data, rect, margin, keep, rng,
+                                          self.max_restarts, classes, masks)
+            except ContradictionError:
+                continue
+            return map_data
+        raise ContradictionError(f"region {tuple(rect)} unsolvable after {self.attempts} attempts")
@@ -0,0 +1,297 @@
+"""Unbounded worlds as lazily generated, memory-bounded chunks.
+
+A world is cut into ``chunk_size`` square chunks addressed by ``(cx, cy)``,
+negative coordinates included.  A chunk comes into being on first access
+by calling a *source* - any picklable ``source(cx, cy, size)`` returning a
+:class:`MapData`, usually a :class:`WindowSource` over generators whose
+output is a pure function of world coordinates (noise, biomes).
+
+Resident chunks sit in an LRU bounded by :attr:`MapData.nbytes`.  When the
+budget is exceeded the least recently used chunk is dropped, and if it was
+edited (or never stored) it is first compressed into the ``chunks`` table
+of a :class:`WorldStore`; a later access reads it back instead of
+regenerating it.
+
+:meth:`ChunkManager.set_viewport` pins the visible chunks - they are never
+evicted, so reading them again never waits - and queues them, then the
+ring of chunks around them nearest first, on a background process pool.
+Only visible chunks are read back from the store on the calling thread;
+prefetched chunks are read and decompressed by the pool workers too, each
+holding its own connection to the store's database (for an in-memory
+store, which workers cannot open, only the row lookup stays on the calling
+thread).  The renderer asks with :meth:`ChunkManager.peek`, which never
+blocks: a chunk still being generated just reads as ``None`` for a frame.
+
+Given a :class:`~model.lod.WorldOverview`, the manager reports every chunk
+it admits, and every resident chunk whose revision has moved on since it
+was last reported (checked for visible chunks on each viewport change and
+for all of them on flush and eviction), so zoomed-out views stay current.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_source = None
+_worker_store_type = None
+_worker_db_path = None
+_worker_store = None
+
+
+def _init_worker(source, store_type=None, db_path=None):
+    global _worker_source, _worker_store_type, _worker_db_path, _worker_store
+    _worker_source = source
+    _worker_store_type = store_type
+    _worker_db_path = db_path
+    _worker_store = None
+
+
+def _generate_chunk(cx, cy, size):
+    """Pool task: ``(chunk, loaded)`` for a freshly generated chunk."""
+    return _worker_source(cx, cy, size), False
+
+
+def _decode_chunk(data):
+    """Pool task: ``(chunk, loaded)`` for stored bytes read by the parent."""
+    return _worker_store_type.decode_chunk(data), True
+
+
+def _fetch_chunk(world, cx, cy, size):
+    """Pool task: read the chunk from the store's database, generating it if absent."""
+    global _worker_store
+    if _worker_store is None:
+        _worker_store = _worker_store_type(_worker_db_path)
+    data = _worker_store.chunk_data(world, cx, cy)
+    if data is None:
+        return _generate_chunk(cx, cy, size)
+    return _worker_store_type.decode_chunk(data), True
+
+
+class WindowSource:
+    """Chunk source running generators that have a ``fill(map_data, x0, y0)`` method.
+
+    Generators run in order on the same chunk, so ``WindowSource(terrain,
+    biomes)`` gives chunks with height, moisture and biome layers.
+    """
+
+    def __init__(self, *generators):
+        if not generators:
+            raise ValueError("need at least one generator")
+        self.generators = generators
+
+    def __call__(self, cx, cy, size):
+        map_data = self.generators[0].new_map(size, size)
+        for generator in self.generators:
+            generator.fill(map_data, cx * size, cy * size)
+        return map_data
+
+
+class ChunkManager:
+    """Lazily generated chunks in an LRU of at most ``max_bytes``.
+
+    ``store`` (a :class:`WorldStore`) receives evicted chunks under the name
+    ``world``; without one, evicted chunks are regenerated when next needed.
+    ``workers`` sets the size of the prefetch pool (0 generates inline) and
+    ``margin`` how many rings of chunks around the viewport are prefetched.
+    ``overview`` is an optional :class:`~model.lod.WorldOverview` to keep
+    up to date.
+    """
+
+    def __init__(self, source, chunk_size=64, max_bytes=64 << 20, store=None, world="default",
+                 workers=2, margin=1, overview=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.store = store
+        self.world = world
+        self.margin = margin
+        self.overview = overview
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.loaded = 0
+        self.spilled = 0
+        self._resident = OrderedDict()
+        self._sizes = {}
+        self._stored = {}  # revision of resident chunks whose stored copy is current
+        self._reported = {}  # revision of resident chunks last drawn into the overview
+        self._pending = {}
+        self._pinned = frozenset()
+        self._pool = None
+        if workers:
+            initargs = (source,)
+            if store is not None:
+                db_path = getattr(store, "db_path", ":memory:")
+                initargs += (type(store), None if db_path == ":memory:" else db_path)
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                             initargs=initargs)
+
+    def __contains__(self, key):
+        return key in self._resident
+
+    def __len__(self):
+        return len(self._resident)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def chunk_of(self, x, y):
+        """Chunk containing world cell ``(x, y)``."""
+        return x // self.chunk_size, y // self.chunk_size
+
+    def chunks_in(self, rect):
+        """Chunks overlapping ``rect`` (world cells), row by row."""
+        x0, y0 = self.chunk_of(rect.x, rect.y)
+        x1, y1 = self.chunk_of(rect.right - 1, rect.bottom - 1)
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1)]
+
+    # -- access -------------------------------------------------------------
+
+    def get(self, cx, cy):
+        """Return chunk ``(cx, cy)``, waiting for it to be loaded or generated if needed."""
+        key = (cx, cy)
+        self._collect()
+        map_data = self._resident.get(key)
+        if map_data is not None:
+            self._resident.move_to_end(key)
+            self.hits += 1
+            return map_data
+        self.misses += 1
+        self.request(cx, cy)
+        if key not in self._resident:
+            self._finish(key, self._pending.pop(key).result())
+        return self._resident[key]
+
+    def peek(self, cx, cy):
+        """Return chunk ``(cx, cy)`` if it is ready, else request it and return ``None``."""
+        key = (cx, cy)
+        self._collect()
+        if key not in self._resident:
+            self.request(cx, cy)
+        map_data = self._resident.get(key)
+        if map_data is not None:
+            self._resident.move_to_end(key)
+        return map_data
+
+    def request(self, cx, cy):
+        """Load chunk ``(cx, cy)`` from the store, or start generating it.
+
+        With a pool, only visible (pinned) chunks are read from the store
+        here; any other chunk is read - or generated - by a worker.
+        """
+        key = (cx, cy)
+        if key in self._resident or key in self._pending:
+            return
+        if self.store is not None and self._pool is not None and key not in self._pinned:
+            self._pending[key] = self._fetch(key)
+            return
+        if self.store is not None:
+            map_data = self.store.load_chunk(self.world, cx, cy)
+            if map_data is not None:
+                self._finish(key, (map_data, True))
+                return
+        if self._pool is None:
+            self._finish(key, (self.source(cx, cy, self.chunk_size), False))
+        else:
+            self._pending[key] = self._pool.submit(_generate_chunk, cx, cy, self.chunk_size)
+
+    def _fetch(self, key):
+        """Queue reading (or, if never stored, generating) ``key`` on the pool."""
+        if getattr(self.store, "db_path", ":memory:") != ":memory:":
+            return self._pool.submit(_fetch_chunk, self.world, *key, self.chunk_size)
+        data = self.store.chunk_data(self.world, *key)
+        if data is None:
+            return self._pool.submit(_generate_chunk, *key, self.chunk_size)
+        return self._pool.submit(_decode_chunk, data)
+
+    def set_viewport(self, rect):
+        """Pin the chunks under ``rect`` (world cells) and prefetch around them."""
+        visible = self.chunks_in(rect)
+        self._pinned = frozenset(visible)
+        m = self.margin * self.chunk_size
+        ring = [key for key in self.chunks_in(rect.expand(m)) if key not in self._pinned]
+        mx, my = self.chunk_of(*rect.centre)
+        ring.sort(key=lambda key: max(abs(key[0] - mx), abs(key[1] - my)))
+        wanted = set(visible).union(ring)
+        for key, future in list(self._pending.items()):
+            if key not in wanted and future.cancel():
+                del self._pending[key]
+        self._collect()
+        for key in visible:
+            if key in self._resident:
+                self._report(key, self._resident[key])
+        for key in visible + ring:
+            self.request(*key)
+
+    # -- residency ----------------------------------------------------------
+
+    def _collect(self):
+        """Admit chunks the pool has finished."""
+        for key, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[key]
+                self._finish(key, future.result())
+
+    def _finish(self, key, result):
+        """Admit a ``(chunk, loaded)`` result, counting it as loaded or generated."""
+        map_data, loaded = result
+        if loaded:
+            self.loaded += 1
+        else:
+            self.generated += 1
+        self._admit(key, map_data)
+        if loaded:
+            self._stored[key] = map_data.revision
+
+    def _admit(self, key, map_data):
+        self._resident[key] = map_data
+        self._reported.pop(key, None)
+        self._report(key, map_data)
+        self._sizes[key] = map_data.nbytes
+        self.resident_bytes += self._sizes[key]
+        while self.resident_bytes > self.max_bytes:
+            victim = next((k for k in self._resident if k not in self._pinned and k != key),
+                          None)
+            if victim is None:
+                break
+            self._evict(victim)
+
+    def _evict(self, key):
+        map_data = self._resident.pop(key)
+        self.resident_bytes -= self._sizes.pop(key)
+        self._report(key, map_data)
+        self._spill(key, map_data)
+        self._stored.pop(key, None)
+        self._reported.pop(key, None)
+
+    def _report(self, key, map_data):
+        if self.overview is None or self._reported.get(key) == map_data.revision:
+            return
+        self.overview.update(*key, map_data)
+        self._reported[key] = map_data.revision
+
+    def _spill(self, key, map_data):
+        if self.store is None or self._stored.get(key) == map_data.revision:
+            return
+        self.store.save_chunk(self.world, *key, map_data)
+        self._stored[key] = map_data.revision
+        self.spilled += 1
+
+    def flush(self):
+        """Write every edited or never-stored resident chunk to the store (and overview)."""
+        for key, map_data in self._resident.items():
+            self._report(key, map_data)
+            self._spill(key, map_data)
+
+    def close(self):
+        """Flush to the store and stop the prefetch pool."""
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self._pending.clear()
@@ -0,0 +1,479 @@
+"""City layouts: a grown road graph, blocks between the roads and lots in blocks.
+
+Roads grow in the style of Parish and Mueller's procedural cities: a
+priority queue holds proposed segments, each accepted segment proposes a
+continuation (slightly bent) and, with some probability, perpendicular
+branches.  Before a proposal is accepted it is checked against the
+existing network - cut short where it crosses a road (the crossed segment
+is split at a new intersection), stretched to meet a road just beyond its
+end, or snapped onto a nearby intersection.
+Segments and nodes live in spatial hashes with buckets at least one
+segment long, so each check looks at a handful of buckets instead of every
+segment.
+
+The network is rasterised into the terrain layer, blocks are the connected
+regions between roads (see :mod:`model.connectivity`) and each block is cut
+into lots by recursive splitting; buildings fill the lots on the walls
+layer.
+"""
+
+import heapq
+import math
+from array import array
+from collections import defaultdict
+
+from model.connectivity import Region, label
+from model.generator import MapGenerator, dirty_window
+from model.jobs import checkpoint, progress
+from model.map_data import MapData, Rect, TERRAIN, WALLS, OPEN, SOLID
+
+# Values of the terrain layer.
+GROUND = 0
+ROAD = 1
+LOT = 2
+BUILDING = 3
+
+# Terrain to block ground: lots and buildings stand on the block they split.
+_BLOCK_GROUND = bytes(GROUND if value in (LOT, BUILDING) else value for value in range(256))
+
+
+class RoadNetwork:
+    """Road graph: ``nodes`` are ``(x, y)`` points, ``segments`` pairs of node ids."""
+
+    def __init__(self, bucket_size):
+        self.bucket_size = bucket_size
+        self.nodes = []
+        self.segments = []
+        self._segment_buckets = defaultdict(list)
+        self._node_buckets = defaultdict(list)
+
+    def _bucket(self, x, y):
+        return int(x // self.bucket_size), int(y // self.bucket_size)
+
+    def _buckets_between(self, ax, ay, bx, by):
+        x0, y0 = self._bucket(min(ax, bx), min(ay, by))
+        x1, y1 = self._bucket(max(ax, bx), max(ay, by))
+        return [(i, j) for j in range(y0, y1 + 1) for i in range(x0, x1 + 1)]
+
+    def add_node(self, x, y):
+        self.nodes.append((x, y))
+        self._node_buckets[self._bucket(x, y)].append(len(self.nodes) - 1)
+        return len(self.nodes) - 1
+
+    def add_segment(self, a, b):
+        self.segments.append((a, b))
+        index = len(self.segments) - 1
+        for key in self._buckets_between(*self.nodes[a], *self.nodes[b]):
+            self._segment_buckets[key].append(index)
+        return index
+
+    def live_segments(self):
+        return [segment for segment in self.segments if segment is not None]
+
+    def segments_near(self, rect):
+        """Indices of the live segments filed in the buckets ``rect`` covers, in order.
+
+        Every segment touching ``rect`` is among them, as is every segment
+        ending at a node inside it.
+        """
+        found = set()
+        for key in self._buckets_between(rect.x, rect.y, rect.right, rect.bottom):
+            found.update(self._segment_buckets.get(key, ()))
+        return [index for index in sorted(found) if self.segments[index] is not None]
+
+    def remove_segment(self, index):
+        self.segments[index] = None
+
+    def remove_node(self, node):
+        """Stop ``node`` from being snapped to; its id stays valid."""
+        self._node_buckets[self._bucket(*self.nodes[node])].remove(node)
+
+    def split(self, index, node):
+        """Replace segment ``index`` by two segments meeting at ``node``."""
+        a, b = self.segments[index]
+        self.segments[index] = None
+        self.add_segment(a, node)
+        self.add_segment(node, b)
+
+    def nearest_node(self, x, y, radius, exclude=-1):
+        best = None
+        bx, by = self._bucket(x, y)
+        for j in (by - 1, by, by + 1):
+            for i in (bx - 1, bx, bx + 1):
+                for node in self._node_buckets.get((i, j), ()):
+                    if node == exclude:
+                        continue
+                    nx, ny = self.nodes[node]
+                    d = (nx - x) ** 2 + (ny - y) ** 2
+                    if d <= radius * radius and (best is None or d < best[0]):
+                        best = (d, node)
+        return None if best is None else best[1]
+
+    def first_crossing(self, a, bx, by):
+        """Closest crossing of the segment from node ``a`` to ``(bx, by)``.
+
+        Returns ``(t, segment, x, y)`` with ``t`` the fraction along the new
+        segment, or ``None``.  Segments touching ``a`` are ignored.
+        """
+        ax, ay = self.nodes[a]
+        rx, ry = bx - ax, by - ay
+        best = None
+        seen = set()
+        for key in self._buckets_between(ax, ay, bx, by):
+            for index in self._segment_buckets.get(key, ()):
+                segment = self.segments[index]
+                if segment is None or index in seen or a in segment:
+                    continue
+                seen.add(index)
+                (qx, qy), (ex, ey) = self.nodes[segment[0]], self.nodes[segment[1]]
+                sx, sy = ex - qx, ey - qy
+                cross = rx * sy - ry * sx
+                if abs(cross) < 1e-9:
+                    continue
+                dx, dy = qx - ax, qy - ay
+                t = (dx * sy - dy * sx) / cross
+                u = (dx * ry - dy * rx) / cross
+                if 0 < t <= 1 and 0 <= u <= 1 and (best is None or t < best[0]):
+                    best = (t, index, ax + t * rx, ay + t * ry)
+        return best
+
+
+class CityGenerator(MapGenerator):
+    """Grow a road network from the map centre and fill the blocks with lots.
+
+    ``segment_length`` is the typical road segment in cells, so blocks come
+    out roughly that size; ``branch_probability`` controls how often roads
+    fork.  After :meth:`generate`, ``network``, ``blocks`` (connectivity
+    regions) and ``lots`` (rectangles) describe the city.
+    """
+
+    def __init__(self, seed=0, segment_length=20, branch_probability=0.6, road_width=2,
+                 min_lot=4, max_lot=10, max_segments=20000):
+        super().__init__(seed)
+        self.segment_length = segment_length
+        self.branch_probability = branch_probability
+        self.road_width = road_width
+        self.min_lot = min_lot
+        self.max_lot = max_lot
+        self.max_segments = max_segments
+        self.network = None
+        self.blocks = []
+        self.lots = []
+
+    def grow(self, rng, width, height):
+        """Build the :class:`RoadNetwork` for a ``width`` x ``height`` map."""
+        network = RoadNetwork(2 * self.segment_length)
+        margin = self.road_width
+        centre = network.add_node(width / 2, height / 2)
+        self.extend(network, rng, [centre],
+                    Rect(margin, margin, width - 2 * margin, height - 2 * margin),
+                    self.max_segments)
+        return network
+
+    def extend(self, network, rng, starts, bounds, limit, accept=None):
+        """Grow roads from the nodes ``starts`` until ``network`` has ``limit`` segments.
+
+        A start is a node id - roads leave it in four directions - or a
+        ``(node, angle)`` pair for one road.  Proposals ending outside
+        ``bounds`` are dropped, as are segments for which
+        ``accept(ax, ay, bx, by)`` is false.
+        """
+        length = self.segment_length
+        snap = length / 2
+        queue = []
+        order = 0
+        base = rng.uniform(0, math.pi / 2)
+        for start in starts:
+            node, angles = ((start, [base + turn * math.pi / 2 for turn in range(4)])
+                            if isinstance(start, int) else (start[0], [start[1]]))
+            for angle in angles:
+                heapq.heappush(queue, (0, order, node, angle))
+                order += 1
+        while queue and len(network.segments) < limit:
+            checkpoint()
+            delay, _, a, angle = heapq.heappop(queue)
+            ax, ay = network.nodes[a]
+            step = length * rng.uniform(0.8, 1.2)
+            bx, by = ax + step * math.cos(angle), ay + step * math.sin(angle)
+            if not bounds.contains(bx, by):
+                continue
+            # Local constraints: stop at the first road crossed, snap onto a
+            # nearby intersection, or stretch to meet a road just ahead.
+            reach = (step + snap) / step
+            crossing = network.first_crossing(a, ax + reach * (bx - ax), ay + reach * (by - ay))
+            if crossing is not None:
+                t, index, x, y = crossing
+                if t * reach * step >= 1:
+                    node = network.nearest_node(x, y, snap / 2, exclude=a)
+                    if accept is not None and not accept(ax, ay, *(
+                            (x, y) if node is None else network.nodes[node])):
+                        continue
+                    if node is None:
+                        node = network.add_node(x, y)
+                        network.split(index, node)
+                    network.add_segment(a, node)
+                continue
+            node = network.nearest_node(bx, by, snap, exclude=a)
+            if node is not None:
+                if network.first_crossing(a, *network.nodes[node]) is None and (
+                        accept is None or accept(ax, ay, *network.nodes[node])):
+                    network.add_segment(a, node)
+                continue
+            if accept is not None and not accept(ax, ay, bx, by):
+                continue
+            b = network.add_node(bx, by)
+            network.add_segment(a, b)
+            heapq.heappush(queue, (delay + 1, order, b, angle + rng.gauss(0, 0.05)))
+            order += 1
+            for side in (-1, 1):
+                if rng.random() < self.branch_probability:
+                    turn = angle + side * math.pi / 2 + rng.gauss(0, 0.05)
+                    heapq.heappush(queue, (delay + 2, order, b, turn))
+                    order += 1
+
+    def rasterise_roads(self, map_data, network, clip=None):
+        """Draw the live segments as roads, only inside the :class:`Rect` ``clip`` if given."""
+        terrain = map_data.layer(TERRAIN)
+        width = map_data.width
+        if clip is None:
+            clip = Rect(0, 0, width, map_data.height)
+        half = self.road_width / 2
+        segments = (network.live_segments() if clip.area == width * map_data.height else
+                    [network.segments[index]
+                     for index in network.segments_near(clip.expand(math.ceil(half) + 1))])
+        for a, b in segments:
+            checkpoint()
+            (ax, ay), (bx, by) = network.nodes[a], network.nodes[b]
+            if not clip.intersects(Rect(int(min(ax, bx) - half), int(min(ay, by) - half),
+                                        int(abs(bx - ax) + 2 * half) + 2,
+                                        int(abs(by - ay) + 2 * half) + 2)):
+                continue
+            steps = max(math.ceil(max(abs(bx - ax), abs(by - ay))), 1)
+            horizontal = abs(bx - ax) >= abs(by - ay)
+            for i in range(steps + 1):
+                x = ax + (bx - ax) * i / steps
+                y = ay + (by - ay) * i / steps
+                if horizontal:
+                    row = int(x)
+                    if not clip.x <= row < clip.right:
+                        continue
+                    top, bottom = max(int(y - half), clip.y), min(int(y + half) + 1, clip.bottom)
+                    for cy in range(top, bottom):
+                        terrain[cy * width + row] = ROAD
+                else:
+                    if not clip.y <= int(y) < clip.bottom:
+                        continue
+                    cy = int(y) * width
+                    lo, hi = max(int(x - half), clip.x), min(int(x + half) + 1, clip.right)
+                    if hi > lo:
+                        terrain[cy + lo:cy + hi] = array(terrain.typecode, [ROAD]) * (hi - lo)
+        map_data.touch()
+
+    def split_lots(self, rng, rect):
+        """Recursively split ``rect`` until both sides are at most ``max_lot``."""
+        lots = []
+        stack = [rect]
+        while stack:
+            x, y, w, h = stack.pop()
+            if w <= self.max_lot and h <= self.max_lot:
+                lots.append(Rect(x, y, w, h))
+                continue
+            if w >= h:
+                cut = int(w * rng.uniform(0.35, 0.65))
+                if min(cut, w - cut) < self.min_lot:
+                    cut = w // 2
+                stack += [Rect(x, y, cut, h), Rect(x + cut, y, w - cut, h)]
+            else:
+                cut = int(h * rng.uniform(0.35, 0.65))
+                if min(cut, h - cut) < self.min_lot:
+                    cut = h // 2
+                stack += [Rect(x, y, w, cut), Rect(x, y + cut, w, h - cut)]
+        return lots
+
+    def place_lots(self, rng, map_data, blocks, image, within=None, area=None):
+        """Lots fully inside their block and ``within``; marks them on the terrain and walls layers.
+
+        ``image`` holds the block labels over ``area`` (the whole map by
+        default), as returned by :meth:`find_blocks`.
+        """
+        if area is None:
+            area = Rect(0, 0, map_data.width, map_data.height)
+        width = area.width
+        lots = []
+        for block in blocks:
+            checkpoint()
+            bounds = block.bounds.expand(-1)
+            if within is not None:
+                x0, y0 = max(bounds.x, within.x), max(bounds.y, within.y)
+                bounds = Rect(x0, y0, min(bounds.right, within.right) - x0,
+                              min(bounds.bottom, within.bottom) - y0)
+            if bounds.width < self.min_lot or bounds.height < self.min_lot:
+                continue
+            for lot in self.split_lots(rng, bounds):
+                if lot.width < self.min_lot or lot.height < self.min_lot:
+                    continue
+                x0, x1 = lot.x - area.x, lot.right - area.x
+                if all(image[row * width + x0:row * width + x1].count(block.label)
+                       == lot.width for row in range(lot.y - area.y, lot.bottom - area.y)):
+                    lots.append(lot)
+        for lot in lots:
+            self.mark_lot(map_data, lot)
+        return lots
+
+    @staticmethod
+    def mark_lot(map_data, lot):
+        """Draw ``lot`` with its building on the terrain and walls layers."""
+        map_data.fill(TERRAIN, LOT, *lot)
+        building = lot.expand(-1)
+        map_data.fill(TERRAIN, BUILDING, *building)
+        map_data.fill(WALLS, SOLID, *building)
+
+    def generate(self, width, height):
+        map_data = self.new_map(width, height)
+        self.network = self.grow(self.stream("city", "roads"), width, height)
+        progress(2, 4)
+        self.rasterise_roads(map_data, self.network)
+        progress(3, 4, map_data.copy)
+        self.blocks, image = self.find_blocks(map_data)
+        self.lots = self.place_lots(self.stream("city", "lots"), map_data, self.blocks, image)
+        return map_data
+
+    def find_blocks(self, map_data, area=None):
+        """``(blocks, image)``: the closed ground regions big enough for a lot and their labels.
+
+        Lots and buildings count as ground, so a block is the same before
+        and after lots are placed on it.  With ``area`` only that rectangle
+        is labelled and ``image`` covers just it; ground reaching the
+        border of ``area`` counts as open country, as ground reaching the
+        map edge always does.
+        """
+        if area is None:
+            area = Rect(0, 0, map_data.width, map_data.height)
+        terrain = map_data.layer(TERRAIN)
+        grid = MapData(area.width, area.height, layers=(TERRAIN,))
+        cells = grid.layer(TERRAIN)
+        for y in range(area.height):
+            start = (area.y + y) * map_data.width + area.x
+            cells[y * area.width:(y + 1) * area.width] = array(
+                "B", terrain[start:start + area.width].tobytes().translate(_BLOCK_GROUND))
+        regions, image = label(grid, TERRAIN, GROUND, labels=True)
+        width, height = area.width, area.height
+        blocks = [region for region in regions
+                  if region.size >= self.min_lot * self.min_lot
+                  and region.bounds.x > 0 and region.bounds.y > 0
+                  and region.bounds.right < width and region.bounds.bottom < height]
+        if area.x or area.y:
+            dx, dy = area.x, area.y
+            blocks = [Region(block.label, block.size, block.bounds._replace(
+                          x=block.bounds.x + dx, y=block.bounds.y + dy),
+                          [(y + dy, x0 + dx, x1 + dx) for y, x0, x1 in block.runs])
+                      for block in blocks]
+        return blocks, image
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Regrow the roads and lots inside the window from the network around it.
+
+        Reuses ``network``, the road graph :meth:`generate` left behind (it
+        is grown again from the seed if this generator did not make the
+        map): segments wholly inside the window are removed and new roads
+        grow inward from the nodes the remaining roads leave there.  Lots
+        reaching outside the window - and with ``keep`` everything in
+        ``rect`` - are held, and new roads keep clear of them.  Blocks are
+        relabelled over the window grown to cover the blocks next to it,
+        since only those can merge with or split off the new ground; the
+        other blocks keep their labels.  (Open country that new roads close
+        off stays open country.)  Lots are only placed inside the window.
+        """
+        window = dirty_window(map_data, rect, margin)
+        kept = rect if keep else None
+        width, height = map_data.width, map_data.height
+        network = self.network
+        if network is None:
+            network = self.network = self.grow(self.stream("city", "roads"), width, height)
+        nodes = network.nodes
+        ends = set()
+        near = network.segments_near(window)
+        for index in near:
+            segment = network.segments[index]
+            if all(window.contains(*nodes[node]) for node in segment):
+                network.remove_segment(index)
+                ends.update(segment)
+        # Every segment ending inside the window is near it.
+        degree = defaultdict(list)
+        for index in near:
+            if network.segments[index] is not None:
+                a, b = network.segments[index]
+                degree[a].append(b)
+                degree[b].append(a)
+        for node in ends.difference(degree):
+            network.remove_node(node)
+
+        dropped = [lot for lot in self.lots if window.contains(lot.x, lot.y)
+                   and window.contains(lot.right - 1, lot.bottom - 1)
+                   and (kept is None or not kept.intersects(lot))]
+        held_lots = [lot for lot in self.lots if lot.intersects(window) and lot not in dropped]
+        held = held_lots + ([kept] if kept is not None else [])
+        pad = self.road_width
+
+        def accept(ax, ay, bx, by):
+            steps = max(math.ceil(max(abs(bx - ax), abs(by - ay))), 1)
+            return not any(area.expand(pad).contains(ax + (bx - ax) * i / steps,
+                                                     ay + (by - ay) * i / steps)
+                           for i in range(steps + 1) for area in held)
+
+        x0, y0 = max(window.x + pad, pad), max(window.y + pad, pad)
+        bounds = Rect(x0, y0, min(window.right - pad, width - pad) - x0,
+                      min(window.bottom - pad, height - pad) - y0)
+        # Roads cut at the window carry on from where they now end.
+        starts = []
+        for node, others in degree.items():
+            x, y = nodes[node]
+            if bounds.contains(x, y):
+                starts += [(node, math.atan2(y - nodes[other][1], x - nodes[other][0]))
+                           for other in others]
+        if not starts and min(bounds.width, bounds.height) >= self.segment_length:
+            starts = [network.add_node(bounds.x + bounds.width / 2, bounds.y + bounds.height / 2)]
+        rng = self.stream("city-region", "roads", *rect, margin, variant)
+        self.extend(network, rng, starts, bounds, len(network.segments) + self.max_segments, accept)
+        progress(1, 3)
+
+        regions = ([map_data.region(name, *kept) for name in (TERRAIN, WALLS)]
+                   if kept is not None else [])
+        saved = [[bytes(row) for row in region.rows()] for region in regions]
+        map_data.fill(TERRAIN, GROUND, *window)
+        map_data.fill(WALLS, OPEN, *window)
+        self.rasterise_roads(map_data, network, clip=window)
+        for lot in held_lots:
+            self.mark_lot(map_data, lot)
+        for region, rows in zip(regions, saved):
+            for row, data in zip(region.rows(), rows):
+                row[:] = memoryview(data).cast(row.format)
+        progress(2, 3)
+
+        near = window.expand(1)
+        touching = [block.bounds for block in self.blocks if block.bounds.intersects(near)]
+        x0 = min([window.x] + [bounds.x for bounds in touching])
+        y0 = min([window.y] + [bounds.y for bounds in touching])
+        inner = Rect(x0, y0, max([window.right] + [bounds.right for bounds in touching]) - x0,
+                     max([window.bottom] + [bounds.bottom for bounds in touching]) - y0)
+        # The extra ring tells blocks inside ``inner`` from ground running on.
+        area = dirty_window(map_data, inner, 1)
+        blocks, image = self.find_blocks(map_data, area)
+        # New lots keep off the lots that stay and the kept rectangle.
+        self.lots = [lot for lot in self.lots if lot not in dropped]
+        for taken in [lot for lot in self.lots if lot.intersects(area)] + (
+                [kept] if kept is not None else []):
+            x0, x1 = max(taken.x, area.x), min(taken.right, area.right)
+            for y in range(max(taken.y, area.y), min(taken.bottom, area.bottom)):
+                start = (y - area.y) * area.width - area.x
+                image[start + x0:start + x1] = array(image.typecode, [0]) * max(x1 - x0, 0)
+        # Blocks wholly inside ``inner`` were found again; the rest stand.
+        self.blocks = [block for block in self.blocks
+                       if not (inner.x <= block.bounds.x and inner.y <= block.bounds.y
+                               and block.bounds.right <= inner.right
+                               and block.bounds.bottom <= inner.bottom)] + blocks
+        rng = self.stream("city-region", "lots", *rect, margin, variant)
+        self.lots += self.place_lots(
+            rng, map_data, [block for block in blocks if block.bounds.intersects(window)],
+            image, within=window, area=area)
+        return map_data
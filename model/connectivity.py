@@ -0,0 +1,243 @@
+"""Connected-region labelling and tunnel planning for the walls layer.
+
+Labelling is a two-pass connected-component pass over horizontal runs
+instead of cells.  Pass one finds the runs of passable cells in each row
+with a regular expression and unions every run with the runs it overlaps
+in the row above (4-connectivity), using a flat ``array`` of parent
+pointers.  Pass two resolves each run to its root, numbers regions in
+raster order and accumulates their sizes and bounding boxes; painting a
+label image is one slice assignment per run.  The cost depends on the
+number of runs, not cells, so it is cheap enough to run after every stage.
+
+:func:`plan_tunnels` joins regions with a minimum spanning tree (Kruskal)
+whose edge weights are the Manhattan distance between the closest sampled
+cells of two regions.  Only each region's ``NEAREST`` neighbours by bounding
+box centre are candidates, found through a uniform grid of centres, so
+planning stays near-linear in the number of regions; :func:`connect` carves
+those tunnels as L-shapes.
+"""
+
+import re
+from array import array
+from heapq import heappush, heapreplace
+from dataclasses import dataclass, field
+
+from model.jobs import checkpoint
+from model.map_data import Rect, WALLS, OPEN, SOLID
+
+# Cells sampled per region when measuring distances between regions.
+SAMPLE_POINTS = 12
+
+# Neighbouring regions considered as tunnel candidates for each region.
+NEAREST = 6
+
+
+@dataclass
+class Region:
+    label: int
+    size: int
+    bounds: Rect
+    runs: list = field(default_factory=list, repr=False)
+
+    @property
+    def anchor(self):
+        """First cell of the region in raster order."""
+        y, x0, _ = self.runs[0]
+        return x0, y
+
+    def points(self, count=SAMPLE_POINTS):
+        """Up to ``count`` cells spread over the region (run midpoints)."""
+        step = max(1, len(self.runs) // count)
+        return [((x0 + x1 - 1) // 2, y) for y, x0, x1 in self.runs[::step]]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent, a, b):
+    a = _find(parent, a)
+    b = _find(parent, b)
+    if a < b:
+        parent[b] = a
+    elif b < a:
+        parent[a] = b
+    return a != b
+
+
+def label(map_data, layer=WALLS, passable=OPEN, labels=False):
+    """Find the connected regions of cells equal to ``passable``.
+
+    Returns ``(regions, image)``: regions in raster order of their first
+    cell, and - when ``labels`` is true - an ``array('I')`` with each cell's
+    region label (1-based, 0 for blocked cells), otherwise ``None``.
+    """
+    width, height = map_data.width, map_data.height
+    view = memoryview(map_data.layer(layer)).cast("B")
+    if map_data.layer(layer).itemsize != 1:
+        raise ValueError("connectivity needs a one-byte-per-cell layer")
+    pattern = re.compile(re.escape(bytes([passable])) + b"+")
+    parent = array("i")
+    runs = []
+    previous = []
+    for y in range(height):
+        checkpoint()
+        current = []
+        for match in pattern.finditer(view, y * width, (y + 1) * width):
+            start, end = match.span()
+            run = len(parent)
+            parent.append(run)
+            runs.append((y, start - y * width, end - y * width))
+            current.append((start - y * width, end - y * width, run))
+        i = j = 0
+        while i < len(current) and j < len(previous):
+            start, end, run = current[i]
+            above_start, above_end, above = previous[j]
+            if start < above_end and above_start < end:
+                _union(parent, run, above)
+            if end <= above_end:
+                i += 1
+            else:
+                j += 1
+        previous = current
+
+    regions = []
+    index = {}
+    for run, (y, x0, x1) in enumerate(runs):
+        root = _find(parent, run)
+        region = index.get(root)
+        if region is None:
+            region = index[root] = [len(regions) + 1, 0, x0, y, x1, y, []]
+            regions.append(region)
+        region[1] += x1 - x0
+        region[2] = min(region[2], x0)
+        region[4] = max(region[4], x1)
+        region[5] = y
+        region[6].append((y, x0, x1))
+    regions = [Region(number, size, Rect(left, top, right - left, bottom + 1 - top), spans)
+               for number, size, left, top, right, bottom, spans in regions]
+
+    image = None
+    if labels:
+        image = array("I", bytes(4 * width * height))
+        for region in regions:
+            checkpoint()
+            for y, x0, x1 in region.runs:
+                image[y * width + x0:y * width + x1] = array("I", [region.label]) * (x1 - x0)
+    return regions, image
+
+
+def is_connected(map_data, layer=WALLS, passable=OPEN):
+    """True when every passable cell can reach every other one."""
+    return len(label(map_data, layer, passable)[0]) <= 1
+
+
+def _distance(a_points, b_points):
+    best = None
+    for ax, ay in a_points:
+        for bx, by in b_points:
+            d = abs(ax - bx) + abs(ay - by)
+            if best is None or d < best[0]:
+                best = (d, (ax, ay), (bx, by))
+    return best
+
+
+def _nearest_pairs(centres, k):
+    """Index pairs ``(a, b)``, ``a < b``, joining each centre to its ``k`` nearest others.
+
+    Centres are bucketed in a uniform grid sized for about ``k`` per cell,
+    and each search walks rings of cells outwards until no unvisited cell
+    can hold anything closer than the ``k``-th best so far.
+    """
+    xs = [x for x, _ in centres]
+    ys = [y for _, y in centres]
+    left, top = min(xs), min(ys)
+    area = (max(xs) - left + 1) * (max(ys) - top + 1)
+    size = max(1, int((area * k / len(centres)) ** 0.5))
+    grid = {}
+    for i, (x, y) in enumerate(centres):
+        grid.setdefault(((x - left) // size, (y - top) // size), []).append(i)
+    rings = max(max(xs) - left, max(ys) - top) // size + 1
+    pairs = set()
+    for a, (ax, ay) in enumerate(centres):
+        checkpoint()
+        gx, gy = (ax - left) // size, (ay - top) // size
+        best = []  # max-heap of (-distance, index)
+        for ring in range(rings + 1):
+            for cx in range(gx - ring, gx + ring + 1):
+                step = 1 if abs(cx - gx) == ring else 2 * ring
+                for cy in range(gy - ring, gy + ring + 1, step):
+                    for b in grid.get((cx, cy), ()):
+                        if b == a:
+                            continue
+                        entry = (-(abs(centres[b][0] - ax) + abs(centres[b][1] - ay)), b)
+                        if len(best) < k:
+                            heappush(best, entry)
+                        elif entry > best[0]:
+                            heapreplace(best, entry)
+            # Cells in the next ring are at least ``ring * size + 1`` away.
+            if len(best) == k and -best[0][0] <= ring * size:
+                break
+        pairs.update((min(a, b), max(a, b)) for _, b in best)
+    return pairs
+
+
+def plan_tunnels(regions, nearest=NEAREST):
+    """Tunnels ``((x0, y0), (x1, y1))`` joining all ``regions`` with the least total length.
+
+    Lengths are measured between sampled cells, and each region is only
+    paired with its ``nearest`` closest regions, so the plan is a close
+    approximation of the true minimum spanning tree.  When those pairs leave
+    groups of regions apart the neighbourhood is doubled until they join.
+    """
+    count = len(regions)
+    if count < 2:
+        return []
+    centres = [region.bounds.centre for region in regions]
+    points = [region.points() for region in regions]
+    edges = {}
+    k = nearest
+    while True:
+        for a, b in _nearest_pairs(centres, min(k, count - 1)):
+            if (a, b) not in edges:
+                checkpoint()
+                distance, start, end = _distance(points[a], points[b])
+                edges[a, b] = (distance, a, b, start, end)
+        parent = array("i", range(count))
+        tunnels = []
+        for _, a, b, start, end in sorted(edges.values()):
+            if _union(parent, a, b):
+                tunnels.append((start, end))
+                if len(tunnels) == count - 1:
+                    return tunnels
+        k *= 2
+
+
+def carve_tunnel(map_data, start, end, layer=WALLS, value=OPEN):
+    """Carve an L-shaped tunnel: along the row of ``start``, then the column of ``end``."""
+    (x0, y0), (x1, y1) = start, end
+    map_data.fill(layer, value, min(x0, x1), y0, abs(x1 - x0) + 1, 1)
+    map_data.fill(layer, value, x1, min(y0, y1), 1, abs(y1 - y0) + 1)
+
+
+def connect(map_data, layer=WALLS, min_size=1):
+    """Make the passable cells of ``map_data`` one region; returns the tunnels carved.
+
+    Regions smaller than ``min_size`` cells are filled in instead of being
+    joined up.
+    """
+    regions, _ = label(map_data, layer)
+    kept = []
+    for region in regions:
+        if region.size >= min_size:
+            kept.append(region)
+        else:
+            for y, x0, x1 in region.runs:
+                map_data.fill(layer, SOLID, x0, y, x1 - x0, 1)
+    tunnels = plan_tunnels(kept)
+    for start, end in tunnels:
+        carve_tunnel(map_data, start, end, layer)
+    return tunnels
@@ -0,0 +1,205 @@
+"""Drunkard's Walk caves carved by many walkers stepping in lockstep.
+
+Walker positions live in one packed ``array('i')`` of cell indices.  Each
+tick draws a single random byte buffer for all walkers, moves every walker
+with two comprehensions written back into the array in one slice assignment
+(moves that would leave the interior are dropped) and then carves the cells
+they landed on.  The number of open cells is counted as
+cells are carved, so checking the target fill ratio never rescans the grid.
+
+Large maps are split into chunks that are walked independently from streams
+keyed by ``(seed, cx, cy)`` (see :mod:`model.rng`).  Each chunk opens a "port" in the middle of
+every edge shared with another chunk and starts walkers there, so caves
+line up across chunk borders whichever process generated them.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from model.connectivity import connect
+from model.generator import MapGenerator, dirty_window, held_cells
+from model.jobs import checkpoint, progress, wait_for
+from model.map_data import LayerRegion, MapData, Rect, WALLS, OPEN, SOLID
+from model.rng import stream
+
+
+def walk(walls, width, height, starts, target, rng, max_steps, inside=None):
+    """Carve ``walls`` (a flat byte buffer) until ``target`` cells are open.
+
+    ``starts`` are the initial walker cells; returns the number of open
+    cells when the walk stopped.  ``inside`` marks the cells walkers may
+    enter with 1 (by default every cell but the outer ring); it must be 0
+    all round the edge.
+    """
+    if inside is None:
+        inside = bytearray(width * height)
+        interior = b"\x01" * (width - 2)
+        for y in range(1, height - 1):
+            inside[y * width + 1:(y + 1) * width - 1] = interior
+    deltas = (-width, 1, width, -1)
+    positions = array("i", starts)
+    for cell in positions:
+        walls[cell] = OPEN
+    carved = walls.count(OPEN)
+    randbytes = rng.randbytes
+    count = len(positions)
+    steps = 0
+    while carved < target and steps < max_steps:
+        steps += 1
+        if not steps & 63:
+            checkpoint()
+        moves = [p + deltas[b & 3] for p, b in zip(positions, randbytes(count))]
+        positions[:] = array("i", [q if inside[q] else p for p, q in zip(positions, moves)])
+        for cell in positions:
+            if walls[cell]:
+                walls[cell] = OPEN
+                carved += 1
+    return carved
+
+
+def walk_chunk(seed, cx, cy, chunk_width, chunk_height, walkers, fill_ratio,
+               ports=(True, True, True, True)):
+    """Walk one chunk and return its walls layer as ``bytes``.
+
+    ``ports`` says which edges (north, east, south, west) face another chunk
+    and should be opened at their midpoint.
+    """
+    rng = stream(seed, "drunkard", cx, cy)
+    walls = bytearray([SOLID]) * (chunk_width * chunk_height)
+    mid_x, mid_y = chunk_width // 2, chunk_height // 2
+    centre = mid_y * chunk_width + mid_x
+    starts = [centre]
+    edges = (
+        (mid_x, 0, mid_x, 1),
+        (chunk_width - 1, mid_y, chunk_width - 2, mid_y),
+        (mid_x, chunk_height - 1, mid_x, chunk_height - 2),
+        (0, mid_y, 1, mid_y),
+    )
+    for open_port, (px, py, sx, sy) in zip(ports, edges):
+        if open_port:
+            walls[py * chunk_width + px] = OPEN
+            starts.append(sy * chunk_width + sx)
+    positions = array("i", [starts[i % len(starts)] for i in range(walkers)])
+    target = int(fill_ratio * (chunk_width - 2) * (chunk_height - 2))
+    max_steps = 64 * chunk_width * chunk_height // max(walkers, 1)
+    walk(walls, chunk_width, chunk_height, positions, target, rng, max_steps)
+    return bytes(walls)
+
+
+def _walk_chunk_task(args):
+    return args[1], args[2], walk_chunk(*args)
+
+
+class DrunkardsWalkGenerator(MapGenerator):
+    """Cave generator that releases ``walkers`` walkers per chunk.
+
+    Walking stops once ``fill_ratio`` of each chunk's interior is open.
+    ``workers`` > 1 walks chunks in a process pool; the result is identical
+    for any worker count.
+    """
+
+    def __init__(self, seed=0, walkers=32, fill_ratio=0.4, chunk_size=128, workers=1):
+        super().__init__(seed)
+        if not 0 < fill_ratio < 1:
+            raise ValueError("fill_ratio must be between 0 and 1")
+        self.walkers = walkers
+        self.fill_ratio = fill_ratio
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def chunk_tasks(self, width, height):
+        size = self.chunk_size
+        chunks_x = -(-width // size)
+        chunks_y = -(-height // size)
+        for cy in range(chunks_y):
+            for cx in range(chunks_x):
+                chunk_width = min(size, width - cx * size)
+                chunk_height = min(size, height - cy * size)
+                ports = (cy > 0, cx < chunks_x - 1, cy < chunks_y - 1, cx > 0)
+                yield (self.seed, cx, cy, chunk_width, chunk_height,
+                       self.walkers, self.fill_ratio, ports)
+
+    def generate(self, width, height):
+        map_data = self.new_map(width, height)
+        tasks = list(self.chunk_tasks(width, height))
+        size = self.chunk_size
+        pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            futures = [pool.submit(_walk_chunk_task, task) for task in tasks] if pool else tasks
+            for done, (item, task) in enumerate(zip(futures, tasks), 1):
+                cx, cy, walls = wait_for(item) if pool else _walk_chunk_task(item)
+                chunk_width, chunk_height = task[3], task[4]
+                source = LayerRegion(memoryview(walls), chunk_width, 0, 0,
+                                     chunk_width, chunk_height)
+                map_data.blit(WALLS, cx * size, cy * size, source)
+                progress(done, len(tasks), map_data.copy)
+        except BaseException:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            raise
+        finally:
+            if pool:
+                pool.shutdown()
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Fill the window with rock and walk it again from the caves that reach its edge.
+
+        Walkers start next to every open cell just outside the window (or
+        in its middle if there is none) and stop once ``fill_ratio`` of the
+        free cells is open; caves the walkers left apart inside the window
+        are then joined (see :func:`~model.connectivity.connect`), so the
+        passages around the window stay connected.  Joins are only dug
+        outside a kept ``rect``.  The map's outer ring stays solid as in
+        :meth:`generate`.
+        """
+        window = dirty_window(map_data, rect, margin)
+        grid = dirty_window(map_data, window, 1)
+        free = held_cells(grid, window, rect if keep else None).translate(
+            bytes([1, 0]) + bytes(254))
+        width = map_data.width
+        walls_layer = map_data.layer(WALLS)
+        walls = bytearray(b"".join(walls_layer[y * width + grid.x:y * width + grid.right].tobytes()
+                                   for y in range(grid.y, grid.bottom)))
+        # Walkers may not touch the map's outer ring either.
+        border = Rect(1, 1, map_data.width - 2, map_data.height - 2)
+        for y in range(grid.height):
+            for x in range(grid.width):
+                if not border.contains(grid.x + x, grid.y + y):
+                    free[y * grid.width + x] = 0
+        starts = []
+        for index, cell in enumerate(free):
+            if cell:
+                walls[index] = SOLID
+                x = index % grid.width
+                if any(not free[n] and walls[n] == OPEN
+                       for n in (index - grid.width, index + 1, index + grid.width, index - 1)
+                       if 0 <= n < len(walls) and abs(n % grid.width - x) <= 1):
+                    starts.append(index)
+        count = free.count(1)
+        if not count:
+            return map_data
+        if not starts:
+            centre = [i for i, cell in enumerate(free) if cell]
+            starts = [centre[len(centre) // 2]]
+        walkers = [starts[i % len(starts)] for i in range(max(self.walkers, len(starts)))]
+        target = walls.count(OPEN) + int(self.fill_ratio * count)
+        walk(walls, grid.width, grid.height, walkers, target,
+             self.stream("drunkard-region", *rect, margin, variant),
+             64 * count // max(len(walkers), 1) + 64, inside=free)
+        sub = MapData(window.width, window.height, layers=(WALLS,))
+        cells = sub.layer(WALLS)
+        for y in range(window.height):
+            start = (y + window.y - grid.y) * grid.width + window.x - grid.x
+            cells[y * window.width:(y + 1) * window.width] = array(
+                cells.typecode, walls[start:start + window.width])
+        connect(sub, WALLS)
+        for y in range(window.height):
+            row = (y + window.y - grid.y) * grid.width + window.x - grid.x
+            start = (window.y + y) * width + window.x
+            for x in range(window.width):
+                if free[row + x]:
+                    walls_layer[start + x] = cells[y * window.width + x]
+        map_data.touch()
+        return map_data
@@ -0,0 +1,135 @@
+"""Common interface for map generation strategies."""
+
+import copy
+from array import array
+
+from model.jobs import Job
+from model.map_data import MapData, Rect
+from model.rng import stream
+
+
+def dirty_window(map_data, rect, margin):
+    """Cells a region re-run may change: ``rect`` grown by ``margin``, clipped to the map."""
+    x0, y0 = max(rect.x - margin, 0), max(rect.y - margin, 0)
+    x1 = min(rect.right + margin, map_data.width)
+    y1 = min(rect.bottom + margin, map_data.height)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError("dirty rectangle lies outside the map")
+    return Rect(x0, y0, x1 - x0, y1 - y0)
+
+
+def held_cells(grid, window, kept=None):
+    """Flat 0/1 ``bytearray`` over ``grid``: 1 outside ``window`` and inside ``kept``."""
+    held = bytearray(b"\x01") * grid.area
+    for rect, value in ((window, b"\x00"), (kept, b"\x01")):
+        if rect is None:
+            continue
+        x0, x1 = max(rect.x, grid.x), min(rect.right, grid.right)
+        if x1 <= x0:
+            continue
+        for y in range(max(rect.y, grid.y), min(rect.bottom, grid.bottom)):
+            start = (y - grid.y) * grid.width + x0 - grid.x
+            held[start:start + x1 - x0] = value * (x1 - x0)
+    return held
+
+
+def window_weights(map_data, window, kept, margin):
+    """Per-cell blend weights over ``window``, one row list at a time.
+
+    A cell's weight is its Chebyshev distance to the nearest held cell -
+    outside ``window`` (map edges hold nothing) or inside ``kept`` - over
+    ``margin + 1``, capped at 1, so new values fade in across the margin
+    and kept cells get 0.
+    """
+    ramp = margin + 1
+    far = ramp
+    left = [x - window.x + 1 if window.x > 0 else far for x in range(window.x, window.right)]
+    right = [window.right - x if window.right < map_data.width else far
+             for x in range(window.x, window.right)]
+    across = [min(a, b, far) for a, b in zip(left, right)]
+    rows = []
+    for y in range(window.y, window.bottom):
+        top = y - window.y + 1 if window.y > 0 else far
+        bottom = window.bottom - y if window.bottom < map_data.height else far
+        down = min(top, bottom)
+        distances = [min(d, down) for d in across]
+        if kept is not None:
+            dy = max(kept.y - y, y - kept.bottom + 1)
+            distances = [min(d, max(kept.x - x, x - kept.right + 1, dy, 0))
+                         for x, d in zip(range(window.x, window.right), distances)]
+        rows.append([min(d / ramp, 1.0) for d in distances])
+    return rows
+
+
+def regenerate_window(generator, map_data, rect, margin, keep, variant, layers, blend=()):
+    """Region re-run for generators whose ``fill(map_data, x0, y0)`` renders any window.
+
+    The variant's output for the window is written over every cell that is
+    not held.  Layers named in ``blend`` are continuous (heights, moisture):
+    they fade from the held values to the new ones across the margin, see
+    :func:`window_weights`; other layers are replaced outright.
+    """
+    window = dirty_window(map_data, rect, margin)
+    patch = generator.variant(variant).fill(MapData(window.width, window.height, layers=()),
+                                            window.x, window.y)
+    weights = window_weights(map_data, window, rect if keep else None, margin)
+    width = map_data.width
+    for name in layers:
+        new = patch.layer(name)
+        if not map_data.has_layer(name):
+            map_data.add_layer(name, new.typecode)
+        old = map_data.layer(name)
+        for row, ws in enumerate(weights):
+            start = (window.y + row) * width + window.x
+            fresh = new[row * window.width:(row + 1) * window.width]
+            held = old[start:start + window.width]
+            if name in blend:
+                values = [o + round((n - o) * w) for o, n, w in zip(held, fresh, ws)]
+            else:
+                values = [n if w else o for o, n, w in zip(held, fresh, ws)]
+            old[start:start + window.width] = array(old.typecode, values)
+    map_data.touch()
+    return map_data
+
+
+class MapGenerator:
+    """Strategy base class: subclasses fill a :class:`MapData` from their parameters."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def stream(self, stage, *coords):
+        """Random stream for ``stage`` (and chunk ``coords``) of this seed (:mod:`model.rng`)."""
+        return stream(self.seed, stage, *coords)
+
+    def new_map(self, width, height):
+        return MapData(width, height)
+
+    def variant(self, variant):
+        """This generator for ``variant`` 0, else a copy making other random choices."""
+        if not variant:
+            return self
+        clone = copy.copy(self)
+        clone.seed = (self.seed, "variant", variant)
+        return clone
+
+    def generate(self, width, height):
+        """Return a freshly generated ``width`` x ``height`` :class:`MapData`."""
+        raise NotImplementedError
+
+    def job(self, width, height, **options):
+        """:class:`~model.jobs.Job` that runs :meth:`generate`; ``options`` go to the job."""
+        return Job(self.generate, width, height, **options)
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Re-run generation inside ``rect`` plus ``margin`` cells, holding every other cell.
+
+        With ``keep`` the cells inside ``rect`` are held too (they carry a
+        hand edit) and only the band around them is redone to fit.
+        ``variant`` picks another random outcome for the same window.  Work
+        is proportional to the window, not the map.  Returns ``map_data``.
+
+        Every generator in this package implements it; the base class has
+        no way to re-run an unknown generator on part of a map.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot regenerate a region")
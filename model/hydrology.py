@@ -0,0 +1,599 @@
+"""Rivers and lakes from a heightmap: priority-flood, D8 flow and accumulation.
+
+:func:`priority_flood` is Barnes et al.'s Priority-Flood+FIFO.  Starting from
+the map edge (every edge cell drains off the map), it repeatedly takes the
+lowest cell on the frontier and floods its unvisited 8 neighbours.  A
+neighbour lower than the current level sits in a depression: it is raised
+to the spill level and appended to the FIFO queue of that level, so the
+flats of filled lakes cost O(1) per cell and drain breadth-first towards
+their spill point.  Every cell is reached from exactly one neighbour, and
+water drains back that way, so the flood tree *is* the D8 flow-direction
+field and needs no separate pass.  Cells leave the queue in an order where
+each one's downstream neighbour comes first, so flow accumulation is one
+pass over that order in reverse.
+
+Heights are integers and the level being processed never goes down, so
+the priority queue is one ``array('i')`` per height, each walked front to
+back and dropped once its level is done: pushes and pops are O(1) and the
+whole pass is linear.  The grid is padded by a closed one-cell border, so
+the inner loop has no bounds checks.  Each field (filled heights,
+directions, watershed labels, accumulation, visit order) costs one flat
+``array``, and the queue holds four bytes per frontier cell.
+
+:class:`Hydrology` floods the map in bands of rows, after Barnes' parallel
+Priority-Flood.  :func:`flood_band` floods one band as if its top and
+bottom rows were map edges too, labelling every cell with the seed it
+drains to and noting where those watersheds touch.  :func:`join_bands`
+floods the far smaller graph of watersheds - joined where they touch and
+across the seams - for the level each one fills to and the way it really
+drains, and :func:`finish_band` raises each band to those levels, turns
+the flow of watersheds that spill over a saddle, and adds the flow coming
+in from other bands.  Bands flood independently, so they spread over
+worker processes, and a windowed edit floods again only the bands it
+touches.
+
+The water layer is classified in blocks of packed 64-bit lanes (see
+:mod:`model.packed`), so only the floods and the accumulation walk run per
+cell in the interpreter.  Pure Python floods about half a million cells a
+second, and labelling and joining the bands costs about half as much again,
+so one process takes close to a minute on a 4096x4096 heightmap; the
+floods and finishes are what ``workers`` share, and a windowed edit of
+such a map redoes about a quarter of the work.
+"""
+
+import heapq
+import sys
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from model import packed
+from model.generator import MapGenerator, dirty_window
+from model.jobs import checkpoint, phase, progress, wait_for
+from model.map_data import HEIGHT, WATER
+from model.noise import TerrainNoiseGenerator
+
+# Values of the water layer.
+DRY = 0
+RIVER = 1
+LAKE = 2
+
+# Flow direction of cells that drain off the map edge.
+OUTLET = 8
+
+# Label of cells the flood has not reached yet.
+OPEN = -2
+
+
+def _padded(values, width, height, typecode):
+    stride = width + 2
+    padded = array(typecode, [0]) * (stride * (height + 2))
+    for y in range(height):
+        start = (y + 1) * stride + 1
+        padded[start:start + width] = values[y * width:(y + 1) * width]
+    return padded
+
+
+def _lanes(values, start, end):
+    """``values[start:end]`` as one little-endian integer with a 64-bit lane per cell."""
+    lanes = array("q", values[start:end])
+    if sys.byteorder == "big":
+        lanes.byteswap()
+    return int.from_bytes(lanes, "little")
+
+
+def _repeat(lane, count):
+    """Packed integer with ``lane`` in each of ``count`` 64-bit lanes."""
+    return int.from_bytes(lane.to_bytes(8, "little") * count, "little")
+
+
+def _unpadded(padded, width, height):
+    stride = width + 2
+    result = array(padded.typecode)
+    for y in range(height):
+        start = (y + 1) * stride + 1
+        result.extend(padded[start:start + width])
+    return result
+
+
+def flood_band(heights, width, height, y0=0, rows=None):
+    """Priority-flood rows ``y0`` to ``y0 + rows`` of a heightmap on their own.
+
+    ``heights`` holds just those rows.  The band's top and bottom rows
+    drain as if they were map edges: every cell on them that is not on the
+    real map edge seeds a watershed label of its own (1, 2, ... in raster
+    order), and real edge cells share label 0.
+
+    Returns padded ``(filled, directions, order, labels, seeds, edges)``:
+    the fields of :func:`priority_flood`, each cell's label (-1 on the
+    padding), the seed cell of each label, and ``edges`` mapping each pair
+    of touching watersheds ``a < b``, keyed ``a * len(seeds) + b``, to
+    ``(spill, cell_a, cell_b)``: the lowest level at which they meet and a
+    pair of neighbouring cells, one in each, where they do.
+    """
+    if heights.typecode not in "bBhHiIlLqQ":
+        raise ValueError("priority_flood needs integer heights")
+    if rows is None:
+        rows = height
+    stride = width + 2
+    size = stride * (rows + 2)
+    offsets = packed.neighbour_offsets(stride)
+    filled = _padded(heights, width, rows, heights.typecode)
+    checkpoint()
+    directions = bytearray([OUTLET]) * size
+    # A cell is closed once it has a label; the padding is closed from the start.
+    labels = array("i", [-1]) * size
+    unlabelled = array("i", [OPEN]) * width
+    for y in range(rows):
+        start = (y + 1) * stride + 1
+        labels[start:start + width] = unlabelled
+
+    base = top = heights[0]
+    for start in range(0, len(heights), 1 << 16):
+        checkpoint()
+        block = heights[start:start + (1 << 16)]
+        base, top = min(base, min(block)), max(top, max(block))
+    buckets = [array("i") for _ in range(top - base + 1)]
+    # Seed the edge cells in raster order, skipping cells already labelled:
+    # the corners' second visit (and every repeat on one-cell-wide bands).
+    edge = [range(stride + 1, stride + width + 1)]
+    edge += [((y + 1) * stride + 1, (y + 1) * stride + width) for y in range(1, rows - 1)]
+    edge.append(range(rows * stride + 1, rows * stride + width + 1))
+    seeds = array("i", [-1])
+    for cells in edge:
+        for cell in cells:
+            if labels[cell] == OPEN:
+                y = cell // stride - 1 + y0
+                if 0 < y < height - 1 and 1 < cell % stride < width:
+                    labels[cell] = len(seeds)
+                    seeds.append(cell)
+                else:
+                    labels[cell] = 0
+                buckets[filled[cell] - base].append(cell)
+    checkpoint()
+
+    # (offset to the neighbour, direction from the neighbour back to this cell)
+    neighbours = tuple((offset, code ^ 4) for code, offset in enumerate(offsets))
+    order = array("i")
+    count = len(seeds)
+    edges = {}
+    unreached = OPEN
+    cells = width * rows
+    for bucket, queue in enumerate(buckets):
+        level = bucket + base
+        push = queue.append
+        # Cells pushed at this level join the walk; the queue, once walked,
+        # is the next stretch of the visiting order.
+        for index, cell in enumerate(queue):
+            if not index & 4095:
+                progress(len(order) + index, cells)
+            label = labels[cell]
+            for offset, back in neighbours:
+                n = cell + offset
+                other = labels[n]
+                if other > label:
+                    # Another watershed got here first.  Each boundary is
+                    # met from both sides; keep it from the lower label's.
+                    key = label * count + other
+                    spill = filled[n] if filled[n] > level else level
+                    known = edges.get(key)
+                    if known is None or spill < known[0]:
+                        edges[key] = (spill, cell, n)
+                elif other == unreached:
+                    directions[n] = back
+                    labels[n] = label
+                    ground = filled[n]
+                    if ground <= level:
+                        filled[n] = level
+                        push(n)
+                    else:
+                        buckets[ground - base].append(n)
+        order += queue
+        buckets[bucket] = None
+    return filled, directions, order, labels, seeds, edges
+
+
+def priority_flood(heights, width, height):
+    """Fill depressions in a flat ``width`` x ``height`` array of integer heights.
+
+    Returns padded ``(filled, directions, order)``: raised heights, the D8
+    direction each cell drains to (an index into
+    :func:`packed.neighbour_offsets`, or :data:`OUTLET`), and the cells in
+    visiting order.  Arrays use row stride ``width + 2``.
+    """
+    filled, directions, order, _, _, _ = flood_band(heights, width, height)
+    return filled, directions, order
+
+
+def flow_accumulation(directions, order, stride, inflow=None):
+    """Number of cells draining through each cell (itself included), padded.
+
+    ``inflow`` maps cells to the number of cells outside the grid that
+    drain into them, as when the grid is one band of a larger map.
+    """
+    offsets = packed.neighbour_offsets(stride)
+    height = len(directions) // stride - 2
+    accumulation = _padded(array("I", [1]) * ((stride - 2) * height), stride - 2, height, "I")
+    for cell, count in (inflow or {}).items():
+        accumulation[cell] += count
+    # Walk the order backwards a block at a time, checkpointing between blocks.
+    block = 1 << 15
+    for end in range(len(order), 0, -block):
+        checkpoint()
+        for cell in reversed(order[max(end - block, 0):end]):
+            code = directions[cell]
+            if code != OUTLET:
+                accumulation[cell + offsets[code]] += accumulation[cell]
+    return accumulation
+
+
+# Rows per band of the banded pass.
+BAND_ROWS = 512
+
+# Level of the off-map watershed: below any height.
+_LOWEST = -1 << 62
+
+
+def _flood(heights, width, height, y0, rows):
+    """:func:`flood_band` plus the number of cells under each label."""
+    flood = flood_band(heights, width, height, y0, rows)
+    counts = Counter(flood[3])
+    return flood + ([counts[label] for label in range(len(flood[4]))],)
+
+
+def join_bands(bands, width):
+    """Spill levels and drainage between the watersheds of flooded bands.
+
+    ``bands`` holds ``(y0, rows, flood)`` for consecutive bands, where
+    ``flood`` is what :func:`flood_band` returned plus the cell count of
+    each label.  The watersheds form a graph: edges inside a band come from
+    ``flood``, and each seam joins the seed cells facing each other across
+    it at the higher of their two heights.  A minimax Priority-Flood over
+    that graph from the off-map watershed gives every watershed the level
+    it fills to before it can drain off the map, and the way it drains:
+    through its seed into the next band, or over a saddle into another
+    watershed of its own band.
+
+    Returns one ``(levels, exits, saddles, inflow)`` per band: the level of
+    each label (then one more for the padding), ``{seed: direction}`` for
+    seeds that drain into the next band, ``[(label, cell, direction), ...]``
+    for watersheds that spill over a saddle at ``cell`` (those they spill
+    into come first), and ``{cell: count}`` for cells that the outflow of
+    other bands enters through.
+    """
+    stride = width + 2
+    codes = {offset: code for code, offset in enumerate(packed.neighbour_offsets(stride))}
+    # Label ``l`` of band ``b`` is watershed ``first[b] + l``; label 0 is always watershed 0.
+    first, total = [], 1
+    for _, _, flood in bands:
+        first.append(total - 1)
+        total += len(flood[4]) - 1
+
+    # adjacent[u] holds (spill, v, band of v's cell, v's cell, band of u's cell, u's cell).
+    adjacent = [[] for _ in range(total)]
+    for b, (_, _, flood) in enumerate(bands):
+        count = len(flood[4])
+        for key, (spill, cell_a, cell_b) in flood[5].items():
+            a, c = divmod(key, count)
+            ga, gc = a and first[b] + a, first[b] + c
+            adjacent[ga].append((spill, gc, b, cell_b, b, cell_a))
+            adjacent[gc].append((spill, ga, b, cell_a, b, cell_b))
+    for b in range(len(bands) - 1):
+        checkpoint()
+        _, rows, upper = bands[b]
+        lower = bands[b + 1][2]
+        for x in range(1, width + 1):
+            cell = rows * stride + x
+            a = upper[3][cell]
+            ga = a and first[b] + a
+            for other in range(stride + max(x - 1, 1), stride + min(x + 1, width) + 1):
+                c = lower[3][other]
+                gc = c and first[b + 1] + c
+                if ga or gc:
+                    spill = max(upper[0][cell], lower[0][other])
+                    adjacent[ga].append((spill, gc, b + 1, other, b, cell))
+                    adjacent[gc].append((spill, ga, b, cell, b + 1, other))
+
+    levels = [None] * total
+    levels[0] = _LOWEST
+    parent = [0] * total
+    via = [None] * total
+    ranked = []
+    heap = [edge[:2] + (0,) + edge[2:] for edge in adjacent[0]]
+    heapq.heapify(heap)
+    while heap:
+        spill, v, u, vb, vc, ub, uc = heapq.heappop(heap)
+        if levels[v] is not None:
+            continue
+        levels[v], parent[v], via[v] = spill, u, (vb, vc, ub, uc)
+        ranked.append(v)
+        if not len(ranked) & 4095:
+            checkpoint()
+        for edge in adjacent[v]:
+            if levels[edge[1]] is None:
+                heapq.heappush(heap, (max(edge[0], spill), edge[1], v) + edge[2:])
+
+    # The seed each watershed's water leaves its band through (0: off the map).
+    drain = [0] * total
+    outflow = [0] * total
+    for v in ranked:
+        vb, _, ub, _ = via[v]
+        drain[v] = v if vb != ub else drain[parent[v]]
+    for b, (_, _, flood) in enumerate(bands):
+        for label, size in enumerate(flood[6]):
+            if label and drain[first[b] + label]:
+                outflow[drain[first[b] + label]] += size
+    inflow = [{} for _ in bands]
+    # Downstream watersheds rank first, so walking back collects each
+    # band's outflow before passing it on.
+    for v in reversed(ranked):
+        if drain[v] == v:
+            _, _, ub, uc = via[v]
+            inflow[ub][uc] = inflow[ub].get(uc, 0) + outflow[v]
+            if drain[parent[v]]:
+                outflow[drain[parent[v]]] += outflow[v]
+
+    joined = [([_LOWEST] + levels[first[b] + 1:first[b] + len(flood[4])] + [_LOWEST], {}, [],
+               inflow[b]) for b, (_, _, flood) in enumerate(bands)]
+    for v in ranked:
+        vb, vc, ub, uc = via[v]
+        dy = uc // stride - vc // stride + bands[ub][0] - bands[vb][0]
+        code = codes[dy * stride + uc % stride - vc % stride]
+        if vb != ub:
+            joined[vb][1][vc] = code
+        else:
+            joined[vb][2].append((v - first[vb], vc, code))
+    return joined
+
+
+def finish_band(flood, width, rows, levels, exits, saddles, inflow):
+    """Unpadded ``(filled, directions, accumulation)`` for one band.
+
+    ``flood`` is the band's :func:`flood_band` result; the rest is the
+    band's share of :func:`join_bands`.  Watersheds are raised to their
+    levels and seeds that drain into the next band point there.  A
+    watershed that spills over a saddle has the flood tree's path from the
+    saddle back to its seed turned around - the path is flat at the
+    watershed's level - so everything that drained to the seed drains out
+    over the saddle instead.
+    """
+    filled, tree, order, labels, seeds = flood[:5]
+    stride = width + 2
+    if any(levels[label] > filled[seed] for label, seed in enumerate(seeds) if label):
+        # ``levels[-1]`` is below every height, so the padding keeps its value.
+        filled = array(filled.typecode, map(max, filled, map(levels.__getitem__, labels)))
+    checkpoint()
+    # Accumulate down the flood tree, then hand each spilled watershed's
+    # flow on over its saddle, upstream watersheds first.
+    accumulation = flow_accumulation(tree, order, stride, inflow)
+    directions = bytearray(tree)
+    for cell, code in exits.items():
+        directions[cell] = code
+    offsets = packed.neighbour_offsets(stride)
+    for label, saddle, out in reversed(saddles):
+        checkpoint()
+        total = accumulation[seeds[label]]
+        # Re-rooting the tree at the saddle: each cell on the turned path
+        # now carries everything but what the cell before it used to.
+        cell, code, before = saddle, out, 0
+        while True:
+            before, accumulation[cell] = accumulation[cell], total - before
+            back = tree[cell]
+            directions[cell] = code
+            if back == OUTLET:
+                break
+            cell += offsets[back]
+            code = back ^ 4
+        # The watershed beyond has not been turned yet (it ranks lower), so
+        # its flood tree still leads to its seed.
+        cell = saddle + offsets[out]
+        while True:
+            accumulation[cell] += total
+            if tree[cell] == OUTLET:
+                break
+            cell += offsets[tree[cell]]
+    return (_unpadded(filled, width, rows), packed.unpad(directions, width, rows),
+            _unpadded(accumulation, width, rows))
+
+
+def _run(function, tasks, pool):
+    """``function(*task)`` for each task in order, in ``pool`` if there is one."""
+    futures = [pool.submit(function, *task) for task in tasks] if pool else None
+    results = []
+    for index, task in enumerate(tasks):
+        if pool:
+            result = wait_for(futures[index])
+        else:
+            with phase(index / len(tasks), (index + 1) / len(tasks)):
+                result = function(*task)
+        results.append(result)
+        progress(index + 1, len(tasks))
+    return results
+
+
+# Cells per block of the packed water classification.
+WATER_BLOCK = 1 << 15
+
+
+def classify_water(filled, heights, accumulation, river_threshold, lake_depth):
+    """Water layer bytes: :data:`LAKE` where filling raised a cell by ``lake_depth``,
+    else :data:`RIVER` where ``river_threshold`` cells drain through it, else :data:`DRY`.
+
+    Works on blocks of 64-bit lanes: adding ``2**62 - limit`` to each lane
+    sets bit 62 exactly when the lane is at least ``limit``, and the two
+    flags end up as a 0-3 code per cell that one ``bytes.translate`` maps
+    to water values.
+    """
+    cells = len(filled)
+    water = bytearray(cells)
+    table = bytes([DRY, RIVER, LAKE, LAKE]) + bytes(252)
+    constants = {}
+    for start in range(0, cells, WATER_BLOCK):
+        checkpoint()
+        end = min(start + WATER_BLOCK, cells)
+        count = end - start
+        if count not in constants:
+            constants[count] = (_repeat(1 << 63, count), _repeat(1 << 62, count),
+                                _repeat((1 << 62) - lake_depth, count),
+                                _repeat((1 << 62) - river_threshold, count))
+        sign, flag, lake_bias, river_bias = constants[count]
+        # Flipping the sign bits makes every lane unsigned without changing
+        # the lane-wise difference, so the subtraction never borrows.
+        depth = (_lanes(filled, start, end) ^ sign) + lake_bias - (_lanes(heights, start, end) ^ sign)
+        flow = _lanes(accumulation, start, end) + river_bias
+        codes = (depth & flag) >> 61 | (flow & flag) >> 62
+        water[start:end] = codes.to_bytes(8 * count, "little")[::8].translate(table)
+    return water
+
+
+class Hydrology:
+    """Compute drainage for the ``height`` layer and write a ``water`` layer.
+
+    Cells draining at least ``river_threshold`` cells become :data:`RIVER`
+    (default: one 4096th of the map, at least 32); cells that filling
+    raised by at least ``lake_depth`` become :data:`LAKE`.  After
+    :meth:`apply`, ``filled``, ``directions`` and ``accumulation`` hold the
+    unpadded fields.
+
+    The map is flooded in bands of ``band`` rows, spread over ``workers``
+    processes when there are more than one, and the bands are joined by
+    :func:`join_bands`.  Each band's flood is kept for the next
+    :meth:`apply` with a ``rect``.
+    """
+
+    def __init__(self, river_threshold=None, lake_depth=256, layer=HEIGHT, band=BAND_ROWS,
+                 workers=1):
+        self.river_threshold = river_threshold
+        self.lake_depth = lake_depth
+        self.layer = layer
+        self.band = band
+        self.workers = workers
+        self.filled = None
+        self.directions = None
+        self.accumulation = None
+        self._bands = None
+
+    def apply(self, map_data, rect=None):
+        """Write the water layer for ``map_data``.
+
+        With ``rect``, the heights are taken to have changed only inside it
+        since the last call on this map: bands clear of it keep their flood,
+        bands whose inflow alone changed pass the difference down to where
+        it leaves them, and bands where nothing changed are left alone.
+        """
+        width, height = map_data.width, map_data.height
+        heights = map_data.layer(self.layer)
+        spans = [(y0, min(self.band, height - y0)) for y0 in range(0, height, self.band)]
+        shape = (width, height, heights.typecode, self.band)
+        floods, joins = [None] * len(spans), [None] * len(spans)
+        whole = rect is None or self._bands is None or self._bands[0] != shape
+        if whole:
+            self.filled = array(heights.typecode, bytes(heights.itemsize * width * height))
+            self.directions = bytearray(width * height)
+            self.accumulation = array("I", bytes(4 * width * height))
+        else:
+            for index, (y0, rows) in enumerate(spans):
+                if rect.bottom <= y0 or y0 + rows <= rect.y:
+                    floods[index] = self._bands[1][index]
+                    joins[index] = self._bands[2][index]
+
+        pool = None
+        if self.workers > 1 and len(spans) > 1:
+            pool = ProcessPoolExecutor(self.workers)
+        try:
+            with phase(0, 0.6):
+                todo = [index for index, flood in enumerate(floods) if flood is None]
+                tasks = [(heights[y0 * width:(y0 + rows) * width], width, height, y0, rows)
+                         for y0, rows in (spans[index] for index in todo)]
+                for index, flood in zip(todo, _run(_flood, tasks, pool)):
+                    floods[index] = flood
+            joined = join_bands([span + (flood,) for span, flood in zip(spans, floods)], width)
+            progress(0.65, 1)
+            changed = []
+            with phase(0.65, 0.9):
+                todo = []
+                for index, join in enumerate(joined):
+                    if joins[index] is None or joins[index][:3] != join[:3]:
+                        todo.append(index)
+                    elif joins[index][3] != join[3]:
+                        self._pass_on(spans[index], width, joins[index][3], join[3])
+                        changed.append(index)
+                tasks = [(floods[index], width, spans[index][1]) + joined[index]
+                         for index in todo]
+                for index, fields in zip(todo, _run(finish_band, tasks, pool)):
+                    start, end = spans[index][0] * width, sum(spans[index]) * width
+                    self.filled[start:end], self.directions[start:end], \
+                        self.accumulation[start:end] = fields
+                    changed.append(index)
+        except BaseException:
+            if pool:
+                # Cancelled or failed: do not wait for bands still running.
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            self._bands = None
+            raise
+        finally:
+            if pool:
+                pool.shutdown()
+        self._bands = (shape, floods, joined)
+
+        threshold = self.river_threshold
+        if threshold is None:
+            threshold = max(32, width * height // 4096)
+        if whole or not map_data.has_layer(WATER):
+            map_data.add_layer(WATER)
+            changed = range(len(spans))
+        water = map_data.layer(WATER)
+        for index in changed:
+            start, end = spans[index][0] * width, sum(spans[index]) * width
+            water[start:end] = array("B", classify_water(
+                self.filled[start:end], heights[start:end], self.accumulation[start:end],
+                threshold, self.lake_depth))
+        map_data.touch()
+        return map_data
+
+    def _pass_on(self, span, width, before, after):
+        """Add each change in a band's inflow to the cells below where it enters."""
+        y0, rows = span
+        stride = width + 2
+        offsets = packed.neighbour_offsets(width)
+        start, end = y0 * width, (y0 + rows) * width
+        for entry in before.keys() | after.keys():
+            change = after.get(entry, 0) - before.get(entry, 0)
+            cell = (entry // stride - 1 + y0) * width + entry % stride - 1
+            while change and start <= cell < end:
+                self.accumulation[cell] += change
+                code = self.directions[cell]
+                if code == OUTLET:
+                    break
+                cell += offsets[code]
+
+
+class HydrologyGenerator(MapGenerator):
+    """Noise terrain followed by a :class:`Hydrology` pass."""
+
+    def __init__(self, seed=0, river_threshold=None, lake_depth=256, band=BAND_ROWS, workers=1,
+                 **terrain_options):
+        super().__init__(seed)
+        self.terrain = TerrainNoiseGenerator(seed, **terrain_options)
+        self.hydrology = Hydrology(river_threshold, lake_depth, band=band, workers=workers)
+
+    def generate(self, width, height):
+        with phase(0, 0.5):
+            map_data = self.terrain.generate(width, height)
+        with phase(0.5, 1):
+            return self.hydrology.apply(map_data)
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """New terrain inside the window, then drainage for the whole map again.
+
+        Heights are redone as in :meth:`TerrainNoiseGenerator.regenerate`.
+        Water is global - a new ridge can send a river the other way far
+        outside the window - so the bands are joined again over the whole
+        map, but only the bands the window touches are flooded again, and
+        only bands whose levels or inflow moved are finished again.
+        """
+        with phase(0, 0.5):
+            self.terrain.regenerate(map_data, rect, margin, keep, variant)
+        with phase(0.5, 1):
+            return self.hydrology.apply(map_data, dirty_window(map_data, rect, margin))
@@ -0,0 +1,167 @@
+"""Minimal PNG reading and writing using only the standard library.
+
+Pixels are exchanged as flat lists of packed ``0xRRGGBBAA`` integers in
+row-major order.  Reading supports non-interlaced 8-bit greyscale, RGB,
+palette and alpha images, which covers the sample maps fed to the
+overlapping WFC model; writing always emits 8-bit RGBA.
+
+:func:`grey_levels` flattens one map layer to a byte per cell for quick
+previews (the job CLI and the main window use it).
+"""
+
+import struct
+import sys
+import zlib
+
+from model.map_data import TERRAIN, WALLS, PROPS, LIGHTING, HEIGHT, BIOME, WATER
+
+# Layers tried, in order, when a preview does not name one.
+PREVIEW_LAYERS = (TERRAIN, WALLS, HEIGHT, BIOME, WATER, PROPS, LIGHTING)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _unfilter(data, width, height, bpp):
+    stride = width * bpp
+    rows = []
+    previous = bytearray(stride)
+    offset = 0
+    for _ in range(height):
+        kind = data[offset]
+        row = bytearray(data[offset + 1:offset + 1 + stride])
+        offset += stride + 1
+        if kind == 1:
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif kind == 2:
+            row = bytearray((a + b) & 0xFF for a, b in zip(row, previous))
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                up_left = previous[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + _paeth(left, previous[i], up_left)) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"unknown PNG filter type {kind}")
+        rows.append(row)
+        previous = row
+    return rows
+
+
+def decode_png(data):
+    """Decode PNG bytes into ``(width, height, pixels)``."""
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("not a PNG file")
+    offset = 8
+    idat = []
+    palette = None
+    transparency = b""
+    header = None
+    while offset < len(data):
+        length, kind = struct.unpack_from(">I4s", data, offset)
+        body = data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = [tuple(body[i:i + 3]) for i in range(0, length, 3)]
+        elif kind == b"tRNS":
+            transparency = body
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG has no IHDR chunk")
+    width, height, depth, colour, _, _, interlace = header
+    if depth != 8 or interlace or colour not in _CHANNELS:
+        raise ValueError("only non-interlaced 8-bit PNG images are supported")
+    channels = _CHANNELS[colour]
+    rows = _unfilter(zlib.decompress(b"".join(idat)), width, height, channels)
+    pixels = []
+    for row in rows:
+        if colour == 6:
+            pixels.extend(int.from_bytes(row[i:i + 4], "big") for i in range(0, len(row), 4))
+        elif colour == 2:
+            pixels.extend(int.from_bytes(row[i:i + 3], "big") << 8 | 0xFF
+                          for i in range(0, len(row), 3))
+        elif colour == 0:
+            pixels.extend(g * 0x01010100 | 0xFF for g in row)
+        elif colour == 4:
+            pixels.extend(row[i] * 0x01010100 | row[i + 1] for i in range(0, len(row), 2))
+        else:
+            pixels.extend((palette[i][0] << 24 | palette[i][1] << 16 | palette[i][2] << 8
+                           | (transparency[i] if i < len(transparency) else 0xFF))
+                          for i in row)
+    return width, height, pixels
+
+
+def read_png(path):
+    with open(path, "rb") as handle:
+        return decode_png(handle.read())
+
+
+def encode_png(width, height, pixels):
+    """Encode packed RGBA ``pixels`` as an 8-bit RGBA PNG."""
+    raw = bytearray()
+    for y in range(height):
+        raw.append(0)
+        for pixel in pixels[y * width:(y + 1) * width]:
+            raw += pixel.to_bytes(4, "big")
+
+    def chunk(kind, body):
+        return (struct.pack(">I", len(body)) + kind + body
+                + struct.pack(">I", zlib.crc32(kind + body) & 0xFFFFFFFF))
+
+    return b"".join([
+        PNG_SIGNATURE,
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(bytes(raw))),
+        chunk(b"IEND", b""),
+    ])
+
+
+def write_png(path, width, height, pixels):
+    with open(path, "wb") as handle:
+        handle.write(encode_png(width, height, pixels))
+
+
+def grey_levels(map_data, name=None):
+    """Layer ``name`` as one grey byte per cell, row-major; returns ``(name, bytes)``.
+
+    Without ``name`` the first layer of :data:`PREVIEW_LAYERS` holding any
+    non-zero cell is used.  16-bit layers keep their high byte and layers
+    of small values (walls, tile or biome indices) are stretched to 0-255.
+    """
+    if name is None:
+        present = [n for n in PREVIEW_LAYERS if map_data.has_layer(n)]
+        name = next((n for n in present if map_data.layer(n).tobytes().strip(b"\0")),
+                    present[0])
+    cells = map_data.layer(name)
+    size = cells.itemsize
+    if size > 1:
+        # The most significant byte of every cell.
+        return name, cells.tobytes()[size - 1 if sys.byteorder == "little" else 0::size]
+    top = max(cells, default=0)
+    if 0 < top < 128:
+        scale = 255 // top
+        return name, cells.tobytes().translate(bytes(min(v * scale, 255) for v in range(256)))
+    return name, cells.tobytes()
+
+
+def grey_pixels(levels):
+    """Packed RGBA pixels for grey ``levels``, as :func:`write_png` takes them."""
+    return [level * 0x01010100 | 0xFF for level in levels]
@@ -0,0 +1,239 @@
+"""Generation jobs: background runs with progress, cancellation and previews.
+
+Generators never see a job object.  They call two module functions that do
+nothing unless a :class:`Job` is running in the current thread:
+
+* :func:`checkpoint` - a cancellation point, cheap enough for inner loops
+  (noise rows, walker ticks, flood buckets);
+* :func:`progress` - also a cancellation point, and reports ``done`` of
+  ``total`` units of the current unit of work, optionally with a
+  ``preview`` callable that returns a partial :class:`MapData`.  Previews
+  are only built when the job wants one, so they cost nothing between
+  ``preview_interval`` ticks.
+
+A generator that runs other generators maps their progress onto part of its
+own with :func:`phase`, so a pipeline stage reports within its slice of the
+bar rather than restarting it.  Work handed to a process pool is awaited
+with :func:`wait_for`, which keeps checkpointing while it waits.
+
+Cancellation is cooperative: :meth:`Job.cancel` sets a flag and the next
+checkpoint raises :class:`JobCancelled` up through the generator.  The
+generators in this package checkpoint every few milliseconds at interactive
+map sizes, well inside the 50 ms a cancel button should take to bite;
+``Job.longest_gap`` records the longest stretch a run went without one.
+"""
+
+import os
+import threading
+import time
+from concurrent import futures
+
+
+class JobCancelled(Exception):
+    """Raised at a checkpoint once the running job has been cancelled."""
+
+
+class _Context(threading.local):
+    job = None
+
+
+_context = _Context()
+
+
+def _forget_job():
+    _context.job = None
+
+
+# A process pool forked from a job's thread must not report to (or be
+# cancelled through) the parent's copy of the job.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_job)
+
+
+def checkpoint():
+    """Raise :class:`JobCancelled` if the job running in this thread was cancelled."""
+    job = _context.job
+    if job is not None:
+        job._checkpoint()
+
+
+def progress(done, total, preview=None):
+    """Report ``done`` of ``total`` for the current phase; also a :func:`checkpoint`."""
+    job = _context.job
+    if job is not None:
+        job._progress(done, total, preview)
+
+
+def wait_for(future, interval=0.01):
+    """``future.result()``, passing a :func:`checkpoint` every ``interval`` seconds meanwhile."""
+    while True:
+        try:
+            return future.result(interval)
+        except futures.TimeoutError:
+            checkpoint()
+
+
+class _Phase:
+    def __init__(self, start, end, previews):
+        self.start = start
+        self.end = end
+        self.previews = previews
+        self.job = None
+        self.saved = None
+
+    def __enter__(self):
+        job = self.job = _context.job
+        if job is not None:
+            self.saved = job._span, job._previews
+            low, high = job._span
+            job._span = (low + (high - low) * self.start, low + (high - low) * self.end)
+            job._previews = job._previews and self.previews
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.job is not None:
+            self.job._span, self.job._previews = self.saved
+
+
+def phase(start, end, previews=True):
+    """Context manager running its body as the ``start``..``end`` fraction of the current phase.
+
+    With ``previews=False`` previews reported inside it are ignored, for
+    callers that report a better one themselves.
+    """
+    return _Phase(start, end, previews)
+
+
+class Job:
+    """Run ``target(*args)`` - usually ``generator.generate`` - as a cancellable job.
+
+    :meth:`start` runs it on a background thread and :meth:`run` in the
+    calling one.  The callbacks are called from the thread running the job:
+    ``on_progress(fraction)`` at most every ``progress_interval`` seconds,
+    ``on_preview(map_data)`` at most every ``preview_interval`` seconds and
+    ``on_finished(job)`` once, whatever the outcome; ``state`` then says
+    which it was.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+    def __init__(self, target, *args, on_progress=None, on_preview=None, on_finished=None,
+                 progress_interval=0.05, preview_interval=0.5):
+        self.target = target
+        self.args = args
+        self.on_progress = on_progress
+        self.on_preview = on_preview
+        self.on_finished = on_finished
+        self.progress_interval = progress_interval
+        self.preview_interval = preview_interval
+        self.state = Job.PENDING
+        self.fraction = 0.0
+        self.preview = None
+        self.result = None
+        self.error = None
+        self.elapsed = 0.0
+        self.longest_gap = 0.0
+        self._cancelled = False
+        self._done = threading.Event()
+        self._thread = None
+        self._span = (0.0, 1.0)
+        self._previews = True
+        self._last_check = self._last_progress = self._last_preview = 0.0
+
+    def __repr__(self):
+        return f"<Job {self.state} {self.fraction:.0%}>"
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        """Run the job on a daemon thread; returns ``self``."""
+        if self.state != Job.PENDING:
+            raise RuntimeError("job already started")
+        self.state = Job.RUNNING
+        self._thread = threading.Thread(target=self._main, name="generation-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        """Run the job in this thread and return the result (``None`` unless finished)."""
+        if self.state != Job.PENDING:
+            raise RuntimeError("job already started")
+        self.state = Job.RUNNING
+        self._main()
+        return self.result
+
+    def cancel(self):
+        """Ask the job to stop at its next checkpoint."""
+        self._cancelled = True
+
+    def wait(self, timeout=None):
+        """Wait for the job to end; returns whether it has."""
+        return self._done.wait(timeout)
+
+    def _main(self):
+        outer = _context.job
+        _context.job = self
+        start = time.perf_counter()
+        self._last_check = self._last_progress = self._last_preview = start
+        try:
+            try:
+                if self._cancelled:
+                    raise JobCancelled
+                self.result = self.target(*self.args)
+            finally:
+                _context.job = outer
+        except JobCancelled:
+            self._finish(Job.CANCELLED, start)
+        except Exception as error:
+            self.error = error
+            self._finish(Job.FAILED, start)
+        else:
+            self._finish(Job.FINISHED, start)
+
+    def _finish(self, state, start):
+        # Called inside the except clauses, so a cancelled generator's frames
+        # (and the large buffers they hold) are freed after the job reports
+        # its end rather than before it.
+        self.state = state
+        self.elapsed = time.perf_counter() - start
+        if state == Job.FINISHED:
+            self.fraction = 1.0
+            if self.on_progress:
+                self.on_progress(1.0)
+        self._done.set()
+        if self.on_finished:
+            self.on_finished(self)
+
+    # -- called by generators through the module functions ------------------
+
+    def _checkpoint(self):
+        now = time.perf_counter()
+        gap = now - self._last_check
+        if gap > self.longest_gap:
+            self.longest_gap = gap
+        self._last_check = now
+        if self._cancelled:
+            raise JobCancelled
+        return now
+
+    def _progress(self, done, total, preview):
+        now = self._checkpoint()
+        low, high = self._span
+        fraction = low + (high - low) * min(done / total, 1.0) if total else high
+        if fraction > self.fraction:
+            self.fraction = fraction
+        if self.on_progress and now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            self.on_progress(self.fraction)
+        if (preview is not None and self._previews
+                and now - self._last_preview >= self.preview_interval):
+            self._last_preview = now
+            self.preview = preview()
+            if self.on_preview:
+                self.on_preview(self.preview)
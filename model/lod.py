@@ -0,0 +1,188 @@
+"""Level-of-detail pyramids: each level halves the one below with a per-layer reducer.
+
+Level 0 is the map itself and level ``k`` is ``ceil(width / 2**k)`` by
+``ceil(height / 2**k)``.  Every cell of level ``k`` summarises a 2x2 block of
+level ``k - 1`` (the last row or column is repeated when a side is odd):
+
+* :func:`majority` for categorical layers (terrain, biomes) - the most
+  common value, ties going to the top-left cell;
+* :func:`maximum` for walls and water, so thin features survive;
+* :func:`mean` for height, moisture and light levels.
+
+Each reducer is applied with ``map`` over four strided slices of a row
+pair, so a level costs one C-level pass per layer rather than a Python loop
+over 2x2 blocks.  :meth:`MipPyramid.update` recomputes only the cells above
+an edited rectangle - a quarter as many per level - so keeping a pyramid
+current costs about a third more than the edit itself.
+
+:class:`WorldOverview` extends this to a chunked world: each chunk is
+reduced to a small thumbnail, the thumbnails are tiled into one mosaic and
+the mosaic has its own pyramid, so a zoomed-out view of the whole world is
+a level that already exists rather than a pass over every cell.
+"""
+
+from array import array
+
+from model.map_data import MapData, Rect, TERRAIN, WALLS, PROPS, LIGHTING, FOG
+from model.map_data import HEIGHT, MOISTURE, BIOME, WATER
+
+
+def majority(a, b, c, d):
+    if a == b or a == c or a == d:
+        return a
+    if b == c or b == d:
+        return b
+    return c if c == d else a
+
+
+maximum = max
+
+
+def mean(a, b, c, d):
+    return (a + b + c + d) // 4
+
+
+DEFAULT_REDUCERS = {
+    TERRAIN: majority,
+    WALLS: maximum,
+    PROPS: maximum,
+    LIGHTING: mean,
+    FOG: maximum,
+    HEIGHT: mean,
+    MOISTURE: mean,
+    BIOME: majority,
+    WATER: maximum,
+}
+
+
+def _halve(source, layers):
+    """Blank map half the size of ``source`` with the same layer types."""
+    target = MapData((source.width + 1) // 2, (source.height + 1) // 2, layers=())
+    for name in layers:
+        target.add_layer(name, source.layer(name).typecode)
+    return target
+
+
+def reduce_region(source, target, reducers, rect):
+    """Recompute the cells of ``target`` (half of ``source``) inside ``rect``."""
+    x0, y0, width, height = rect
+    if width <= 0 or height <= 0:
+        return
+    sw, sh, tw = source.width, source.height, target.width
+    left, right = 2 * x0, 2 * (x0 + width)
+    for name in target.layer_names:
+        reducer = reducers.get(name, majority)
+        src, dst = source.layer(name), target.layer(name)
+        typecode = dst.typecode
+        for ty in range(y0, y0 + height):
+            rows = []
+            for sy in (2 * ty, min(2 * ty + 1, sh - 1)):
+                row = src[sy * sw + left:sy * sw + min(right, sw)]
+                if right > sw:
+                    row.append(row[-1])
+                rows.append(row)
+            top, bottom = rows
+            start = ty * tw + x0
+            dst[start:start + width] = array(typecode, map(
+                reducer, top[0::2], top[1::2], bottom[0::2], bottom[1::2]))
+    target.touch()
+
+
+class MipPyramid:
+    """Downsampled copies of ``map_data`` down to ``min_size`` cells on the long side.
+
+    ``layers`` picks the layers to keep (all by default) and ``reducers``
+    overrides :data:`DEFAULT_REDUCERS` per layer name; other layers use
+    :func:`majority`.  Pass ``build=False`` for a blank (all zero) map, whose
+    pyramid is blank too.  After editing the map call :meth:`update` with
+    the edited rectangle, or :meth:`refresh` to rebuild after unknown edits.
+    """
+
+    def __init__(self, map_data, layers=None, reducers=None, min_size=1, build=True):
+        self.map_data = map_data
+        self.layers = tuple(layers) if layers is not None else map_data.layer_names
+        self.reducers = {**DEFAULT_REDUCERS, **(reducers or {})}
+        self.levels = [map_data]
+        while max(self.levels[-1].width, self.levels[-1].height) > min_size:
+            self.levels.append(_halve(self.levels[-1], self.layers))
+        self._revision = None
+        if build:
+            self.update(Rect(0, 0, map_data.width, map_data.height))
+        else:
+            self._revision = map_data.revision
+
+    def __len__(self):
+        return len(self.levels)
+
+    def level(self, k):
+        return self.levels[k]
+
+    def level_for(self, width, height):
+        """Finest level that fits in ``width`` x ``height`` cells (the coarsest if none does)."""
+        for level in self.levels:
+            if level.width <= width and level.height <= height:
+                return level
+        return self.levels[-1]
+
+    def update(self, rect):
+        """Recompute every level above the edited ``rect`` of level 0."""
+        x0, y0, x1, y1 = rect.x, rect.y, rect.right, rect.bottom
+        for source, target in zip(self.levels, self.levels[1:]):
+            x0, y0 = max(x0, 0) // 2, max(y0, 0) // 2
+            x1 = min((x1 + 1) // 2, target.width)
+            y1 = min((y1 + 1) // 2, target.height)
+            reduce_region(source, target, self.reducers, Rect(x0, y0, x1 - x0, y1 - y0))
+        self._revision = self.map_data.revision
+
+    def refresh(self):
+        """Rebuild the pyramid if the map changed since the last update."""
+        if self._revision != self.map_data.revision:
+            self.update(Rect(0, 0, self.map_data.width, self.map_data.height))
+
+
+class WorldOverview:
+    """Mosaic of chunk thumbnails for the chunks inside ``bounds``, with its own pyramid.
+
+    ``bounds`` is a :class:`Rect` in chunk coordinates.  Each chunk becomes
+    a ``chunk_size >> level`` square thumbnail; chunks that were never
+    reported read as zero.  :class:`~model.chunks.ChunkManager` reports the
+    chunks it loads and edits when given an overview.
+    """
+
+    def __init__(self, bounds, chunk_size, level=3, layers=None, reducers=None):
+        if chunk_size % (1 << level):
+            raise ValueError("chunk_size must be divisible by 2 ** level")
+        self.bounds = bounds
+        self.chunk_size = chunk_size
+        self.level = level
+        self.tile = chunk_size >> level
+        self.layers = layers
+        self.reducers = reducers
+        self.mosaic = None
+        self.pyramid = None
+
+    def _thumbnail(self, map_data):
+        pyramid = MipPyramid(map_data, self.layers, self.reducers, min_size=self.tile)
+        return pyramid.level(self.level)
+
+    def update(self, cx, cy, map_data):
+        """Redraw chunk ``(cx, cy)`` from ``map_data``; chunks outside ``bounds`` are ignored."""
+        if not self.bounds.contains(cx, cy):
+            return
+        thumbnail = self._thumbnail(map_data)
+        tile = self.tile
+        if self.mosaic is None:
+            self.mosaic = MapData(self.bounds.width * tile, self.bounds.height * tile, layers=())
+            for name in thumbnail.layer_names:
+                self.mosaic.add_layer(name, thumbnail.layer(name).typecode)
+            self.pyramid = MipPyramid(self.mosaic, reducers=self.reducers, build=False)
+        x, y = (cx - self.bounds.x) * tile, (cy - self.bounds.y) * tile
+        for name in self.mosaic.layer_names:
+            self.mosaic.blit(name, x, y, thumbnail.region(name, 0, 0, tile, tile))
+        self.pyramid.update(Rect(x, y, tile, tile))
+
+    def level_for(self, width, height):
+        """Finest overview level that fits in ``width`` x ``height`` cells, or ``None``."""
+        if self.pyramid is None:
+            return None
+        return self.pyramid.level_for(width, height)
@@ -0,0 +1,383 @@
+"""Layered map storage backed by flat, contiguous typed buffers.
+
+Every layer is a single ``array.array`` of ``width * height`` cells stored in
+row-major order, so a 4096x4096 map costs one byte per cell per layer.  The
+arrays expose the buffer protocol, which means ``memoryview`` slices (and
+``numpy.asarray``) see the same memory without copying.
+"""
+
+import json
+import struct
+from array import array
+from collections import namedtuple
+
+TERRAIN = "terrain"
+WALLS = "walls"
+PROPS = "props"
+LIGHTING = "lighting"
+FOG = "fog"
+
+DEFAULT_LAYERS = (TERRAIN, WALLS, PROPS, LIGHTING, FOG)
+
+# Optional outdoor layers: 16-bit elevation, 8-bit moisture, biome index and
+# surface water.
+HEIGHT = "height"
+MOISTURE = "moisture"
+BIOME = "biome"
+WATER = "water"
+
+# Values of the walls layer.
+OPEN = 0
+SOLID = 1
+
+
+class Rect(namedtuple("Rect", "x y width height")):
+    """Axis-aligned cell rectangle; ``x``/``y`` is the top-left corner."""
+
+    __slots__ = ()
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    @property
+    def centre(self):
+        return self.x + self.width // 2, self.y + self.height // 2
+
+    @property
+    def area(self):
+        return self.width * self.height
+
+    def contains(self, x, y):
+        return self.x <= x < self.right and self.y <= y < self.bottom
+
+    def intersects(self, other):
+        return (self.x < other.right and other.x < self.right
+                and self.y < other.bottom and other.y < self.bottom)
+
+    def expand(self, margin):
+        return Rect(self.x - margin, self.y - margin,
+                    self.width + 2 * margin, self.height + 2 * margin)
+
+
+class LayerRegion:
+    """Zero-copy rectangular window onto one layer of a :class:`MapData`."""
+
+    def __init__(self, buffer, stride, x, y, width, height):
+        self._buffer = buffer
+        self._stride = stride
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return (f"<LayerRegion(x={self.x}, y={self.y}, "
+                f"width={self.width}, height={self.height})>")
+
+    def _offset(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"cell ({x}, {y}) outside region")
+        return (self.y + y) * self._stride + self.x + x
+
+    def __getitem__(self, xy):
+        return self._buffer[self._offset(*xy)]
+
+    def __setitem__(self, xy, value):
+        self._buffer[self._offset(*xy)] = value
+
+    def row(self, y):
+        """Return row ``y`` of the region as a writable memoryview."""
+        start = self._offset(0, y)
+        return self._buffer[start:start + self.width]
+
+    def rows(self):
+        for y in range(self.height):
+            yield self.row(y)
+
+    def fill(self, value):
+        if not self.width or not self.height:
+            return
+        run = array(self._buffer.format, [value]) * self.width
+        for row in self.rows():
+            row[:] = run
+
+    def tobytes(self):
+        return b"".join(row.tobytes() for row in self.rows())
+
+
+class PropLayer:
+    """Point features (trees, rocks, ...) stored as parallel arrays.
+
+    ``xs`` and ``ys`` hold float positions in cells and ``kinds`` one byte per
+    prop, so a million props cost 9 MB and each column can be handed to
+    buffer-protocol consumers without copying.
+    """
+
+    def __init__(self):
+        self.xs = array("f")
+        self.ys = array("f")
+        self.kinds = array("B")
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return zip(self.xs, self.ys, self.kinds)
+
+    def __repr__(self):
+        return f"<PropLayer(props={len(self)})>"
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.xs, self.ys, self.kinds))
+
+    def append(self, x, y, kind):
+        self.xs.append(x)
+        self.ys.append(y)
+        self.kinds.append(kind)
+
+    def extend(self, xs, ys, kinds):
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.kinds.extend(kinds)
+
+    def clear(self):
+        del self.xs[:], self.ys[:], self.kinds[:]
+
+    def within(self, rect):
+        """Indices of the props inside ``rect``."""
+        x0, y0, x1, y1 = rect.x, rect.y, rect.right, rect.bottom
+        return [i for i, (x, y) in enumerate(zip(self.xs, self.ys))
+                if x0 <= x < x1 and y0 <= y < y1]
+
+    def copy(self):
+        clone = PropLayer()
+        clone.extend(self.xs, self.ys, self.kinds)
+        return clone
+
+
+class MapData:
+    """A ``width`` x ``height`` grid made of named, independently typed layers.
+
+    Cells are addressed as ``(x, y)`` with the origin in the top-left corner.
+    Layers default to unsigned bytes (``typecode="B"``); pass ``"H"`` or
+    another ``array`` typecode to :meth:`add_layer` when a layer needs more
+    than 256 distinct values.
+
+    ``revision`` goes up on every edit made through this class, so caches
+    derived from the map can tell when they are stale.  Code that writes
+    through a raw layer, view or region should call :meth:`touch`.
+    """
+
+    def __init__(self, width, height, layers=DEFAULT_LAYERS, typecode="B"):
+        if width <= 0 or height <= 0:
+            raise ValueError("map dimensions must be positive")
+        self.width = width
+        self.height = height
+        self.revision = 0
+        self._layers = {}
+        self._props = {}
+        for name in layers:
+            self.add_layer(name, typecode)
+
+    def __repr__(self):
+        return (f"<MapData(width={self.width}, height={self.height}, "
+                f"layers={list(self._layers)})>")
+
+    @property
+    def size(self):
+        return self.width * self.height
+
+    @property
+    def layer_names(self):
+        return tuple(self._layers)
+
+    @property
+    def nbytes(self):
+        return (sum(buf.itemsize * len(buf) for buf in self._layers.values())
+                + sum(props.nbytes for props in self._props.values()))
+
+    def add_layer(self, name, typecode="B", fill=0):
+        """Create (or replace) layer ``name`` with every cell set to ``fill``."""
+        buf = array(typecode, [fill]) * self.size
+        self._layers[name] = buf
+        self.revision += 1
+        return buf
+
+    def remove_layer(self, name):
+        del self._layers[name]
+        self.revision += 1
+
+    def touch(self):
+        """Record an edit made directly through a layer buffer or view."""
+        self.revision += 1
+
+    def has_layer(self, name):
+        return name in self._layers
+
+    def add_prop_layer(self, name=PROPS):
+        """Create (or replace) an empty :class:`PropLayer` called ``name``."""
+        props = self._props[name] = PropLayer()
+        self.revision += 1
+        return props
+
+    def prop_layer(self, name=PROPS):
+        try:
+            return self._props[name]
+        except KeyError:
+            raise KeyError(f"unknown prop layer {name!r}") from None
+
+    def has_prop_layer(self, name=PROPS):
+        return name in self._props
+
+    def layer(self, name):
+        """Return the raw ``array`` backing layer ``name``."""
+        try:
+            return self._layers[name]
+        except KeyError:
+            raise KeyError(f"unknown layer {name!r}") from None
+
+    def view(self, name):
+        """Return a 2-D ``(height, width)`` memoryview over layer ``name``."""
+        buf = self.layer(name)
+        return memoryview(buf).cast("B").cast(buf.typecode, (self.height, self.width))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def index(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"cell ({x}, {y}) outside {self.width}x{self.height} map")
+        return y * self.width + x
+
+    def get(self, name, x, y):
+        return self._layers[name][self.index(x, y)]
+
+    def set(self, name, x, y, value):
+        self._layers[name][self.index(x, y)] = value
+        self.revision += 1
+
+    def row(self, name, y):
+        """Return row ``y`` of layer ``name`` as a writable memoryview."""
+        if not 0 <= y < self.height:
+            raise IndexError(f"row {y} outside map")
+        start = y * self.width
+        return memoryview(self.layer(name))[start:start + self.width]
+
+    def _clip(self, x, y, width, height):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x1 <= x0 or y1 <= y0:
+            # An empty rectangle is empty in both directions, so regions
+            # never end up with rows of width 0.
+            return x0, y0, 0, 0
+        return x0, y0, x1 - x0, y1 - y0
+
+    def region(self, name, x, y, width, height):
+        """Return a zero-copy :class:`LayerRegion` clipped to the map bounds."""
+        x, y, width, height = self._clip(x, y, width, height)
+        return LayerRegion(memoryview(self.layer(name)), self.width, x, y, width, height)
+
+    def fill(self, name, value, x=0, y=0, width=None, height=None):
+        """Set every cell of a rectangle (the whole layer by default) to ``value``."""
+        buf = self.layer(name)
+        if width is None:
+            width = self.width - x
+        if height is None:
+            height = self.height - y
+        x, y, width, height = self._clip(x, y, width, height)
+        if not width or not height:
+            return
+        self.revision += 1
+        if width == self.width:
+            start = y * self.width
+            buf[start:start + width * height] = array(buf.typecode, [value]) * (width * height)
+            return
+        if width == 1:
+            start = y * self.width + x
+            buf[start:start + height * self.width:self.width] = array(buf.typecode, [value]) * height
+            return
+        run = array(buf.typecode, [value]) * width
+        for row in range(y, y + height):
+            start = row * self.width + x
+            buf[start:start + width] = run
+
+    def blit(self, name, x, y, source):
+        """Copy a :class:`LayerRegion` into layer ``name`` with its top-left at ``(x, y)``.
+
+        The copy is clipped to the map bounds; ``source`` may belong to this
+        map or another one and must share the layer's typecode.
+        """
+        buf = self.layer(name)
+        dx, dy, width, height = self._clip(x, y, source.width, source.height)
+        if not width or not height:
+            return
+        self.revision += 1
+        sx, sy = dx - x, dy - y
+        dst = memoryview(buf)
+        rows = range(height)
+        if source._buffer.obj is buf and dy > source.y + sy:
+            # Overlapping move within one layer: copy bottom-up.
+            rows = reversed(rows)
+        for row in rows:
+            start = (dy + row) * self.width + dx
+            src_row = source.row(sy + row)
+            dst[start:start + width] = src_row[sx:sx + width]
+
+    _MAGIC = b"IWMD"
+    _HEADER = struct.Struct("<4sI")
+
+    def to_bytes(self):
+        """Serialise every layer and prop layer (native byte order) for storage."""
+        meta = json.dumps({
+            "width": self.width,
+            "height": self.height,
+            "layers": [[name, buf.typecode] for name, buf in self._layers.items()],
+            "props": [[name, len(props)] for name, props in self._props.items()],
+        }).encode()
+        parts = [self._HEADER.pack(self._MAGIC, len(meta)), meta]
+        parts += [buf.tobytes() for buf in self._layers.values()]
+        for props in self._props.values():
+            parts += [props.xs.tobytes(), props.ys.tobytes(), props.kinds.tobytes()]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a map from :meth:`to_bytes` output."""
+        view = memoryview(data)
+        magic, meta_length = cls._HEADER.unpack_from(view)
+        if magic != cls._MAGIC:
+            raise ValueError("not serialised map data")
+        offset = cls._HEADER.size
+        meta = json.loads(bytes(view[offset:offset + meta_length]))
+        offset += meta_length
+
+        def read(typecode, count):
+            nonlocal offset
+            values = array(typecode)
+            end = offset + values.itemsize * count
+            values.frombytes(view[offset:end])
+            offset = end
+            return values
+
+        map_data = cls(meta["width"], meta["height"], layers=())
+        for name, typecode in meta["layers"]:
+            map_data._layers[name] = read(typecode, map_data.size)
+        for name, count in meta["props"]:
+            props = map_data._props[name] = PropLayer()
+            props.extend(read("f", count), read("f", count), read("B", count))
+        return map_data
+
+    def copy(self):
+        clone = MapData.__new__(MapData)
+        clone.width = self.width
+        clone.height = self.height
+        clone.revision = self.revision
+        clone._layers = {name: buf[:] for name, buf in self._layers.items()}
+        clone._props = {name: props.copy() for name, props in self._props.items()}
+        return clone
@@ -0,0 +1,270 @@
+"""Map quality metrics for the walls layer, computed in a few whole-grid passes.
+
+Everything is derived from one packed copy of the open cells (see
+:mod:`model.packed`), with bytewise shifts, adds and masks:
+
+* neighbour counts - orthogonal counts give dead ends; 2x2 "bit quads"
+  give the Euler number, and with the region count the number of loops;
+* one distance transform - the chessboard distance of each open cell to the
+  nearest blocked one, by repeated 3x3 erosion - whose ridge gives the
+  corridor widths;
+* a morphological opening with a 4x4 square, which keeps every 4x4 block
+  of open cells and drops anything narrower;
+* connected-component labelling (:func:`~model.connectivity.label`) of the
+  open space, for regions and connectivity, and of the opened space, for
+  rooms.
+
+Rooms are therefore the components of open space at least four cells
+across, and 3-wide corridors stay corridors.  Corridor cells are the open
+cells outside rooms; chokepoints are one-cell-wide gaps opening into a
+room.
+"""
+
+import json
+from array import array
+from dataclasses import asdict, dataclass, field
+
+from model import packed
+from model.connectivity import label
+from model.map_data import MapData, WALLS, OPEN
+
+# Distances saturate here so that ``distance + 1`` still fits in a byte.
+MAX_CLEARANCE = 254
+
+# 2x2 window codes (one bit per cell) by number and layout of open cells.
+_Q1 = (1, 2, 4, 8)
+_Q3 = (7, 11, 13, 14)
+_QD = (6, 9)
+
+
+def _table(values):
+    return bytes(1 if code in values else 0 for code in range(256))
+
+
+@dataclass
+class MapMetrics:
+    """Metrics of one map; the histograms map a width or size to a count.
+
+    ``corridor_widths`` counts corridor ridge cells - one or two per step
+    along a corridor - by width; ``room_sizes`` counts rooms per power-of-two area
+    bucket, keyed by the bucket's lower bound.
+    """
+
+    open_ratio: float = 0.0
+    regions: int = 0
+    connectivity: float = 0.0
+    rooms: int = 0
+    room_sizes: dict = field(default_factory=dict)
+    corridor_cells: int = 0
+    corridor_widths: dict = field(default_factory=dict)
+    dead_ends: int = 0
+    dead_end_ratio: float = 0.0
+    loops: int = 0
+    chokepoints: int = 0
+    max_clearance: int = 0
+
+    def as_dict(self):
+        return asdict(self)
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        for name in ("room_sizes", "corridor_widths"):
+            data[name] = {int(key): count for key, count in data.get(name, {}).items()}
+        return cls(**data)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+
+class PackedGrid:
+    """Packed 0/1 planes over a map with a one-cell border (row stride ``width + 2``)."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width + 2
+        self.length = self.stride * (height + 2)
+        self.ones = packed.interior_mask(width, height)
+        self.border = packed.border_mask(width, height)
+        self.full = (1 << 8 * self.length) - 1
+
+    def plane(self, cells):
+        """Pack a flat ``width * height`` buffer of 0/1 bytes."""
+        return packed.to_int(packed.pad(cells, self.width, self.height))
+
+    def cells(self, value):
+        """Unpack a plane back to ``width * height`` bytes."""
+        return packed.unpad(packed.to_bytes(value & self.full, self.length),
+                            self.width, self.height)
+
+    def shift(self, value, dx, dy):
+        """Align each cell with its neighbour ``(dx, dy)`` away."""
+        return packed.shifted(value, dx + dy * self.stride) & self.full
+
+    def erode(self, value):
+        """Cells whose whole 3x3 neighbourhood is set."""
+        out = value
+        for offset in packed.neighbour_offsets(self.stride):
+            out &= packed.shifted(value, offset)
+        return out
+
+    def dilate(self, value):
+        out = value
+        for offset in packed.neighbour_offsets(self.stride):
+            out |= packed.shifted(value, offset)
+        return out & self.full
+
+    def count(self, value, table=None):
+        data = packed.to_bytes(value & self.full, self.length)
+        return (data.translate(table) if table else data).count(1)
+
+
+def open_plane(grid, map_data, layer=WALLS, passable=OPEN):
+    """Packed plane with 1 for every cell of ``layer`` equal to ``passable``."""
+    if map_data.layer(layer).itemsize != 1:
+        raise ValueError("metrics need a one-byte-per-cell layer")
+    table = bytes(1 if value == passable else 0 for value in range(256))
+    return grid.plane(bytes(map_data.layer(layer)).translate(table))
+
+
+def dead_end_plane(grid, cells):
+    """Open cells with exactly one open orthogonal neighbour."""
+    count = sum(grid.shift(cells, dx, dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)))
+    # Open cells get 8 added, so a dead end is the byte value 9.
+    coded = packed.to_bytes(count + (cells << 3), grid.length).translate(_table((9,)))
+    return packed.to_int(coded)
+
+
+def room_regions(grid, cells):
+    """Rooms as :class:`~model.connectivity.Region` objects.
+
+    The open cells are opened with a 4x4 square: every 4x4 block of open
+    cells is kept and everything narrower dropped.  Each component of what
+    remains is a room.
+    """
+    width, height = grid.width, grid.height
+    rows = cells & grid.shift(cells, 1, 0) & grid.shift(cells, 2, 0) & grid.shift(cells, 3, 0)
+    blocks = rows & grid.shift(rows, 0, 1) & grid.shift(rows, 0, 2) & grid.shift(rows, 0, 3)
+    rows = blocks | grid.shift(blocks, -1, 0) | grid.shift(blocks, -2, 0) | grid.shift(blocks, -3, 0)
+    opened = rows | grid.shift(rows, 0, -1) | grid.shift(rows, 0, -2) | grid.shift(rows, 0, -3)
+    rooms = MapData(width, height, layers=(WALLS,))
+    rooms.layer(WALLS)[:] = array("B", grid.cells(opened))
+    return label(rooms, passable=1)[0]
+
+
+def room_planes(grid, cells):
+    """``(rooms, in_rooms, corridor, dead_ends)`` for the open ``cells``.
+
+    ``rooms`` are :func:`room_regions`; the rest are packed planes of the
+    room cells, the corridor cells (open cells outside rooms) and the dead
+    ends.  :mod:`model.seed_search` scores with these too, so the numbers a
+    search ranks by are the ones stored with saved maps.
+    """
+    rooms = room_regions(grid, cells)
+    in_rooms = region_plane(grid, rooms)
+    return rooms, in_rooms, cells & ~in_rooms, dead_end_plane(grid, cells)
+
+
+def region_plane(grid, regions):
+    """Packed plane with 1 on every cell of ``regions``."""
+    cells = bytearray(grid.width * grid.height)
+    width = grid.width
+    for region in regions:
+        for y, x0, x1 in region.runs:
+            cells[y * width + x0:y * width + x1] = b"\x01" * (x1 - x0)
+    return grid.plane(cells)
+
+
+def _clearance(grid, cells):
+    """Chessboard distance transform by erosion: ``(distances, max_clearance)``."""
+    distance = 0
+    current = cells
+    depth = 0
+    while current and depth < MAX_CLEARANCE:
+        distance += current
+        depth += 1
+        current = grid.erode(current)
+    return distance, depth
+
+
+def _corridor_widths(grid, distance, corridor):
+    """Histogram of corridor widths read off the ridge of the distance transform.
+
+    Distances of neighbours differ by at most one.  A ridge cell is at least
+    as far from the walls as its four neighbours; a corridor ``w`` cells wide
+    has ridge distance ``ceil(w / 2)``, and an even-width one has a
+    neighbour at the same distance across it as well as along it.
+    """
+    length = grid.length
+    ones = grid.ones
+    ridge = corridor
+    same = []
+    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        # Per byte: neighbour distance - distance + 1, in 0..2; 2 means farther.
+        step = packed.to_bytes((grid.shift(distance, dx, dy) + ones - distance) & grid.full,
+                               length)
+        ridge &= packed.to_int(step.translate(_table((0, 1))))
+        same.append(packed.to_int(step.translate(_table((1,)))))
+    # Level on both sides along the corridor and on at least one across it.
+    left, right, down, up = same
+    even = ridge & ((left & right & (up | down)) | (up & down & (left | right)))
+    widths = packed.to_bytes(((distance & ridge * 0xFF) << 1) - ridge + even, length)
+    histogram = {}
+    for width in set(widths) - {0}:
+        histogram[width] = widths.count(width)
+    return dict(sorted(histogram.items()))
+
+
+def _loops(grid, cells, regions):
+    """Independent cycles of the open space: regions minus its 4-connected Euler number."""
+    quads = (cells + (grid.shift(cells, 1, 0) << 1) + (grid.shift(cells, 0, 1) << 2)
+             + (grid.shift(cells, 1, 1) << 3))
+    data = packed.to_bytes(quads, grid.length)
+    euler = (data.translate(_table(_Q1)).count(1) - data.translate(_table(_Q3)).count(1)
+             + 2 * data.translate(_table(_QD)).count(1)) // 4
+    return regions - euler
+
+
+def map_metrics(map_data, layer=WALLS, passable=OPEN):
+    """:class:`MapMetrics` for the cells of ``layer`` equal to ``passable``."""
+    grid = PackedGrid(map_data.width, map_data.height)
+    cells = open_plane(grid, map_data, layer, passable)
+    metrics = MapMetrics()
+    open_cells = grid.count(cells)
+    if not open_cells:
+        return metrics
+    metrics.open_ratio = open_cells / (grid.width * grid.height)
+
+    regions, _ = label(map_data, layer, passable)
+    metrics.regions = len(regions)
+    metrics.connectivity = max(region.size for region in regions) / open_cells
+    metrics.loops = _loops(grid, cells, len(regions))
+
+    distance, metrics.max_clearance = _clearance(grid, cells)
+    rooms, in_rooms, corridor, dead_ends = room_planes(grid, cells)
+    metrics.rooms = len(rooms)
+    for region in rooms:
+        bucket = 1 << (region.size.bit_length() - 1)
+        metrics.room_sizes[bucket] = metrics.room_sizes.get(bucket, 0) + 1
+    metrics.room_sizes = dict(sorted(metrics.room_sizes.items()))
+
+    metrics.corridor_cells = grid.count(corridor)
+    metrics.corridor_widths = _corridor_widths(grid, distance, corridor)
+    metrics.dead_ends = grid.count(dead_ends)
+    if metrics.corridor_cells:
+        metrics.dead_end_ratio = grid.count(dead_ends & corridor) / metrics.corridor_cells
+
+    # One-cell-wide gaps (walls on both sides) that open into a room.
+    blocked = (grid.ones | grid.border) - cells
+    narrow = cells & ((grid.shift(blocked, 1, 0) & grid.shift(blocked, -1, 0))
+                      | (grid.shift(blocked, 0, 1) & grid.shift(blocked, 0, -1)))
+    beside_room = 0
+    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        beside_room |= grid.shift(in_rooms, dx, dy)
+    metrics.chokepoints = grid.count(narrow & beside_room & ~in_rooms)
+    return metrics
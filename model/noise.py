@@ -0,0 +1,272 @@
+"""Seeded gradient (Perlin) noise evaluated a row at a time.
+
+Noise is a pure function of ``(seed, x, y)`` in world cells, so any window -
+a chunk at ``(cx, cy)`` or the whole map - matches its neighbours exactly at
+the seams.  With ``period`` set, the lattice also wraps and the field tiles
+with that period.
+
+Evaluating a row splits it into runs that share one lattice cell.  Within a
+run the four corner gradients are fixed and the bilinear blend of their dot
+products reduces to ``P*fx + Q + u*(R*fx + S)`` with four per-run
+constants, which one list comprehension evaluates for the whole run.  The
+lattice positions and fade values along x depend only on the window, so
+they are computed once and shared by every row of every chunk in the same
+column of chunks.
+
+Caches:
+
+* permutation/gradient tables per octave seed (``lru_cache``);
+* x-axis lattice data per ``(frequency, x0, width, period)`` window;
+* low-frequency octaves in aligned tiles (an LRU keyed by octave and tile
+  coordinate).  Their wavelength spans several chunks, so one tile serves
+  a whole neighbourhood of chunk requests and each later neighbour gets
+  those octaves by slicing instead of evaluating them again.
+"""
+
+import math
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+
+from model.generator import MapGenerator, regenerate_window
+from model.jobs import checkpoint, phase, progress
+from model.map_data import HEIGHT, MOISTURE
+from model.rng import stream
+
+_GRADIENTS = ((1.0, 1.0), (-1.0, 1.0), (1.0, -1.0), (-1.0, -1.0),
+              (1.0, 0.0), (-1.0, 0.0), (0.0, 1.0), (0.0, -1.0))
+
+
+@lru_cache(maxsize=64)
+def permutation(seed):
+    """Doubled permutation of ``range(256)`` for ``seed``."""
+    values = list(range(256))
+    stream(seed, "noise-permutation").shuffle(values)
+    return tuple(values * 2)
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+@lru_cache(maxsize=256)
+def _axis(frequency, start, length, period):
+    """Lattice runs along one axis: ``[(cell, begin, end), ...]``, fractions, fades."""
+    runs = []
+    fractions = []
+    fades = []
+    previous = None
+    for i in range(length):
+        position = (start + i) * frequency
+        cell = math.floor(position)
+        fraction = position - cell
+        if period:
+            cell %= period
+        if cell != previous:
+            if runs:
+                runs[-1][2] = i
+            runs.append([cell, i, length])
+            previous = cell
+        fractions.append(fraction)
+        fades.append(_fade(fraction))
+    return tuple(tuple(run) for run in runs), tuple(fractions), tuple(fades)
+
+
+class GradientNoise:
+    """Fractal (fBm) Perlin noise with ``octaves`` layers, values roughly in [-1, 1].
+
+    ``frequency`` is in lattice cells per map cell for the first octave;
+    each further octave multiplies it by ``lacunarity`` and its amplitude by
+    ``gain``.  Octaves whose wavelength is at least ``cache_wavelength``
+    cells are evaluated in aligned ``tile_size`` tiles kept in an LRU of
+    ``cache_size`` tiles; smaller requests are sliced out of those tiles.
+    """
+
+    def __init__(self, seed=0, frequency=1 / 64, octaves=4, lacunarity=2.0, gain=0.5,
+                 period=None, tile_size=256, cache_size=32, cache_wavelength=64):
+        self.seed = seed
+        self.frequency = frequency
+        self.octaves = octaves
+        self.lacunarity = lacunarity
+        self.gain = gain
+        self.period = period
+        self.cache_size = cache_size
+        self.tile_size = tile_size
+        self.cache_wavelength = cache_wavelength
+        self._tiles = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def reseeded(self, seed):
+        """A field with the same settings (and an empty tile cache) for ``seed``."""
+        return GradientNoise(seed, self.frequency, self.octaves, self.lacunarity, self.gain,
+                             self.period, self.tile_size, self.cache_size, self.cache_wavelength)
+
+    def _octave_frequency(self, octave):
+        return self.frequency * self.lacunarity ** octave
+
+    def _octave_period(self, octave):
+        if not self.period:
+            return 0
+        return max(1, round(self.period * self._octave_frequency(octave)))
+
+    def octave_row(self, octave, y, x0, width):
+        """Raw noise for one octave along row ``y`` from ``x0``."""
+        checkpoint()
+        frequency = self._octave_frequency(octave)
+        period = self._octave_period(octave)
+        perm = permutation(f"{self.seed}:{octave}")
+        runs, fractions, fades = _axis(frequency, x0, width, period)
+        position = y * frequency
+        iy = math.floor(position)
+        fy = position - iy
+        v = _fade(fy)
+        iy1 = iy + 1
+        if period:
+            iy %= period
+            iy1 = (iy + 1) % period
+        row = []
+        extend = row.extend
+        for ix, begin, end in runs:
+            ix1 = (ix + 1) % period if period else ix + 1
+            ax, ay = _GRADIENTS[perm[(perm[ix & 255] + iy) & 255] & 7]
+            bx, by = _GRADIENTS[perm[(perm[ix1 & 255] + iy) & 255] & 7]
+            cx, cy = _GRADIENTS[perm[(perm[ix & 255] + iy1) & 255] & 7]
+            dx, dy = _GRADIENTS[perm[(perm[ix1 & 255] + iy1) & 255] & 7]
+            # Corner dot products as linear functions of fx: a = ax*fx + ay*fy,
+            # b = bx*(fx-1) + by*fy, c = cx*fx + cy*(fy-1), d = dx*(fx-1) + dy*(fy-1).
+            a0, b0 = ay * fy, by * fy - bx
+            c0, d0 = cy * (fy - 1), dy * (fy - 1) - dx
+            w = 1 - v
+            p = w * ax + v * cx
+            q = w * a0 + v * c0
+            r = w * (bx - ax) + v * (dx - cx)
+            s = w * (b0 - a0) + v * (d0 - c0)
+            extend([p * f + q + u * (r * f + s)
+                    for f, u in zip(fractions[begin:end], fades[begin:end])])
+        return row
+
+    def _tile(self, octave, tx, ty):
+        key = (octave, tx, ty)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.cache_hits += 1
+            return tile
+        self.cache_misses += 1
+        size = self.tile_size
+        tile = [array("d", self.octave_row(octave, y, tx * size, size))
+                for y in range(ty * size, (ty + 1) * size)]
+        self._tiles[key] = tile
+        if len(self._tiles) > self.cache_size:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _octave_block(self, octave, x0, y0, width, height):
+        size = self.tile_size
+        if (1 / self._octave_frequency(octave) < self.cache_wavelength
+                or (width >= size and height >= size)):
+            return [self.octave_row(octave, y, x0, width) for y in range(y0, y0 + height)]
+        x1 = x0 + width
+        spans = [(tx, max(x0, tx * size) - tx * size, min(x1, (tx + 1) * size) - tx * size)
+                 for tx in range(x0 // size, (x1 - 1) // size + 1)]
+        block = []
+        y1 = y0 + height
+        for ty in range(y0 // size, (y1 - 1) // size + 1):
+            tiles = [(self._tile(octave, tx, ty), begin, end) for tx, begin, end in spans]
+            top = ty * size
+            for offset in range(max(y0, top) - top, min(y1, top + size) - top):
+                if len(tiles) == 1:
+                    tile, begin, end = tiles[0]
+                    block.append(tile[offset][begin:end])
+                else:
+                    row = array("d")
+                    for tile, begin, end in tiles:
+                        row.extend(tile[offset][begin:end])
+                    block.append(row)
+        return block
+
+    def region(self, x0, y0, width, height):
+        """fBm noise for a window as a flat row-major ``array('f')``."""
+        rows = [[0.0] * width for _ in range(height)]
+        amplitude = 1.0
+        norm = 0.0
+        for octave in range(self.octaves):
+            block = self._octave_block(octave, x0, y0, width, height)
+            for i, values in enumerate(block):
+                checkpoint()
+                rows[i] = [t + amplitude * n for t, n in zip(rows[i], values)]
+            norm += amplitude
+            amplitude *= self.gain
+        # 2-D Perlin noise peaks at sqrt(1/2); rescale towards [-1, 1].
+        scale = math.sqrt(2) / norm
+        result = array("f")
+        for values in rows:
+            checkpoint()
+            result.extend([t * scale for t in values])
+        return result
+
+    def chunk(self, cx, cy, size):
+        """Noise for chunk ``(cx, cy)`` of a world split into ``size``-cell chunks."""
+        return self.region(cx * size, cy * size, size, size)
+
+
+def quantise(values, levels):
+    """Map noise values in [-1, 1] onto integers ``0 .. levels - 1``."""
+    top = levels - 1
+    half = top / 2
+    return [0 if n <= -1 else top if n >= 1 else int((n + 1) * half) for n in values]
+
+
+class TerrainNoiseGenerator(MapGenerator):
+    """Write 16-bit height and 8-bit moisture layers from two noise fields."""
+
+    def __init__(self, seed=0, frequency=1 / 128, octaves=5, moisture_frequency=1 / 96,
+                 moisture_octaves=3, period=None):
+        super().__init__(seed)
+        self.height_noise = GradientNoise(f"{seed}:height", frequency, octaves, period=period)
+        self.moisture_noise = GradientNoise(f"{seed}:moisture", moisture_frequency,
+                                            moisture_octaves, period=period)
+
+    @staticmethod
+    def _field(noise, x0, y0, width, height, levels, typecode):
+        # Bands of tile_size rows give the same values as one region call
+        # (noise is a function of position) and use the tile cache the same
+        # way, but let a running job see progress between them.
+        band = noise.tile_size
+        values = array(typecode)
+        for top in range(0, height, band):
+            rows = min(band, height - top)
+            region = noise.region(x0, y0 + top, width, rows)
+            for start in range(0, len(region), width):
+                checkpoint()
+                values.extend(quantise(region[start:start + width], levels))
+            progress(top + rows, height)
+        return values
+
+    def fill(self, map_data, x0=0, y0=0):
+        """Fill ``map_data`` with the window of the world whose top-left is ``(x0, y0)``."""
+        width, height = map_data.width, map_data.height
+        with phase(0, 0.6):
+            heights = self._field(self.height_noise, x0, y0, width, height, 65536, "H")
+        map_data.add_layer(HEIGHT, "H")[:] = heights
+        with phase(0.6, 1):
+            moisture = self._field(self.moisture_noise, x0, y0, width, height, 256, "B")
+        map_data.add_layer(MOISTURE, "B")[:] = moisture
+        return map_data
+
+    def generate(self, width, height):
+        return self.fill(self.new_map(width, height))
+
+    def variant(self, variant):
+        if not variant:
+            return self
+        clone = super().variant(variant)
+        clone.height_noise = self.height_noise.reseeded(f"{clone.seed}:height")
+        clone.moisture_noise = self.moisture_noise.reseeded(f"{clone.seed}:moisture")
+        return clone
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Render the window again; heights and moisture fade into held cells over ``margin``."""
+        return regenerate_window(self, map_data, rect, margin, keep, variant,
+                                 (HEIGHT, MOISTURE), blend=(HEIGHT, MOISTURE))
@@ -0,0 +1,238 @@
+"""Overlapping-model WFC: learn ``N`` x ``N`` patterns from an example map.
+
+Every ``N`` x ``N`` window of the sample becomes a pattern.  Windows are
+identified by a 2-D polynomial (Rabin-Karp) hash modulo the Mersenne prime
+``2**61 - 1``, built from per-row window hashes, so extraction is a few
+linear passes over the sample rather than one tuple per window.
+
+Two patterns may be horizontal neighbours when the right ``N - 1`` columns
+of one equal the left ``N - 1`` columns of the other (and likewise
+vertically).  Patterns are bucketed by the hash of each overlap, so the
+adjacency index costs one dictionary lookup per pattern and direction
+instead of comparing every pair.  The result is an ordinary
+:class:`~model.tileset.CompiledTileset` whose tiles are patterns, weighted
+by how often they occur.
+"""
+
+import hashlib
+from array import array
+
+from model.generator import MapGenerator, dirty_window, held_cells
+from model.image_io import read_png
+from model.map_data import Rect, TERRAIN
+from model.tileset import COMPILER_VERSION, CompiledTileset, NORTH, EAST, SOUTH, WEST
+from model.wfc import WFCSolver
+
+MODULUS = (1 << 61) - 1
+ROW_BASE = 1_000_003
+COLUMN_BASE = 998_244_353
+
+
+def _window_hashes(values, size):
+    """Polynomial hashes of every length-``size`` window of ``values``."""
+    hashes = values[:len(values) - size + 1]
+    for offset in range(1, size):
+        hashes = [(h * ROW_BASE + v) % MODULUS for h, v in zip(hashes, values[offset:])]
+    return hashes
+
+
+def _hash_cells(cells):
+    value = 0
+    for cell in cells:
+        value = (value * ROW_BASE + cell) % MODULUS
+    return value
+
+
+class OverlappingModel:
+    """Patterns and their adjacency extracted from a colour-indexed sample.
+
+    ``sample`` is a flat row-major list of colour ids (use
+    :meth:`from_pixels` for packed RGBA).  With ``periodic`` set the sample
+    wraps around, so every cell starts a window.
+
+    Given a :class:`~model.store.WorldStore`, the compiled patterns are
+    cached under :meth:`content_hash`, so a warm load skips extraction and
+    rebuilds the patterns from the stored tile names.
+    """
+
+    def __init__(self, sample, width, height, size=3, periodic=True, palette=None, store=None):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.periodic = periodic
+        self.palette = palette or []
+        self.patterns = []
+        self.counts = []
+        self._offset_masks = None
+        if store is None:
+            self.tileset = self._build(sample)
+        else:
+            self.tileset = store.cached_compiled(self.content_hash(sample),
+                                                 lambda: self._build(sample))
+            if not self.patterns:
+                self._restore(self.tileset)
+
+    @classmethod
+    def from_pixels(cls, pixels, width, height, size=3, periodic=True, store=None):
+        palette_index = {}
+        sample = [palette_index.setdefault(pixel, len(palette_index)) for pixel in pixels]
+        return cls(sample, width, height, size, periodic, list(palette_index), store)
+
+    @classmethod
+    def from_png(cls, path, size=3, periodic=True, store=None):
+        width, height, pixels = read_png(path)
+        return cls.from_pixels(pixels, width, height, size, periodic, store)
+
+    def content_hash(self, sample):
+        """Cache key for the compiled model of ``sample`` with these settings."""
+        digest = hashlib.sha256(array("I", sample).tobytes())
+        digest.update(f"{COMPILER_VERSION}:overlapping:{self.width}x{self.height}:"
+                      f"{self.size}:{self.periodic}".encode())
+        return digest.hexdigest()
+
+    def _build(self, sample):
+        self._extract(sample)
+        return self._compile(sample)
+
+    def _restore(self, tileset):
+        """Recover patterns and counts from a compiled tileset loaded from the cache."""
+        self.patterns = [tuple(int(v) for v in name.split(",")) for name in tileset.names]
+        self.counts = [int(weight) for weight in tileset.weights]
+
+    def _rows(self, sample):
+        size, width = self.size, self.width
+        rows = [sample[y * width:(y + 1) * width] for y in range(self.height)]
+        if self.periodic:
+            rows = [row + row[:size - 1] for row in rows]
+            rows += rows[:size - 1]
+        return rows
+
+    def _extract(self, sample):
+        size = self.size
+        rows = self._rows(sample)
+        row_hashes = [_window_hashes(row, size) for row in rows]
+        index = {}
+        patterns, counts = self.patterns, self.counts
+        for y in range(len(rows) - size + 1):
+            column = row_hashes[y]
+            for offset in range(1, size):
+                column = [(h * COLUMN_BASE + v) % MODULUS
+                          for h, v in zip(column, row_hashes[y + offset])]
+            for x, key in enumerate(column):
+                found = index.get(key)
+                if found is None:
+                    index[key] = len(patterns)
+                    patterns.append(tuple(v for row in rows[y:y + size] for v in row[x:x + size]))
+                    counts.append(1)
+                else:
+                    counts[found] += 1
+
+    def _overlap(self, pattern, dx, dy):
+        """Hash of the ``N - 1`` overlap of ``pattern`` shifted by ``(dx, dy)``."""
+        size = self.size
+        xs = range(max(dx, 0), size + min(dx, 0))
+        ys = range(max(dy, 0), size + min(dy, 0))
+        return _hash_cells(pattern[y * size + x] for y in ys for x in xs)
+
+    def _compile(self, sample):
+        count = len(self.patterns)
+        compatible = [[0] * count for _ in range(4)]
+        # Pattern b may sit east of a when a's right part equals b's left part.
+        for direction, (near, far) in ((EAST, ((1, 0), (-1, 0))), (SOUTH, ((0, 1), (0, -1)))):
+            opposite = WEST if direction == EAST else NORTH
+            buckets = {}
+            for tile, pattern in enumerate(self.patterns):
+                key = self._overlap(pattern, *far)
+                buckets[key] = buckets.get(key, 0) | (1 << tile)
+            for tile, pattern in enumerate(self.patterns):
+                mask = buckets.get(self._overlap(pattern, *near), 0)
+                compatible[direction][tile] = mask
+                bits = mask
+                while bits:
+                    low = bits & -bits
+                    compatible[opposite][low.bit_length() - 1] |= 1 << tile
+                    bits ^= low
+        # Tile names spell out each pattern so a cached copy can restore them.
+        names = [",".join(map(str, pattern)) for pattern in self.patterns]
+        return CompiledTileset(self.counts, compatible, names, self.content_hash(sample))
+
+    def offset_masks(self):
+        """Per offset ``dy * N + dx``, a dict colour -> mask of the patterns with that colour there."""
+        if self._offset_masks is None:
+            masks = [{} for _ in range(self.size * self.size)]
+            for tile, pattern in enumerate(self.patterns):
+                for offset, colour in enumerate(pattern):
+                    masks[offset][colour] = masks[offset].get(colour, 0) | (1 << tile)
+            self._offset_masks = masks
+        return self._offset_masks
+
+    def colours(self, tiles):
+        """Map solved pattern indices to the colour id of each pattern's top-left cell."""
+        patterns = self.patterns
+        return [patterns[tile][0] for tile in tiles]
+
+
+class OverlappingWFCGenerator(MapGenerator):
+    """Generate maps that locally resemble a sample image.
+
+    The terrain layer receives colour ids; ``model.palette`` maps them back
+    to packed RGBA for rendering.
+    """
+
+    def __init__(self, model, seed=0, **solver_options):
+        super().__init__(seed)
+        self.model = model
+        self.solver_options = solver_options
+        self.stats = None
+
+    def generate(self, width, height):
+        solver = WFCSolver(self.model.tileset, width, height, self.stream("overlapping"),
+                           **self.solver_options)
+        colours = self.model.colours(solver.solve())
+        self.stats = solver.stats
+        map_data = self.new_map(width, height)
+        if max(colours, default=0) > 255:
+            map_data.add_layer(TERRAIN, "H")
+        terrain = map_data.layer(TERRAIN)
+        terrain[:] = array(terrain.typecode, colours)
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Re-solve the window so every ``N`` x ``N`` window across its edge is a pattern.
+
+        The map stores colours, not patterns, so each cell's domain starts
+        as the patterns agreeing with every held colour they would cover.
+        The solver runs on the window plus the ``N - 1`` cells above and to
+        the left of it, whose patterns reach into the window.
+        """
+        model = self.model
+        size = model.size
+        window = dirty_window(map_data, rect, margin)
+        x0, y0 = max(window.x - size + 1, 0), max(window.y - size + 1, 0)
+        grid = Rect(x0, y0, window.right - x0, window.bottom - y0)
+        width, height = map_data.width, map_data.height
+        held = held_cells(Rect(0, 0, width, height), window, rect if keep else None)
+        terrain = map_data.layer(TERRAIN)
+        masks = model.offset_masks()
+        full = model.tileset.full_mask
+        initial = []
+        for y in range(grid.y, grid.bottom):
+            for x in range(grid.x, grid.right):
+                domain = full
+                for dy in range(size):
+                    for dx in range(size):
+                        index = (y + dy) * width + x + dx
+                        if x + dx < width and y + dy < height and held[index]:
+                            domain &= masks[dy * size + dx].get(terrain[index], 0)
+                initial.append(domain)
+        solver = WFCSolver(model.tileset, grid.width, grid.height,
+                           self.stream("overlapping-region", *rect, margin, variant),
+                           initial=initial, **self.solver_options)
+        colours = array(terrain.typecode, model.colours(solver.solve()))
+        self.stats = solver.stats
+        for y in range(window.y, window.bottom):
+            start = (y - grid.y) * grid.width + window.x - grid.x
+            terrain[y * width + window.x:y * width + window.right] = colours[
+                start:start + window.width]
+        map_data.touch()
+        return map_data
@@ -0,0 +1,85 @@
+"""Whole-grid neighbourhood arithmetic on packed byte buffers.
+
+A layer is copied into a buffer with a one-cell border around it (row stride
+``width + 2``) and read as one little-endian integer, one byte per cell.
+Shifting that integer by ``8 * offset`` bits lines every cell up with its
+neighbour at ``offset``, so adding eight shifted copies yields all
+8-neighbour counts at once.  As long as cell values are small (counts of
+0/1 cells never exceed 8) no byte carries into the next, which makes this a
+SIMD-within-a-register add executed by CPython's big-integer code.
+
+Results go back to bytes with ``int.to_bytes`` and are typically mapped
+through a 256-entry table with ``bytes.translate``.
+"""
+
+
+def neighbour_offsets(stride):
+    """Byte offsets of the 8 neighbours, clockwise from north-west."""
+    return (-stride - 1, -stride, -stride + 1, 1, stride + 1, stride, stride - 1, -1)
+
+
+def pad(buf, width, height, border=0):
+    """Copy a flat ``width`` x ``height`` byte buffer into a bordered bytearray."""
+    stride = width + 2
+    padded = bytearray([border]) * (stride * (height + 2))
+    view = memoryview(buf).cast("B")
+    for y in range(height):
+        start = (y + 1) * stride + 1
+        padded[start:start + width] = view[y * width:(y + 1) * width]
+    return padded
+
+
+def unpad(padded, width, height):
+    """Inverse of :func:`pad`: drop the border and return the cells as ``bytes``."""
+    stride = width + 2
+    view = memoryview(padded)
+    return b"".join(view[(y + 1) * stride + 1:(y + 1) * stride + 1 + width]
+                    for y in range(height))
+
+
+def to_int(padded):
+    return int.from_bytes(padded, "little")
+
+
+def to_bytes(value, length):
+    return value.to_bytes(length, "little")
+
+
+def shifted(value, offset):
+    """Align each cell with its neighbour ``offset`` bytes away."""
+    return value >> (8 * offset) if offset > 0 else value << (-8 * offset)
+
+
+def neighbour_sum(value, stride, length):
+    """Per-byte sum of the 8 neighbours of every cell of a ``length``-byte packed grid."""
+    total = 0
+    for offset in neighbour_offsets(stride):
+        total += shifted(value, offset)
+    return total & ((1 << 8 * length) - 1)
+
+
+def neighbour_mask(value, stride, length):
+    """Per-byte 8-bit mask with bit ``i`` set when neighbour ``i`` is non-zero.
+
+    ``value`` must hold 0/1 cells.  Bit order follows
+    :func:`neighbour_offsets`.
+    """
+    total = 0
+    for bit, offset in enumerate(neighbour_offsets(stride)):
+        total += shifted(value, offset) << bit
+    return total & ((1 << 8 * length) - 1)
+
+
+def interior_mask(width, height, value=1):
+    """Packed integer with ``value`` in every interior byte and 0 on the border."""
+    stride = width + 2
+    row = b"\x00" + bytes([value]) * width + b"\x00"
+    return to_int(b"\x00" * stride + row * height + b"\x00" * stride)
+
+
+def border_mask(width, height, value=1):
+    """Packed integer with ``value`` in every border byte and 0 inside."""
+    stride = width + 2
+    edge = bytes([value])
+    row = edge + b"\x00" * width + edge
+    return to_int(edge * stride + row * height + edge * stride)
@@ -0,0 +1,357 @@
+"""Shortest paths over the walls layer: A*, Jump Point Search and distance fields.
+
+Searches run on a padded copy of the walls layer (see :mod:`model.packed`)
+holding 1 for blocked cells and 0 for open ones, addressed by flat index
+with row stride ``width + 2``.  The solid border means no bounds checks are
+needed in the inner loops.  Paths move in 8 directions by default (cost 1
+straight, sqrt(2) diagonal) and never cut a blocked corner; pass
+``diagonal=False`` for 4-connected movement.
+
+:class:`PathFinder` caches the padded grid and Dijkstra distance fields per
+``(map revision, goal set)``.  Any edit that bumps
+:attr:`MapData.revision <model.map_data.MapData.revision>` invalidates them.
+"""
+
+import heapq
+import math
+from array import array
+from collections import OrderedDict, deque
+
+from model import packed
+from model.map_data import WALLS, OPEN
+
+SQRT2 = math.sqrt(2)
+_INF = float("inf")
+
+_ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_DIAGONAL = ((1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+def _octile(dx, dy):
+    dx, dy = abs(dx), abs(dy)
+    return dx + dy + (SQRT2 - 2) * min(dx, dy)
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+class DistanceField:
+    """Cost to the nearest goal from every cell; ``inf`` where no goal is reachable."""
+
+    def __init__(self, finder, values):
+        self._finder = finder
+        self._values = values
+
+    def distance(self, x, y):
+        return self._values[self._finder.index(x, y)]
+
+    def farthest(self):
+        """``((x, y), cost)`` of the reachable cell farthest from the goals; ``None`` if none."""
+        values = self._values
+        cost = max((value for value in values if value != _INF), default=None)
+        if cost is None:
+            return None
+        return self._finder.cell(values.index(cost)), cost
+
+    def path(self, x, y):
+        """Walk downhill from ``(x, y)`` to a goal; ``None`` if none is reachable."""
+        finder = self._finder
+        values = self._values
+        node = finder.index(x, y)
+        if values[node] == _INF:
+            return None
+        path = [finder.cell(node)]
+        while values[node] > 0:
+            node = min(finder.moves(node), key=lambda move: values[move[0]] + move[1])[0]
+            path.append(finder.cell(node))
+        return path
+
+
+class PathFinder:
+    """Pathfinding service bound to one :class:`MapData` layer.
+
+    Cells equal to ``passable`` are open.  Up to ``cache_size`` distance
+    fields are kept for the current map revision.
+    """
+
+    def __init__(self, map_data, layer=WALLS, passable=OPEN, diagonal=True, cache_size=16):
+        self.map_data = map_data
+        self.layer = layer
+        self.passable = passable
+        self.diagonal = diagonal
+        self.cache_size = cache_size
+        self.stride = map_data.width + 2
+        self._revision = None
+        self._grid = None
+        self._fields = OrderedDict()
+        self.expanded = 0
+        s = self.stride
+        moves = [(dx + dy * s, 1.0, 0, 0) for dx, dy in _ORTHOGONAL]
+        if diagonal:
+            moves += [(dx + dy * s, SQRT2, dx, dy * s) for dx, dy in _DIAGONAL]
+        self._moves = moves
+
+    # -- grid ---------------------------------------------------------------
+
+    @property
+    def grid(self):
+        """Padded ``bytearray``: 1 for blocked cells (and the border), 0 for open ones."""
+        map_data = self.map_data
+        if self._revision != map_data.revision:
+            table = bytes(0 if value == self.passable else 1 for value in range(256))
+            cells = bytes(map_data.layer(self.layer)).translate(table)
+            self._grid = packed.pad(cells, map_data.width, map_data.height, border=1)
+            self._revision = map_data.revision
+            self._fields.clear()
+        return self._grid
+
+    def index(self, x, y):
+        if not self.map_data.in_bounds(x, y):
+            raise IndexError(f"cell ({x}, {y}) outside map")
+        return (y + 1) * self.stride + x + 1
+
+    def cell(self, node):
+        y, x = divmod(node, self.stride)
+        return x - 1, y - 1
+
+    def moves(self, node):
+        """Open neighbours of ``node`` as ``(node, cost)`` pairs."""
+        grid = self.grid
+        for offset, cost, a, b in self._moves:
+            n = node + offset
+            if not grid[n] and not (a and (grid[node + a] or grid[node + b])):
+                yield n, cost
+
+    def _heuristic(self, node, goal):
+        dx = node % self.stride - goal % self.stride
+        dy = node // self.stride - goal // self.stride
+        if self.diagonal:
+            return _octile(dx, dy)
+        return abs(dx) + abs(dy)
+
+    def _trace(self, parent, node):
+        path = [node]
+        while parent[node] != -1:
+            node = parent[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    # -- A* -----------------------------------------------------------------
+
+    def astar(self, start, goal):
+        """Shortest path from ``start`` to ``goal`` as a list of cells, or ``None``."""
+        grid = self.grid
+        source, target = self.index(*start), self.index(*goal)
+        if grid[source] or grid[target]:
+            return None
+        stride = self.stride
+        tx, ty = target % stride, target // stride
+        diagonal = self.diagonal
+        moves = self._moves
+        g = {source: 0.0}
+        parent = {source: -1}
+        heap = [(self._heuristic(source, target), 0.0, source)]
+        expanded = 0
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                self.expanded = expanded
+                return [self.cell(n) for n in self._trace(parent, node)]
+            if cost > g[node]:
+                continue
+            expanded += 1
+            for offset, step, a, b in moves:
+                n = node + offset
+                if grid[n] or (a and (grid[node + a] or grid[node + b])):
+                    continue
+                new = cost + step
+                if new < g.get(n, _INF):
+                    g[n] = new
+                    parent[n] = node
+                    dx, dy = abs(n % stride - tx), abs(n // stride - ty)
+                    if diagonal:
+                        h = dx + dy + (SQRT2 - 2) * min(dx, dy)
+                    else:
+                        h = dx + dy
+                    heapq.heappush(heap, (new + h, new, n))
+        self.expanded = expanded
+        return None
+
+    # -- Jump Point Search --------------------------------------------------
+
+    def _jump_straight(self, grid, node, step, side, target):
+        """Scan along ``step`` from ``node``; ``side`` is the perpendicular offset."""
+        while not grid[node]:
+            if node == target:
+                return node
+            if ((not grid[node + side] and grid[node + side - step])
+                    or (not grid[node - side] and grid[node - side - step])):
+                return node
+            node += step
+        return -1
+
+    def _jump(self, grid, node, dx, dy, target):
+        stride = self.stride
+        if not dy:
+            return self._jump_straight(grid, node, dx, stride, target)
+        if not dx:
+            return self._jump_straight(grid, node, dy * stride, 1, target)
+        vertical = dy * stride
+        step = dx + vertical
+        while not grid[node]:
+            if node == target:
+                return node
+            if (self._jump_straight(grid, node + dx, dx, stride, target) != -1
+                    or self._jump_straight(grid, node + vertical, vertical, 1, target) != -1):
+                return node
+            if grid[node + dx] or grid[node + vertical]:
+                return -1
+            node += step
+        return -1
+
+    def _directions(self, grid, node, came_from):
+        stride = self.stride
+        if came_from == -1:
+            return [(dx, dy) for dx, dy in _ORTHOGONAL + _DIAGONAL
+                    if not (dx and dy and (grid[node + dx] or grid[node + dy * stride]))]
+        dx = _sign(node % stride - came_from % stride)
+        dy = _sign(node // stride - came_from // stride)
+        directions = []
+        if dx and dy:
+            vertical_open = not grid[node + dy * stride]
+            horizontal_open = not grid[node + dx]
+            if vertical_open:
+                directions.append((0, dy))
+            if horizontal_open:
+                directions.append((dx, 0))
+            if vertical_open and horizontal_open:
+                directions.append((dx, dy))
+        elif dx:
+            ahead = not grid[node + dx]
+            for side in (1, -1):
+                if not grid[node + side * stride]:
+                    directions.append((0, side))
+                    if ahead:
+                        directions.append((dx, side))
+            if ahead:
+                directions.append((dx, 0))
+        else:
+            ahead = not grid[node + dy * stride]
+            for side in (1, -1):
+                if not grid[node + side]:
+                    directions.append((side, 0))
+                    if ahead:
+                        directions.append((side, dy))
+            if ahead:
+                directions.append((0, dy))
+        return directions
+
+    def jps(self, start, goal):
+        """Jump Point Search for 8-connected uniform-cost grids.
+
+        Returns the same path cost as :meth:`astar` while expanding only
+        jump points; the returned path lists every cell along the way.
+        """
+        if not self.diagonal:
+            return self.astar(start, goal)
+        grid = self.grid
+        source, target = self.index(*start), self.index(*goal)
+        if grid[source] or grid[target]:
+            return None
+        stride = self.stride
+        g = {source: 0.0}
+        parent = {source: -1}
+        heap = [(self._heuristic(source, target), 0.0, source)]
+        expanded = 0
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                self.expanded = expanded
+                return self._expand(self._trace(parent, node))
+            if cost > g[node]:
+                continue
+            expanded += 1
+            for dx, dy in self._directions(grid, node, parent[node]):
+                jump = self._jump(grid, node + dx + dy * stride, dx, dy, target)
+                if jump == -1:
+                    continue
+                new = cost + _octile(jump % stride - node % stride,
+                                     jump // stride - node // stride)
+                if new < g.get(jump, _INF):
+                    g[jump] = new
+                    parent[jump] = node
+                    heapq.heappush(heap, (new + self._heuristic(jump, target), new, jump))
+        self.expanded = expanded
+        return None
+
+    def _expand(self, jump_points):
+        """Fill in the straight and diagonal segments between jump points."""
+        path = [self.cell(jump_points[0])]
+        for node in jump_points[1:]:
+            x, y = path[-1]
+            tx, ty = self.cell(node)
+            while (x, y) != (tx, ty):
+                x += _sign(tx - x)
+                y += _sign(ty - y)
+                path.append((x, y))
+        return path
+
+    def find_path(self, start, goal):
+        """Shortest path using the fastest search for this movement model."""
+        return self.jps(start, goal) if self.diagonal else self.astar(start, goal)
+
+    # -- distance fields ----------------------------------------------------
+
+    def distance_field(self, goals):
+        """Cached :class:`DistanceField` to the nearest of ``goals`` (cells)."""
+        grid = self.grid
+        key = (self._revision, frozenset(goals))
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            return field
+        values = array("d", [_INF]) * len(grid)
+        sources = [self.index(x, y) for x, y in key[1]]
+        sources = [node for node in sources if not grid[node]]
+        if self.diagonal:
+            self._dijkstra(grid, values, sources)
+        else:
+            self._bfs(grid, values, sources)
+        field = self._fields[key] = DistanceField(self, values)
+        if len(self._fields) > self.cache_size:
+            self._fields.popitem(last=False)
+        return field
+
+    def _bfs(self, grid, values, sources):
+        offsets = [offset for offset, _, _, _ in self._moves]
+        queue = deque(sources)
+        for node in sources:
+            values[node] = 0.0
+        while queue:
+            node = queue.popleft()
+            cost = values[node] + 1.0
+            for offset in offsets:
+                n = node + offset
+                if not grid[n] and values[n] == _INF:
+                    values[n] = cost
+                    queue.append(n)
+
+    def _dijkstra(self, grid, values, sources):
+        moves = self._moves
+        heap = [(0.0, node) for node in sources]
+        for node in sources:
+            values[node] = 0.0
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost > values[node]:
+                continue
+            for offset, step, a, b in moves:
+                n = node + offset
+                if grid[n] or (a and (grid[node + a] or grid[node + b])):
+                    continue
+                new = cost + step
+                if new < values[n]:
+                    values[n] = new
+                    heapq.heappush(heap, (new, n))
@@ -0,0 +1,499 @@
+"""Declarative generation pipelines with content-addressed stage caching.
+
+A :class:`Pipeline` is a list of :class:`Stage` objects.  Each stage names
+the layers it reads (``inputs``) and the grid or prop layers it writes
+(``outputs``), and is a plain function ``run(map_data, seed, **params)``.
+
+Every layer carries a provenance hash: blank layers hash the map size, and
+a stage's outputs hash its *key* - SHA-256 over the stage name, version,
+parameters, seed, map size and the provenance of its inputs.  The key
+therefore changes exactly when something the stage depends on changes,
+without hashing any cell data.  Outputs are cached under their key in a
+byte-bounded LRU, so changing the prop density re-runs the props stage (and
+any stage that reads props) while every other stage restores its layers
+from the cache.
+
+:func:`standard_stages` wires the generators in this package into the
+usual outdoor chain: noise -> biomes -> hydrology -> WFC detail -> props ->
+lighting.
+
+:meth:`Pipeline.regenerate` redoes a window of a generated map with the same
+bookkeeping.  A stage with a ``region`` function redoes its window; one
+without re-runs over the whole map, but only once an input has changed, and
+its outputs come from the cache when the new key has been seen before.
+Each stage's window is the edit grown to cover the cells its inputs
+actually changed, so a region stage downstream of a global one follows
+whatever the global one moved.
+"""
+
+import hashlib
+import json
+import time
+import weakref
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from model.biomes import VoronoiBiomeGenerator
+from model.chunked_wfc import ChunkedWFCGenerator
+from model.generator import MapGenerator, dirty_window
+from model.hydrology import DRY, Hydrology
+from model.jobs import checkpoint, phase, progress
+from model.map_data import Rect, TERRAIN, PROPS, LIGHTING, HEIGHT, MOISTURE, BIOME, WATER
+from model.noise import TerrainNoiseGenerator
+from model.scatter import PoissonScatterGenerator
+from model.tileset import Tileset
+
+
+def _fingerprint(value):
+    """JSON stand-in for parameters that are not plain data (tilesets)."""
+    content_hash = getattr(value, "content_hash", "")
+    if content_hash:
+        return content_hash
+    if isinstance(value, Tileset):
+        data = json.dumps([value.weights, value.compatible]).encode()
+        return hashlib.sha256(data).hexdigest()
+    raise TypeError(f"cannot fingerprint stage parameter of type {type(value).__name__}")
+
+
+def _bounds(rects):
+    """The smallest :class:`Rect` covering every rectangle in ``rects``."""
+    x0 = min(rect.x for rect in rects)
+    y0 = min(rect.y for rect in rects)
+    x1 = max(rect.right for rect in rects)
+    y1 = max(rect.bottom for rect in rects)
+    return Rect(x0, y0, x1 - x0, y1 - y0)
+
+
+def _changed(before, after, width):
+    """Bounding :class:`Rect` of the cells where two layer buffers differ, or ``None``.
+
+    Rows are compared as slices; within a changed row the first and last
+    differing columns are found by bisecting on prefix and suffix slices,
+    so the scan stays in C even when the whole map changed.
+    """
+    x0, x1, rows = width, 0, []
+    for y in range(len(after) // width):
+        a = before[y * width:(y + 1) * width]
+        b = after[y * width:(y + 1) * width]
+        if a == b:
+            continue
+        rows.append(y)
+        if a[:x0] != b[:x0]:
+            lo, hi = 0, x0 - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if a[:mid + 1] != b[:mid + 1]:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            x0 = lo
+        if a[x1:] != b[x1:]:
+            lo, hi = x1, width - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if a[mid:] != b[mid:]:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            x1 = lo + 1
+    if not rows:
+        return None
+    return Rect(x0, rows[0], x1 - x0, rows[-1] + 1 - rows[0])
+
+
+@dataclass
+class Stage:
+    """One pipeline step; bump ``version`` whenever ``run`` changes its output.
+
+    ``region``, if given, is ``region(map_data, seed, rect, margin, keep,
+    variant, **params)`` and redoes the stage's outputs inside a window (see
+    :meth:`~model.generator.MapGenerator.regenerate`).
+    """
+
+    name: str
+    run: object
+    inputs: tuple = ()
+    outputs: tuple = ()
+    params: dict = field(default_factory=dict)
+    version: int = 1
+    region: object = None
+
+    def key(self, seed, width, height, input_hashes):
+        data = json.dumps([self.name, self.version, self.params, seed, width, height,
+                           input_hashes], sort_keys=True, default=_fingerprint)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+
+@dataclass
+class StageReport:
+    name: str
+    key: str
+    cached: bool
+    seconds: float
+
+
+@dataclass
+class RunReport:
+    stages: list = field(default_factory=list)
+
+    @property
+    def seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+    def __str__(self):
+        lines = [f"{'stage':<12} {'seconds':>8}  source"]
+        for stage in self.stages:
+            source = "cache" if stage.cached else "run"
+            lines.append(f"{stage.name:<12} {stage.seconds:>8.3f}  {source} {stage.key[:12]}")
+        lines.append(f"{'total':<12} {self.seconds:>8.3f}")
+        return "\n".join(lines)
+
+
+class Pipeline(MapGenerator):
+    """Run ``stages`` in order, reusing cached outputs; ``report`` describes the last run.
+
+    ``cache_bytes`` bounds the memory held by cached stage outputs.
+    """
+
+    def __init__(self, stages, seed=0, cache_bytes=256 << 20):
+        super().__init__(seed)
+        self.stages = list(stages)
+        self.cache_bytes = cache_bytes
+        self.report = None
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        # Layer provenance of the maps this pipeline produced, for regenerate.
+        self._provenance = weakref.WeakKeyDictionary()
+        self._check()
+
+    def _check(self):
+        names = set()
+        written = set(self.new_map(1, 1).layer_names)
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"duplicate stage {stage.name!r}")
+            names.add(stage.name)
+            missing = [name for name in stage.inputs if name not in written]
+            if missing:
+                raise ValueError(
+                    f"stage {stage.name!r} reads {missing} before any stage writes it")
+            written.update(stage.outputs)
+
+    def stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(f"unknown stage {name!r}")
+
+    def configure(self, name, **params):
+        """Update the parameters of stage ``name``; later runs re-run it and its dependants."""
+        self.stage(name).params.update(params)
+
+    # -- cache --------------------------------------------------------------
+
+    @staticmethod
+    def _snapshot(map_data, outputs):
+        layers = {name: map_data.layer(name)[:] for name in outputs if map_data.has_layer(name)}
+        props = {name: map_data.prop_layer(name).copy()
+                 for name in outputs if map_data.has_prop_layer(name)}
+        size = (sum(len(buf) * buf.itemsize for buf in layers.values())
+                + sum(layer.nbytes for layer in props.values()))
+        return size, layers, props
+
+    @staticmethod
+    def _restore(map_data, snapshot):
+        _, layers, props = snapshot
+        for name, buf in layers.items():
+            map_data.add_layer(name, buf.typecode)[:] = buf
+        for name, layer in props.items():
+            map_data.add_prop_layer(name).extend(layer.xs, layer.ys, layer.kinds)
+
+    def _remember(self, key, snapshot):
+        self._cache[key] = snapshot
+        self._cached_bytes += snapshot[0]
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            _, old = self._cache.popitem(last=False)
+            self._cached_bytes -= old[0]
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    # -- running ------------------------------------------------------------
+
+    def _blank(self, width, height):
+        blank = hashlib.sha256(f"blank:{width}x{height}".encode()).hexdigest()
+        return dict.fromkeys(self.new_map(1, 1).layer_names, blank)
+
+    def _provenance_of(self, map_data):
+        """Layer provenance of ``map_data``; a map from elsewhere counts as a fresh generate."""
+        provenance = self._provenance.get(map_data)
+        if provenance is None:
+            width, height = map_data.width, map_data.height
+            provenance = self._blank(width, height)
+            for stage in self.stages:
+                key = stage.key(self.seed, width, height,
+                                [provenance[name] for name in stage.inputs])
+                provenance.update((name, f"{key}:{name}") for name in stage.outputs)
+        return dict(provenance)
+
+    def generate(self, width, height):
+        map_data = self.new_map(width, height)
+        provenance = self._blank(width, height)
+        report = RunReport()
+        count = len(self.stages)
+        for index, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            key = stage.key(self.seed, width, height, [provenance[name] for name in stage.inputs])
+            snapshot = self._cache.get(key)
+            if snapshot is not None:
+                self._cache.move_to_end(key)
+                self._restore(map_data, snapshot)
+            else:
+                with phase(index / count, (index + 1) / count, previews=False):
+                    stage.run(map_data, self.seed, **stage.params)
+                self._remember(key, self._snapshot(map_data, stage.outputs))
+            progress(index + 1, count, map_data.copy)
+            for name in stage.outputs:
+                provenance[name] = f"{key}:{name}"
+            report.stages.append(StageReport(stage.name, key, snapshot is not None,
+                                             time.perf_counter() - start))
+        self.report = report
+        self._provenance[map_data] = provenance
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        """Redo ``rect`` plus ``margin`` stage by stage, reusing every output the edit left valid.
+
+        Stages with a ``region`` function always redo their window: ``rect``,
+        grown to the box around the cells their inputs changed when those
+        reach past ``rect`` plus ``margin``.  Other stages are skipped while
+        their inputs are unchanged and otherwise re-run over the whole map,
+        unless the stage cache holds outputs for their new key.  Region runs
+        are cached too, keyed on their window and the provenance they
+        started from, so flipping back to an earlier variant restores
+        instead of solving again.  ``report`` describes the run.
+        """
+        width, height = map_data.width, map_data.height
+        provenance = self._provenance_of(map_data)
+        changed = {}
+        report = RunReport()
+        count = len(self.stages)
+        for index, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            key = stage.key(self.seed, width, height, [provenance[name] for name in stage.inputs])
+            window = None
+            if stage.region is not None:
+                window = self._window(map_data, rect, margin,
+                                      [changed[name] for name in stage.inputs if name in changed])
+                edit = [key, [provenance.get(name) for name in stage.outputs],
+                        list(window), margin, keep, variant]
+                key = hashlib.sha256(json.dumps(edit).encode()).hexdigest()
+            elif all(provenance.get(name) == f"{key}:{name}" for name in stage.outputs):
+                # Nothing it reads has changed, so its outputs on the map stand.
+                progress(index + 1, count)
+                report.stages.append(StageReport(stage.name, key, True,
+                                                 time.perf_counter() - start))
+                continue
+            before = {name: map_data.layer(name)[:]
+                      for name in stage.outputs if map_data.has_layer(name)}
+            snapshot = self._cache.get(key)
+            if snapshot is not None:
+                self._cache.move_to_end(key)
+                self._restore(map_data, snapshot)
+            else:
+                with phase(index / count, (index + 1) / count, previews=False):
+                    if window is None:
+                        stage.run(map_data, self.seed, **stage.params)
+                    else:
+                        self._run_region(stage, map_data, rect, window, margin, keep, variant)
+                self._remember(key, self._snapshot(map_data, stage.outputs))
+            progress(index + 1, count, map_data.copy)
+            everywhere = Rect(0, 0, width, height)
+            for name in stage.outputs:
+                provenance[name] = f"{key}:{name}"
+                if name in before and map_data.has_layer(name):
+                    area = _changed(before[name], map_data.layer(name), width)
+                elif window is not None:
+                    area = dirty_window(map_data, window, margin)
+                else:
+                    area = everywhere
+                if area is not None:
+                    changed[name] = _bounds([changed[name], area]) if name in changed else area
+            report.stages.append(StageReport(stage.name, key, snapshot is not None,
+                                             time.perf_counter() - start))
+        self.report = report
+        self._provenance[map_data] = provenance
+        return map_data
+
+    @staticmethod
+    def _window(map_data, rect, margin, dirty):
+        """``rect``, or the box around it and the ``dirty`` rects its window does not cover."""
+        window = dirty_window(map_data, rect, margin)
+        if all(window.x <= area.x and window.y <= area.y and area.right <= window.right
+               and area.bottom <= window.bottom for area in dirty):
+            return rect
+        return _bounds([rect, *dirty])
+
+    def _run_region(self, stage, map_data, rect, window, margin, keep, variant):
+        """Run ``stage.region`` on ``window``, holding a kept ``rect`` even when the window grew."""
+        if not keep or window == rect:
+            stage.region(map_data, self.seed, window, margin, keep, variant, **stage.params)
+            return
+        saved = {name: [bytes(row) for row in map_data.region(name, *rect).rows()]
+                 for name in stage.outputs if map_data.has_layer(name)}
+        stage.region(map_data, self.seed, window, margin, False, variant, **stage.params)
+        for name, rows in saved.items():
+            for row, data in zip(map_data.region(name, *rect).rows(), rows):
+                row[:] = memoryview(data).cast(row.format)
+        map_data.touch()
+
+
+# -- standard stages --------------------------------------------------------
+
+def noise_stage(map_data, seed, **params):
+    TerrainNoiseGenerator(seed, **params).fill(map_data)
+
+
+def noise_region(map_data, seed, rect, margin, keep, variant, **params):
+    TerrainNoiseGenerator(seed, **params).regenerate(map_data, rect, margin, keep, variant)
+
+
+def biome_stage(map_data, seed, **params):
+    VoronoiBiomeGenerator(seed, **params).fill(map_data)
+
+
+def biome_region(map_data, seed, rect, margin, keep, variant, **params):
+    VoronoiBiomeGenerator(seed, **params).regenerate(map_data, rect, margin, keep, variant)
+
+
+def hydrology_stage(map_data, seed, **params):
+    Hydrology(**params).apply(map_data)
+
+
+def _tile_mask(tileset, names):
+    mask = 0
+    for name in names:
+        mask |= 1 << tileset.names.index(name)
+    return mask
+
+
+def _detail_domains(map_data, tileset, water_tiles, biome_tiles, area):
+    """Per-cell classes over ``area`` and the tiles each class allows.
+
+    A cell's class is ``2 * biome + wet``; wet cells may only take
+    ``water_tiles`` and dry cells the tiles ``biome_tiles`` lists for their
+    biome.  Returns ``(None, None)`` when neither constrains anything.
+    """
+    if not water_tiles and not biome_tiles:
+        return None, None
+    full = tileset.full_mask
+    water = _tile_mask(tileset, water_tiles) if water_tiles else full
+    masks = [full, water] * 256
+    for biome, names in (biome_tiles or {}).items():
+        masks[2 * int(biome)] = _tile_mask(tileset, names)
+    width = map_data.width
+    biomes, wet = map_data.layer(BIOME), map_data.layer(WATER)
+    classes = array("H", bytes(2 * width * map_data.height))
+    for y in range(area.y, area.bottom):
+        start, end = y * width + area.x, y * width + area.right
+        classes[start:end] = array("H", (2 * b + (w != DRY)
+                                         for b, w in zip(biomes[start:end], wet[start:end])))
+    return classes, masks
+
+
+def detail_stage(map_data, seed, tileset, water_tiles=(), biome_tiles=None, **params):
+    """WFC terrain detail, solved chunk by chunk.
+
+    ``water_tiles`` names the tiles allowed on river and lake cells, and
+    ``biome_tiles`` maps a biome index to the tiles allowed on its dry cells;
+    cells left out of both may take any tile.
+    """
+    area = Rect(0, 0, map_data.width, map_data.height)
+    classes, masks = _detail_domains(map_data, tileset, water_tiles, biome_tiles, area)
+    generator = ChunkedWFCGenerator(tileset, seed, **params)
+    tiles = generator.solve(map_data.width, map_data.height, classes, masks)
+    typecode = "H" if tileset.size > 256 else "B"
+    map_data.add_layer(TERRAIN, typecode)[:] = array(typecode, tiles)
+
+
+def detail_region(map_data, seed, rect, margin, keep, variant, tileset, water_tiles=(),
+                  biome_tiles=None, **params):
+    # Only the window and its pinned ring are read, so classify just those.
+    area = dirty_window(map_data, dirty_window(map_data, rect, margin), 1)
+    classes, masks = _detail_domains(map_data, tileset, water_tiles, biome_tiles, area)
+    ChunkedWFCGenerator(tileset, seed, **params).regenerate(map_data, rect, margin, keep, variant,
+                                                           classes, masks)
+
+
+def props_stage(map_data, seed, **params):
+    PoissonScatterGenerator(seed, **params).fill(map_data)
+
+
+def props_region(map_data, seed, rect, margin, keep, variant, **params):
+    PoissonScatterGenerator(seed, **params).regenerate(map_data, rect, margin, keep, variant)
+
+
+def _shade(map_data, area, strength, ambient):
+    width = map_data.width
+    heights = map_data.layer(HEIGHT)
+    light = map_data.layer(LIGHTING)
+    x0, x1 = area.x, area.right
+    for y in range(area.y, area.bottom):
+        checkpoint()
+        row = heights[y * width + x0:y * width + x1]
+        line = (y - 1 if y else 0) * width
+        # Each cell compares itself with its north-west neighbour; the top
+        # row and left column compare with the cell above.
+        shifted = (heights[line + x0 - 1:line + x1 - 1] if x0
+                   else heights[line:line + 1] + heights[line:line + x1 - 1])
+        light[y * width + x0:y * width + x1] = array(light.typecode, (
+            min(255, max(0, int(ambient + strength * (h - n)))) for n, h in zip(shifted, row)))
+    map_data.touch()
+
+
+def lighting_stage(map_data, seed, strength=1 / 64, ambient=160):
+    """Hillshade from the height layer, lit from the north-west."""
+    _shade(map_data, Rect(0, 0, map_data.width, map_data.height), strength, ambient)
+
+
+def lighting_region(map_data, seed, rect, margin, keep, variant, strength=1 / 64, ambient=160):
+    """Shade the window again, plus the row below and column right of it.
+
+    A cell's light reads only its own height and its north-west
+    neighbour's, so nothing further out can change.  Shading has no random
+    choices and follows the heights, so ``keep`` and ``variant`` are moot.
+    """
+    window = dirty_window(map_data, rect, margin)
+    _shade(map_data, Rect(window.x, window.y, min(window.width + 1, map_data.width - window.x),
+                          min(window.height + 1, map_data.height - window.y)),
+           strength, ambient)
+
+
+def standard_stages(tileset=None, noise=None, biomes=None, hydrology=None, detail=None,
+                    props=None, lighting=None):
+    """The outdoor chain; each keyword gives that stage's parameters.
+
+    The WFC detail stage is left out when no ``tileset`` is given; it reads
+    the biome and water layers, which ``water_tiles`` and ``biome_tiles`` in
+    its parameters turn into per-cell tile constraints.
+    Hydrology has no region function: drainage is global, so it re-runs
+    whole whenever the heights change.
+    """
+    stages = [
+        Stage("noise", noise_stage, (), (HEIGHT, MOISTURE), dict(noise or {}),
+              region=noise_region),
+        Stage("biomes", biome_stage, (), (BIOME,), dict(biomes or {}), region=biome_region),
+        Stage("hydrology", hydrology_stage, (HEIGHT,), (WATER,), dict(hydrology or {})),
+    ]
+    if tileset is not None:
+        stages.append(Stage("detail", detail_stage, (BIOME, WATER), (TERRAIN,),
+                            dict(detail or {}, tileset=tileset), region=detail_region))
+    stages += [
+        Stage("props", props_stage, (MOISTURE,), (PROPS,),
+              dict({"density_layer": MOISTURE}, **(props or {})), region=props_region),
+        Stage("lighting", lighting_stage, (HEIGHT,), (LIGHTING,), dict(lighting or {}),
+              region=lighting_region),
+    ]
+    return stages
@@ -0,0 +1,73 @@
+"""Deterministic random streams keyed by world seed, stage and chunk.
+
+A shared ``random.Random`` makes results depend on the order its draws are
+made in, which breaks as soon as chunks are generated in parallel.  Instead
+every consumer asks for its own stream by key::
+
+    rng = stream(seed, "scatter", cx, cy)
+
+The key is hashed (BLAKE2b) into 32 bytes that identify the stream, so two
+keys give unrelated streams and the same key gives the same stream in any
+process, at any time, in any order.  A :class:`Stream` is a
+``random.Random`` seeded from that digest, so the usual helpers (``choices``,
+``shuffle``, ``gauss`` ...) work unchanged.  Bulk bytes are counter-based
+instead: block ``n`` of :meth:`Stream.randbytes` is SHAKE-256 of the key and
+``n``, so large buffers come from C at hash speed rather than a Python loop.
+
+:meth:`Stream.split` derives a child stream from the parent's key, not from
+its state, so adding draws to one stage never shifts another.
+"""
+
+import hashlib
+import random
+import sys
+from array import array
+
+DIGEST_SIZE = 32
+
+
+def derive(seed, *key):
+    """Digest identifying the stream for ``seed`` and ``key`` parts (ints or strings)."""
+    return hashlib.blake2b(repr((seed,) + key).encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def stream(seed, stage, *coords):
+    """:class:`Stream` for one generation ``stage``, optionally per chunk ``coords``."""
+    return Stream(derive(seed, stage, *coords))
+
+
+class Stream(random.Random):
+    """``random.Random`` bound to a key, with counter-based bulk output."""
+
+    def __init__(self, key):
+        self.key = key
+        self.counter = 0
+        super().__init__(int.from_bytes(key, "big"))
+
+    def __reduce__(self):
+        return _restore, (self.key, self.counter, self.getstate())
+
+    def split(self, *key):
+        """Independent child stream named by ``key``."""
+        return Stream(hashlib.blake2b(repr(key).encode(), digest_size=DIGEST_SIZE,
+                                      key=self.key).digest())
+
+    def randbytes(self, n):
+        """``n`` random bytes from the next counter block."""
+        block = self.counter.to_bytes(8, "little")
+        self.counter += 1
+        return hashlib.shake_256(self.key + block).digest(n)
+
+    def floats(self, n):
+        """``array('d')`` of ``n`` uniform floats in ``[0, 1)`` (53-bit)."""
+        values = array("Q", self.randbytes(8 * n))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return array("d", [(value >> 11) * 2.0 ** -53 for value in values])
+
+
+def _restore(key, counter, state):
+    rng = Stream(key)
+    rng.counter = counter
+    rng.setstate(state)
+    return rng
@@ -0,0 +1,258 @@
+"""Poisson-disk scattering of props with Bridson's algorithm.
+
+:func:`poisson_disk` keeps a background grid of cell size ``r_min / sqrt(2)``
+so each grid cell holds at most one point, and a candidate only has to be
+checked against the points in the few grid cells within ``r_max`` of it.
+With a density layer, each point's radius shrinks from ``r_max`` (density 1)
+to ``r_min`` (density 255), and density 0 keeps the area empty.  Two points
+must be at least the larger of their radii apart.
+
+Big maps are scattered chunk by chunk in the same four parity phases as
+:mod:`model.chunked_wfc`.  A chunk only places points inside its own bounds,
+but it starts its frontier from - and keeps clear of - the points already
+placed by neighbours in earlier phases.  Chunks in one phase are a whole
+chunk apart (at least ``2 * r_max``), so they cannot interact and can run in
+a process pool.  Each chunk draws from the stream ``(seed, cx, cy)``, so the layout
+depends only on the seed, never on the worker count, and has no seams.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from model.generator import MapGenerator, dirty_window
+from model.jobs import checkpoint, progress, wait_for
+from model.map_data import Rect, PROPS
+from model.rng import stream
+
+PHASES = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+
+def poisson_disk(bounds, r_min, r_max, rng, k=30, density=None, existing=()):
+    """Sample points inside ``bounds`` (a :class:`Rect`); returns ``[(x, y, r), ...]``.
+
+    ``density`` is an optional row-major byte buffer covering ``bounds``.
+    ``existing`` points ``(x, y, r)`` - typically from neighbouring chunks -
+    are respected and used to seed the frontier but are not returned.
+    """
+    if not 0 < r_min <= r_max:
+        raise ValueError("need 0 < r_min <= r_max")
+    x0, y0, width, height = bounds
+    x1, y1 = x0 + width, y0 + height
+    cell = r_min / math.sqrt(2)
+    margin = 2 * r_max
+    gx0, gy0 = x0 - margin, y0 - margin
+    gw = int((width + 2 * margin) / cell) + 1
+    gh = int((height + 2 * margin) / cell) + 1
+    grid = [-1] * (gw * gh)
+    # Grid cells that can hold a point within r_max of a point in the centre
+    # cell, nearest first so conflicts are usually found early.  The 2*r_max
+    # margin keeps every offset inside the grid for points within bounds.
+    reach = math.ceil(r_max / cell)
+    offsets = sorted(((i * i + j * j, j * gw + i)
+                      for j in range(-reach, reach + 1) for i in range(-reach, reach + 1)
+                      if (max(abs(i) - 1, 0) ** 2 + max(abs(j) - 1, 0) ** 2) * cell * cell
+                      < r_max * r_max))
+    offsets = [offset for _, offset in offsets]
+    points = []
+    spread = r_max - r_min
+
+    def radius(x, y):
+        if density is None:
+            return r_min
+        d = density[int(y - y0) * width + int(x - x0)]
+        return r_max - spread * (d - 1) / 254 if d else 0
+
+    def fits(x, y, r):
+        base = int((y - gy0) / cell) * gw + int((x - gx0) / cell)
+        for offset in offsets:
+            index = grid[base + offset]
+            if index >= 0:
+                px, py, pr = points[index]
+                limit = r if r > pr else pr
+                if (px - x) ** 2 + (py - y) ** 2 < limit * limit:
+                    return False
+        return True
+
+    def add(x, y, r):
+        gx, gy = int((x - gx0) / cell), int((y - gy0) / cell)
+        if not (0 <= gx < gw and 0 <= gy < gh):
+            return
+        grid[gy * gw + gx] = len(points)
+        points.append((x, y, r))
+
+    for x, y, r in existing:
+        add(x, y, r)
+    active = list(range(len(points)))
+    first = len(points)
+    random_value = rng.random
+    tau = 2 * math.pi
+    misses = 0
+    steps = 0
+    while misses < k:
+        steps += 1
+        if not steps & 63:
+            checkpoint()
+        if not active:
+            x, y = x0 + random_value() * width, y0 + random_value() * height
+            r = radius(x, y)
+            if not r or not fits(x, y, r):
+                misses += 1
+                continue
+            misses = 0
+            active.append(len(points))
+            add(x, y, r)
+        slot = int(random_value() * len(active))
+        px, py, pr = points[active[slot]]
+        for _ in range(k):
+            angle = random_value() * tau
+            distance = pr * (1 + random_value())
+            x, y = px + distance * math.cos(angle), py + distance * math.sin(angle)
+            if not (x0 <= x < x1 and y0 <= y < y1):
+                continue
+            r = radius(x, y)
+            if r and fits(x, y, r):
+                active.append(len(points))
+                add(x, y, r)
+                break
+        else:
+            active[slot] = active[-1]
+            active.pop()
+    return points[first:]
+
+
+def scatter_chunk(task):
+    """Scatter one chunk; returns ``(cx, cy, points, kinds)``."""
+    seed, cx, cy, bounds, r_min, r_max, k, density, existing, weights = task
+    rng = stream(seed, "scatter", cx, cy)
+    points = poisson_disk(Rect(*bounds), r_min, r_max, rng, k, density, existing)
+    kinds = rng.choices(range(len(weights)), weights, k=len(points))
+    return cx, cy, points, kinds
+
+
+class PoissonScatterGenerator(MapGenerator):
+    """Scatter props of the given ``kinds`` with minimum spacing.
+
+    Without ``density_layer`` every prop keeps ``r_min`` apart; with it,
+    spacing varies between ``r_min`` and ``r_max`` as described above.
+    ``weights`` sets how often each kind is picked.  ``workers`` > 1
+    scatters the chunks of each phase in a process pool.
+    """
+
+    def __init__(self, seed=0, r_min=2.0, r_max=None, kinds=("tree",), weights=None,
+                 density_layer=None, chunk_size=64, workers=1, k=30):
+        super().__init__(seed)
+        self.r_min = r_min
+        self.r_max = r_max if r_max is not None else r_min
+        if chunk_size < 2 * self.r_max:
+            raise ValueError("chunk_size must be at least twice r_max")
+        self.kinds = tuple(kinds)
+        self.weights = list(weights) if weights is not None else [1] * len(self.kinds)
+        if len(self.weights) != len(self.kinds):
+            raise ValueError("need one weight per kind")
+        self.density_layer = density_layer
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.k = k
+
+    def _task(self, map_data, placed, cx, cy):
+        checkpoint()
+        size = self.chunk_size
+        bounds = Rect(cx * size, cy * size, min(size, map_data.width - cx * size),
+                      min(size, map_data.height - cy * size))
+        density = None
+        if self.density_layer is not None:
+            density = map_data.region(self.density_layer, *bounds).tobytes()
+        reach = bounds.expand(math.ceil(2 * self.r_max))
+        existing = [p for ny in (cy - 1, cy, cy + 1) for nx in (cx - 1, cx, cx + 1)
+                    for p in placed.get((nx, ny), ())
+                    if reach.contains(int(p[0]), int(p[1]))]
+        return (self.seed, cx, cy, tuple(bounds), self.r_min, self.r_max, self.k,
+                density, existing, self.weights)
+
+    def scatter(self, map_data):
+        """Return ``(points, kinds)`` for the whole map in chunk order."""
+        chunks_x = -(-map_data.width // self.chunk_size)
+        chunks_y = -(-map_data.height // self.chunk_size)
+        placed = {}
+        kinds = {}
+        count = chunks_x * chunks_y
+        pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            for px, py in PHASES:
+                tasks = [self._task(map_data, placed, cx, cy)
+                         for cy in range(py, chunks_y, 2)
+                         for cx in range(px, chunks_x, 2)]
+                futures = [pool.submit(scatter_chunk, task) for task in tasks] if pool else tasks
+                for item in futures:
+                    cx, cy, points, chunk_kinds = wait_for(item) if pool else scatter_chunk(item)
+                    placed[cx, cy] = points
+                    kinds[cx, cy] = chunk_kinds
+                    progress(len(placed), count)
+        except BaseException:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            raise
+        finally:
+            if pool:
+                pool.shutdown()
+        order = [(cx, cy) for cy in range(chunks_y) for cx in range(chunks_x)]
+        return ([p for key in order for p in placed[key]],
+                [kind for key in order for kind in kinds[key]])
+
+    def fill(self, map_data, name=PROPS):
+        """Scatter into prop layer ``name`` and mark each prop's cell (kind + 1) there too."""
+        points, kinds = self.scatter(map_data)
+        props = map_data.add_prop_layer(name)
+        props.extend([p[0] for p in points], [p[1] for p in points], kinds)
+        if map_data.has_layer(name):
+            cells = map_data.layer(name)
+            width = map_data.width
+            for (x, y, _), kind in zip(points, kinds):
+                cells[int(y) * width + int(x)] = kind + 1
+            map_data.touch()
+        return map_data
+
+    def generate(self, width, height):
+        return self.fill(self.new_map(width, height))
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0, name=PROPS):
+        """Re-scatter the props inside the window around the ones outside it.
+
+        Props in the window (but not in a kept ``rect``) are dropped and the
+        window is sampled again; every remaining prop within ``2 * r_max``
+        counts as an already placed neighbour at ``r_max`` spacing, so the
+        new props keep clear of them without the rest being redrawn.
+        """
+        window = dirty_window(map_data, rect, margin)
+        kept = rect if keep else None
+        old = map_data.prop_layer(name).copy() if map_data.has_prop_layer(name) else None
+        props = map_data.add_prop_layer(name)
+        dropped = []
+        if old is not None:
+            dropped = [i for i in old.within(window)
+                       if kept is None or not kept.contains(int(old.xs[i]), int(old.ys[i]))]
+            gone = set(dropped)
+            for index, prop in enumerate(old):
+                if index not in gone:
+                    props.append(*prop)
+        reach = window.expand(math.ceil(2 * self.r_max))
+        existing = [(x, y, self.r_max) for x, y, _ in props if reach.contains(int(x), int(y))]
+        density = None
+        if self.density_layer is not None:
+            density = map_data.region(self.density_layer, *window).tobytes()
+        rng = self.stream("scatter-region", *rect, margin, variant)
+        points = [p for p in poisson_disk(window, self.r_min, self.r_max, rng, self.k,
+                                          density, existing)
+                  if kept is None or not kept.contains(int(p[0]), int(p[1]))]
+        kinds = rng.choices(range(len(self.weights)), self.weights, k=len(points))
+        props.extend([p[0] for p in points], [p[1] for p in points], kinds)
+        if map_data.has_layer(name):
+            cells = map_data.layer(name)
+            width = map_data.width
+            for index in dropped:
+                cells[int(old.ys[index]) * width + int(old.xs[index])] = 0
+            for (x, y, _), kind in zip(points, kinds):
+                cells[int(y) * width + int(x)] = kind + 1
+        map_data.touch()
+        return map_data
@@ -0,0 +1,212 @@
+"""Seed search: generate many candidate maps in parallel and keep the best.
+
+Each seed is generated and scored by a worker; only ``(seed, score,
+metrics)`` comes back, and the winning maps are regenerated from their
+seeds on demand, since generation is deterministic per seed.
+
+The metrics are measured cheapest first - open ratio (a byte count), then
+connectivity (one :func:`~model.connectivity.label` pass), then room count
+and dead-end ratio (packed planes from :func:`model.metrics.room_planes`,
+so they mean what they mean in the metrics stored with saved maps), then
+path length (breadth-first distance fields).  Hard ``constraints``
+are checked as soon as the metric they name is known, so a candidate that
+is already disconnected never pays for its path search.
+
+The generator factory is handed to each worker process once, through the
+pool initializer, rather than with every seed.  A factory that closes over
+a compiled tileset (``functools.partial(WFCGenerator, tileset)``) therefore
+ships it once per worker, and the tileset's support and entropy memo tables
+keep warming up across all the candidates that worker generates.
+"""
+
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from model.connectivity import label
+from model.jobs import progress, wait_for
+from model.map_data import WALLS, OPEN
+from model.metrics import PackedGrid, open_plane, room_planes
+from model.pathfinding import PathFinder
+from model.wfc import ContradictionError
+
+# Default score: connected maps with long routes and several rooms, few dead ends.
+DEFAULT_WEIGHTS = {
+    "connectivity": 100.0,
+    "rooms": 5.0,
+    "path_length": 0.5,
+    "dead_end_ratio": -50.0,
+}
+
+
+def _open_ratio(map_data, entrances):
+    cells = bytes(map_data.layer(WALLS))
+    return {"open_ratio": cells.count(OPEN) / len(cells)}
+
+
+def _connectivity(map_data, entrances):
+    regions, _ = label(map_data)
+    open_cells = sum(region.size for region in regions)
+    largest = max((region.size for region in regions), default=0)
+    return {"regions": len(regions),
+            "connectivity": largest / open_cells if open_cells else 0.0}
+
+
+def _shape(map_data, entrances):
+    grid = PackedGrid(map_data.width, map_data.height)
+    rooms, _, corridor, dead_ends = room_planes(grid, open_plane(grid, map_data))
+    corridor_cells = grid.count(corridor)
+    return {"rooms": len(rooms), "dead_ends": grid.count(dead_ends),
+            "dead_end_ratio": (grid.count(dead_ends & corridor) / corridor_cells
+                               if corridor_cells else 0.0)}
+
+
+def _path_length(map_data, entrances):
+    finder = PathFinder(map_data, diagonal=False, cache_size=2)
+    if entrances and len(entrances) > 1:
+        first, *others = entrances
+        field = finder.distance_field([first])
+        lengths = [field.distance(x, y) for x, y in others]
+        return {"path_length": max(lengths) if float("inf") not in lengths else 0.0}
+    # Fewer than two entrances: the two-sweep estimate of the longest shortest path.
+    regions, _ = label(map_data)
+    if not regions:
+        return {"path_length": 0.0}
+    start = max(regions, key=lambda region: region.size).anchor
+    end, _ = finder.distance_field([start]).farthest()
+    _, length = finder.distance_field([end]).farthest()
+    return {"path_length": length}
+
+
+# Metric groups, cheapest first.
+METRICS = (_open_ratio, _connectivity, _shape, _path_length)
+
+
+def measure(map_data, constraints=None, entrances=None):
+    """Score inputs for ``map_data``; returns ``(metrics, failed)``.
+
+    ``constraints`` maps metric names to ``(low, high)`` bounds, either of
+    which may be ``None``.  Measuring stops at the first metric outside its
+    bounds, whose name is returned as ``failed`` (``None`` if all passed).
+    ``entrances`` are cells whose path length is measured from the first to
+    the farthest of the others (0 when one is unreachable); with fewer than
+    two it is the longest route through the largest region.  Rooms, dead
+    ends and the dead-end ratio are defined as in :func:`~model.metrics.map_metrics`.
+    """
+    constraints = constraints or {}
+    metrics = {}
+    for group in METRICS:
+        found = group(map_data, entrances)
+        metrics.update(found)
+        for name, value in found.items():
+            low, high = constraints.get(name, (None, None))
+            if (low is not None and value < low) or (high is not None and value > high):
+                return metrics, name
+    return metrics, None
+
+
+def weighted_score(metrics, weights):
+    return sum(weight * metrics.get(name, 0.0) for name, weight in weights.items())
+
+
+@dataclass
+class Candidate:
+    seed: int
+    score: float
+    metrics: dict = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+# -- workers ----------------------------------------------------------------
+
+_worker = None
+
+
+def _init_worker(factory, width, height, weights, constraints, entrances):
+    global _worker
+    _worker = factory, width, height, weights, constraints, entrances
+
+
+def _evaluate(seed):
+    """Generate and measure one seed; returns ``(seed, score, metrics, failed, seconds)``."""
+    factory, width, height, weights, constraints, entrances = _worker
+    start = time.perf_counter()
+    generator = factory(seed)
+    try:
+        map_data = generator.generate(width, height)
+    except ContradictionError:
+        return seed, None, {}, "contradiction", time.perf_counter() - start
+    metrics, failed = measure(map_data, constraints, entrances)
+    score = None if failed else weighted_score(metrics, weights)
+    return seed, score, metrics, failed, time.perf_counter() - start
+
+
+class SeedSearch:
+    """Generate a map per seed with ``factory(seed)`` and keep the ``top`` best scores.
+
+    ``factory`` must be picklable when ``workers > 1`` (a class or a
+    ``functools.partial``, not a lambda).  Scores are the ``weights``-weighted
+    sum of the :func:`measure` metrics; candidates failing ``constraints``
+    are dropped and tallied by metric in ``rejected`` after :meth:`run`.
+    """
+
+    def __init__(self, factory, width, height, top=5, weights=None, constraints=None,
+                 entrances=None, workers=1):
+        if top < 1:
+            raise ValueError("top must be at least 1")
+        self.factory = factory
+        self.width = width
+        self.height = height
+        self.top = top
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.constraints = dict(constraints or {})
+        self.entrances = entrances
+        self.workers = workers
+        self.rejected = {}
+
+    def run(self, seeds):
+        """Search ``seeds`` and return the best candidates, highest score first.
+
+        Ties go to the lower seed.  Reports progress per candidate when run
+        as a :class:`~model.jobs.Job`, and is cancellable between them.
+        """
+        seeds = list(seeds)
+        self.rejected = {}
+        best = []
+        initargs = (self.factory, self.width, self.height, self.weights, self.constraints,
+                    self.entrances)
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                       initargs=initargs)
+        else:
+            _init_worker(*initargs)
+        try:
+            futures = [pool.submit(_evaluate, seed) for seed in seeds] if pool else seeds
+            for done, item in enumerate(futures, 1):
+                seed, score, metrics, failed, seconds = wait_for(item) if pool else _evaluate(item)
+                if failed:
+                    self.rejected[failed] = self.rejected.get(failed, 0) + 1
+                else:
+                    # Min-heap on (score, -seed): the root is the weakest kept candidate.
+                    entry = (score, -seed, Candidate(seed, score, metrics, seconds))
+                    if len(best) < self.top:
+                        heapq.heappush(best, entry)
+                    else:
+                        heapq.heappushpop(best, entry)
+                progress(done, len(seeds))
+        except BaseException:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            raise
+        finally:
+            if pool:
+                pool.shutdown()
+        return [candidate for _, _, candidate in sorted(best, reverse=True)]
+
+    def generate(self, candidate):
+        """Regenerate the map for ``candidate`` (or a bare seed)."""
+        seed = getattr(candidate, "seed", candidate)
+        return self.factory(seed).generate(self.width, self.height)
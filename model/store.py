@@ -0,0 +1,194 @@
+"""SQLite persistence for tilesets, compiled tileset caches and generated maps."""
+
+import json
+import zlib
+
+from sqlalchemy import create_engine, Column, Integer, String, LargeBinary, Text
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+from model.map_data import MapData, WALLS
+from model.metrics import MapMetrics, map_metrics
+from model.tileset import CompiledTileset, compile_tileset, rules_hash
+
+Base = declarative_base()
+
+
+class TilesetRecord(Base):
+    __tablename__ = 'tilesets'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    biome_type = Column(String, index=True)
+    tile_blob = Column(LargeBinary)  # JSON adjacency rules, see model.tileset
+
+    @property
+    def rules(self):
+        return json.loads(self.tile_blob)
+
+    def __repr__(self):
+        return f"<TilesetRecord(name='{self.name}', biome_type='{self.biome_type}')>"
+
+
+class CompiledTilesetRecord(Base):
+    __tablename__ = 'compiled_tilesets'
+
+    content_hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary)
+
+    def __repr__(self):
+        return f"<CompiledTilesetRecord(content_hash='{self.content_hash}')>"
+
+
+class ChunkRecord(Base):
+    __tablename__ = 'chunks'
+
+    world = Column(String, primary_key=True)
+    cx = Column(Integer, primary_key=True)
+    cy = Column(Integer, primary_key=True)
+    data = Column(LargeBinary)  # zlib-compressed MapData.to_bytes()
+
+    def __repr__(self):
+        return f"<ChunkRecord(world='{self.world}', cx={self.cx}, cy={self.cy})>"
+
+
+class MapRecord(Base):
+    __tablename__ = 'maps'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, index=True)
+    generator = Column(String)
+    seed = Column(Integer)
+    width = Column(Integer)
+    height = Column(Integer)
+    data = Column(LargeBinary)  # zlib-compressed MapData.to_bytes()
+    metrics_json = Column('metrics', Text)  # MapMetrics.to_json()
+
+    @property
+    def metrics(self):
+        return MapMetrics.from_json(self.metrics_json) if self.metrics_json else None
+
+    def __repr__(self):
+        return f"<MapRecord(name='{self.name}', size={self.width}x{self.height})>"
+
+
+class WorldStore:
+    def __init__(self, db_path=':memory:'):
+        self.db_path = db_path
+        self.engine = create_engine(f'sqlite:///{db_path}')
+        Base.metadata.create_all(self.engine)
+        self._session_maker = sessionmaker(bind=self.engine)
+        self._session = self._session_maker()
+        self._compiled = {}
+
+    def add_tileset(self, name, biome_type, rules):
+        record = TilesetRecord(name=name, biome_type=biome_type,
+                               tile_blob=json.dumps(rules).encode())
+        self._session.add(record)
+        self._session.commit()
+        return record
+
+    def get_tileset(self, key):
+        """Look a tileset up by id, name or biome type."""
+        query = self._session.query(TilesetRecord)
+        if isinstance(key, int):
+            return query.filter(TilesetRecord.id == key).first()
+        return (query.filter(TilesetRecord.name == key).first()
+                or query.filter(TilesetRecord.biome_type == key).first())
+
+    def load_compiled(self, key):
+        """Return the :class:`CompiledTileset` for tileset ``key``, compiling on a cache miss.
+
+        Compiled tables are cached by the content hash of the rules, both in
+        memory and in the ``compiled_tilesets`` table, so a warm load is one
+        buffer read instead of a recompile.
+        """
+        record = self.get_tileset(key)
+        if record is None:
+            return None
+        rules = record.rules
+        return self.cached_compiled(rules_hash(rules), lambda: compile_tileset(rules))
+
+    def cached_compiled(self, content_hash, build):
+        """Return the compiled tileset stored under ``content_hash``, calling ``build`` on a miss."""
+        compiled = self._compiled.get(content_hash)
+        if compiled is not None:
+            return compiled
+        cached = self._session.get(CompiledTilesetRecord, content_hash)
+        if cached is not None:
+            compiled = CompiledTileset.from_bytes(cached.data)
+        else:
+            compiled = build()
+            self._session.add(CompiledTilesetRecord(content_hash=content_hash,
+                                                    data=compiled.to_bytes()))
+            self._session.commit()
+        self._compiled[content_hash] = compiled
+        return compiled
+
+    def save_chunk(self, world, cx, cy, map_data):
+        """Store chunk ``(cx, cy)`` of ``world``, replacing any earlier copy."""
+        # Level 1: spilling happens while panning, and chunk layers are
+        # mostly long runs that compress well even at the fastest setting.
+        data = zlib.compress(map_data.to_bytes(), 1)
+        self._session.merge(ChunkRecord(world=world, cx=cx, cy=cy, data=data))
+        self._session.commit()
+
+    def load_chunk(self, world, cx, cy):
+        """Return the stored :class:`MapData` for chunk ``(cx, cy)``, or ``None``."""
+        data = self.chunk_data(world, cx, cy)
+        return None if data is None else self.decode_chunk(data)
+
+    def chunk_data(self, world, cx, cy):
+        """Return the compressed bytes stored for chunk ``(cx, cy)``, or ``None``."""
+        record = self._session.get(ChunkRecord, (world, cx, cy))
+        return None if record is None else record.data
+
+    @staticmethod
+    def decode_chunk(data):
+        """Rebuild a chunk from :meth:`chunk_data` output (no database access)."""
+        return MapData.from_bytes(zlib.decompress(data))
+
+    def save_map(self, name, map_data, generator=None, seed=None, metrics=None):
+        """Store a generated map with its :class:`~model.metrics.MapMetrics`.
+
+        ``metrics`` are measured from the walls layer unless given; maps
+        without one are stored without metrics.
+        """
+        if metrics is None and map_data.has_layer(WALLS):
+            metrics = map_metrics(map_data)
+        record = MapRecord(name=name, generator=generator, seed=seed, width=map_data.width,
+                           height=map_data.height, data=zlib.compress(map_data.to_bytes(), 6),
+                           metrics_json=metrics.to_json() if metrics else None)
+        self._session.add(record)
+        self._session.commit()
+        return record
+
+    def get_map(self, map_id):
+        return self._session.get(MapRecord, map_id)
+
+    def load_map(self, map_id):
+        """Return the stored :class:`MapData` for map ``map_id``, or ``None``."""
+        record = self.get_map(map_id)
+        if record is None:
+            return None
+        return MapData.from_bytes(zlib.decompress(record.data))
+
+    def find_maps(self, name=None, **bounds):
+        """Map records, oldest first, whose metrics lie within ``bounds``.
+
+        Each keyword names a :class:`~model.metrics.MapMetrics` field and
+        gives ``(low, high)``, either of which may be ``None``.  Maps stored
+        without metrics never match a bound.
+        """
+        query = self._session.query(MapRecord).order_by(MapRecord.id)
+        if name is not None:
+            query = query.filter(MapRecord.name == name)
+        found = []
+        for record in query:
+            metrics = record.metrics
+            if bounds and metrics is None:
+                continue
+            if all((low is None or getattr(metrics, field) >= low)
+                   and (high is None or getattr(metrics, field) <= high)
+                   for field, (low, high) in bounds.items()):
+                found.append(record)
+        return found
@@ -0,0 +1,379 @@
+"""Tile adjacency tables in the form consumed by the WFC solver.
+
+A tileset with ``n`` tiles is described by one integer bitmask per tile and
+direction: bit ``b`` of ``compatible[d][a]`` is set when tile ``b`` may sit
+next to tile ``a`` in direction ``d``.  A cell's set of possible tiles is
+likewise a single integer, so propagation is a handful of ``|`` and ``&``
+operations instead of set arithmetic.
+"""
+
+import hashlib
+import json
+import math
+import struct
+from array import array
+
+NORTH, EAST, SOUTH, WEST = range(4)
+DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+OPPOSITE = (SOUTH, WEST, NORTH, EAST)
+
+
+class Tileset:
+    """Per-direction compatibility masks and tile weights."""
+
+    def __init__(self, weights, compatible, names=None):
+        if len(compatible) != 4 or any(len(masks) != len(weights) for masks in compatible):
+            raise ValueError("compatible must hold one mask per tile for each of 4 directions")
+        if any(w <= 0 for w in weights):
+            raise ValueError("tile weights must be positive")
+        self.weights = tuple(float(w) for w in weights)
+        self.compatible = tuple(tuple(masks) for masks in compatible)
+        self.names = tuple(names) if names is not None else tuple(str(i) for i in range(len(weights)))
+        self._support_cache = ({}, {}, {}, {})
+        self._support_tables = [None] * 4
+        self._entropy_cache = {}
+        self._choice_cache = {}
+
+    def __repr__(self):
+        return f"<Tileset(size={self.size})>"
+
+    def __getstate__(self):
+        # The memo tables are rebuilt on demand; don't ship them to workers.
+        state = self.__dict__.copy()
+        state["_support_cache"] = ({}, {}, {}, {})
+        state["_support_tables"] = [None] * 4
+        state["_entropy_cache"] = {}
+        state["_choice_cache"] = {}
+        return state
+
+    @property
+    def size(self):
+        return len(self.weights)
+
+    @property
+    def full_mask(self):
+        return (1 << self.size) - 1
+
+    @classmethod
+    def from_adjacency(cls, size, pairs, weights=None, names=None):
+        """Build a tileset from ``(a, direction, b)`` triples.
+
+        Each triple allows tile ``b`` next to tile ``a`` in ``direction``; the
+        mirrored rule (``a`` next to ``b`` in the opposite direction) is added
+        automatically.
+        """
+        compatible = [[0] * size for _ in range(4)]
+        for a, direction, b in pairs:
+            compatible[direction][a] |= 1 << b
+            compatible[OPPOSITE[direction]][b] |= 1 << a
+        return cls(weights or [1.0] * size, compatible, names)
+
+    @classmethod
+    def from_edges(cls, edges, weights=None, names=None):
+        """Build a tileset from edge labels given as ``(north, east, south, west)``.
+
+        Two tiles may touch when the labels on their shared edge are equal.
+        """
+        by_label = ({}, {}, {}, {})
+        for tile, labels in enumerate(edges):
+            for direction, label in enumerate(labels):
+                by_label[direction][label] = by_label[direction].get(label, 0) | (1 << tile)
+        compatible = [[by_label[OPPOSITE[d]].get(labels[d], 0) for labels in edges]
+                      for d in range(4)]
+        return cls(weights or [1.0] * len(edges), compatible, names)
+
+    def _support_table(self, direction):
+        """Per byte of a domain, the union of masks for each of the 256 byte values."""
+        table = self._support_tables[direction]
+        if table is None:
+            masks = self.compatible[direction]
+            table = []
+            for base in range(0, self.size, 8):
+                chunk = [0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    tile = base + low.bit_length() - 1
+                    chunk[value] = chunk[value ^ low] | (masks[tile] if tile < self.size else 0)
+                table.append(chunk)
+            self._support_tables[direction] = table
+        return table
+
+    def support(self, direction, domain):
+        """Return the mask of tiles allowed in ``direction`` of any tile in ``domain``."""
+        cache = self._support_cache[direction]
+        allowed = cache.get(domain)
+        if allowed is None:
+            allowed = 0
+            table = self._support_table(direction)
+            if domain.bit_count() <= len(table):
+                masks = self.compatible[direction]
+                bits = domain
+                while bits:
+                    low = bits & -bits
+                    allowed |= masks[low.bit_length() - 1]
+                    bits ^= low
+            else:
+                for chunk, value in zip(table, domain.to_bytes(len(table), "little")):
+                    if value:
+                        allowed |= chunk[value]
+            cache[domain] = allowed
+        return allowed
+
+    def tiles(self, domain):
+        """Return the tile indices present in ``domain``."""
+        tiles = []
+        while domain:
+            low = domain & -domain
+            tiles.append(low.bit_length() - 1)
+            domain ^= low
+        return tiles
+
+    def sample(self, rng):
+        """Draw a weighted tile from the full domain."""
+        tiles, cumulative = self.choices(self.full_mask)
+        return rng.choices(tiles, cum_weights=cumulative)[0]
+
+    def entropy(self, domain):
+        """Shannon entropy of the weighted tile distribution in ``domain``."""
+        value = self._entropy_cache.get(domain)
+        if value is None:
+            weights = [self.weights[i] for i in self.tiles(domain)]
+            total = sum(weights)
+            value = math.log(total) - sum(w * math.log(w) for w in weights) / total
+            self._entropy_cache[domain] = value
+        return value
+
+    def choices(self, domain):
+        """Return ``(tiles, cumulative_weights)`` for weighted sampling from ``domain``."""
+        entry = self._choice_cache.get(domain)
+        if entry is None:
+            tiles = self.tiles(domain)
+            cumulative = []
+            total = 0.0
+            for tile in tiles:
+                total += self.weights[tile]
+                cumulative.append(total)
+            entry = self._choice_cache[domain] = (tiles, cumulative)
+        return entry
+
+
+# -- Rule compilation -------------------------------------------------------
+#
+# Source rules are plain JSON-compatible data::
+#
+#     {
+#         "tiles": [
+#             {"name": "grass", "weight": 4, "edges": ["g", "g", "g", "g"]},
+#             {"name": "road", "symmetry": "I", "edges": ["g", "r", "g", "r"]},
+#             {"name": "bend", "symmetry": "L", "edges": ["r", "r", "g", "g"]},
+#         ],
+#         "neighbors": [["grass", "E", "bend"]],
+#     }
+#
+# ``edges`` (north, east, south, west) make tiles with equal labels on a
+# shared edge compatible; ``neighbors`` add explicit ``[a, direction, b]``
+# rules.  Both are expanded over each tile's symmetry class.
+
+COMPILER_VERSION = 1
+
+_DIRECTION_NAMES = {"N": NORTH, "E": EAST, "S": SOUTH, "W": WEST}
+
+
+def _compose(outer, inner):
+    return tuple(outer[inner[d]] for d in range(4))
+
+
+_ROTATE = (EAST, SOUTH, WEST, NORTH)      # quarter turn clockwise
+_MIRROR = (NORTH, WEST, SOUTH, EAST)      # left-right reflection
+_IDENTITY = (NORTH, EAST, SOUTH, WEST)
+
+
+def _dihedral_group():
+    elements = []
+    rotation = _IDENTITY
+    for _ in range(4):
+        elements.append(rotation)
+        rotation = _compose(_ROTATE, rotation)
+    elements += [_compose(r, _MIRROR) for r in elements]
+    return tuple(elements)
+
+
+# The eight symmetries of the square as direction permutations; element ``g``
+# moves a tile's edge on side ``d`` to side ``g[d]``.
+TRANSFORMS = _dihedral_group()
+
+_ROT180 = TRANSFORMS[2]
+_MIRROR_UD = _compose(_ROT180, _MIRROR)
+_TRANSPOSE = _compose(TRANSFORMS[3], _MIRROR)       # swaps N<->W, E<->S
+_ANTI_TRANSPOSE = _compose(TRANSFORMS[1], _MIRROR)  # swaps N<->E, S<->W
+
+# Transforms that leave a tile of each symmetry class unchanged, assuming the
+# base orientation: "I" runs east-west, "T" opens east, south and west, and
+# "L" joins north and east.
+SYMMETRY_CLASSES = {
+    "X": frozenset(TRANSFORMS),
+    "I": frozenset((_IDENTITY, _ROT180, _MIRROR, _MIRROR_UD)),
+    "\\": frozenset((_IDENTITY, _ROT180, _TRANSPOSE, _ANTI_TRANSPOSE)),
+    "T": frozenset((_IDENTITY, _MIRROR)),
+    "L": frozenset((_IDENTITY, _ANTI_TRANSPOSE)),
+    "F": frozenset((_IDENTITY,)),
+}
+
+
+def rules_hash(rules):
+    """Content hash of ``rules`` (and the compiler version) used as the cache key."""
+    canonical = json.dumps(rules, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{COMPILER_VERSION}:{canonical}".encode()).hexdigest()
+
+
+def build_alias_table(weights):
+    """Vose alias table for O(1) weighted sampling: ``(probability, alias)``."""
+    count = len(weights)
+    total = sum(weights)
+    scaled = [w * count / total for w in weights]
+    probability = array("d", [1.0]) * count
+    alias = array("I", range(count))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    return probability, alias
+
+
+class CompiledTileset(Tileset):
+    """A :class:`Tileset` produced by :func:`compile_tileset` that can round-trip to bytes.
+
+    ``alias_probability`` and ``alias_index`` hold a Vose alias table over
+    the tile weights so a tile can be drawn from the full domain in O(1).
+    """
+
+    _MAGIC = b"IWTS"
+    _HEADER = struct.Struct("<4sHII")
+
+    def __init__(self, weights, compatible, names=None, content_hash="", alias=None):
+        super().__init__(weights, compatible, names)
+        self.content_hash = content_hash
+        self.alias_probability, self.alias_index = alias or build_alias_table(self.weights)
+
+    def sample(self, rng):
+        """Draw a tile from the full domain using the alias table."""
+        column = rng.randrange(self.size)
+        if rng.random() < self.alias_probability[column]:
+            return column
+        return self.alias_index[column]
+
+    def to_bytes(self):
+        size = self.size
+        stride = (size + 7) // 8
+        meta = json.dumps({"names": self.names, "hash": self.content_hash}).encode()
+        parts = [
+            self._HEADER.pack(self._MAGIC, COMPILER_VERSION, size, len(meta)),
+            meta,
+            array("d", self.weights).tobytes(),
+            self.alias_probability.tobytes(),
+            self.alias_index.tobytes(),
+        ]
+        for masks in self.compatible:
+            parts.append(b"".join(mask.to_bytes(stride, "little") for mask in masks))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a compiled tileset from :meth:`to_bytes` output in one pass."""
+        view = memoryview(data)
+        magic, version, size, meta_length = cls._HEADER.unpack_from(view)
+        if magic != cls._MAGIC or version != COMPILER_VERSION:
+            raise ValueError("not a compiled tileset for this compiler version")
+        offset = cls._HEADER.size
+        meta = json.loads(bytes(view[offset:offset + meta_length]))
+        offset += meta_length
+
+        def read(typecode):
+            nonlocal offset
+            values = array(typecode)
+            end = offset + values.itemsize * size
+            values.frombytes(view[offset:end])
+            offset = end
+            return values
+
+        weights = read("d")
+        alias = (read("d"), read("I"))
+        stride = (size + 7) // 8
+        compatible = []
+        for _ in range(4):
+            block = view[offset:offset + stride * size]
+            compatible.append([int.from_bytes(block[i:i + stride], "little")
+                               for i in range(0, stride * size, stride)])
+            offset += stride * size
+        return cls(weights, compatible, meta["names"], meta["hash"], alias)
+
+
+def _variants(symmetry):
+    """Return one representative transform per distinct orientation of a tile."""
+    try:
+        stabiliser = SYMMETRY_CLASSES[symmetry]
+    except KeyError:
+        raise ValueError(f"unknown symmetry class {symmetry!r}") from None
+    seen = set()
+    representatives = []
+    for transform in TRANSFORMS:
+        coset = frozenset(_compose(transform, s) for s in stabiliser)
+        if coset not in seen:
+            seen.add(coset)
+            representatives.append((transform, coset))
+    return representatives
+
+
+def compile_tileset(rules):
+    """Expand ``rules`` over tile symmetries and build a :class:`CompiledTileset`.
+
+    Orientations that end up identical (same source tile and same edge
+    labels) are merged.  Every orientation keeps the weight of its tile.
+    """
+    names, weights, variant_edges = [], [], []
+    orientation = {}   # (tile name, transform) -> variant index
+    by_key = {}
+    for tile in rules["tiles"]:
+        name = tile["name"]
+        edges = tile.get("edges")
+        for transform, coset in _variants(tile.get("symmetry", "X")):
+            moved = None
+            if edges is not None:
+                moved = [None] * 4
+                for side, label in enumerate(edges):
+                    moved[transform[side]] = label
+                moved = tuple(moved)
+            key = (name, moved) if moved is not None else (name, coset)
+            index = by_key.get(key)
+            if index is None:
+                index = by_key[key] = len(names)
+                suffix = TRANSFORMS.index(transform)
+                names.append(name if not suffix else f"{name}#{suffix}")
+                weights.append(tile.get("weight", 1.0))
+                variant_edges.append(moved)
+            for element in coset:
+                orientation[name, element] = index
+
+    size = len(names)
+    compatible = [[0] * size for _ in range(4)]
+    by_label = ({}, {}, {}, {})
+    for index, edges in enumerate(variant_edges):
+        if edges is not None:
+            for side, label in enumerate(edges):
+                by_label[side][label] = by_label[side].get(label, 0) | (1 << index)
+    for index, edges in enumerate(variant_edges):
+        if edges is not None:
+            for side in range(4):
+                compatible[side][index] |= by_label[OPPOSITE[side]].get(edges[side], 0)
+    for a, direction, b in rules.get("neighbors", ()):
+        direction = _DIRECTION_NAMES[direction] if isinstance(direction, str) else direction
+        for transform in TRANSFORMS:
+            left, right = orientation[a, transform], orientation[b, transform]
+            side = transform[direction]
+            compatible[side][left] |= 1 << right
+            compatible[OPPOSITE[side]][right] |= 1 << left
+    return CompiledTileset(weights, compatible, names, rules_hash(rules))
@@ -0,0 +1,367 @@
+"""Wave Function Collapse over a :class:`~model.tileset.Tileset`.
+
+Each cell's remaining possibilities are an integer bitset.  The next cell to
+collapse is taken from a min-heap keyed on Shannon entropy; entries are never
+updated in place, instead a popped entry is discarded when the cell's domain
+no longer matches the one recorded at push time (lazy invalidation).
+Propagation walks a worklist of changed cells and intersects each neighbour
+with the tileset's memoised per-direction support masks.  Contradictions are
+repaired by bounded backtracking over a trail of domain changes rather than
+by restarting the grid.
+
+Every 1024 heap pops the solver reports :func:`~model.jobs.progress`, with
+the tiles decided so far as the preview.
+"""
+
+import heapq
+import random
+import time
+from array import array
+from dataclasses import dataclass, asdict, fields
+from functools import lru_cache
+
+from model.generator import MapGenerator, dirty_window, held_cells
+from model.jobs import checkpoint, progress
+from model.map_data import MapData, TERRAIN
+from model.tileset import DIRECTIONS
+
+
+class ContradictionError(RuntimeError):
+    """Raised when the solver cannot find a consistent assignment."""
+
+
+class _Contradiction(Exception):
+    def __init__(self, cell=None):
+        super().__init__(cell)
+        self.cell = cell
+
+
+@dataclass
+class WFCStats:
+    restarts: int = 0
+    backtracks: int = 0
+    local_resets: int = 0
+    collapses: int = 0
+    propagations: int = 0
+    elapsed: float = 0.0
+
+    def as_dict(self):
+        return asdict(self)
+
+    def add(self, other):
+        """Accumulate every counter of ``other`` into this one."""
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+
+@lru_cache(maxsize=16)
+def neighbour_table(width, height):
+    """Return ``(direction, neighbour)`` pairs for every cell of a grid."""
+    neighbours = []
+    for y in range(height):
+        checkpoint()
+        for x in range(width):
+            cell = []
+            for direction, (dx, dy) in enumerate(DIRECTIONS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    cell.append((direction, ny * width + nx))
+            neighbours.append(tuple(cell))
+    return neighbours
+
+
+class WFCSolver:
+    """Solve one ``width`` x ``height`` grid; cells are indexed ``y * width + x``.
+
+    Every domain change is appended to a trail (cell index plus previous
+    domain), and each collapse records the trail length before it.  On a
+    contradiction the solver undoes the trail to the latest decision, bans
+    the tile it chose and carries on.  After ``max_backtracks`` undos in one
+    run it instead resets the cells within ``reset_radius`` of the
+    contradiction (doubling the radius if that fails too), and only restarts
+    the whole grid when ``max_local_resets`` is exhausted.  Passing
+    ``max_backtracks=0, max_local_resets=0`` gives plain restart-on-failure.
+    """
+
+    def __init__(self, tileset, width, height, rng=None, max_restarts=10, initial=None,
+                 max_backtracks=64, reset_radius=4, max_local_resets=8):
+        self.tileset = tileset
+        self.width = width
+        self.height = height
+        self.rng = rng or random.Random()
+        self.max_restarts = max_restarts
+        self.initial = initial
+        self.max_backtracks = max_backtracks
+        self.reset_radius = reset_radius
+        self.max_local_resets = max_local_resets
+        self.stats = WFCStats()
+        self.domains = []
+        self._neighbours = neighbour_table(width, height)
+
+    def solve(self):
+        """Return the chosen tile index for every cell, recovering from contradictions.
+
+        When ``initial`` domains were given, cells whose domain is narrower
+        than the full tileset act as constraints and are honoured by the
+        solution.
+        """
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    self._run()
+                    return [domain.bit_length() - 1 for domain in self.domains]
+                except _Contradiction:
+                    if self.stats.restarts >= self.max_restarts:
+                        raise ContradictionError(
+                            f"no solution after {self.stats.restarts} restarts") from None
+                    self.stats.restarts += 1
+        finally:
+            self.stats.elapsed += time.perf_counter() - start
+
+    def _run(self):
+        tileset = self.tileset
+        rng = self.rng
+        full = tileset.full_mask
+        self._heap = heap = []
+        self._trail_cells = array("i")
+        self._trail_domains = []
+        self._decisions = decisions = []
+        self._backtracks_left = self.max_backtracks
+        self._resets_left = self.max_local_resets
+        if self.initial is None:
+            self.domains = domains = [full] * (self.width * self.height)
+        else:
+            self.domains = domains = list(self.initial)
+            if not all(domains):
+                raise _Contradiction
+            self._propagate([cell for cell, domain in enumerate(domains) if domain != full])
+        entropy = tileset.entropy
+        for first in range(0, len(domains), 4096):
+            checkpoint()
+            heap.extend((entropy(domain) + rng.random() * 1e-6, cell, domain)
+                        for cell, domain in enumerate(domains[first:first + 4096], first)
+                        if domain & (domain - 1))
+        heapq.heapify(heap)
+        stats = self.stats
+        pops = 0
+        while heap:
+            _, cell, domain = heapq.heappop(heap)
+            pops += 1
+            if not pops & 63:
+                checkpoint()
+                if not pops & 1023:
+                    progress(self.decided(), len(domains), self.partial_map)
+            if domains[cell] != domain or domain & (domain - 1) == 0:
+                continue
+            if domain == full:
+                tile = tileset.sample(rng)
+            else:
+                tiles, cumulative = tileset.choices(domain)
+                tile = rng.choices(tiles, cum_weights=cumulative)[0]
+            decisions.append((len(self._trail_cells), cell, domain, tile))
+            self._assign(cell, 1 << tile)
+            stats.collapses += 1
+            try:
+                self._propagate([cell])
+            except _Contradiction as contradiction:
+                self._recover(contradiction.cell)
+
+    def decided(self):
+        """Number of collapsed cells, estimated from at most about 1024 of them."""
+        domains = self.domains
+        sample = domains[::max(len(domains) // 1024, 1)]
+        collapsed = sum(1 for domain in sample if not domain & (domain - 1))
+        return len(domains) * collapsed // max(len(sample), 1)
+
+    def partial_map(self):
+        """:class:`MapData` with the tiles decided so far on its terrain layer, 0 elsewhere."""
+        map_data = MapData(self.width, self.height)
+        if self.tileset.size > 256:
+            map_data.add_layer(TERRAIN, "H")
+        terrain = map_data.layer(TERRAIN)
+        width = self.width
+        for start in range(0, len(terrain), width):
+            checkpoint()
+            terrain[start:start + width] = array(terrain.typecode, [
+                0 if domain & (domain - 1) else domain.bit_length() - 1
+                for domain in self.domains[start:start + width]])
+        return map_data
+
+    def _assign(self, cell, domain):
+        self._trail_cells.append(cell)
+        self._trail_domains.append(self.domains[cell])
+        self.domains[cell] = domain
+
+    def _push(self, cell, domain):
+        if domain & (domain - 1):
+            heapq.heappush(self._heap,
+                           (self.tileset.entropy(domain) + self.rng.random() * 1e-6, cell, domain))
+
+    def _undo(self, mark):
+        cells, previous = self._trail_cells, self._trail_domains
+        domains = self.domains
+        while len(cells) > mark:
+            cell = cells.pop()
+            domains[cell] = domain = previous.pop()
+            self._push(cell, domain)
+
+    def _recover(self, cell):
+        """Backtrack past the contradiction at ``cell``, falling back to a local reset."""
+        decisions = self._decisions
+        stats = self.stats
+        while decisions and self._backtracks_left > 0:
+            mark, decided, before, tile = decisions.pop()
+            self._undo(mark)
+            self._backtracks_left -= 1
+            stats.backtracks += 1
+            remaining = before & ~(1 << tile)
+            if not remaining:
+                continue
+            self._assign(decided, remaining)
+            try:
+                self._propagate([decided])
+            except _Contradiction as contradiction:
+                cell = contradiction.cell
+                continue
+            self._push(decided, remaining)
+            return
+        self._local_reset(cell)
+
+    def _local_reset(self, cell):
+        """Reopen the cells around ``cell`` and re-derive them from the surrounding ring."""
+        width, height = self.width, self.height
+        full = self.tileset.full_mask
+        domains = self.domains
+        initial = self.initial
+        x, y = cell % width, cell // width
+        radius = self.reset_radius
+        while self._resets_left > 0 and radius > 0:
+            self._resets_left -= 1
+            self.stats.local_resets += 1
+            # A reset is a commit point: nothing before it can be undone.
+            self._decisions.clear()
+            del self._trail_cells[:]
+            self._trail_domains.clear()
+            self._backtracks_left = self.max_backtracks
+            x0, x1 = max(x - radius, 0), min(x + radius + 1, width)
+            y0, y1 = max(y - radius, 0), min(y + radius + 1, height)
+            region = [row * width + col for row in range(y0, y1) for col in range(x0, x1)]
+            for index in region:
+                domains[index] = full if initial is None else initial[index]
+            ring = [row * width + col
+                    for row in range(max(y0 - 1, 0), min(y1 + 1, height))
+                    for col in range(max(x0 - 1, 0), min(x1 + 1, width))
+                    if not (x0 <= col < x1 and y0 <= row < y1)]
+            try:
+                self._propagate(ring + [i for i in region if domains[i] != full])
+            except _Contradiction:
+                radius *= 2
+                continue
+            for index in region:
+                self._push(index, domains[index])
+            return
+        raise _Contradiction(cell)
+
+    def _propagate(self, worklist):
+        tileset = self.tileset
+        support = tileset.support
+        entropy = tileset.entropy
+        domains = self.domains
+        neighbours = self._neighbours
+        heap = self._heap
+        random_value = self.rng.random
+        push = heapq.heappush
+        trail_cells = self._trail_cells
+        trail_domains = self._trail_domains
+        stats = self.stats
+        while worklist:
+            current = worklist.pop()
+            domain = domains[current]
+            for direction, other in neighbours[current]:
+                old = domains[other]
+                new = old & support(direction, domain)
+                if new == old:
+                    continue
+                if not new:
+                    raise _Contradiction(other)
+                trail_cells.append(other)
+                trail_domains.append(old)
+                domains[other] = new
+                stats.propagations += 1
+                worklist.append(other)
+                if new & (new - 1):
+                    push(heap, (entropy(new) + random_value() * 1e-6, other, new))
+
+
+def solve_region(tileset, map_data, rect, margin, keep, rng, max_restarts=10, classes=None,
+                 masks=None):
+    """Re-solve the terrain tiles in ``rect`` plus ``margin``; returns the solver stats.
+
+    The solver runs on the window plus a one-cell ring; the ring (and
+    ``rect`` itself with ``keep``) is pinned to the tiles already there,
+    so the new tiles meet the old ones along every edge.  With ``classes``
+    (one per map cell), a released cell of class ``c`` starts from
+    ``masks[c]`` rather than every tile.
+    """
+    window = dirty_window(map_data, rect, margin)
+    grid = dirty_window(map_data, window, 1)
+    held = held_cells(grid, window, rect if keep else None)
+    terrain = map_data.layer(TERRAIN)
+    full = tileset.full_mask
+    width = map_data.width
+    initial = []
+    for y in range(grid.y, grid.bottom):
+        start = (y - grid.y) * grid.width
+        tiles = terrain[y * width + grid.x:y * width + grid.right]
+        domains = ([masks[c] for c in classes[y * width + grid.x:y * width + grid.right]]
+                   if classes is not None else [full] * grid.width)
+        initial.extend(1 << tile if hold else domain for tile, hold, domain
+                       in zip(tiles, held[start:start + grid.width], domains))
+    solver = WFCSolver(tileset, grid.width, grid.height, rng, max_restarts, initial=initial)
+    tiles = array(terrain.typecode, solver.solve())
+    for y in range(window.y, window.bottom):
+        start = (y - grid.y) * grid.width + window.x - grid.x
+        terrain[y * width + window.x:y * width + window.right] = tiles[start:start + window.width]
+    map_data.touch()
+    return solver.stats
+
+
+class WFCGenerator(MapGenerator):
+    """Fill the terrain layer of a new map with tile indices chosen by WFC."""
+
+    def __init__(self, tileset, seed=0, max_restarts=10):
+        super().__init__(seed)
+        self.tileset = tileset
+        self.max_restarts = max_restarts
+        self.stats = None
+
+    @classmethod
+    def from_store(cls, store, tileset_id, seed=0, **kwargs):
+        """Build a generator for a tileset saved in a :class:`~model.store.WorldStore`."""
+        tileset = store.load_compiled(tileset_id)
+        if tileset is None:
+            raise KeyError(f"unknown tileset {tileset_id!r}")
+        return cls(tileset, seed, **kwargs)
+
+    def new_map(self, width, height):
+        map_data = super().new_map(width, height)
+        if self.tileset.size > 256:
+            map_data.add_layer(TERRAIN, "H")
+        return map_data
+
+    def generate(self, width, height):
+        solver = WFCSolver(self.tileset, width, height,
+                           self.stream("wfc"), self.max_restarts)
+        tiles = solver.solve()
+        self.stats = solver.stats
+        map_data = self.new_map(width, height)
+        terrain = map_data.layer(TERRAIN)
+        terrain[:] = array(terrain.typecode, tiles)
+        return map_data
+
+    def regenerate(self, map_data, rect, margin=2, keep=False, variant=0):
+        rng = self.stream("wfc-region", *rect, margin, variant)
+        self.stats = solve_region(self.tileset, map_data, rect, margin, keep, rng,
+                                  self.max_restarts)
+        return map_data
@@ -0,0 +1,89 @@
+import pytest
+import os
+import random
+import sys
+from array import array
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.autotile import (Autotiler, AUTOTILE, BLOB_MASKS, BLOB_TABLE, NO_TILE, N, NE, E,
+                            blob_mask)
+from model.map_data import MapData, Rect, WALLS, OPEN, SOLID
+
+def reference_tile(map_data, x, y, edge=True):
+    """Blob index of one cell computed by looking at each neighbour in turn."""
+    if map_data.get(WALLS, x, y) != SOLID:
+        return NO_TILE
+    mask = 0
+    for bit, (dx, dy) in enumerate(((-1, -1), (0, -1), (1, -1), (1, 0),
+                                    (1, 1), (0, 1), (-1, 1), (-1, 0))):
+        nx, ny = x + dx, y + dy
+        if map_data.in_bounds(nx, ny):
+            connected = map_data.get(WALLS, nx, ny) == SOLID
+        else:
+            connected = edge
+        mask |= connected << bit
+    return BLOB_TABLE[mask]
+
+def assert_tiled(map_data, edge=True):
+    """Check every cell against the reference."""
+    for y in range(map_data.height):
+        for x in range(map_data.width):
+            assert map_data.get(AUTOTILE, x, y) == reference_tile(map_data, x, y, edge)
+
+@pytest.fixture
+def noise_map():
+    """Fixture providing a map with walls on a random half of the cells."""
+    rng = random.Random(5)
+    map_data = MapData(23, 17)
+    for x in range(23):
+        for y in range(17):
+            map_data.set(WALLS, x, y, SOLID if rng.random() < 0.5 else OPEN)
+    return map_data
+
+def test_blob_table():
+    """Test the 256 masks fold onto 47 shapes and lone corners are dropped."""
+    assert len(BLOB_MASKS) == 47 and max(BLOB_TABLE) == 46
+    assert blob_mask(NE) == 0
+    assert blob_mask(N | NE | E) == N | NE | E
+    assert BLOB_TABLE[N | NE] == BLOB_TABLE[N]
+
+@pytest.mark.parametrize("edge", [True, False])
+def test_whole_map_matches_reference(noise_map, edge):
+    """Test tiling a layer in one pass agrees with the cell-by-cell answer."""
+    Autotiler(noise_map, edge=edge)
+    assert_tiled(noise_map, edge)
+
+def test_update_cells(noise_map):
+    """Test patching neighbour masks after scattered edits matches a full retile."""
+    tiler = Autotiler(noise_map)
+    rng = random.Random(9)
+    edits = [(rng.randrange(23), rng.randrange(17)) for _ in range(40)] + [(0, 0), (22, 16)]
+    for x, y in edits:
+        noise_map.set(WALLS, x, y, rng.choice((OPEN, SOLID)))
+    tiler.update_cells(edits)
+    assert_tiled(noise_map)
+    masks = bytes(tiler.masks)
+    tiler.update(Rect(0, 0, 23, 17))
+    assert bytes(tiler.masks) == masks
+
+def test_update_rect(noise_map):
+    """Test retiling an edited rectangle also fixes the ring around it."""
+    tiler = Autotiler(noise_map)
+    noise_map.fill(WALLS, SOLID, 4, 3, 6, 5)
+    tiler.update(Rect(4, 3, 6, 5))
+    assert_tiled(noise_map)
+
+def test_refresh_and_tilesheet_order():
+    """Test a custom tile order is applied and refresh retiles after raw edits."""
+    map_data = MapData(4, 4)
+    tiles = list(range(100, 147))
+    tiler = Autotiler(map_data, tiles=tiles)
+    assert set(map_data.layer(AUTOTILE)) == {NO_TILE}
+    map_data.layer(WALLS)[:] = array("B", [SOLID]) * 16
+    map_data.touch()
+    tiler.refresh()
+    assert set(map_data.layer(AUTOTILE)) == {100 + BLOB_TABLE[0xFF]}
+    with pytest.raises(ValueError):
+        Autotiler(map_data, tiles=[0] * 46)
@@ -0,0 +1,84 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.biomes import VoronoiBiomeGenerator
+from model.map_data import Rect, BIOME
+
+@pytest.fixture
+def sharp():
+    """Fixture providing a partitioner with straight Voronoi edges."""
+    return VoronoiBiomeGenerator(seed=2, spacing=16, blend=0)
+
+def brute_force(generator, x, y, buckets):
+    """Biomes of every site tied for nearest to (x, y)."""
+    distances = {}
+    for gy in buckets:
+        for gx in buckets:
+            sx, sy, biome = generator.site(gx, gy)
+            distances.setdefault((sx - x) ** 2 + (sy - y) ** 2, set()).add(biome)
+    return distances[min(distances)]
+
+def test_matches_nearest_site(sharp):
+    """Test the row envelopes against an exhaustive nearest-site search."""
+    cells = sharp.partition(-5, 3, 40, 30)
+    for y in range(30):
+        for x in range(40):
+            assert cells[y * 40 + x] in brute_force(sharp, x - 5, y + 3, range(-3, 6))
+            assert sharp.nearest(x - 5, y + 3) in brute_force(sharp, x - 5, y + 3, range(-3, 6))
+
+def test_row_runs_cover_row(sharp):
+    """Test that runs tile the requested row exactly and alternate biomes."""
+    runs = sharp.row_runs(7, 10, 100)
+    assert runs[0][0] == 10 and runs[-1][1] == 110
+    assert all(a[1] == b[0] and a[2] != b[2] for a, b in zip(runs, runs[1:]))
+
+def test_chunks_agree_with_whole_map():
+    """Test that blended chunks match the same window of a whole-map partition."""
+    whole = VoronoiBiomeGenerator(seed=4, spacing=20, blend=4).partition(0, 0, 60, 60)
+    generator = VoronoiBiomeGenerator(seed=4, spacing=20, blend=4)
+    for cx, cy in ((0, 0), (1, 0), (1, 1)):
+        chunk = generator.partition(cx * 30, cy * 30, 30, 30)
+        for y in range(30):
+            start = (cy * 30 + y) * 60 + cx * 30
+            assert chunk[y * 30:(y + 1) * 30] == whole[start:start + 30]
+
+def test_blend_only_touches_borders():
+    """Test that blending changes some border cells and nothing deep inside regions."""
+    sharp = VoronoiBiomeGenerator(seed=4, spacing=20, blend=0).partition(0, 0, 80, 80)
+    blended = VoronoiBiomeGenerator(seed=4, spacing=20, blend=4).partition(0, 0, 80, 80)
+    changed = [i for i in range(len(sharp)) if sharp[i] != blended[i]]
+    assert changed
+    for i in changed:
+        x, y = i % 80, i // 80
+        window = {sharp[ny * 80 + nx] for ny in range(max(0, y - 4), min(80, y + 5))
+                  for nx in range(max(0, x - 4), min(80, x + 5))}
+        assert len(window) > 1
+
+def test_weights_and_layer():
+    """Test biome weights and the generated biome layer."""
+    generator = VoronoiBiomeGenerator(seed=1, biomes=("forest", "dungeon"), weights=[1, 0],
+                                      spacing=8)
+    map_data = generator.generate(32, 24)
+    assert set(map_data.layer(BIOME)) == {0}
+    with pytest.raises(ValueError):
+        VoronoiBiomeGenerator(biomes=("forest",), weights=[1, 2])
+
+def test_regenerate_region():
+    """Test a region re-run redraws the window and keeps a hand-painted rectangle."""
+    generator = VoronoiBiomeGenerator(seed=3, biomes=("a", "b", "c", "d"), spacing=6)
+    map_data = generator.generate(48, 32)
+    before = map_data.layer(BIOME)[:]
+    rect = Rect(16, 10, 12, 10)
+    generator.regenerate(map_data, rect, margin=2, variant=2)
+    after = map_data.layer(BIOME)
+    window = rect.expand(2)
+    changed = [(i % 48, i // 48) for i in range(48 * 32) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+
+    map_data.fill(BIOME, 3, *rect)
+    generator.regenerate(map_data, rect, margin=2, keep=True, variant=5)
+    assert set(map_data.region(BIOME, *rect).tobytes()) == {3}
@@ -0,0 +1,77 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.bsp import BSPGenerator
+from model.connectivity import label
+from model.map_data import Rect, WALLS, OPEN, SOLID
+
+@pytest.fixture
+def generator():
+    """Fixture providing a seeded BSP generator."""
+    return BSPGenerator(seed=42)
+
+def test_rooms_are_carved(generator):
+    """Test that every room is open floor surrounded by the map border."""
+    map_data = generator.generate(80, 60)
+    assert len(generator.rooms) > 1
+    for room in generator.rooms:
+        assert 0 < room.x and room.right < 80 and 0 < room.y and room.bottom < 60
+        region = map_data.region(WALLS, *room)
+        assert set(region.tobytes()) == {OPEN}
+
+def test_rooms_do_not_overlap(generator):
+    """Test that rooms from different leaves never intersect."""
+    generator.generate(120, 90)
+    rooms = generator.rooms
+    for i, first in enumerate(rooms):
+        for second in rooms[i + 1:]:
+            assert not first.intersects(second)
+
+def test_dungeon_is_connected(generator):
+    """Test that corridors join every room into one open region."""
+    map_data = generator.generate(70, 50)
+    walls = map_data.layer(WALLS)
+    start = generator.rooms[0].y * 70 + generator.rooms[0].x
+    seen = {start}
+    frontier = [start]
+    while frontier:
+        cell = frontier.pop()
+        x, y = cell % 70, cell // 70
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            other = ny * 70 + nx
+            if 0 <= nx < 70 and 0 <= ny < 50 and walls[other] == OPEN and other not in seen:
+                seen.add(other)
+                frontier.append(other)
+    assert len(seen) == walls.count(OPEN)
+
+def test_seed_determinism():
+    """Test that the same seed reproduces the same dungeon."""
+    first = BSPGenerator(seed=5).generate(100, 100)
+    second = BSPGenerator(seed=5).generate(100, 100)
+    assert first.layer(WALLS) == second.layer(WALLS)
+    assert first.layer(WALLS).count(SOLID) > 0
+
+def test_map_too_small(generator):
+    """Test that maps smaller than one leaf are rejected."""
+    with pytest.raises(ValueError):
+        generator.generate(5, 5)
+
+def test_regenerate_region(generator):
+    """Test a region re-run rebuilds its rooms and keeps the dungeon connected."""
+    map_data = generator.generate(80, 60)
+    before = map_data.layer(WALLS)[:]
+    old_rooms = list(generator.rooms)
+    rect = Rect(25, 18, 24, 20)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    after = map_data.layer(WALLS)
+    window = rect.expand(2)
+    changed = [(i % 80, i // 80) for i in range(80 * 60) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    assert len(label(map_data)[0]) == 1
+    assert generator.rooms != old_rooms
+    for room in generator.rooms:
+        assert set(map_data.region(WALLS, *room).tobytes()) == {OPEN}
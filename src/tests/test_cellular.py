@@ -0,0 +1,105 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.cellular import CellularAutomataGenerator, parse_rule, rule_table, step
+from model.connectivity import is_connected
+from model.map_data import Rect, WALLS, OPEN
+
+def reference_step(cells, width, height, birth, survival):
+    """Per-cell implementation used as the oracle; outside cells count as solid."""
+    result = bytearray(len(cells))
+    for y in range(height):
+        for x in range(width):
+            count = 0
+            for ny in range(y - 1, y + 2):
+                for nx in range(x - 1, x + 2):
+                    if (nx, ny) == (x, y):
+                        continue
+                    inside = 0 <= nx < width and 0 <= ny < height
+                    count += cells[ny * width + nx] if inside else 1
+            alive = cells[y * width + x]
+            result[y * width + x] = (count in survival) if alive else (count in birth)
+    return bytes(result)
+
+def test_parse_rule():
+    """Test parsing birth/survival notation."""
+    assert parse_rule("B3/S23") == ({3}, {2, 3})
+    assert parse_rule("b5678/s45678")[0] == {5, 6, 7, 8}
+    with pytest.raises(ValueError):
+        parse_rule("3/23")
+
+@pytest.mark.parametrize("rule", ["B5678/S45678", "B3/S23", "B678/S2345678"])
+def test_step_matches_reference(rule):
+    """Test the packed implementation against the per-cell oracle."""
+    birth, survival = parse_rule(rule)
+    rng = random.Random(rule)
+    cells = bytes(rng.random() < 0.45 for _ in range(23 * 17))
+    expected = cells
+    for _ in range(3):
+        expected = reference_step(expected, 23, 17, birth, survival)
+    assert step(cells, 23, 17, rule_table(birth, survival), iterations=3) == expected
+
+def test_step_holds_cells():
+    """Test held cells keep their state while the others follow the rule."""
+    birth, survival = parse_rule("B5678/S45678")
+    rng = random.Random(9)
+    cells = bytes(rng.random() < 0.45 for _ in range(20 * 15))
+    held = bytes(x < 6 or y == 7 for y in range(15) for x in range(20))
+    result = step(cells, 20, 15, rule_table(birth, survival), held=held)
+    expected = reference_step(cells, 20, 15, birth, survival)
+    assert result == bytes(c if h else e for c, h, e in zip(cells, held, expected))
+
+def test_generator_is_seed_deterministic():
+    """Test that the same seed produces the same cave."""
+    first = CellularAutomataGenerator(seed=3).generate(64, 48)
+    second = CellularAutomataGenerator(seed=3).generate(64, 48)
+    assert first.layer(WALLS) == second.layer(WALLS)
+    assert 0 < first.layer(WALLS).count(1) < 64 * 48
+
+def test_regenerate_region():
+    """Test a region re-run changes only its window and can keep the edited cells."""
+    generator = CellularAutomataGenerator(seed=5)
+    map_data = generator.generate(64, 48)
+    before = map_data.copy()
+    rect = Rect(20, 10, 12, 8)
+    generator.regenerate(map_data, rect, margin=3, variant=1)
+    window = rect.expand(3)
+    old, new = before.layer(WALLS), map_data.layer(WALLS)
+    changed = [(i % 64, i // 64) for i in range(64 * 48) if old[i] != new[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    again = before.copy()
+    generator.regenerate(again, rect, margin=3, variant=1)
+    assert again.layer(WALLS) == new
+
+    before.fill(WALLS, 0, *rect)
+    generator.regenerate(before, rect, margin=3, keep=True)
+    assert set(before.region(WALLS, *rect).tobytes()) == {0}
+
+def test_regenerate_keeps_map_connected():
+    """Test a connected map stays connected and changes stay in the window."""
+    generator = CellularAutomataGenerator(seed=7, connected=True)
+    map_data = generator.generate(64, 48)
+    assert is_connected(map_data)
+    window = Rect(20, 14, 16, 12).expand(2)
+    for variant in range(4):
+        before = map_data.layer(WALLS)[:]
+        generator.regenerate(map_data, Rect(20, 14, 16, 12), margin=2, variant=variant)
+        after = map_data.layer(WALLS)
+        assert all(window.contains(i % 64, i // 64) for i in range(64 * 48)
+                   if before[i] != after[i])
+        assert is_connected(map_data)
+
+def test_regenerate_rejoins_cut_passage():
+    """Test a passage cut by the window is joined through it again."""
+    generator = CellularAutomataGenerator(seed=1, fill=1.0, connected=True)
+    map_data = generator.new_map(40, 20)
+    map_data.fill(WALLS, 1)
+    map_data.fill(WALLS, OPEN, 1, 10, 38, 1)
+    generator.regenerate(map_data, Rect(16, 6, 8, 8), margin=1)
+    assert map_data.get(WALLS, 15, 10) == OPEN and is_connected(map_data)
+    assert len(generator.tunnels) == 1
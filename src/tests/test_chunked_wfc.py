@@ -0,0 +1,90 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.chunked_wfc import ChunkedWFCGenerator, UNSOLVED
+from model.map_data import Rect, TERRAIN
+from model.tileset import Tileset, DIRECTIONS
+
+@pytest.fixture
+def tileset():
+    """Fixture with a small edge-labelled tileset."""
+    edges = [(a, b, c, d) for a in "gr" for b in "gr" for c in "gr" for d in "gr"]
+    return Tileset.from_edges(edges)
+
+def count_conflicts(tileset, tiles, width, height):
+    conflicts = 0
+    for y in range(height):
+        for x in range(width):
+            tile = tiles[y * width + x]
+            for direction, (dx, dy) in enumerate(DIRECTIONS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    if not tileset.compatible[direction][tile] >> tiles[ny * width + nx] & 1:
+                        conflicts += 1
+    return conflicts
+
+def test_seams_are_consistent(tileset):
+    """Test that chunk seams satisfy the adjacency rules."""
+    generator = ChunkedWFCGenerator(tileset, seed=1, chunk_size=16, overlap=3)
+    tiles = generator.solve(50, 37)
+    assert UNSOLVED not in tiles
+    assert count_conflicts(tileset, tiles, 50, 37) == 0
+
+def test_output_independent_of_worker_count(tileset):
+    """Test that the same seed gives the same map for any number of workers."""
+    serial = ChunkedWFCGenerator(tileset, seed=9, chunk_size=16, workers=1).solve(48, 48)
+    parallel = ChunkedWFCGenerator(tileset, seed=9, chunk_size=16, workers=2).solve(48, 48)
+    assert serial == parallel
+
+def test_generate_fills_terrain(tileset):
+    """Test that generate() writes the tiles into the terrain layer."""
+    generator = ChunkedWFCGenerator(tileset, seed=2, chunk_size=16)
+    map_data = generator.generate(20, 20)
+    assert max(map_data.layer(TERRAIN)) < tileset.size
+
+def test_stats_include_recovery_counters():
+    """Test that backtracks and local resets from every window reach the totals."""
+    edges = [(a, b, c, d) for a in "wxyz" for b in "wxyz" for c in "wxyz" for d in "wxyz"]
+    sparse = Tileset.from_edges(random.Random(4).sample(edges, 30))
+    serial = ChunkedWFCGenerator(sparse, seed=0, chunk_size=16, overlap=3)
+    parallel = ChunkedWFCGenerator(sparse, seed=0, chunk_size=16, overlap=3, workers=2)
+    assert serial.solve(32, 32) == parallel.solve(32, 32)
+    totals = serial.stats.as_dict()
+    assert totals["backtracks"] > 0
+    del totals["elapsed"]
+    assert {name: value for name, value in parallel.stats.as_dict().items()
+            if name != "elapsed"} == totals
+
+def test_overlap_too_large(tileset):
+    """Test that overlapping same-phase windows are rejected."""
+    with pytest.raises(ValueError):
+        ChunkedWFCGenerator(tileset, chunk_size=8, overlap=4)
+
+def test_regenerate_across_chunk_seam(tileset):
+    """Test re-solving a window that straddles a chunk seam stays consistent."""
+    generator = ChunkedWFCGenerator(tileset, seed=4, chunk_size=16, overlap=3)
+    map_data = generator.generate(40, 32)
+    before = map_data.layer(TERRAIN)[:]
+    generator.regenerate(map_data, Rect(12, 12, 8, 8), margin=2, variant=1)
+    after = map_data.layer(TERRAIN)
+    assert before != after
+    assert count_conflicts(tileset, list(after), 40, 32) == 0
+
+def test_classes_constrain_domains(tileset):
+    """Test cells of a class only take the tiles its mask allows, in solve and regenerate."""
+    classes = [1 if 8 <= x < 20 else 0 for y in range(32) for x in range(40)]
+    masks = [tileset.full_mask, 1 << 15]
+    generator = ChunkedWFCGenerator(tileset, seed=4, chunk_size=16, overlap=3)
+    tiles = generator.solve(40, 32, classes, masks)
+    assert all(tiles[i] == 15 for i, c in enumerate(classes) if c)
+    assert count_conflicts(tileset, tiles, 40, 32) == 0
+    map_data = generator.to_map(tiles, 40, 32)
+    generator.regenerate(map_data, Rect(12, 12, 16, 8), variant=1, classes=classes, masks=masks)
+    after = map_data.layer(TERRAIN)
+    assert all(after[i] == 15 for i, c in enumerate(classes) if c)
+    assert count_conflicts(tileset, list(after), 40, 32) == 0
@@ -0,0 +1,105 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.chunks import ChunkManager, WindowSource
+from model.map_data import Rect, HEIGHT, WALLS
+from model.noise import TerrainNoiseGenerator
+from model.store import WorldStore
+
+SIZE = 16
+
+@pytest.fixture
+def source():
+    """Fixture providing a noise terrain source."""
+    return WindowSource(TerrainNoiseGenerator(seed=4))
+
+@pytest.fixture
+def chunk_bytes(source):
+    """Fixture giving the memory cost of one chunk."""
+    return source(0, 0, SIZE).nbytes
+
+def test_chunks_match_big_map(source):
+    """Test chunks are windows of the same world, negative coordinates included."""
+    manager = ChunkManager(source, SIZE, workers=0)
+    terrain = TerrainNoiseGenerator(seed=4)
+    big = terrain.fill(terrain.new_map(2 * SIZE, SIZE), -SIZE, 0)
+    left, right = manager.get(-1, 0), manager.get(0, 0)
+    for y in range(SIZE):
+        assert list(big.row(HEIGHT, y)) == list(left.row(HEIGHT, y)) + list(right.row(HEIGHT, y))
+    assert manager.get(-1, 0) is left
+    assert (manager.generated, manager.hits, manager.misses) == (2, 1, 2)
+
+def test_chunk_of(source):
+    """Test world cells map onto chunks with floor division."""
+    manager = ChunkManager(source, SIZE, workers=0)
+    assert manager.chunk_of(0, 15) == (0, 0)
+    assert manager.chunk_of(-1, 16) == (-1, 1)
+    assert manager.chunks_in(Rect(-1, 0, 18, 1)) == [(-1, 0), (0, 0), (1, 0)]
+
+def test_lru_evicts_to_budget(source, chunk_bytes):
+    """Test the least recently used chunk goes first and the budget holds."""
+    manager = ChunkManager(source, SIZE, max_bytes=3 * chunk_bytes, workers=0)
+    for cx in range(3):
+        manager.get(cx, 0)
+    manager.get(0, 0)
+    manager.get(3, 0)
+    assert (1, 0) not in manager and (0, 0) in manager
+    assert manager.resident_bytes <= manager.max_bytes
+
+def test_evicted_edits_spill_to_store(source, chunk_bytes):
+    """Test edited chunks survive eviction through the store."""
+    store = WorldStore()
+    manager = ChunkManager(source, SIZE, max_bytes=chunk_bytes, store=store, workers=0)
+    chunk = manager.get(5, -5)
+    chunk.set(WALLS, 3, 3, 1)
+    manager.get(6, -5)
+    assert (5, -5) not in manager and manager.spilled == 1
+    reloaded = manager.get(5, -5)
+    assert reloaded.get(WALLS, 3, 3) == 1
+    assert manager.loaded == 1 and manager.generated == 2
+    # Unchanged since it was loaded, so evicting it again writes nothing.
+    manager.get(6, -5)
+    assert manager.spilled == 2
+
+def test_viewport_pins_visible_chunks(source, chunk_bytes):
+    """Test visible chunks are never evicted and the ring is prefetched."""
+    manager = ChunkManager(source, SIZE, max_bytes=4 * chunk_bytes, workers=0)
+    viewport = Rect(0, 0, 2 * SIZE, SIZE)
+    manager.set_viewport(viewport)
+    assert all(manager.peek(*key) is not None for key in manager.chunks_in(viewport))
+    for cx in range(10, 20):
+        manager.get(cx, 0)
+    assert (0, 0) in manager and (1, 0) in manager
+
+def test_background_prefetch_matches_inline(source):
+    """Test chunks generated in the pool equal chunks generated inline."""
+    inline = ChunkManager(source, SIZE, workers=0)
+    with ChunkManager(source, SIZE, workers=1) as pooled:
+        pooled.set_viewport(Rect(0, 0, SIZE, SIZE))
+        chunk = pooled.get(0, 0)
+        assert chunk.layer(HEIGHT) == inline.get(0, 0).layer(HEIGHT)
+        assert pooled.get(1, 1).layer(HEIGHT) == inline.get(1, 1).layer(HEIGHT)
+
+def test_prefetch_reads_store_in_workers(source, tmp_path):
+    """Test only visible chunks are read from the store on the calling thread."""
+    path = str(tmp_path / "world.db")
+    with ChunkManager(source, SIZE, store=WorldStore(path), workers=0) as writer:
+        for cy in range(-1, 2):
+            for cx in range(-1, 2):
+                writer.get(cx, cy).set(WALLS, 1, 1, 1)
+    store = WorldStore(path)
+    read_here = []
+    load_chunk = store.load_chunk
+    store.load_chunk = lambda world, cx, cy: read_here.append((cx, cy)) or load_chunk(world, cx, cy)
+    with ChunkManager(source, SIZE, store=store, workers=1) as manager:
+        manager.set_viewport(Rect(0, 0, SIZE, SIZE))
+        assert read_here == [(0, 0)]
+        for cy in range(-1, 2):
+            for cx in range(-1, 2):
+                assert manager.get(cx, cy).get(WALLS, 1, 1) == 1
+        assert read_here == [(0, 0)]
+        assert (manager.loaded, manager.generated) == (9, 0)
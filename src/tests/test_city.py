@@ -0,0 +1,125 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.city import CityGenerator, RoadNetwork, ROAD, BUILDING
+from model.map_data import Rect, TERRAIN, WALLS, SOLID
+
+def crosses(p, q, r, s):
+    """Proper intersection of segments pq and rs; the brute-force reference."""
+    def orient(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (orient(p, q, r) * orient(p, q, s) < 0) and (orient(r, s, p) * orient(r, s, q) < 0)
+
+@pytest.fixture
+def city():
+    """Fixture providing a generated city and its map."""
+    generator = CityGenerator(seed=3)
+    return generator, generator.generate(160, 120)
+
+def test_first_crossing_matches_brute_force():
+    """Test the spatial-hash crossing query against checking every segment."""
+    rng = random.Random(2)
+    network = RoadNetwork(bucket_size=10)
+    for _ in range(60):
+        a = network.add_node(rng.uniform(0, 100), rng.uniform(0, 100))
+        b = network.add_node(rng.uniform(0, 100), rng.uniform(0, 100))
+        network.add_segment(a, b)
+    start = network.add_node(50, 50)
+    for _ in range(30):
+        bx, by = rng.uniform(0, 100), rng.uniform(0, 100)
+        expected = [index for index, (a, b) in enumerate(network.segments)
+                    if crosses((50, 50), (bx, by), network.nodes[a], network.nodes[b])]
+        crossing = network.first_crossing(start, bx, by)
+        if not expected:
+            assert crossing is None
+        else:
+            assert crossing is not None and crossing[1] in expected
+
+def test_split_keeps_geometry():
+    """Test splitting a segment at a node replaces it with two halves."""
+    network = RoadNetwork(bucket_size=10)
+    a, b = network.add_node(0, 0), network.add_node(30, 0)
+    index = network.add_segment(a, b)
+    middle = network.add_node(12, 0)
+    network.split(index, middle)
+    assert sorted(network.live_segments()) == [(a, middle), (middle, b)]
+    assert network.nearest_node(13, 1, 2) == middle
+    assert network.nearest_node(20, 0, 2) is None
+
+def test_roads_do_not_cross_without_intersection(city):
+    """Test no two road segments cross away from a shared node."""
+    network = city[0].network
+    segments = network.live_segments()
+    for i, (a, b) in enumerate(segments):
+        for c, d in segments[i + 1:]:
+            if {a, b} & {c, d}:
+                continue
+            assert not crosses(network.nodes[a], network.nodes[b],
+                               network.nodes[c], network.nodes[d])
+
+def test_lots_inside_blocks(city):
+    """Test every lot lies on ground of a single block, clear of roads."""
+    generator, map_data = city
+    terrain = map_data.layer(TERRAIN)
+    assert generator.blocks and generator.lots
+    assert terrain.count(ROAD) > 0
+    for lot in generator.lots:
+        cells = [terrain[y * map_data.width + x]
+                 for y in range(lot.y, lot.bottom) for x in range(lot.x, lot.right)]
+        assert ROAD not in cells
+        assert generator.min_lot <= lot.width and generator.min_lot <= lot.height
+        building = lot.expand(-1)
+        assert map_data.get(WALLS, building.x, building.y) == SOLID
+        assert map_data.get(TERRAIN, building.x, building.y) == BUILDING
+
+def test_blocks_are_closed(city):
+    """Test blocks never touch the map edge."""
+    generator, map_data = city
+    edge = Rect(0, 0, map_data.width, map_data.height)
+    for block in generator.blocks:
+        assert edge.expand(-1).contains(block.bounds.x, block.bounds.y)
+        assert block.bounds.right < map_data.width and block.bounds.bottom < map_data.height
+
+def test_deterministic(city):
+    """Test the same seed gives the same city."""
+    generator, map_data = city
+    again = CityGenerator(seed=3).generate(160, 120)
+    assert again.layer(TERRAIN) == map_data.layer(TERRAIN)
+    assert CityGenerator(seed=4).generate(160, 120).layer(TERRAIN) != map_data.layer(TERRAIN)
+
+def test_regenerate_region(city):
+    """Test a region re-run regrows roads and lots inside the window only."""
+    generator, map_data = city
+    before = map_data.layer(TERRAIN)[:]
+    rect = Rect(50, 40, 40, 30)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    after = map_data.layer(TERRAIN)
+    window = rect.expand(2)
+    changed = [(i % 160, i // 160) for i in range(160 * 120) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    test_roads_do_not_cross_without_intersection(city)
+    test_lots_inside_blocks(city)
+    assert any(window.contains(lot.x, lot.y) for lot in generator.lots)
+
+def test_regenerate_keeps_hand_edit(city):
+    """Test a kept rectangle survives while the roads around it are regrown."""
+    generator, map_data = city
+    rect = Rect(60, 50, 12, 8)
+    map_data.fill(TERRAIN, BUILDING, *rect)
+    generator.regenerate(map_data, rect, margin=8, keep=True, variant=2)
+    assert set(map_data.region(TERRAIN, *rect).tobytes()) == {BUILDING}
+
+def test_regenerate_relabels_blocks_locally(city):
+    """Test the blocks after a region re-run match labelling the whole map again."""
+    generator, map_data = city
+    generator.regenerate(map_data, Rect(50, 40, 40, 30), margin=2, variant=1)
+    blocks, _ = generator.find_blocks(map_data)
+    assert (sorted((block.bounds, block.size) for block in generator.blocks)
+            == sorted((block.bounds, block.size) for block in blocks))
+    for i, lot in enumerate(generator.lots):
+        assert not any(lot.intersects(other) for other in generator.lots[i + 1:])
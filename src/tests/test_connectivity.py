@@ -0,0 +1,116 @@
+import pytest
+import os
+import random
+import sys
+from collections import deque
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.cellular import CellularAutomataGenerator
+from model.connectivity import carve_tunnel, connect, is_connected, label, plan_tunnels
+from model.map_data import MapData, Rect, WALLS, OPEN, SOLID
+
+def flood_regions(cells, width, height):
+    """BFS flood fill used as the oracle: sorted region sizes."""
+    seen = bytearray(len(cells))
+    sizes = []
+    for start in range(len(cells)):
+        if cells[start] != OPEN or seen[start]:
+            continue
+        seen[start] = 1
+        queue = deque([start])
+        size = 0
+        while queue:
+            cell = queue.popleft()
+            size += 1
+            x, y = cell % width, cell // width
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                n = ny * width + nx
+                if 0 <= nx < width and 0 <= ny < height and cells[n] == OPEN and not seen[n]:
+                    seen[n] = 1
+                    queue.append(n)
+        sizes.append(size)
+    return sorted(sizes)
+
+@pytest.fixture
+def rooms():
+    """Fixture providing a solid map with two separate rooms."""
+    map_data = MapData(20, 10)
+    map_data.fill(WALLS, SOLID)
+    map_data.fill(WALLS, OPEN, 1, 1, 4, 3)
+    map_data.fill(WALLS, OPEN, 12, 5, 6, 4)
+    return map_data
+
+def test_regions_and_bounds(rooms):
+    """Test region sizes, bounding boxes and the label image."""
+    regions, image = label(rooms, labels=True)
+    assert [(r.label, r.size, r.bounds) for r in regions] == [
+        (1, 12, Rect(1, 1, 4, 3)), (2, 24, Rect(12, 5, 6, 4))]
+    assert image[2 * 20 + 3] == 1 and image[6 * 20 + 13] == 2 and image[0] == 0
+    assert regions[0].anchor == (1, 1)
+
+def test_u_shape_merges():
+    """Test that runs joined only further down end up in one region."""
+    map_data = MapData(5, 4)
+    map_data.fill(WALLS, SOLID)
+    for x, y in ((0, 0), (0, 1), (0, 2), (4, 0), (4, 1), (4, 2)):
+        map_data.set(WALLS, x, y, OPEN)
+    map_data.fill(WALLS, OPEN, 0, 3, 5, 1)
+    regions, _ = label(map_data)
+    assert [r.size for r in regions] == [11]
+
+def test_matches_flood_fill():
+    """Test labelling random grids against a BFS flood fill."""
+    rng = random.Random(7)
+    for _ in range(5):
+        map_data = MapData(23, 17)
+        walls = map_data.layer(WALLS)
+        for i in range(len(walls)):
+            walls[i] = SOLID if rng.random() < 0.45 else OPEN
+        regions, _ = label(map_data)
+        assert sorted(r.size for r in regions) == flood_regions(walls, 23, 17)
+
+def test_connect_joins_everything(rooms):
+    """Test that carved tunnels leave a single region."""
+    rooms.fill(WALLS, OPEN, 8, 1, 2, 2)
+    tunnels = connect(rooms)
+    assert len(tunnels) == 2
+    assert is_connected(rooms)
+
+def test_connect_fills_small_regions(rooms):
+    """Test that pockets below min_size are filled rather than joined."""
+    rooms.set(WALLS, 9, 1, OPEN)
+    assert len(connect(rooms, min_size=2)) == 1
+    assert rooms.get(WALLS, 9, 1) == SOLID
+    assert is_connected(rooms)
+
+def test_plan_tunnels_is_spanning():
+    """Test that n regions need exactly n - 1 tunnels."""
+    map_data = MapData(30, 3)
+    map_data.fill(WALLS, SOLID)
+    for x in range(1, 30, 4):
+        map_data.set(WALLS, x, 1, OPEN)
+    regions, _ = label(map_data)
+    assert len(plan_tunnels(regions)) == len(regions) - 1
+
+def test_plan_tunnels_joins_distant_clusters():
+    """Test that clusters further apart than the nearest-neighbour limit still get joined."""
+    map_data = MapData(80, 6)
+    map_data.fill(WALLS, SOLID)
+    for x in list(range(1, 20, 2)) + list(range(61, 80, 2)):
+        map_data.set(WALLS, x, 1, OPEN)
+        map_data.set(WALLS, x, 4, OPEN)
+    regions, _ = label(map_data)
+    tunnels = plan_tunnels(regions, nearest=2)
+    assert len(tunnels) == len(regions) - 1
+    for start, end in tunnels:
+        carve_tunnel(map_data, start, end)
+    assert is_connected(map_data)
+
+def test_connected_caves():
+    """Test the cellular-automata generator's connected option."""
+    generator = CellularAutomataGenerator(seed=3, connected=True)
+    map_data = generator.generate(96, 96)
+    assert is_connected(map_data)
+    assert generator.tunnels
@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.drunkard import DrunkardsWalkGenerator, walk, walk_chunk
+from model.connectivity import label
+from model.map_data import Rect, WALLS, OPEN, SOLID
+
+def test_walk_tracks_fill_incrementally():
+    """Test that the running open-cell count matches the buffer."""
+    walls = bytearray([SOLID]) * (30 * 20)
+    carved = walk(walls, 30, 20, [10 * 30 + 15] * 4, 150, random.Random(1), 10_000)
+    assert carved == walls.count(OPEN)
+    assert carved >= 150
+
+def test_walkers_stay_inside_border():
+    """Test that walkers never carve the outer ring of a chunk."""
+    walls = bytearray(walk_chunk(0, 0, 0, 24, 24, 16, 0.6, ports=(False,) * 4))
+    for i in range(24):
+        assert walls[i] == SOLID and walls[23 * 24 + i] == SOLID
+        assert walls[i * 24] == SOLID and walls[i * 24 + 23] == SOLID
+
+def test_fill_ratio_is_reached():
+    """Test that each chunk stops at the requested fill ratio."""
+    map_data = DrunkardsWalkGenerator(seed=4, fill_ratio=0.3, chunk_size=64).generate(128, 64)
+    open_cells = map_data.layer(WALLS).count(OPEN)
+    assert 0.3 * 2 * 62 * 62 <= open_cells < 0.35 * map_data.size
+
+def test_ports_join_neighbouring_chunks():
+    """Test that shared chunk edges are opened at their midpoints."""
+    map_data = DrunkardsWalkGenerator(seed=2, chunk_size=32).generate(64, 32)
+    assert map_data.get(WALLS, 31, 16) == OPEN
+    assert map_data.get(WALLS, 32, 16) == OPEN
+
+def test_same_result_for_any_worker_count():
+    """Test that chunk seeds make output independent of parallelism."""
+    serial = DrunkardsWalkGenerator(seed=8, chunk_size=32, workers=1).generate(96, 64)
+    parallel = DrunkardsWalkGenerator(seed=8, chunk_size=32, workers=2).generate(96, 64)
+    assert serial.layer(WALLS) == parallel.layer(WALLS)
+
+def test_regenerate_joins_surrounding_caves():
+    """Test a region re-run stays in its window and carves from the caves around it."""
+    generator = DrunkardsWalkGenerator(seed=4, fill_ratio=0.4, chunk_size=64)
+    map_data = generator.generate(64, 48)
+    before = map_data.layer(WALLS)[:]
+    rect = Rect(20, 14, 16, 12)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    after = map_data.layer(WALLS)
+    window = rect.expand(2)
+    changed = [(i % 64, i // 64) for i in range(64 * 48) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    assert len(label(map_data)[0]) == len(label(generator.generate(64, 48))[0])
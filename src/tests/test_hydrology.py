@@ -0,0 +1,185 @@
+import pytest
+import os
+import random
+import sys
+from array import array
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model import hydrology, packed
+from model.hydrology import (Hydrology, HydrologyGenerator, OUTLET, DRY, LAKE, RIVER,
+                             classify_water, flow_accumulation, priority_flood)
+from model.map_data import MapData, Rect, HEIGHT, WATER
+
+def naive_fill(heights, width, height):
+    """Repeatedly lower water from +inf until stable; the slow reference fill."""
+    big = 1 << 30
+    water = [heights[i] if x in (0, width - 1) or y in (0, height - 1) else big
+             for i, (x, y) in enumerate((i % width, i // width) for i in range(width * height))]
+    changed = True
+    while changed:
+        changed = False
+        for y in range(1, height - 1):
+            for x in range(1, width - 1):
+                i = y * width + x
+                lowest = min(water[(y + dy) * width + x + dx]
+                             for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy)
+                level = max(heights[i], lowest)
+                if level < water[i]:
+                    water[i] = level
+                    changed = True
+    return water
+
+def unpadded(values, width, height):
+    """Drop the one-cell border from a padded array."""
+    stride = width + 2
+    return [values[(y + 1) * stride + 1 + x] for y in range(height) for x in range(width)]
+
+@pytest.fixture
+def bowl():
+    """Fixture providing a heightmap with a closed pit in the middle."""
+    width, height = 7, 7
+    heights = array("H", [50] * (width * height))
+    for y in range(2, 5):
+        for x in range(2, 5):
+            heights[y * width + x] = 10
+    heights[3 * width + 5] = heights[3 * width + 6] = 20
+    return heights, width, height
+
+def test_fill_matches_naive(bowl):
+    """Test depression filling against the naive iteration."""
+    heights, width, height = bowl
+    filled, _, _ = priority_flood(heights, width, height)
+    assert unpadded(filled, width, height) == naive_fill(heights, width, height)
+    rng = random.Random(5)
+    for _ in range(5):
+        noise = array("H", (rng.randrange(100) for _ in range(12 * 9)))
+        filled, _, _ = priority_flood(noise, 12, 9)
+        assert unpadded(filled, 12, 9) == naive_fill(noise, 12, 9)
+
+def test_every_cell_drains_off_the_map(bowl):
+    """Test that following flow directions always reaches an outlet downhill."""
+    heights, width, height = bowl
+    filled, directions, order = priority_flood(heights, width, height)
+    offsets = packed.neighbour_offsets(width + 2)
+    assert len(order) == width * height
+    for cell in order:
+        steps = 0
+        while directions[cell] != OUTLET:
+            nxt = cell + offsets[directions[cell]]
+            assert filled[nxt] <= filled[cell]
+            cell = nxt
+            steps += 1
+            assert steps <= width * height
+
+def test_accumulation_conserves_cells(bowl):
+    """Test that outlets together drain every cell exactly once."""
+    heights, width, height = bowl
+    filled, directions, order = priority_flood(heights, width, height)
+    accumulation = flow_accumulation(directions, order, width + 2)
+    assert sum(accumulation[c] for c in order if directions[c] == OUTLET) == width * height
+    assert min(accumulation[c] for c in order) == 1
+
+def test_water_layer(bowl):
+    """Test that the filled pit becomes a lake and the spill path carries a river."""
+    heights, width, height = bowl
+    map_data = MapData(width, height)
+    map_data.add_layer(HEIGHT, "H")[:] = heights
+    hydrology = Hydrology(river_threshold=9, lake_depth=5)
+    water = hydrology.apply(map_data).layer(WATER)
+    assert water[3 * width + 3] == LAKE
+    assert water[3 * width + 5] == RIVER
+    assert hydrology.filled[3 * width + 3] == 20
+
+def test_packed_water_matches_per_cell_rule(monkeypatch):
+    """Test the lane-packed classification, across block edges and with signed heights."""
+    monkeypatch.setattr("model.hydrology.WATER_BLOCK", 64)
+    rng = random.Random(8)
+    heights = array("h", (rng.randrange(-30000, 30000) for _ in range(500)))
+    filled = array("h", (h + rng.choice((0, 3, 40)) for h in heights))
+    accumulation = array("I", (rng.randrange(20) for _ in range(500)))
+    expected = bytes(LAKE if f - h >= 10 else RIVER if a >= 12 else DRY
+                     for f, h, a in zip(filled, heights, accumulation))
+    assert bytes(classify_water(filled, heights, accumulation, 12, 10)) == expected
+
+def test_rejects_float_heights():
+    """Test that the bucket queue requires integer heights."""
+    with pytest.raises(ValueError):
+        priority_flood(array("f", [0.0] * 9), 3, 3)
+
+def test_generator():
+    """Test the terrain-plus-hydrology generator end to end."""
+    map_data = HydrologyGenerator(seed=2).generate(64, 48)
+    water = map_data.layer(WATER)
+    assert len(water) == 64 * 48 and water.count(RIVER) > 0
+
+def drained_counts(hydrology, width, height):
+    """Follow every cell's flow downhill to the map edge, counting the cells through each."""
+    steps = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+    offsets = packed.neighbour_offsets(width)
+    counts = [0] * (width * height)
+    for cell in range(width * height):
+        for _ in range(width * height):
+            counts[cell] += 1
+            code = hydrology.directions[cell]
+            x, y = cell % width, cell // width
+            if code == OUTLET:
+                assert x in (0, width - 1) or y in (0, height - 1)
+                break
+            nxt = cell + offsets[code]
+            assert abs(nxt % width - x) <= 1 and 0 <= nxt < width * height
+            assert hydrology.filled[nxt] <= hydrology.filled[cell]
+            cell = nxt
+        else:
+            pytest.fail("flow directions form a cycle")
+    return counts
+
+def test_bands_match_whole_map():
+    """Test banded flooding fills like one flood and drains every cell off the map."""
+    rng = random.Random(7)
+    for _ in range(40):
+        width, height = rng.randrange(1, 14), rng.randrange(1, 14)
+        heights = array("H", (rng.randrange(rng.choice((3, 100))) for _ in range(width * height)))
+        map_data = MapData(width, height)
+        map_data.add_layer(HEIGHT, "H")[:] = heights
+        hydrology = Hydrology(river_threshold=4, band=rng.randrange(1, 5))
+        hydrology.apply(map_data)
+        filled, _, _ = priority_flood(heights, width, height)
+        assert list(hydrology.filled) == unpadded(filled, width, height)
+        assert list(hydrology.accumulation) == drained_counts(hydrology, width, height)
+
+def test_bands_independent_of_worker_count():
+    """Test the same heights drain the same way for any number of workers."""
+    map_data = HydrologyGenerator(seed=4, band=16).generate(64, 48)
+    serial = Hydrology(band=16).apply(map_data.copy())
+    parallel = Hydrology(band=16, workers=2).apply(map_data.copy())
+    assert parallel.layer(WATER) == serial.layer(WATER) == map_data.layer(WATER)
+
+def test_regenerate_reuses_untouched_bands(monkeypatch):
+    """Test a windowed pass floods only the bands it touches and matches a fresh pass."""
+    generator = HydrologyGenerator(seed=3, band=8)
+    map_data = generator.generate(48, 40)
+    flooded = []
+    flood = hydrology._flood
+    monkeypatch.setattr(hydrology, "_flood", lambda *task: flooded.append(task[3]) or flood(*task))
+    generator.regenerate(map_data, Rect(16, 12, 12, 6), margin=2, variant=1)
+    assert flooded == [8, 16]
+    fresh = Hydrology(band=8)
+    expected = fresh.apply(map_data.copy()).layer(WATER)
+    assert map_data.layer(WATER) == expected
+    assert generator.hydrology.accumulation == fresh.accumulation
+
+def test_regenerate_redrains_whole_map():
+    """Test new terrain stays in the window while water matches a fresh pass."""
+    generator = HydrologyGenerator(seed=3)
+    map_data = generator.generate(48, 40)
+    before = map_data.layer(HEIGHT)[:]
+    rect = Rect(16, 12, 12, 12)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    after = map_data.layer(HEIGHT)
+    window = rect.expand(2)
+    changed = [(i % 48, i // 48) for i in range(48 * 40) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    expected = Hydrology().apply(map_data.copy()).layer(WATER)
+    assert map_data.layer(WATER) == expected
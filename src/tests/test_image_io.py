@@ -0,0 +1,55 @@
+import pytest
+import os
+import struct
+import sys
+import zlib
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.image_io import decode_png, read_png, write_png, grey_levels, grey_pixels
+from model.map_data import MapData, WALLS
+
+def test_round_trip(tmp_path):
+    """Test that written PNGs read back pixel for pixel."""
+    pixels = [0xFF0000FF, 0x00FF00FF, 0x0000FF80, 0x00000000, 0x12345678, 0xFFFFFFFF]
+    path = tmp_path / "sample.png"
+    write_png(path, 3, 2, pixels)
+    assert read_png(path) == (3, 2, pixels)
+
+def test_rejects_non_png():
+    """Test that arbitrary bytes are rejected."""
+    with pytest.raises(ValueError):
+        decode_png(b"GIF89a")
+
+def test_decodes_filtered_rgb():
+    """Test decoding an RGB image that uses Sub, Up, Average and Paeth filters."""
+    rows = [bytes([1, 10, 20, 30, 5, 5, 5]),   # Sub
+            bytes([2, 1, 1, 1, 1, 1, 1]),      # Up
+            bytes([3, 2, 2, 2, 4, 4, 4]),      # Average
+            bytes([4, 0, 0, 0, 0, 0, 0])]      # Paeth
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+    data = (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", 2, 4, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows)))
+            + chunk(b"IEND", b""))
+    width, height, pixels = decode_png(data)
+    assert (width, height) == (2, 4)
+    assert pixels[0] == 0x0A141EFF
+    assert pixels[1] == 0x0F1923FF
+    assert pixels[2] == 0x0B151FFF
+    # Average: first pixel adds half of the pixel above.
+    assert pixels[4] == ((0x0B // 2 + 2) << 24 | (0x15 // 2 + 2) << 16 | (0x1F // 2 + 2) << 8 | 0xFF)
+    # Paeth with zero residuals copies the predictor.
+    assert pixels[6] == pixels[4]
+
+def test_grey_levels_picks_nonblank_layer():
+    """Test grey_levels skips blank layers and stretches small values to full range."""
+    map_data = MapData(2, 2)
+    map_data.add_layer(WALLS)
+    map_data.set(WALLS, 1, 0, 1)
+    name, levels = grey_levels(map_data)
+    assert name == WALLS
+    assert levels[0] == 0 and levels[1] == 255
+    assert grey_pixels(levels[:1]) == [0xFF]
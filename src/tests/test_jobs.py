@@ -0,0 +1,106 @@
+import pytest
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.cellular import CellularAutomataGenerator
+from model.jobs import Job, checkpoint, phase, progress, wait_for
+from model.noise import TerrainNoiseGenerator
+
+def counting(steps, delay=0.0):
+    """Job target reporting each of ``steps`` steps with a one-cell preview."""
+    for step in range(steps):
+        time.sleep(delay)
+        progress(step + 1, steps, lambda: step)
+    return steps
+
+def test_run_finishes_with_full_progress():
+    """Test a finished job holds the result and reports monotonic progress ending at 1."""
+    fractions = []
+    job = Job(counting, 10, on_progress=fractions.append, progress_interval=0)
+    assert job.run() == 10
+    assert job.state == Job.FINISHED and job.done
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+
+def test_previews_are_throttled():
+    """Test previews are built every tick at interval 0 and not at all when never due."""
+    previews = []
+    Job(counting, 5, on_preview=previews.append, preview_interval=0).run()
+    assert previews == [0, 1, 2, 3, 4]
+    job = Job(counting, 5, preview_interval=60)
+    job.run()
+    assert job.preview is None
+
+def test_phase_maps_progress_onto_span():
+    """Test nested phases report within their slice of the parent's progress."""
+    def staged():
+        with phase(0, 0.5):
+            progress(1, 2)
+        seen.append(job.fraction)
+        with phase(0.5, 1):
+            with phase(0, 0.5):
+                progress(1, 1)
+        seen.append(job.fraction)
+
+    seen = []
+    job = Job(staged)
+    job.run()
+    assert seen == [0.25, 0.75]
+
+def test_cancel_before_start():
+    """Test a job cancelled before it starts never runs its target."""
+    calls = []
+    job = Job(calls.append, 1)
+    job.cancel()
+    job.run()
+    assert job.state == Job.CANCELLED and calls == []
+
+def test_failure_is_captured():
+    """Test an exception in the target ends the job as failed, not in the caller."""
+    finished = []
+    job = Job(int, "not a number", on_finished=finished.append).start()
+    assert job.wait(5)
+    assert job.state == Job.FAILED and isinstance(job.error, ValueError)
+    assert finished == [job]
+
+def test_checkpoint_outside_job_is_noop():
+    """Test checkpoint and progress do nothing when no job is running."""
+    checkpoint()
+    progress(1, 2, lambda: pytest.fail("preview built outside a job"))
+
+def test_wait_for_checkpoints_while_waiting():
+    """Test waiting on a future is cancellable and returns its result otherwise."""
+    with ThreadPoolExecutor(1) as pool:
+        assert Job(wait_for, pool.submit(sum, [1, 2])).run() == 3
+        future = pool.submit(time.sleep, 0.3)
+        job = Job(wait_for, future).start()
+        time.sleep(0.05)
+        job.cancel()
+        assert job.wait(0.1)
+        assert job.state == Job.CANCELLED
+
+def test_job_matches_generate():
+    """Test a generator run as a job produces the same map as generate()."""
+    generator = CellularAutomataGenerator(seed=3)
+    expected = generator.generate(64, 48)
+    job = generator.job(64, 48).start()
+    assert job.wait(30)
+    assert job.result.to_bytes() == expected.to_bytes()
+
+def test_cancel_takes_effect_quickly():
+    """Test a cancelled noise job stops within 50 ms and checkpoints often."""
+    job = TerrainNoiseGenerator(seed=1).job(512, 512)
+    finished = []
+    job.on_finished = lambda job: finished.append(time.perf_counter())
+    job.start()
+    time.sleep(0.1)
+    cancelled = time.perf_counter()
+    job.cancel()
+    assert job.wait(5)
+    assert job.state == Job.CANCELLED
+    assert finished[0] - cancelled < 0.05
+    assert job.longest_gap < 0.05
@@ -0,0 +1,93 @@
+import pytest
+import os
+import random
+import sys
+from array import array
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.chunks import ChunkManager, WindowSource
+from model.lod import MipPyramid, WorldOverview, majority, maximum, mean
+from model.map_data import MapData, Rect, HEIGHT, TERRAIN, WALLS
+from model.noise import TerrainNoiseGenerator
+
+def naive_level(values, width, height, reducer):
+    """Halve a flat grid block by block; the slow reference."""
+    def at(x, y):
+        return values[min(y, height - 1) * width + min(x, width - 1)]
+    return [reducer(at(2 * x, 2 * y), at(2 * x + 1, 2 * y), at(2 * x, 2 * y + 1),
+                    at(2 * x + 1, 2 * y + 1))
+            for y in range((height + 1) // 2) for x in range((width + 1) // 2)]
+
+@pytest.fixture
+def map_data():
+    """Fixture providing an odd-sized map with random terrain, walls and heights."""
+    rng = random.Random(1)
+    map_data = MapData(13, 9)
+    map_data.layer(TERRAIN)[:] = array("B", (rng.randrange(4) for _ in range(13 * 9)))
+    map_data.layer(WALLS)[:] = array("B", (rng.random() < 0.2 for _ in range(13 * 9)))
+    map_data.add_layer(HEIGHT, "H")[:] = array("H", (rng.randrange(60000) for _ in range(13 * 9)))
+    return map_data
+
+def test_reducers():
+    """Test majority ties, maximum and mean on single blocks."""
+    assert majority(1, 2, 2, 3) == 2
+    assert majority(1, 2, 1, 2) == 1
+    assert majority(4, 5, 6, 7) == 4
+    assert majority(4, 5, 6, 6) == 6
+    assert maximum(0, 0, 1, 0) == 1
+    assert mean(65535, 65535, 65535, 65533) == 65534
+
+def test_levels_match_naive(map_data):
+    """Test every level against block-by-block halving, odd sides included."""
+    pyramid = MipPyramid(map_data)
+    assert [(level.width, level.height) for level in pyramid.levels] == [
+        (13, 9), (7, 5), (4, 3), (2, 2), (1, 1)]
+    for name, reducer in ((TERRAIN, majority), (WALLS, maximum), (HEIGHT, mean)):
+        for below, level in zip(pyramid.levels, pyramid.levels[1:]):
+            expected = naive_level(below.layer(name), below.width, below.height, reducer)
+            assert list(level.layer(name)) == expected
+    assert pyramid.level(2).layer(HEIGHT).typecode == "H"
+
+def test_update_matches_rebuild(map_data):
+    """Test incremental updates give the same pyramid as a full rebuild."""
+    pyramid = MipPyramid(map_data)
+    map_data.fill(TERRAIN, 3, 5, 2, 4, 3)
+    map_data.fill(HEIGHT, 9, 11, 8, 2, 1)
+    pyramid.update(Rect(5, 2, 4, 3))
+    pyramid.update(Rect(11, 8, 2, 1))
+    fresh = MipPyramid(map_data)
+    for level, expected in zip(pyramid.levels, fresh.levels):
+        assert all(level.layer(name) == expected.layer(name) for name in level.layer_names)
+
+def test_refresh_and_level_for(map_data):
+    """Test refresh rebuilds after untracked edits and level_for picks the finest fit."""
+    pyramid = MipPyramid(map_data, layers=(WALLS,))
+    map_data.fill(WALLS, 1)
+    pyramid.refresh()
+    assert set(pyramid.level(3).layer(WALLS)) == {1}
+    assert pyramid.level_for(8, 8).width == 7
+    assert pyramid.level_for(1, 1).width == 1
+    assert pyramid.level(1).layer_names == (WALLS,)
+
+def test_world_overview_follows_chunks():
+    """Test chunk thumbnails tile the overview and edits reach it."""
+    terrain = TerrainNoiseGenerator(seed=2)
+    overview = WorldOverview(Rect(-1, 0, 2, 2), 16, level=2)
+    manager = ChunkManager(WindowSource(terrain), 16, workers=0, overview=overview)
+    manager.get(-1, 0)
+    manager.get(0, 1)
+    manager.get(5, 5)
+    mosaic = overview.mosaic
+    assert (mosaic.width, mosaic.height) == (8, 8)
+    big = terrain.fill(terrain.new_map(32, 32), -16, 0)
+    expected = MipPyramid(big, layers=(HEIGHT,)).level(2)
+    assert list(mosaic.row(HEIGHT, 0)[:4]) == list(expected.row(HEIGHT, 0)[:4])
+    assert list(mosaic.row(HEIGHT, 5)[4:]) == list(expected.row(HEIGHT, 5)[4:])
+    assert set(mosaic.row(HEIGHT, 5)[:4]) == {0}
+
+    manager.get(-1, 0).fill(WALLS, 1)
+    manager.set_viewport(Rect(-16, 0, 16, 16))
+    assert set(mosaic.region(WALLS, 0, 0, 4, 4).tobytes()) == {1}
+    assert overview.level_for(2, 2).layer(WALLS)[0] == 1
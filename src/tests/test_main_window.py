@@ -0,0 +1,165 @@
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+import threading
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.jobs import Job, checkpoint
+from model.map_data import MapData
+
+
+class Signal:
+    """Stand-in for ``pyqtSignal``: emits straight to the connected slots."""
+
+    def __init__(self, *types):
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__.setdefault(self.name, BoundSignal())
+
+
+class BoundSignal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class QObject:
+    def __init__(self, parent=None):
+        self.parent = parent
+
+
+class QMainWindow(QObject):
+    def __init__(self):
+        super().__init__()
+        self.status_bar = Mock()
+        self.setCentralWidget = Mock()
+        self.setWindowTitle = Mock()
+
+    def statusBar(self):
+        return self.status_bar
+
+
+# Mock PyQt6 before importing the window, as in test_view.py
+qt_core = Mock(QObject=QObject, pyqtSignal=Signal)
+qt_widgets = Mock(QMainWindow=QMainWindow)
+for widget in ("QComboBox", "QSpinBox", "QPushButton", "QProgressBar", "QLabel"):
+    # A separate mock per widget, so the seed and size boxes differ.
+    getattr(qt_widgets, widget).side_effect = lambda *args: Mock()
+with patch.dict(sys.modules, {'PyQt6': Mock(), 'PyQt6.QtCore': qt_core,
+                              'PyQt6.QtGui': Mock(), 'PyQt6.QtWidgets': qt_widgets}):
+    from view.main_window import JobRunner, MainWindow
+
+
+class Blocking:
+    """Generator whose job waits at checkpoints until ``release`` is set."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.release = threading.Event()
+
+    def generate(self, width, height):
+        while not self.release.wait(0.005):
+            checkpoint()
+        return MapData(width, height)
+
+    def job(self, width, height):
+        return Job(self.generate, width, height)
+
+
+class Failing(Blocking):
+    def generate(self, width, height):
+        raise ValueError("bad size")
+
+
+@pytest.fixture
+def runner():
+    """Fixture providing a JobRunner recording its outcome signals in ``events``.
+
+    ``ended`` is set by each outcome; jobs call back from their own thread
+    after :meth:`Job.wait` has already returned.
+    """
+    runner = JobRunner()
+    runner.events = []
+    runner.ended = threading.Event()
+
+    def record(*event):
+        runner.events.append(event)
+        runner.ended.set()
+
+    runner.finished.connect(lambda map_data: record("finished", map_data))
+    runner.cancelled.connect(lambda: record("cancelled"))
+    runner.failed.connect(lambda message: record("failed", message))
+    return runner
+
+
+def test_runner_emits_finished(runner):
+    """Test a finished job emits its map once and the runner goes idle."""
+    generator = Blocking()
+    generator.release.set()
+    runner.start(generator, 8, 6)
+    assert runner.ended.wait(1)
+    assert [event[0] for event in runner.events] == ["finished"]
+    assert runner.events[0][1].width == 8
+    assert not runner.running
+
+
+def test_runner_cancel_and_failure(runner):
+    """Test cancelling emits ``cancelled`` and a failing generator emits its error."""
+    runner.start(Blocking(), 8, 6)
+    assert runner.running
+    runner.cancel()
+    assert runner.ended.wait(1)
+    runner.ended.clear()
+    runner.start(Failing(), 8, 6)
+    assert runner.ended.wait(1)
+    assert runner.events == [("cancelled",), ("failed", "ValueError: bad size")]
+
+
+def test_runner_drops_superseded_job(runner):
+    """Test starting a new job cancels the old one without relaying its signals."""
+    first = Blocking()
+    runner.start(first, 8, 6)
+    old = runner.job
+    second = Blocking()
+    second.release.set()
+    runner.start(second, 4, 4)
+    assert old.wait(1) and runner.ended.wait(1)
+    assert old.state == Job.CANCELLED
+    assert [(event[0], event[1].width) for event in runner.events] == [("finished", 4)]
+
+
+def test_window_wiring():
+    """Test the window starts the chosen generator and re-enables its buttons when done."""
+    generator = Blocking()
+    generator.release.set()
+    window = MainWindow({"caves": Mock(return_value=generator)}, size=32)
+    window.generator_box.currentText.return_value = "caves"
+    window.seed_box.value.return_value = 7
+    window.size_box.value.return_value = 32
+    window.show_map = Mock()
+    stopped = threading.Event()
+    on_stopped = window.on_stopped
+    window.on_stopped = lambda message: (on_stopped(message), stopped.set())
+    window.generate()
+    window.generators["caves"].assert_called_once_with(7)
+    window.generate_button.setEnabled.assert_any_call(False)
+    assert stopped.wait(1)
+    window.show_map.assert_called_once()
+    window.generate_button.setEnabled.assert_called_with(True)
+    window.cancel_button.setEnabled.assert_called_with(False)
+    assert window.statusBar().showMessage.call_args[0][0].startswith("Done in")
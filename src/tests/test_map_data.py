@@ -0,0 +1,105 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import MapData, Rect, DEFAULT_LAYERS, TERRAIN, WALLS
+
+@pytest.fixture
+def map_data():
+    """Fixture providing a small map with the default layers."""
+    return MapData(8, 6)
+
+def test_default_layers(map_data):
+    """Test that every default layer exists and costs one byte per cell."""
+    assert map_data.layer_names == DEFAULT_LAYERS
+    assert map_data.nbytes == 8 * 6 * len(DEFAULT_LAYERS)
+
+def test_get_set(map_data):
+    """Test O(1) cell access and bounds checking."""
+    map_data.set(TERRAIN, 3, 2, 7)
+    assert map_data.get(TERRAIN, 3, 2) == 7
+    assert map_data.layer(TERRAIN)[2 * 8 + 3] == 7
+    with pytest.raises(IndexError):
+        map_data.get(TERRAIN, 8, 0)
+
+def test_row_is_zero_copy(map_data):
+    """Test that writing through a row view updates the layer."""
+    row = map_data.row(WALLS, 4)
+    row[1] = 9
+    assert map_data.get(WALLS, 1, 4) == 9
+
+def test_region_view(map_data):
+    """Test region views, including clipping at the map edge."""
+    region = map_data.region(TERRAIN, 6, 4, 5, 5)
+    assert (region.width, region.height) == (2, 2)
+    region[1, 1] = 3
+    assert map_data.get(TERRAIN, 7, 5) == 3
+
+def test_fill_rectangle(map_data):
+    """Test bulk fills of partial and full-width rectangles."""
+    map_data.fill(WALLS, 1, 2, 1, 3, 2)
+    assert sum(map_data.layer(WALLS)) == 6
+    assert map_data.get(WALLS, 4, 2) == 1
+    assert map_data.get(WALLS, 5, 2) == 0
+    map_data.fill(WALLS, 2)
+    assert set(map_data.layer(WALLS)) == {2}
+
+def test_blit_between_maps(map_data):
+    """Test copying a region from another map."""
+    other = MapData(4, 4)
+    other.fill(TERRAIN, 5, 1, 1, 2, 2)
+    map_data.blit(TERRAIN, 5, 3, other.region(TERRAIN, 1, 1, 2, 2))
+    assert map_data.get(TERRAIN, 5, 3) == 5
+    assert map_data.get(TERRAIN, 6, 4) == 5
+    assert sum(map_data.layer(TERRAIN)) == 20
+
+def test_view_shape(map_data):
+    """Test the 2-D memoryview exported for buffer-protocol consumers."""
+    map_data.add_layer("height", "H", fill=300)
+    view = map_data.view("height")
+    assert view.shape == (6, 8)
+    assert view[5, 7] == 300
+
+def test_copy_is_independent(map_data):
+    """Test that copies do not share buffers."""
+    clone = map_data.copy()
+    clone.set(TERRAIN, 0, 0, 1)
+    assert map_data.get(TERRAIN, 0, 0) == 0
+
+def test_fill_column(map_data):
+    """Test single-column fills, which use a strided slice."""
+    map_data.fill(WALLS, 1, 3, 1, 1, 10)
+    assert [map_data.get(WALLS, 3, y) for y in range(6)] == [0, 1, 1, 1, 1, 1]
+    assert sum(map_data.layer(WALLS)) == 5
+
+def test_bytes_round_trip(map_data):
+    """Test serialising layers of mixed types and prop layers."""
+    map_data.add_layer("height", "H", fill=1000)
+    map_data.set(WALLS, 2, 3, 1)
+    map_data.add_prop_layer().append(1.5, 2.25, 4)
+    clone = MapData.from_bytes(map_data.to_bytes())
+    assert clone.layer_names == map_data.layer_names
+    assert all(clone.layer(name) == map_data.layer(name) for name in clone.layer_names)
+    assert list(clone.prop_layer()) == [(1.5, 2.25, 4)]
+    with pytest.raises(ValueError):
+        MapData.from_bytes(b"nonsense")
+
+def test_rect_helpers():
+    """Test Rect geometry helpers."""
+    room = Rect(2, 3, 4, 2)
+    assert (room.right, room.bottom, room.centre, room.area) == (6, 5, (4, 4), 8)
+    assert room.contains(5, 4) and not room.contains(6, 4)
+    assert room.intersects(Rect(5, 4, 3, 3))
+    assert not room.intersects(Rect(6, 3, 2, 2))
+    assert room.expand(1) == Rect(1, 2, 6, 4)
+
+def test_empty_region_fill(map_data):
+    """Test that regions clipped to nothing are empty in both directions."""
+    region = map_data.region(TERRAIN, 10, 2, 3, 3)
+    assert (region.width, region.height) == (0, 0)
+    region.fill(5)
+    assert region.tobytes() == b""
+    assert map_data.layer(TERRAIN).count(5) == 0
@@ -0,0 +1,84 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.bsp import BSPGenerator
+from model.map_data import MapData, WALLS, OPEN, SOLID
+from model.metrics import MapMetrics, map_metrics
+
+def solid_map(width, height):
+    """A map with every cell blocked."""
+    map_data = MapData(width, height)
+    map_data.fill(WALLS, SOLID)
+    return map_data
+
+@pytest.fixture
+def two_rooms():
+    """Fixture providing two 6x10 rooms joined by a 2-wide and a 3-wide corridor."""
+    map_data = solid_map(30, 12)
+    map_data.fill(WALLS, OPEN, 1, 1, 6, 10)
+    map_data.fill(WALLS, OPEN, 20, 1, 6, 10)
+    map_data.fill(WALLS, OPEN, 7, 2, 13, 2)
+    map_data.fill(WALLS, OPEN, 7, 6, 13, 3)
+    return map_data
+
+def test_rooms_and_corridors(two_rooms):
+    """Test rooms, corridor widths and the loop the two corridors make."""
+    metrics = map_metrics(two_rooms)
+    assert metrics.regions == 1 and metrics.connectivity == 1.0
+    assert metrics.rooms == 2 and metrics.room_sizes == {32: 2}
+    assert metrics.corridor_cells == 13 * 5
+    # Both cells across a 2-wide corridor are on the ridge.
+    assert metrics.corridor_widths == {2: 26, 3: 13}
+    assert metrics.loops == 1
+    assert metrics.max_clearance == 3
+
+def test_dead_end_and_chokepoint():
+    """Test a one-wide spur off a room is a dead end entered through a chokepoint."""
+    map_data = solid_map(12, 8)
+    map_data.fill(WALLS, OPEN, 1, 1, 5, 5)
+    map_data.fill(WALLS, OPEN, 6, 3, 5, 1)
+    metrics = map_metrics(map_data)
+    assert metrics.open_ratio == 30 / 96
+    assert metrics.rooms == 1 and metrics.corridor_cells == 5
+    assert metrics.dead_ends == 1 and metrics.dead_end_ratio == 0.2
+    assert metrics.chokepoints == 1
+    assert metrics.loops == 0
+
+def test_ring_is_one_loop():
+    """Test a corridor around a pillar counts as a loop and not as a room."""
+    map_data = solid_map(5, 5)
+    map_data.fill(WALLS, OPEN, 1, 1, 3, 3)
+    map_data.set(WALLS, 2, 2, SOLID)
+    metrics = map_metrics(map_data)
+    assert metrics.loops == 1 and metrics.rooms == 0
+    assert metrics.corridor_widths == {1: 8}
+
+def test_separate_regions():
+    """Test connectivity is the share of open cells in the largest region."""
+    map_data = solid_map(10, 3)
+    map_data.fill(WALLS, OPEN, 0, 1, 3, 1)
+    map_data.fill(WALLS, OPEN, 5, 1, 5, 1)
+    metrics = map_metrics(map_data)
+    assert metrics.regions == 2
+    assert metrics.connectivity == 5 / 8
+    assert metrics.dead_ends == 4
+
+def test_blocked_map():
+    """Test a map with no open cells yields empty metrics."""
+    assert map_metrics(solid_map(4, 4)) == MapMetrics()
+
+def test_bsp_rooms_counted():
+    """Test every BSP room is found, and nothing else."""
+    generator = BSPGenerator(seed=4)
+    metrics = map_metrics(generator.generate(128, 96))
+    assert metrics.rooms == len(generator.rooms)
+    assert metrics.regions == 1 and metrics.dead_ends == 0
+
+def test_json_round_trip(two_rooms):
+    """Test metrics survive JSON, histogram keys included."""
+    metrics = map_metrics(two_rooms)
+    assert MapMetrics.from_json(metrics.to_json()) == metrics
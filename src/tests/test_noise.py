@@ -0,0 +1,76 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import Rect, HEIGHT, MOISTURE
+from model.noise import GradientNoise, TerrainNoiseGenerator, quantise
+
+@pytest.fixture
+def noise():
+    """Fixture providing a three-octave noise field."""
+    return GradientNoise(seed=5, frequency=1 / 32, octaves=3, tile_size=64, cache_wavelength=16)
+
+def test_deterministic(noise):
+    """Test that the same seed gives the same values and another seed does not."""
+    values = noise.region(0, 0, 32, 8)
+    assert GradientNoise(seed=5, frequency=1 / 32, octaves=3).region(0, 0, 32, 8) == values
+    assert GradientNoise(seed=6, frequency=1 / 32, octaves=3).region(0, 0, 32, 8) != values
+
+def test_chunks_match_whole_region(noise):
+    """Test that chunks, including unaligned ones, are slices of one continuous field."""
+    whole = GradientNoise(seed=5, frequency=1 / 32, octaves=3).region(0, 0, 96, 96)
+    for cx, cy in ((0, 0), (1, 0), (2, 1)):
+        chunk = noise.chunk(cx, cy, 32)
+        for y in range(32):
+            start = (cy * 32 + y) * 96 + cx * 32
+            assert chunk[y * 32:(y + 1) * 32] == whole[start:start + 32]
+    offset = noise.region(20, 50, 40, 10)
+    assert offset[:40] == whole[50 * 96 + 20:50 * 96 + 60]
+
+def test_adjacent_chunks_share_octave_tiles(noise):
+    """Test that low-frequency octaves are evaluated once per tile, not per chunk."""
+    noise.chunk(0, 0, 32)
+    misses = noise.cache_misses
+    noise.chunk(1, 0, 32)
+    noise.chunk(0, 1, 32)
+    assert noise.cache_misses == misses
+    assert noise.cache_hits > 0
+
+def test_period_tiles():
+    """Test that a periodic field repeats in both directions."""
+    field = GradientNoise(seed=1, frequency=1 / 16, octaves=2, period=64)
+    values = field.region(0, 0, 128, 65)
+    assert values[:64] == values[64:128]
+    assert values[:128] == values[64 * 128:65 * 128]
+
+def test_quantise_clamps():
+    """Test mapping noise values onto integer levels."""
+    assert quantise([-2.0, -1.0, 0.0, 1.0, 3.0], 256) == [0, 0, 127, 255, 255]
+
+def test_terrain_layers():
+    """Test that the terrain generator writes 16-bit height and 8-bit moisture."""
+    map_data = TerrainNoiseGenerator(seed=2).generate(40, 30)
+    heights = map_data.layer(HEIGHT)
+    assert heights.typecode == "H" and len(heights) == 40 * 30
+    assert map_data.layer(MOISTURE).typecode == "B"
+    assert len(set(heights)) > 100
+
+def test_regenerate_blends_into_window():
+    """Test a region re-run changes only its window and fades in across the margin."""
+    generator = TerrainNoiseGenerator(seed=2)
+    map_data = generator.generate(40, 30)
+    before = map_data.layer(HEIGHT)[:]
+    rect = Rect(12, 8, 10, 8)
+    generator.regenerate(map_data, rect, margin=3, variant=1)
+    after = map_data.layer(HEIGHT)
+    window = rect.expand(3)
+    changed = [(i % 40, i // 40) for i in range(40 * 30) if before[i] != after[i]]
+    assert changed and all(window.contains(x, y) for x, y in changed)
+    # The cell next to the held ring has only moved a quarter of the way.
+    fresh = TerrainNoiseGenerator(seed=2).variant(1).generate(40, 30).layer(HEIGHT)
+    edge = 8 * 40 + window.x
+    assert abs(after[edge] - before[edge]) <= abs(fresh[edge] - before[edge]) / 4 + 1
+    assert after[12 * 40 + 17] == fresh[12 * 40 + 17]
@@ -0,0 +1,73 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.image_io import write_png
+from model.map_data import Rect, TERRAIN
+from model.overlapping import OverlappingModel, OverlappingWFCGenerator
+from model.tileset import EAST, SOUTH
+
+@pytest.fixture
+def stripes():
+    """Fixture with a 6x6 sample of vertical stripes two cells wide."""
+    return [(x // 2) % 2 for y in range(6) for x in range(6)]
+
+def test_patterns_are_deduplicated(stripes):
+    """Test that repeated windows collapse to one weighted pattern."""
+    model = OverlappingModel(stripes, 6, 6, size=2)
+    # Vertical stripes only produce the four horizontal phases.
+    assert len(model.patterns) == 4
+    assert sum(model.counts) == 36
+
+def test_adjacency_matches_overlaps(stripes):
+    """Test that compatibility is exactly overlap equality."""
+    model = OverlappingModel(stripes, 6, 6, size=2)
+    patterns = model.patterns
+    for a, first in enumerate(patterns):
+        for b, second in enumerate(patterns):
+            east = first[1] == second[0] and first[3] == second[2]
+            south = first[2:] == second[:2]
+            assert bool(model.tileset.compatible[EAST][a] >> b & 1) == east
+            assert bool(model.tileset.compatible[SOUTH][a] >> b & 1) == south
+
+def test_generated_map_resembles_sample(stripes):
+    """Test that output only contains 2x2 windows seen in the sample."""
+    model = OverlappingModel(stripes, 6, 6, size=2)
+    map_data = OverlappingWFCGenerator(model, seed=3).generate(12, 8)
+    terrain = map_data.layer(TERRAIN)
+    seen = set(model.patterns)
+    for y in range(7):
+        for x in range(11):
+            window = (terrain[y * 12 + x], terrain[y * 12 + x + 1],
+                      terrain[(y + 1) * 12 + x], terrain[(y + 1) * 12 + x + 1])
+            assert window in seen
+
+def test_from_png(tmp_path):
+    """Test building a model from a PNG sample with a palette."""
+    colours = [0x228B22FF, 0x8B4513FF]
+    path = tmp_path / "sample.png"
+    write_png(path, 4, 4, [colours[(x + y) % 2] for y in range(4) for x in range(4)])
+    model = OverlappingModel.from_png(path, size=2)
+    assert sorted(model.palette) == sorted(colours)
+    assert len(model.patterns) == 2
+
+def test_regenerate_matches_surroundings():
+    """Test a re-solved window only changes inside and every 3x3 window stays a pattern."""
+    sample = [(x // 3 + y // 2) % 3 for y in range(12) for x in range(12)]
+    model = OverlappingModel(sample, 12, 12, size=3)
+    generator = OverlappingWFCGenerator(model, seed=1)
+    map_data = generator.generate(30, 24)
+    before = map_data.layer(TERRAIN)[:]
+    rect = Rect(10, 8, 8, 6)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    terrain = map_data.layer(TERRAIN)
+    window = rect.expand(2)
+    assert all(window.contains(i % 30, i // 30) for i in range(30 * 24) if before[i] != terrain[i])
+    seen = set(model.patterns)
+    for y in range(22):
+        for x in range(28):
+            assert tuple(terrain[(y + dy) * 30 + x + dx]
+                         for dy in range(3) for dx in range(3)) in seen
@@ -0,0 +1,49 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model import packed
+
+@pytest.fixture
+def grid():
+    """Fixture with a 4x3 grid of 0/1 cells."""
+    return bytes([1, 0, 0, 1,
+                  0, 1, 1, 0,
+                  1, 1, 0, 0])
+
+def test_pad_round_trip(grid):
+    """Test that padding adds a border and unpad removes it."""
+    padded = packed.pad(grid, 4, 3, border=7)
+    assert len(padded) == 6 * 5
+    assert padded[:6] == bytes([7]) * 6
+    assert packed.unpad(padded, 4, 3) == grid
+
+def test_neighbour_sum_matches_loops(grid):
+    """Test the shifted-add counts against a direct count."""
+    length = 6 * 5
+    counts = packed.to_bytes(packed.neighbour_sum(packed.to_int(packed.pad(grid, 4, 3)), 6, length), length)
+    counts = packed.unpad(counts, 4, 3)
+    for y in range(3):
+        for x in range(4):
+            expected = sum(grid[ny * 4 + nx]
+                           for ny in range(y - 1, y + 2) for nx in range(x - 1, x + 2)
+                           if (nx, ny) != (x, y) and 0 <= nx < 4 and 0 <= ny < 3)
+            assert counts[y * 4 + x] == expected
+
+def test_neighbour_mask_bits(grid):
+    """Test that mask bits follow the clockwise offset order."""
+    length = 6 * 5
+    value = packed.neighbour_mask(packed.to_int(packed.pad(grid, 4, 3)), 6, length)
+    masks = packed.unpad(packed.to_bytes(value, length), 4, 3)
+    # Cell (1, 1): north-west (0, 0) is set, east (2, 1) is set, south-west (0, 2) and south (1, 2) are set.
+    assert masks[1 * 4 + 1] == 0b0000_0001 | 0b0000_1000 | 0b0100_0000 | 0b0010_0000
+
+def test_masks_cover_border_and_interior():
+    """Test that border and interior masks partition the padded grid."""
+    inside = packed.interior_mask(3, 2)
+    outside = packed.border_mask(3, 2)
+    assert inside & outside == 0
+    assert packed.to_bytes(inside | outside, 5 * 4) == b"\x01" * 20
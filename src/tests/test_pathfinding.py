@@ -0,0 +1,105 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import MapData, WALLS, OPEN, SOLID
+from model.pathfinding import PathFinder, SQRT2
+
+def path_cost(path):
+    """Length of a cell path with diagonal steps costing sqrt(2)."""
+    return sum(SQRT2 if a[0] != b[0] and a[1] != b[1] else 1 for a, b in zip(path, path[1:]))
+
+def assert_walkable(map_data, path):
+    """Check that a path only steps between adjacent open cells without cutting corners."""
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert max(abs(ax - bx), abs(ay - by)) == 1
+        assert map_data.get(WALLS, bx, by) == OPEN
+        if ax != bx and ay != by:
+            assert map_data.get(WALLS, bx, ay) == OPEN and map_data.get(WALLS, ax, by) == OPEN
+
+@pytest.fixture
+def wall_map():
+    """Fixture providing an open map split by a wall with a gap at the bottom."""
+    map_data = MapData(12, 8)
+    map_data.fill(WALLS, SOLID, 6, 0, 1, 7)
+    return map_data
+
+def test_astar_around_wall(wall_map):
+    """Test that A* routes through the gap."""
+    path = PathFinder(wall_map).astar((1, 1), (10, 1))
+    assert path[0] == (1, 1) and path[-1] == (10, 1)
+    assert (6, 7) in path
+    assert_walkable(wall_map, path)
+
+def test_four_connected(wall_map):
+    """Test 4-connected movement takes only orthogonal steps."""
+    path = PathFinder(wall_map, diagonal=False).astar((0, 0), (11, 0))
+    assert len(path) - 1 == 6 + 7 + 7 + 5
+    assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+
+def test_unreachable(wall_map):
+    """Test that blocked or cut-off goals return None."""
+    wall_map.set(WALLS, 6, 7, SOLID)
+    finder = PathFinder(wall_map)
+    assert finder.astar((1, 1), (10, 1)) is None
+    assert finder.jps((1, 1), (10, 1)) is None
+    assert finder.astar((1, 1), (6, 3)) is None
+
+def test_jps_matches_astar():
+    """Test that JPS and distance fields find A*-optimal paths on random grids."""
+    rng = random.Random(3)
+    for _ in range(40):
+        map_data = MapData(20, 15)
+        walls = map_data.layer(WALLS)
+        for i in range(len(walls)):
+            walls[i] = SOLID if rng.random() < 0.3 else OPEN
+        map_data.touch()
+        finder = PathFinder(map_data)
+        start = (rng.randrange(20), rng.randrange(15))
+        goal = (rng.randrange(20), rng.randrange(15))
+        expected = finder.astar(start, goal)
+        found = finder.jps(start, goal)
+        if expected is None:
+            assert found is None
+            continue
+        assert_walkable(map_data, found)
+        assert (found[0], found[-1]) == (start, goal)
+        assert path_cost(found) == pytest.approx(path_cost(expected))
+        field = finder.distance_field([goal])
+        assert field.distance(*start) == pytest.approx(path_cost(expected))
+        assert path_cost(field.path(*start)) == pytest.approx(path_cost(expected))
+
+def test_distance_field_cached_per_revision(wall_map):
+    """Test that fields are reused until the map is edited."""
+    finder = PathFinder(wall_map)
+    field = finder.distance_field([(10, 1)])
+    assert finder.distance_field([(10, 1)]) is field
+    wall_map.set(WALLS, 6, 7, SOLID)
+    fresh = finder.distance_field([(10, 1)])
+    assert fresh is not field
+    assert fresh.distance(1, 1) == float("inf")
+
+def test_multiple_goals(wall_map):
+    """Test that a field measures the distance to the nearest goal."""
+    field = PathFinder(wall_map, diagonal=False).distance_field([(0, 0), (11, 0)])
+    assert field.distance(2, 0) == 2
+    assert field.distance(9, 0) == 2
+    assert field.path(2, 0)[-1] == (0, 0)
+
+def test_farthest_cell(wall_map):
+    """Test the farthest reachable cell of a field lies behind the wall, top right."""
+    field = PathFinder(wall_map, diagonal=False).distance_field([(0, 0)])
+    assert field.farthest() == ((11, 0), 25.0)
+
+def test_revision_counts_edits():
+    """Test that MapData edits bump the revision."""
+    map_data = MapData(4, 4)
+    revision = map_data.revision
+    map_data.set(WALLS, 0, 0, SOLID)
+    map_data.fill(WALLS, OPEN)
+    map_data.touch()
+    assert map_data.revision == revision + 3
@@ -0,0 +1,202 @@
+import pytest
+import os
+import sys
+from array import array
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import Rect, BIOME, HEIGHT, LIGHTING, PROPS, TERRAIN, WATER, WALLS
+from model.pipeline import Pipeline, Stage, lighting_stage, standard_stages
+from model.tileset import Tileset
+
+@pytest.fixture
+def calls():
+    """Fixture recording which stages actually ran."""
+    return []
+
+@pytest.fixture
+def pipeline(calls):
+    """Fixture providing a three-stage pipeline with one independent stage."""
+    def raise_ground(map_data, seed, level=3):
+        calls.append("ground")
+        map_data.add_layer(HEIGHT, "H", fill=level)
+
+    def flood(map_data, seed):
+        calls.append("water")
+        map_data.add_layer(WATER, fill=map_data.get(HEIGHT, 0, 0) + 1)
+
+    def walls(map_data, seed, value=1):
+        calls.append("walls")
+        map_data.fill(WALLS, value)
+
+    return Pipeline([
+        Stage("ground", raise_ground, (), (HEIGHT,), {"level": 3}),
+        Stage("water", flood, (HEIGHT,), (WATER,)),
+        Stage("walls", walls, (), (WALLS,)),
+    ], seed=1)
+
+def test_cached_run_restores_outputs(pipeline, calls):
+    """Test a second identical run restores every layer from the cache."""
+    first = pipeline.generate(6, 4)
+    second = pipeline.generate(6, 4)
+    assert calls == ["ground", "water", "walls"]
+    assert all(stage.cached for stage in pipeline.report.stages)
+    for name in (HEIGHT, WATER, WALLS):
+        assert second.layer(name) == first.layer(name)
+
+def test_changed_params_rerun_dependants_only(pipeline, calls):
+    """Test a parameter change re-runs that stage and the stages reading its outputs."""
+    pipeline.generate(6, 4)
+    del calls[:]
+    pipeline.configure("ground", level=5)
+    map_data = pipeline.generate(6, 4)
+    assert calls == ["ground", "water"]
+    assert map_data.get(WATER, 0, 0) == 6
+    assert [stage.cached for stage in pipeline.report.stages] == [False, False, True]
+
+def test_keys_cover_seed_and_size(pipeline, calls):
+    """Test a different seed or map size misses the cache."""
+    pipeline.generate(6, 4)
+    pipeline.generate(6, 5)
+    pipeline.seed = 2
+    pipeline.generate(6, 4)
+    assert calls.count("walls") == 3
+
+def test_cache_is_bounded(pipeline):
+    """Test old stage outputs are dropped to stay within the byte budget."""
+    pipeline.cache_bytes = 100
+    for level in range(5):
+        pipeline.configure("ground", level=level)
+        pipeline.generate(8, 8)
+    assert pipeline._cached_bytes <= 100 or len(pipeline._cache) == 1
+
+def test_report(pipeline):
+    """Test the run report lists every stage with its timing."""
+    pipeline.generate(6, 4)
+    text = str(pipeline.report)
+    assert [stage.name for stage in pipeline.report.stages] == ["ground", "water", "walls"]
+    assert "total" in text and "run" in text
+    assert pipeline.report.seconds >= 0
+
+def test_invalid_pipelines():
+    """Test missing inputs and duplicate stage names are rejected."""
+    with pytest.raises(ValueError):
+        Pipeline([Stage("water", lambda map_data, seed: None, (HEIGHT,), (WATER,))])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", print), Stage("a", print)])
+
+def test_standard_pipeline_reruns_props_only():
+    """Test the outdoor chain re-runs only the props stage for a new prop density."""
+    edges = [(a, b, c, d) for a in "gr" for b in "gr" for c in "gr" for d in "gr"]
+    pipeline = Pipeline(standard_stages(Tileset.from_edges(edges), props={"r_min": 3.0}), seed=2)
+    first = pipeline.generate(48, 40)
+    assert [stage.name for stage in pipeline.report.stages] == [
+        "noise", "biomes", "hydrology", "detail", "props", "lighting"]
+    pipeline.configure("props", r_min=5.0)
+    second = pipeline.generate(48, 40)
+    assert [stage.name for stage in pipeline.report.stages if not stage.cached] == ["props"]
+    assert len(second.prop_layer()) < len(first.prop_layer())
+    assert second.layer(LIGHTING) == first.layer(LIGHTING)
+    assert second.has_layer(PROPS)
+
+@pytest.fixture
+def regions(calls):
+    """Fixture providing ground (with a region function) -> water -> walls."""
+    def ground(map_data, seed):
+        calls.append("ground")
+        map_data.add_layer(HEIGHT, "H", fill=1)
+
+    def ground_region(map_data, seed, rect, margin, keep, variant):
+        calls.append("ground-region")
+        map_data.fill(HEIGHT, 9 + variant, *rect)
+
+    def flood(map_data, seed):
+        calls.append("water")
+        map_data.add_layer(WATER)[:] = array("B", map_data.layer(HEIGHT))
+
+    def walls(map_data, seed):
+        calls.append("walls")
+        map_data.fill(WALLS, 1)
+
+    return Pipeline([Stage("ground", ground, (), (HEIGHT,), region=ground_region),
+                     Stage("water", flood, (HEIGHT,), (WATER,)),
+                     Stage("walls", walls, (), (WALLS,))])
+
+def test_regenerate_skips_unchanged_stages(regions, calls):
+    """Test region stages redo the window, dependants re-run and independent stages are skipped."""
+    map_data = regions.generate(6, 4)
+    regions.regenerate(map_data, Rect(1, 1, 2, 2), margin=0)
+    assert calls == ["ground", "water", "walls", "ground-region", "water"]
+    assert map_data.get(WATER, 1, 1) == 9 and map_data.get(WATER, 0, 0) == 1
+    assert [stage.cached for stage in regions.report.stages] == [False, False, True]
+
+def test_regenerate_restores_cached_stages(regions, calls):
+    """Test the same edit of the same map comes from the stage cache, region runs included."""
+    first = regions.generate(6, 4)
+    regions.regenerate(first, Rect(1, 1, 2, 2), margin=0, variant=1)
+    del calls[:]
+    second = regions.generate(6, 4)
+    regions.regenerate(second, Rect(1, 1, 2, 2), margin=0, variant=1)
+    assert calls == []
+    assert second.layer(WATER) == first.layer(WATER)
+    # A further edit starts from the edited map, not from generate's output.
+    regions.regenerate(second, Rect(4, 0, 1, 1), margin=0)
+    assert calls == ["ground-region", "water"]
+    assert second.get(WATER, 1, 1) == 10 and second.get(WATER, 4, 0) == 9
+
+def test_regenerate_grows_windows_to_upstream_changes(calls):
+    """Test a region stage's window covers what a global stage before it changed."""
+    def ground(map_data, seed):
+        map_data.add_layer(HEIGHT, "H", fill=1)
+
+    def ground_region(map_data, seed, rect, margin, keep, variant):
+        map_data.fill(HEIGHT, 9, *rect)
+
+    def flood(map_data, seed):
+        map_data.add_layer(WATER)[0] = max(map_data.layer(HEIGHT))
+
+    def mark_region(map_data, seed, rect, margin, keep, variant):
+        calls.append(rect)
+
+    pipeline = Pipeline([Stage("ground", ground, (), (HEIGHT,), region=ground_region),
+                         Stage("water", flood, (HEIGHT,), (WATER,)),
+                         Stage("mark", print, (WATER,), (WALLS,), region=mark_region)])
+    map_data = pipeline.generate(8, 6)
+    pipeline.regenerate(map_data, Rect(4, 3, 2, 2), margin=0)
+    assert calls == [Rect(0, 0, 6, 5)]
+
+def test_standard_pipeline_regenerates_window():
+    """Test the outdoor chain redoes heights and props inside a window only."""
+    edges = [(a, b, c, d) for a in "gr" for b in "gr" for c in "gr" for d in "gr"]
+    pipeline = Pipeline(standard_stages(Tileset.from_edges(edges), props={"r_min": 3.0}), seed=2)
+    map_data = pipeline.generate(48, 40)
+    before = map_data.copy()
+    rect = Rect(16, 12, 12, 10)
+    pipeline.regenerate(map_data, rect, margin=2, variant=1)
+    window = rect.expand(2)
+    for name in (HEIGHT, PROPS):
+        old, new = before.layer(name), map_data.layer(name)
+        changed = [(i % 48, i // 48) for i in range(48 * 40) if old[i] != new[i]]
+        assert changed and all(window.contains(x, y) for x, y in changed)
+    # Shading redone around the window matches shading the whole map.
+    shaded = map_data.copy()
+    lighting_stage(shaded, 2)
+    assert map_data.layer(LIGHTING) == shaded.layer(LIGHTING)
+
+def test_detail_follows_water_and_biomes():
+    """Test the detail stage keeps water tiles on water and each biome's tiles on its land."""
+    edges = [(a, b, c, d) for a in "gr" for b in "gr" for c in "gr" for d in "gr"]
+    names = ["".join(edge) for edge in edges]
+    detail = {"water_tiles": ["rrrr"], "biome_tiles": {0: [name for name in names if "g" in name]}}
+    pipeline = Pipeline(standard_stages(Tileset.from_edges(edges, names=names), detail=detail),
+                        seed=2)
+    map_data = pipeline.generate(48, 40)
+    for edit in (None, Rect(16, 12, 12, 10)):
+        if edit:
+            pipeline.regenerate(map_data, edit, margin=2, variant=1)
+        water, biomes, terrain = (map_data.layer(name) for name in (WATER, BIOME, TERRAIN))
+        wet = [terrain[i] for i in range(48 * 40) if water[i]]
+        assert wet and set(wet) == {names.index("rrrr")}
+        assert all(terrain[i] != names.index("rrrr")
+                   for i in range(48 * 40) if not water[i] and biomes[i] == 0)
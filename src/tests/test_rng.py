@@ -0,0 +1,59 @@
+import pytest
+import os
+import pickle
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.rng import Stream, derive, stream
+
+@pytest.fixture
+def rng():
+    """Fixture providing the stream for one chunk of one stage."""
+    return stream(7, "scatter", 2, 3)
+
+def test_same_key_same_stream(rng):
+    """Test a stream depends only on its key."""
+    other = stream(7, "scatter", 2, 3)
+    assert [rng.random() for _ in range(5)] == [other.random() for _ in range(5)]
+    assert rng.randbytes(32) == other.randbytes(32)
+
+def test_keys_are_independent():
+    """Test neighbouring keys give different streams."""
+    keys = [(7, "scatter", 2, 3), (7, "scatter", 3, 2), (7, "drunkard", 2, 3),
+            (8, "scatter", 2, 3), ("7", "scatter", 2, 3)]
+    assert len({derive(*key) for key in keys}) == len(keys)
+    assert len({stream(*key).randbytes(16) for key in keys}) == len(keys)
+
+def test_order_independent():
+    """Test drawing from one stream never shifts another."""
+    a = stream(1, "roads").split("lots").random()
+    roads = stream(1, "roads")
+    roads.random()
+    roads.randbytes(100)
+    assert roads.split("lots").random() == a
+    assert roads.split("lots").random() != roads.split("props").random()
+
+def test_randbytes_is_counter_based(rng):
+    """Test bulk bytes advance per call and match the counter block."""
+    first, second = rng.randbytes(64), rng.randbytes(64)
+    assert first != second and rng.counter == 2
+    again = stream(7, "scatter", 2, 3)
+    assert again.randbytes(16) == first[:16]
+
+def test_floats(rng):
+    """Test bulk floats are uniform-ish in [0, 1)."""
+    values = rng.floats(4000)
+    assert len(values) == 4000
+    assert all(0 <= value < 1 for value in values)
+    assert 0.45 < sum(values) / len(values) < 0.55
+
+def test_pickle_round_trip(rng):
+    """Test a pickled stream carries on exactly where it was."""
+    rng.random()
+    rng.randbytes(8)
+    copy = pickle.loads(pickle.dumps(rng))
+    assert isinstance(copy, Stream)
+    assert copy.random() == rng.random()
+    assert copy.randbytes(8) == rng.randbytes(8)
@@ -0,0 +1,93 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import MapData, Rect, PROPS
+from model.scatter import PoissonScatterGenerator, poisson_disk
+
+def spacing_violations(points):
+    """Count pairs closer than the larger of their radii (brute force)."""
+    bad = 0
+    for i, (x, y, r) in enumerate(points):
+        for px, py, pr in points[i + 1:]:
+            if (px - x) ** 2 + (py - y) ** 2 < max(r, pr) ** 2 - 1e-6:
+                bad += 1
+    return bad
+
+def test_minimum_spacing():
+    """Test that samples stay inside the bounds and keep their distance."""
+    points = poisson_disk(Rect(5, 5, 40, 30), 3.0, 3.0, random.Random(1))
+    assert len(points) > 60
+    assert all(5 <= x < 45 and 5 <= y < 35 for x, y, _ in points)
+    assert spacing_violations(points) == 0
+
+def test_density_controls_radius():
+    """Test that density 0 stays empty and denser areas pack points closer."""
+    width, height = 60, 20
+    density = bytearray(width * height)
+    for y in range(height):
+        density[y * width + 30:y * width + 60] = b"\xff" * 30
+        density[y * width + 10:y * width + 20] = b"\x01" * 10
+    points = poisson_disk(Rect(0, 0, width, height), 1.5, 5.0, random.Random(2),
+                          density=bytes(density))
+    assert spacing_violations(points) == 0
+    assert not any(x < 10 or 20 <= x < 30 for x, _, _ in points)
+    sparse = sum(1 for x, _, _ in points if x < 20)
+    dense = sum(1 for x, _, _ in points if x >= 30)
+    assert dense > 5 * sparse
+
+def test_existing_points_respected():
+    """Test that neighbouring points are avoided and not returned."""
+    existing = [(10.0, 10.0, 4.0)]
+    points = poisson_disk(Rect(8, 0, 20, 20), 4.0, 4.0, random.Random(3), existing=existing)
+    assert existing[0] not in points
+    assert spacing_violations(points + existing) == 0
+
+def test_chunks_have_no_seams():
+    """Test spacing across chunk borders and independence from worker count."""
+    map_data = MapData(96, 80)
+    generator = PoissonScatterGenerator(seed=4, r_min=3, chunk_size=16)
+    points, kinds = generator.scatter(map_data)
+    assert spacing_violations(points) == 0
+    parallel = PoissonScatterGenerator(seed=4, r_min=3, chunk_size=16, workers=2)
+    assert parallel.scatter(map_data) == (points, kinds)
+
+def test_prop_layer():
+    """Test that props land in a struct-of-arrays layer and the props grid."""
+    generator = PoissonScatterGenerator(seed=5, r_min=4, kinds=("tree", "rock"),
+                                        weights=[1, 1], chunk_size=16)
+    map_data = generator.generate(40, 40)
+    props = map_data.prop_layer()
+    assert len(props) > 20 and props.nbytes == 9 * len(props)
+    assert set(props.kinds) == {0, 1}
+    x, y, kind = next(iter(props))
+    assert map_data.get(PROPS, int(x), int(y)) == kind + 1
+    assert len(props.within(Rect(0, 0, 20, 20))) < len(props)
+    assert len(map_data.copy().prop_layer()) == len(props)
+
+def test_invalid_parameters():
+    """Test parameter validation."""
+    with pytest.raises(ValueError):
+        PoissonScatterGenerator(r_min=2, r_max=10, chunk_size=16)
+    with pytest.raises(ValueError):
+        poisson_disk(Rect(0, 0, 10, 10), 3, 2, random.Random())
+
+def test_regenerate_respects_props_outside():
+    """Test a region re-run only redraws props in its window and keeps clear of the rest."""
+    generator = PoissonScatterGenerator(seed=3, r_min=2.0, kinds=("tree", "rock"))
+    map_data = generator.generate(60, 40)
+    before = sorted(map_data.prop_layer())
+    rect = Rect(20, 10, 15, 12)
+    generator.regenerate(map_data, rect, margin=2, variant=1)
+    after = sorted(map_data.prop_layer())
+    window = rect.expand(2)
+    outside = lambda props: [p for p in props if not window.contains(int(p[0]), int(p[1]))]
+    assert outside(after) == outside(before)
+    assert after != before
+    assert spacing_violations([(x, y, 2.0) for x, y, _ in after]) == 0
+    cells = map_data.layer(PROPS)
+    assert sum(1 for value in cells if value) == len(set((int(x), int(y)) for x, y, _ in after))
@@ -0,0 +1,86 @@
+import pytest
+import os
+import sys
+from functools import partial
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.bsp import BSPGenerator
+from model.cellular import CellularAutomataGenerator
+from model.map_data import MapData, WALLS, OPEN, SOLID
+from model.metrics import map_metrics
+from model.seed_search import SeedSearch, measure
+
+@pytest.fixture
+def room_map():
+    """Fixture providing a 5x5 room with a four-cell dead-end corridor to the east."""
+    map_data = MapData(12, 8)
+    map_data.fill(WALLS, SOLID)
+    map_data.fill(WALLS, OPEN, 1, 1, 5, 5)
+    map_data.fill(WALLS, OPEN, 6, 3, 5, 1)
+    return map_data
+
+def test_measure_room_map(room_map):
+    """Test every metric on a map small enough to count by hand."""
+    metrics, failed = measure(room_map, entrances=[(1, 1), (10, 3)])
+    assert failed is None
+    assert metrics["open_ratio"] == 30 / 96
+    assert metrics["regions"] == 1 and metrics["connectivity"] == 1.0
+    assert metrics["rooms"] == 1
+    assert metrics["dead_ends"] == 1 and metrics["dead_end_ratio"] == 0.2
+    assert metrics["path_length"] == 11
+
+def test_path_length_without_entrances(room_map):
+    """Test the path length defaults to the longest route through the map."""
+    metrics, _ = measure(room_map)
+    assert metrics["path_length"] == 11
+
+def test_path_length_with_one_entrance(room_map):
+    """Test a single entrance falls back to the longest route through the map."""
+    metrics, failed = measure(room_map, entrances=[(1, 1)])
+    assert failed is None
+    assert metrics["path_length"] == 11
+
+def test_constraint_stops_measuring(room_map):
+    """Test a failed constraint is reported and later metrics are skipped."""
+    room_map.set(WALLS, 8, 3, SOLID)
+    metrics, failed = measure(room_map, constraints={"connectivity": (1.0, None)})
+    assert failed == "connectivity"
+    assert metrics["regions"] == 2
+    assert "rooms" not in metrics and "path_length" not in metrics
+
+def test_search_keeps_best_in_order():
+    """Test the search returns the top scores, best first, and can rebuild the winner."""
+    search = SeedSearch(BSPGenerator, 64, 64, top=3)
+    best = search.run(range(10))
+    assert len(best) == 3
+    assert [c.score for c in best] == sorted((c.score for c in best), reverse=True)
+    generator = BSPGenerator(best[0].seed)
+    map_data = generator.generate(64, 64)
+    assert best[0].metrics["rooms"] == map_metrics(map_data).rooms
+    assert search.generate(best[0]).to_bytes() == map_data.to_bytes()
+
+def test_measure_agrees_with_map_metrics():
+    """Test the search scores the same room and dead-end numbers stored with saved maps."""
+    map_data = CellularAutomataGenerator(seed=4).generate(96, 64)
+    metrics, _ = measure(map_data)
+    stored = map_metrics(map_data)
+    for name in ("open_ratio", "regions", "connectivity", "rooms", "dead_ends",
+                 "dead_end_ratio"):
+        assert metrics[name] == getattr(stored, name)
+
+def test_rejected_candidates_are_tallied():
+    """Test candidates failing a hard constraint are dropped and counted."""
+    search = SeedSearch(partial(CellularAutomataGenerator, connected=False), 48, 48, top=8,
+                        constraints={"connectivity": (1.0, None)})
+    best = search.run(range(8))
+    assert len(best) + sum(search.rejected.values()) == 8
+    assert set(search.rejected) <= {"connectivity"}
+    assert all(c.metrics["connectivity"] == 1.0 for c in best)
+
+def test_workers_match_serial():
+    """Test a process pool finds the same candidates as a serial search."""
+    serial = SeedSearch(BSPGenerator, 48, 48, top=4).run(range(8))
+    pooled = SeedSearch(BSPGenerator, 48, 48, top=4, workers=2).run(range(8))
+    assert [(c.seed, c.score) for c in pooled] == [(c.seed, c.score) for c in serial]
@@ -0,0 +1,91 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import MapData, WALLS
+from model.overlapping import OverlappingModel
+from model.store import WorldStore, CompiledTilesetRecord
+from model.wfc import WFCGenerator
+
+RULES = {
+    "tiles": [
+        {"name": "grass", "edges": ["g", "g", "g", "g"]},
+        {"name": "road", "symmetry": "I", "edges": ["g", "r", "g", "r"]},
+    ],
+}
+
+@pytest.fixture
+def store():
+    """Fixture to set up an in-memory store with one tileset."""
+    store = WorldStore(db_path=':memory:')
+    store.add_tileset("meadow", "forest", RULES)
+    yield store
+
+def test_get_tileset(store):
+    """Test looking a tileset up by name or biome."""
+    assert store.get_tileset("meadow").rules == RULES
+    assert store.get_tileset("forest").name == "meadow"
+    assert store.get_tileset("missing") is None
+
+def test_compiled_tileset_is_cached(store):
+    """Test that compiling stores the tables under the rules hash."""
+    compiled = store.load_compiled("forest")
+    record = store._session.get(CompiledTilesetRecord, compiled.content_hash)
+    assert record is not None
+    assert store.load_compiled("forest") is compiled
+
+def test_cache_hit_skips_compile(store, monkeypatch):
+    """Test that a fresh process-level cache loads from the stored bytes."""
+    compiled = store.load_compiled("forest")
+    store._compiled.clear()
+    monkeypatch.setattr("model.store.compile_tileset", lambda rules: pytest.fail("recompiled"))
+    assert store.load_compiled("forest").compatible == compiled.compatible
+
+def test_overlapping_model_warm_load(store, monkeypatch):
+    """Test that a cached overlapping model is rebuilt without re-extracting patterns."""
+    sample = [(x // 2 + y) % 3 for y in range(8) for x in range(8)]
+    cold = OverlappingModel(sample, 8, 8, size=2, store=store)
+    assert store._session.get(CompiledTilesetRecord, cold.tileset.content_hash) is not None
+    assert cold.content_hash(sample) != OverlappingModel(sample, 8, 8, size=3).content_hash(sample)
+    store._compiled.clear()
+    monkeypatch.setattr(OverlappingModel, "_extract", lambda self, sample: pytest.fail("re-extracted"))
+    warm = OverlappingModel(sample, 8, 8, size=2, store=store)
+    assert warm.patterns == cold.patterns
+    assert warm.counts == cold.counts
+    assert warm.tileset.compatible == cold.tileset.compatible
+
+def test_generator_from_store(store):
+    """Test building a WFC generator from a stored tileset."""
+    map_data = WFCGenerator.from_store(store, "forest", seed=3).generate(10, 10)
+    assert map_data.width == 10
+    with pytest.raises(KeyError):
+        WFCGenerator.from_store(store, "missing")
+
+def test_chunk_round_trip(store):
+    """Test chunks are stored per world and coordinates and can be replaced."""
+    chunk = MapData(4, 4)
+    chunk.set(WALLS, 1, 1, 1)
+    store.save_chunk("earth", -1, 2, chunk)
+    chunk.set(WALLS, 2, 2, 1)
+    store.save_chunk("earth", -1, 2, chunk)
+    loaded = store.load_chunk("earth", -1, 2)
+    assert loaded.layer(WALLS) == chunk.layer(WALLS)
+    assert store.load_chunk("mars", -1, 2) is None
+    assert store.load_chunk("earth", 2, -1) is None
+
+def test_map_saved_with_metrics(store):
+    """Test maps are stored with their metrics and can be filtered on them."""
+    open_map = MapData(8, 8)
+    walled = MapData(8, 8)
+    walled.fill(WALLS, 1, 4, 0, 1, 8)
+    first = store.save_map("open", open_map, generator="test", seed=1)
+    store.save_map("walled", walled)
+    assert store.load_map(first.id).to_bytes() == open_map.to_bytes()
+    assert store.get_map(first.id).metrics.rooms == 1
+    assert [r.name for r in store.find_maps(regions=(2, None))] == ["walled"]
+    assert [r.name for r in store.find_maps(open_ratio=(None, 1.0))] == ["open", "walled"]
+    assert store.find_maps(name="open", connectivity=(None, 0.5)) == []
+    assert store.load_map(99) is None
@@ -0,0 +1,71 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.tileset import (CompiledTileset, compile_tileset, rules_hash,
+                           build_alias_table, EAST, WEST, SOUTH)
+
+@pytest.fixture
+def road_rules():
+    """Fixture with edge-labelled road tiles in several symmetry classes."""
+    return {
+        "tiles": [
+            {"name": "grass", "weight": 4, "edges": ["g", "g", "g", "g"]},
+            {"name": "road", "symmetry": "I", "edges": ["g", "r", "g", "r"]},
+            {"name": "bend", "symmetry": "L", "edges": ["r", "r", "g", "g"]},
+            {"name": "cross", "symmetry": "F", "edges": ["r", "r", "r", "r"]},
+        ],
+    }
+
+def test_symmetry_expansion_and_dedup(road_rules):
+    """Test that symmetry classes expand to the right number of orientations."""
+    tileset = compile_tileset(road_rules)
+    # grass 1 + road 2 + bend 4 + cross (all 8 orientations identical) 1
+    assert tileset.size == 8
+    assert tileset.names[:4] == ("grass", "road", "road#1", "bend")
+
+def test_edges_define_compatibility(road_rules):
+    """Test that only matching edge labels are compatible."""
+    tileset = compile_tileset(road_rules)
+    grass, road = tileset.names.index("grass"), tileset.names.index("road")
+    assert not tileset.compatible[EAST][road] >> grass & 1
+    assert tileset.compatible[EAST][road] >> road & 1
+    assert tileset.compatible[SOUTH][road] >> grass & 1
+
+def test_neighbor_rules_follow_symmetry():
+    """Test that explicit neighbour rules are expanded over every orientation."""
+    rules = {
+        "tiles": [{"name": "wall", "symmetry": "I"}, {"name": "floor"}],
+        "neighbors": [["wall", "E", "wall"], ["wall", "N", "floor"]],
+    }
+    tileset = compile_tileset(rules)
+    wall, rotated, floor = 0, 1, 2
+    assert tileset.compatible[EAST][wall] == 1 << wall
+    assert tileset.compatible[WEST][wall] == 1 << wall
+    # The rotated wall runs north-south, so its east side faces the floor.
+    assert tileset.compatible[EAST][rotated] >> floor & 1
+
+def test_bytes_round_trip(road_rules):
+    """Test that serialised tilesets load back unchanged."""
+    tileset = compile_tileset(road_rules)
+    loaded = CompiledTileset.from_bytes(tileset.to_bytes())
+    assert loaded.compatible == tileset.compatible
+    assert loaded.weights == tileset.weights
+    assert loaded.names == tileset.names
+    assert loaded.content_hash == rules_hash(road_rules)
+
+def test_rules_hash_ignores_key_order(road_rules):
+    """Test that the cache key depends on content, not dict ordering."""
+    assert rules_hash(road_rules) == rules_hash(dict(reversed(list(road_rules.items()))))
+
+def test_alias_table_sampling():
+    """Test that alias sampling follows the tile weights."""
+    probability, alias = build_alias_table([1.0, 3.0])
+    tileset = CompiledTileset([1.0, 3.0], [[3, 3]] * 4, alias=(probability, alias))
+    rng = random.Random(0)
+    draws = [tileset.sample(rng) for _ in range(4000)]
+    assert 0.7 < draws.count(1) / len(draws) < 0.8
@@ -0,0 +1,122 @@
+import pytest
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from model.map_data import Rect, TERRAIN
+from model.tileset import Tileset, DIRECTIONS, EAST, SOUTH, WEST
+from model.wfc import WFCSolver, WFCGenerator, ContradictionError
+
+@pytest.fixture
+def road_tileset():
+    """Fixture with grass, horizontal road and vertical road tiles."""
+    # Edge labels: g = grass, r = road
+    edges = [
+        ("g", "g", "g", "g"),
+        ("g", "r", "g", "r"),
+        ("r", "g", "r", "g"),
+        ("r", "r", "r", "r"),
+    ]
+    return Tileset.from_edges(edges, weights=[4, 1, 1, 0.5])
+
+def assert_consistent(tileset, tiles, width, height):
+    for y in range(height):
+        for x in range(width):
+            tile = tiles[y * width + x]
+            for direction, (dx, dy) in enumerate(DIRECTIONS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    assert tileset.compatible[direction][tile] >> tiles[ny * width + nx] & 1
+
+def test_from_adjacency_mirrors_rules():
+    """Test that adjacency triples are mirrored into the opposite direction."""
+    tileset = Tileset.from_adjacency(2, [(0, EAST, 1)])
+    assert tileset.compatible[EAST][0] == 0b10
+    assert tileset.compatible[WEST][1] == 0b01
+
+def test_support_is_union_of_masks(road_tileset):
+    """Test that the support of a domain is the union of its tiles' masks."""
+    domain = 0b0011
+    expected = road_tileset.compatible[SOUTH][0] | road_tileset.compatible[SOUTH][1]
+    assert road_tileset.support(SOUTH, domain) == expected
+
+def test_solution_is_consistent(road_tileset):
+    """Test that every pair of neighbours in a solution is compatible."""
+    solver = WFCSolver(road_tileset, 24, 16, random.Random(1))
+    tiles = solver.solve()
+    assert len(tiles) == 24 * 16
+    assert_consistent(road_tileset, tiles, 24, 16)
+    assert solver.stats.collapses > 0
+
+def test_generator_is_seed_deterministic(road_tileset):
+    """Test that the same seed reproduces the same map."""
+    first = WFCGenerator(road_tileset, seed=7).generate(20, 20)
+    second = WFCGenerator(road_tileset, seed=7).generate(20, 20)
+    assert first.layer(TERRAIN) == second.layer(TERRAIN)
+
+def test_unsatisfiable_tileset_raises():
+    """Test that an impossible tileset reports a contradiction."""
+    # Nothing may sit east of tile 1 or west of tile 0, so a middle cell has no option.
+    tileset = Tileset.from_adjacency(2, [(0, SOUTH, 0), (1, SOUTH, 1), (0, EAST, 1)])
+    solver = WFCSolver(tileset, 3, 1, max_restarts=2)
+    with pytest.raises(ContradictionError):
+        solver.solve()
+    assert solver.stats.restarts == 2
+
+def test_initial_domains_are_honoured(road_tileset):
+    """Test that narrowed initial domains constrain the solution."""
+    full = road_tileset.full_mask
+    initial = [full] * 25
+    initial[12] = 1 << 3  # crossroads in the centre
+    tiles = WFCSolver(road_tileset, 5, 5, random.Random(0), initial=initial).solve()
+    assert tiles[12] == 3
+    assert_consistent(road_tileset, tiles, 5, 5)
+
+def test_backtracking_avoids_restarts():
+    """Test that trail backtracking solves a grid that restarting cannot."""
+    edges = [(a, b, c, d) for a in "wxyz" for b in "wxyz" for c in "wxyz" for d in "wxyz"]
+    tileset = Tileset.from_edges(random.Random(4).sample(edges, 30))
+    restarted = WFCSolver(tileset, 24, 24, random.Random(0), max_restarts=20,
+                          max_backtracks=0, max_local_resets=0)
+    with pytest.raises(ContradictionError):
+        restarted.solve()
+    solver = WFCSolver(tileset, 24, 24, random.Random(0), max_restarts=20)
+    tiles = solver.solve()
+    assert_consistent(tileset, tiles, 24, 24)
+    assert solver.stats.backtracks > 0
+    assert solver.stats.restarts == 0
+
+def test_regenerate_region(road_tileset):
+    """Test re-solving a window leaves the rest alone and meets it consistently."""
+    generator = WFCGenerator(road_tileset, seed=2)
+    map_data = generator.generate(20, 16)
+    before = map_data.layer(TERRAIN)[:]
+    rect = Rect(6, 5, 5, 4)
+    generator.regenerate(map_data, rect, margin=2, variant=3)
+    after = map_data.layer(TERRAIN)
+    window = rect.expand(2)
+    assert all(window.contains(i % 20, i // 20) for i in range(20 * 16) if before[i] != after[i])
+    assert_consistent(road_tileset, list(after), 20, 16)
+
+
+def test_regenerate_keeps_hand_edit():
+    """Test a kept crossroads block gets roads around it that end before the old map."""
+    caps = [("r", "g", "g", "g"), ("g", "r", "g", "g"), ("g", "g", "r", "g"),
+            ("g", "g", "g", "r")]
+    tileset = Tileset.from_edges([
+        ("g", "g", "g", "g"), ("g", "r", "g", "r"), ("r", "g", "r", "g"),
+        ("r", "r", "r", "r")] + caps, weights=[4, 1, 1, 0.5, 0.2, 0.2, 0.2, 0.2])
+    generator = WFCGenerator(tileset, seed=2)
+    map_data = generator.generate(20, 16)
+    before = map_data.layer(TERRAIN)[:]
+    rect = Rect(6, 5, 5, 4)
+    map_data.fill(TERRAIN, 3, *rect)
+    generator.regenerate(map_data, rect, margin=2, keep=True)
+    terrain = map_data.layer(TERRAIN)
+    assert set(map_data.region(TERRAIN, *rect).tobytes()) == {3}
+    window = rect.expand(2)
+    assert all(window.contains(i % 20, i // 20) for i in range(20 * 16) if before[i] != terrain[i])
+    assert_consistent(tileset, list(terrain), 20, 16)
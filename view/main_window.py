@@ -0,0 +1,146 @@
+"""Main window: run a generator as a job with a progress bar, cancel button and live preview.
+
+Jobs (:mod:`model.jobs`) call back from their own thread.  :class:`JobRunner`
+turns those callbacks into Qt signals; a signal emitted from another thread
+is queued to receivers in the GUI thread, so widgets are only ever touched
+there and the window stays responsive while a map generates.
+"""
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtWidgets import (QComboBox, QHBoxLayout, QLabel, QMainWindow, QProgressBar,
+                             QPushButton, QSpinBox, QVBoxLayout, QWidget)
+
+from model.image_io import grey_levels
+from model.jobs import Job
+
+
+class JobRunner(QObject):
+    """Runs one generation job at a time and re-emits its callbacks as signals.
+
+    Starting a job cancels the previous one; signals from a superseded job
+    are dropped.
+    """
+
+    progress = pyqtSignal(float)
+    preview = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.job = None
+
+    @property
+    def running(self):
+        return self.job is not None and not self.job.done
+
+    def start(self, generator, width, height):
+        """Cancel any running job and generate a ``width`` x ``height`` map with ``generator``."""
+        self.cancel()
+        job = self.job = generator.job(width, height)
+        job.on_progress = self._relay(job, self.progress.emit)
+        job.on_preview = self._relay(job, self.preview.emit)
+        job.on_finished = self._relay(job, self._finished)
+        job.start()
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def _relay(self, job, emit):
+        def relay(value):
+            if job is self.job:
+                emit(value)
+        return relay
+
+    def _finished(self, job):
+        if job.state == Job.FINISHED:
+            self.finished.emit(job.result)
+        elif job.state == Job.CANCELLED:
+            self.cancelled.emit()
+        else:
+            self.failed.emit(f"{type(job.error).__name__}: {job.error}")
+
+
+class MainWindow(QMainWindow):
+    """Pick a generator, seed and size; generate with progress, previews and cancel.
+
+    ``generators`` maps names to factories taking a seed.
+    """
+
+    def __init__(self, generators, size=256):
+        super().__init__()
+        self.generators = generators
+        self.runner = JobRunner(self)
+        self._init_ui(size)
+        self.runner.progress.connect(self.on_progress)
+        self.runner.preview.connect(self.show_map)
+        self.runner.finished.connect(self.on_finished)
+        self.runner.cancelled.connect(lambda: self.on_stopped("Cancelled"))
+        self.runner.failed.connect(lambda message: self.on_stopped(f"Failed: {message}"))
+
+    def _init_ui(self, size):
+        self.generator_box = QComboBox()
+        self.generator_box.addItems(sorted(self.generators))
+        self.seed_box = QSpinBox()
+        self.seed_box.setRange(0, 2 ** 31 - 1)
+        self.size_box = QSpinBox()
+        self.size_box.setRange(16, 4096)
+        self.size_box.setValue(size)
+        self.generate_button = QPushButton("Generate")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.generate_button.clicked.connect(self.generate)
+        self.cancel_button.clicked.connect(self.runner.cancel)
+
+        controls = QHBoxLayout()
+        for widget in (self.generator_box, self.seed_box, self.size_box,
+                       self.generate_button, self.cancel_button):
+            controls.addWidget(widget)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.map_label = QLabel()
+        self.map_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.map_label.setMinimumSize(512, 512)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.map_label, 1)
+        central = QWidget()
+        central.setLayout(layout)
+        self.setCentralWidget(central)
+        self.setWindowTitle("InfiniteWorlds")
+
+    def generate(self):
+        name = self.generator_box.currentText()
+        size = self.size_box.value()
+        self.progress_bar.setValue(0)
+        self.generate_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.statusBar().showMessage(f"Generating {name} {size}x{size}...")
+        self.runner.start(self.generators[name](self.seed_box.value()), size, size)
+
+    def on_progress(self, fraction):
+        self.progress_bar.setValue(int(fraction * 1000))
+
+    def on_finished(self, map_data):
+        self.show_map(map_data)
+        self.on_stopped(f"Done in {self.runner.job.elapsed:.2f} s")
+
+    def on_stopped(self, message):
+        self.generate_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.statusBar().showMessage(message)
+
+    def show_map(self, map_data):
+        """Draw the main layer of ``map_data`` (a finished map or a preview) in grey."""
+        _, levels = grey_levels(map_data)
+        image = QImage(levels, map_data.width, map_data.height, map_data.width,
+                       QImage.Format.Format_Grayscale8).copy()
+        pixmap = QPixmap.fromImage(image).scaled(
+            self.map_label.size(), Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.FastTransformation)
+        self.map_label.setPixmap(pixmap)